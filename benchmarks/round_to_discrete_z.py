@@ -0,0 +1,91 @@
+"""
+Benchmark RoundToDiscreteZPass on circuits with many rotations.
+
+Compares the batched pass against the original one-replacement-per-op
+implementation and checks that both produce the same circuit.
+
+    python benchmarks/round_to_discrete_z.py --rotations 100000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.rounding import RoundToDiscreteZPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CircuitGate
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import IdentityGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SdgGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import ZGate
+from bqskit.ir.operation import Operation
+
+
+def legacy_run(circuit: Circuit, synthesis_epsilon: float) -> None:
+    """The original per-operation implementation of the pass."""
+    residues = [
+        [IdentityGate()], [TGate()], [SGate()], [SGate(), TGate()],
+        [ZGate()], [SdgGate(), TdgGate()], [SdgGate()], [TdgGate()],
+    ]
+    for cycle, op in circuit.operations_with_cycles(reverse=True):
+        if not isinstance(op.gate, RZGate):
+            continue
+        angle = op.params[0] % (2 * np.pi)
+        value = np.round(angle / (np.pi / 4))
+        if abs(angle - value * np.pi / 4) > synthesis_epsilon:
+            continue
+        subcircuit = Circuit(1)
+        for gate in residues[int(value) % 8]:
+            subcircuit.append_gate(gate, (0,))
+        new_op = Operation(CircuitGate(subcircuit), op.location)
+        circuit.replace((cycle, op.location[0]), new_op)
+
+
+def build_circuit(num_rotations: int, seed: int) -> Circuit:
+    rng = np.random.default_rng(seed)
+    circuit = Circuit(8)
+    offsets = [0, 0, 0, 1e-10, 0.3]
+    for i in range(num_rotations):
+        q = int(rng.integers(8))
+        angle = rng.integers(-16, 16) * np.pi / 4 + rng.choice(offsets)
+        circuit.append_gate(RZGate(), q, [angle])
+        if i % 4 == 0:
+            circuit.append_gate(CNOTGate(), (q, (q + 1) % 8))
+    return circuit
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rotations', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    circuit = build_circuit(args.rotations, args.seed)
+    legacy, batched = circuit.copy(), circuit.copy()
+
+    start = time.perf_counter()
+    legacy_run(legacy, 1e-8)
+    legacy_time = time.perf_counter() - start
+
+    data = PassData(batched)
+    start = time.perf_counter()
+    asyncio.run(RoundToDiscreteZPass(1e-8).run(batched, data))
+    batched_time = time.perf_counter() - start
+
+    assert legacy == batched
+    assert all(
+        a.gate == b.gate and a.location == b.location
+        for a, b in zip(legacy, batched)
+    )
+    print(f'{args.rotations} rotations')
+    print(f'  legacy:  {legacy_time:8.3f} s')
+    print(f'  batched: {batched_time:8.3f} s')
+    print(f'  speedup: {legacy_time / batched_time:8.1f}x')
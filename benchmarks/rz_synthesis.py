@@ -0,0 +1,83 @@
+"""
+Benchmark approximate RZ synthesis.
+
+Reports the per-rotation latency of uncached synthesis over random angles
+at several precisions, and the cache hit rate and per-rotation latency of
+RZtoCliffordTSynthesisPass on a circuit that repeats a few angles, as in
+QFT or layered variational circuits.
+
+    python benchmarks/rz_synthesis.py --rotations 50
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.gridsynth import rz_cache
+from bqskit.ft.cliffordt.gridsynth import RZtoCliffordTSynthesisPass
+from bqskit.ft.cliffordt.gridsynth import synthesize_rz
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+
+
+def bench_latency(rotations: int, epsilon: float, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    times, t_counts = [], []
+    for angle in rng.uniform(-np.pi, np.pi, rotations):
+        start = time.perf_counter()
+        gates = synthesize_rz(angle, epsilon, None)
+        times.append(time.perf_counter() - start)
+        t_counts.append(sum(isinstance(g, (TGate, TdgGate)) for g in gates))
+    print(
+        f'epsilon={epsilon:.0e}'
+        f'  median={np.median(times) * 1e3:8.2f} ms'
+        f'  max={np.max(times) * 1e3:8.2f} ms'
+        f'  mean T-count={np.mean(t_counts):6.1f}',
+    )
+
+
+def bench_pass(num_qudits: int, layers: int, epsilon: float) -> None:
+    # QFT-like structure: every layer reuses the same controlled phases
+    circuit = Circuit(num_qudits)
+    for _ in range(layers):
+        for q in range(num_qudits - 1):
+            circuit.append_gate(CNOTGate(), (q, q + 1))
+            circuit.append_gate(RZGate(), q + 1, [np.pi / 2 ** (q + 2)])
+            circuit.append_gate(CNOTGate(), (q, q + 1))
+    rotations = circuit.count(RZGate())
+
+    rz_cache.clear()
+    with Compiler(num_workers=1) as compiler:
+        start = time.perf_counter()
+        _, data = compiler.compile(
+            circuit,
+            [RZtoCliffordTSynthesisPass(epsilon)],
+            request_data=True,
+        )
+        elapsed = time.perf_counter() - start
+    counts = data['rz_synthesis_cache']
+    total = counts['hits'] + counts['misses']
+    print(
+        f'{rotations} rotations  {elapsed / rotations * 1e3:8.2f} ms each'
+        f'  hit rate={counts["hits"] / total:.3f}',
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rotations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('Uncached synthesis of random angles:')
+    for epsilon in [1e-3, 1e-6, 1e-10, 1e-15]:
+        bench_latency(args.rotations, epsilon, args.seed)
+
+    print('RZtoCliffordTSynthesisPass on a repeated-angle circuit:')
+    bench_pass(num_qudits=6, layers=20, epsilon=1e-10)
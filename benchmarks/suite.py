@@ -0,0 +1,513 @@
+"""
+Benchmark the Clifford+T workflows and passes.
+
+Each case runs in a fresh interpreter, so its peak RSS is its own, and
+reports the wall time of its passes, without the compiler's startup,
+its peak RSS, output T-count, the number of output gates outside
+Clifford+T and RZ, and the profile of each top-level pass (see
+bqskit.ft.cliffordt.profiling) as one JSON object.
+Every case is seeded and runs offline.
+
+The cases cover RoundToDiscreteZPass, the Clifford replacement rules,
+the search synthesis workflow, and the four CliffordTModel workflows at
+optimization levels 1 to 4, on QFT, ripple-carry adder, random
+Clifford+RZ and Trotterized Ising circuits of growing size.
+
+The startup case times `import bqskit.ft` and building a CliffordTModel
+in fresh interpreters, apart from the bqskit modules the model needs,
+and fails if the import takes longer than --startup-limit.
+
+    python benchmarks/suite.py --suite quick --output baseline.json
+    python benchmarks/suite.py --suite quick --baseline baseline.json
+
+With --baseline, the results are compared to an earlier run and the
+script exits with status 1 if any case got slower or used more memory
+by more than the tolerance, or if its T-count or its number of gates
+outside Clifford+T and RZ grew. Those gates hide T gates the T-count
+does not see, so a workflow that leaves them is not a T-count win.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import re
+import resource
+import subprocess
+import sys
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.basepass import BasePass
+from bqskit.ft.cliffordt.cliffordtmodel import default_workflow
+from bqskit.ft.cliffordt.defaultworkflow import build_search_synthesis_workflow
+from bqskit.ft.cliffordt.defaultworkflow import clifford_replace
+from bqskit.ft.cliffordt.profiling import profile_workflow
+from bqskit.ft.cliffordt.resources import estimate_resources
+from bqskit.ft.cliffordt.rounding import RoundToDiscreteZPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.passes import GroupSingleQuditGatePass
+from bqskit.passes import SetRandomSeedPass
+from bqskit.passes import UnfoldPass
+from bqskit.qis.state import StateSystem
+from bqskit.qis.state import StateVector
+
+
+# Circuit families
+
+
+def qft(num_qudits: int) -> Circuit:
+    """The quantum Fourier transform, with controlled phases as RZs."""
+    circuit = Circuit(num_qudits)
+    for i in range(num_qudits):
+        circuit.append_gate(HGate(), i)
+        for j in range(i + 1, num_qudits):
+            angle = np.pi / 2 ** (j - i)
+            circuit.append_gate(RZGate(), i, [angle / 2])
+            circuit.append_gate(CNOTGate(), (j, i))
+            circuit.append_gate(RZGate(), i, [-angle / 2])
+            circuit.append_gate(CNOTGate(), (j, i))
+            circuit.append_gate(RZGate(), j, [angle / 2])
+    for i in range(num_qudits // 2):
+        circuit.append_gate(CNOTGate(), (i, num_qudits - 1 - i))
+        circuit.append_gate(CNOTGate(), (num_qudits - 1 - i, i))
+        circuit.append_gate(CNOTGate(), (i, num_qudits - 1 - i))
+    return circuit
+
+
+def _toffoli(circuit: Circuit, a: int, b: int, c: int) -> None:
+    """Append a Toffoli gate in its 7 T gate Clifford+T form."""
+    circuit.append_gate(HGate(), c)
+    circuit.append_gate(CNOTGate(), (b, c))
+    circuit.append_gate(TdgGate(), c)
+    circuit.append_gate(CNOTGate(), (a, c))
+    circuit.append_gate(TGate(), c)
+    circuit.append_gate(CNOTGate(), (b, c))
+    circuit.append_gate(TdgGate(), c)
+    circuit.append_gate(CNOTGate(), (a, c))
+    circuit.append_gate(TGate(), b)
+    circuit.append_gate(TGate(), c)
+    circuit.append_gate(HGate(), c)
+    circuit.append_gate(CNOTGate(), (a, b))
+    circuit.append_gate(TGate(), a)
+    circuit.append_gate(TdgGate(), b)
+    circuit.append_gate(CNOTGate(), (a, b))
+
+
+def adder(num_qudits: int) -> Circuit:
+    """A Cuccaro ripple-carry adder on as many bits as fit."""
+    bits = max((num_qudits - 2) // 2, 1)
+    circuit = Circuit(2 * bits + 2)
+    # Qudit 0 is the carry in, a_i is 2i + 1, b_i is 2i + 2, last is out
+    a = [2 * i + 1 for i in range(bits)]
+    b = [2 * i + 2 for i in range(bits)]
+    carry = [0] + a
+
+    def maj(x: int, y: int, z: int) -> None:
+        circuit.append_gate(CNOTGate(), (z, y))
+        circuit.append_gate(CNOTGate(), (z, x))
+        _toffoli(circuit, x, y, z)
+
+    def uma(x: int, y: int, z: int) -> None:
+        _toffoli(circuit, x, y, z)
+        circuit.append_gate(CNOTGate(), (z, x))
+        circuit.append_gate(CNOTGate(), (x, y))
+
+    for i in range(bits):
+        maj(carry[i], b[i], a[i])
+    circuit.append_gate(CNOTGate(), (a[-1], 2 * bits + 1))
+    for i in reversed(range(bits)):
+        uma(carry[i], b[i], a[i])
+    return circuit
+
+
+def random_clifford_rz(num_qudits: int, seed: int = 0) -> Circuit:
+    """Random H, S, CNOT and arbitrary RZ gates, ten per qudit."""
+    rng = np.random.default_rng(seed)
+    circuit = Circuit(num_qudits)
+    for _ in range(10 * num_qudits):
+        kind = rng.integers(4)
+        q = int(rng.integers(num_qudits))
+        if kind == 0:
+            circuit.append_gate(HGate(), q)
+        elif kind == 1:
+            circuit.append_gate(SGate(), q)
+        elif kind == 2 and num_qudits > 1:
+            r = (q + 1 + int(rng.integers(num_qudits - 1))) % num_qudits
+            circuit.append_gate(CNOTGate(), (q, r))
+        else:
+            circuit.append_gate(RZGate(), q, [rng.uniform(-np.pi, np.pi)])
+    return circuit
+
+
+def trotter(num_qudits: int, steps: int = 2, dt: float = 0.1) -> Circuit:
+    """First-order Trotter steps of a transverse-field Ising chain."""
+    circuit = Circuit(num_qudits)
+    for _ in range(steps):
+        for q in range(num_qudits - 1):
+            circuit.append_gate(CNOTGate(), (q, q + 1))
+            circuit.append_gate(RZGate(), q + 1, [2 * dt])
+            circuit.append_gate(CNOTGate(), (q, q + 1))
+        for q in range(num_qudits):
+            circuit.append_gate(HGate(), q)
+            circuit.append_gate(RZGate(), q, [2 * 0.7 * dt])
+            circuit.append_gate(HGate(), q)
+    return circuit
+
+
+families: dict[str, Callable[[int], Circuit]] = {
+    'qft': qft,
+    'adder': adder,
+    'random': random_clifford_rz,
+    'trotter': trotter,
+}
+
+
+# Cases
+
+
+class Case(NamedTuple):
+    """A benchmark: what to run, on which circuit, at which level."""
+    kind: str
+    family: str
+    num_qudits: int
+    optimization_level: int = 1
+
+    @property
+    def name(self) -> str:
+        return (
+            f'{self.kind}/O{self.optimization_level}'
+            f'/{self.family}-{self.num_qudits}'
+        )
+
+    @staticmethod
+    def parse(name: str) -> Case:
+        match = re.fullmatch(r'(\S+)/O(\d)/(\w+)-(\d+)', name)
+        if match is None:
+            raise ValueError(f'Invalid case name: {name}.')
+        kind, level, family, num_qudits = match.groups()
+        if kind not in kinds or family not in families:
+            raise ValueError(f'Unknown case: {name}.')
+        return Case(kind, family, int(num_qudits), int(level))
+
+
+kinds = (
+    'rounding', 'replacement', 'search',
+    'circuit', 'unitary', 'statemap', 'stateprep',
+)
+"""The passes and CliffordTModel target types benchmarked."""
+
+
+def build_cases(suite: str) -> list[Case]:
+    """Return the cases of the 'quick' or 'full' suite."""
+    full = suite == 'full'
+    levels = [1, 2, 3, 4]
+    cases = []
+    for family in families:
+        for n in ([32, 64, 128] if full else [32]):
+            cases.append(Case('rounding', family, n))
+            cases.append(Case('replacement', family, n))
+
+        for n in ([4, 6, 8] if full else [4]):
+            cases += [Case('circuit', family, n, level) for level in levels]
+
+        # Whole-target synthesis only scales to a few qudits, and the
+        # adder needs at least four
+        if family == 'adder':
+            continue
+        for n in ([2, 3] if full else [2]):
+            cases += [Case('search', family, n, level) for level in levels]
+            if family != 'qft':
+                continue
+            for kind in ['unitary', 'statemap', 'stateprep']:
+                # At the default epsilon, stateprep search runs until the
+                # timeout, so it is only in the full suite
+                if full:
+                    cases += [Case(kind, family, n, lvl) for lvl in levels]
+                elif kind != 'stateprep':
+                    cases.append(Case(kind, family, n, 1))
+    return cases
+
+
+def run_case(case: Case, seed: int, epsilon: float) -> dict[str, Any]:
+    """Run one case in this process and return its results."""
+    family = families[case.family]
+    circuit = family(case.num_qudits)
+    target: Any = None
+    passes: list[BasePass]
+
+    if case.kind == 'rounding':
+        passes = [RoundToDiscreteZPass(epsilon)]
+
+    elif case.kind == 'replacement':
+        passes = [GroupSingleQuditGatePass(), clifford_replace(), UnfoldPass()]
+
+    elif case.kind == 'search':
+        # Synthesize the family's unitary, as compile does for unitaries
+        circuit = Circuit.from_unitary(circuit.get_unitary())
+        passes = build_search_synthesis_workflow(
+            case.optimization_level, epsilon,
+        )
+
+    else:
+        utry = circuit.get_unitary()
+        if case.kind == 'unitary':
+            circuit = Circuit.from_unitary(utry)
+        elif case.kind == 'stateprep':
+            target = StateVector(utry[:, 0])
+        elif case.kind == 'statemap':
+            basis = np.eye(utry.shape[0])
+            target = StateSystem({
+                StateVector(basis[i]): StateVector(utry[:, i])
+                for i in range(2)
+            })
+        if target is not None:
+            circuit = Circuit(case.num_qudits)
+        passes = list(
+            default_workflow(case.kind, case.optimization_level, epsilon),
+        )
+
+    # As in compile, the registered workflows see the default model
+    data: dict[str, Any] = {}
+    if target is not None:
+        data['target'] = target
+
+    workflow = [SetRandomSeedPass(seed)] + profile_workflow(passes)
+    with Compiler(num_workers=1) as compiler:
+        task = compiler.submit(circuit, workflow, True, data=data)
+        out, out_data = compiler.result(task)
+
+    # Only the passes are timed, not the compiler's startup or transfers;
+    # records merged from windows are part of their top-level pass
+    profile = out_data['pass_profile']
+    elapsed = sum(
+        record['wall_time'] for record in profile
+        if 'window' not in record and 'seam' not in record
+    )
+
+    # The workers have exited, so their peak is in RUSAGE_CHILDREN
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    resources = estimate_resources(out)
+    return {
+        'case': case.name,
+        'seconds': elapsed,
+        'peak_rss_mb': peak_kb / 1024,
+        't_count': resources.t_count,
+        'rz_count': resources.rz_count,
+        'other_count': resources.other_count,
+        'num_operations': out.num_operations,
+        'input_operations': family(case.num_qudits).num_operations,
+        'passes': profile,
+    }
+
+
+startup_script = """
+import resource
+start = time.perf_counter()
+import bqskit.ft
+imported = time.perf_counter()
+import bqskit.compiler.machine
+import bqskit.compiler.registry
+import bqskit.ir.gates
+core = time.perf_counter()
+from bqskit.ft import CliffordTModel
+CliffordTModel({num_qudits})
+built = time.perf_counter()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(imported - start, core - imported, built - core, peak)
+"""
+"""Time the import, the bqskit modules the model needs, and the model."""
+
+
+def run_startup(num_qudits: int = 8, repeats: int = 5) -> dict[str, Any]:
+    """Time the startup in fresh interpreters, keeping the fastest run."""
+    script = startup_script.format(num_qudits=num_qudits)
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        runs.append([float(x) for x in output.split()])
+    imported, core, model, peak_kb = np.min(runs, axis=0)
+    return {
+        'case': 'startup',
+        'seconds': imported + model,
+        'import_seconds': imported,
+        'core_seconds': core,
+        'model_seconds': model,
+        'peak_rss_mb': peak_kb / 1024,
+        't_count': 0,
+        'rz_count': 0,
+        'other_count': 0,
+    }
+
+
+def run_isolated(case: Case, args: argparse.Namespace) -> dict[str, Any]:
+    """Run `case` in a fresh interpreter and return its results."""
+    command = [
+        sys.executable, __file__, '--case', case.name,
+        '--seed', str(args.seed), '--epsilon', str(args.epsilon),
+    ]
+    try:
+        output = subprocess.run(
+            command,
+            capture_output=True,
+            check=True,
+            text=True,
+            timeout=args.timeout,
+        ).stdout
+    except subprocess.TimeoutExpired:
+        return {'case': case.name, 'error': f'timeout after {args.timeout} s'}
+    except subprocess.CalledProcessError as e:
+        lines = e.stderr.strip().splitlines()
+        return {'case': case.name, 'error': lines[-1] if lines else str(e)}
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(
+    results: list[dict[str, Any]],
+    baseline: list[dict[str, Any]],
+    time_tolerance: float,
+    memory_tolerance: float,
+    startup_limit: float = 0.1,
+) -> list[str]:
+    """Return a description of every regression against `baseline`."""
+    previous = {r['case']: r for r in baseline if 'error' not in r}
+    regressions = []
+    for result in results:
+        name = result['case']
+        if name == 'startup':
+            # Startup takes milliseconds, so it is held to a fixed limit
+            if result['import_seconds'] > startup_limit:
+                regressions.append(
+                    f'{name}: import bqskit.ft took'
+                    f' {result["import_seconds"] * 1000:.0f} ms',
+                )
+            continue
+        if name not in previous:
+            continue
+        if 'error' in result:
+            regressions.append(f'{name}: {result["error"]}')
+            continue
+        old = previous[name]
+        if result['seconds'] > old['seconds'] * (1 + time_tolerance):
+            regressions.append(
+                f'{name}: {old["seconds"]:.2f} s -> {result["seconds"]:.2f} s',
+            )
+        if result['peak_rss_mb'] > old['peak_rss_mb'] * (1 + memory_tolerance):
+            regressions.append(
+                f'{name}: {old["peak_rss_mb"]:.0f} MB'
+                f' -> {result["peak_rss_mb"]:.0f} MB',
+            )
+        if result['t_count'] > old['t_count']:
+            regressions.append(
+                f'{name}: T-count {old["t_count"]} -> {result["t_count"]}',
+            )
+        if result['other_count'] > old.get('other_count', 0):
+            regressions.append(
+                f'{name}: other gates {old.get("other_count", 0)}'
+                f' -> {result["other_count"]}',
+            )
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--suite', choices=['quick', 'full'], default='quick')
+    parser.add_argument(
+        '--filter', default='',
+        help='Only run cases whose name matches this regular expression.',
+    )
+    parser.add_argument('--case', help='Run one case in this process.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--epsilon', type=float, default=1e-8)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', help='Write the results to this file.')
+    parser.add_argument('--baseline', help='Compare to this results file.')
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    parser.add_argument('--startup-limit', type=float, default=0.1)
+    parser.add_argument('--list', action='store_true')
+    args = parser.parse_args()
+
+    if args.case == 'startup':
+        print(json.dumps(run_startup()))
+        sys.exit(0)
+
+    if args.case is not None:
+        result = run_case(Case.parse(args.case), args.seed, args.epsilon)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    startup = re.search(args.filter, 'startup') is not None
+    cases = [
+        case for case in build_cases(args.suite)
+        if re.search(args.filter, case.name)
+    ]
+    if args.list:
+        print('\n'.join(['startup'] * startup + [c.name for c in cases]))
+        sys.exit(0)
+
+    results = []
+    if startup:
+        result = run_startup()
+        results.append(result)
+        print(
+            f'{"startup":32} import {result["import_seconds"] * 1000:.1f} ms'
+            f'  model {result["model_seconds"] * 1000:.1f} ms'
+            f'  (bqskit {result["core_seconds"] * 1000:.0f} ms)',
+        )
+
+    for case in cases:
+        result = run_isolated(case, args)
+        results.append(result)
+        if 'error' in result:
+            print(f'{case.name:32} error: {result["error"]}')
+        else:
+            print(
+                f'{case.name:32} {result["seconds"]:9.2f} s'
+                f' {result["peak_rss_mb"]:7.0f} MB'
+                f'  T={result["t_count"]:<6} other={result["other_count"]:<4}'
+                f' ops={result["num_operations"]}',
+            )
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'suite': args.suite,
+                'seed': args.seed,
+                'epsilon': args.epsilon,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(
+            results,
+            baseline,
+            args.time_tolerance,
+            args.memory_tolerance,
+            args.startup_limit,
+        )
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        sys.exit(1 if regressions else 0)
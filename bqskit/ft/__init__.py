@@ -1,12 +1,93 @@
 from __future__ import annotations
 
-from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
-from bqskit.ft.ftmodel import FaultTolerantModel
-from bqskit.ft.rules.replacement import ReplacementRule
+from importlib import import_module
+from typing import Any
+
+
+_lazy_imports = {
+    'BatchedSingleQubitPass': 'bqskit.ft.cliffordt.batching',
+    'BudgetedRotationSynthesisPass': 'bqskit.ft.cliffordt.budget',
+    'CachedSynthesisPass': 'bqskit.ft.cliffordt.blockcache',
+    'CheckpointPass': 'bqskit.ft.cliffordt.checkpoint',
+    'CliffordSynthesisPass': 'bqskit.ft.cliffordt.clifford',
+    'CliffordTCircuit': 'bqskit.ft.cliffordt.compact',
+    'CliffordTModel': 'bqskit.ft.cliffordt.cliffordtmodel',
+    'CliffordTOptions': 'bqskit.ft.cliffordt.options',
+    'CliffordTResources': 'bqskit.ft.cliffordt.resources',
+    'CliffordTSchedule': 'bqskit.ft.cliffordt.scheduling',
+    'CliffordTTemplate': 'bqskit.ft.cliffordt.template',
+    'EquivalenceVerificationPass': 'bqskit.ft.cliffordt.verification',
+    'FaultTolerantModel': 'bqskit.ft.ftmodel',
+    'ForEachUniqueBlockPass': 'bqskit.ft.cliffordt.blockcache',
+    'GilesSelingerSynthesisPass': 'bqskit.ft.cliffordt.gilesselinger',
+    'MagicStateSchedulingPass': 'bqskit.ft.cliffordt.scheduling',
+    'MatsumotoAmanoSynthesisPass': 'bqskit.ft.cliffordt.matsumotoamano',
+    'MeasureErrorPass': 'bqskit.ft.cliffordt.budget',
+    'PauliRotationCircuit': 'bqskit.ft.cliffordt.paulirotation',
+    'PauliRotationPass': 'bqskit.ft.cliffordt.paulirotation',
+    'PeepholeOptimizationPass': 'bqskit.ft.cliffordt.peephole',
+    'PhaseFoldingPass': 'bqskit.ft.cliffordt.phasefolding',
+    'ProfiledPass': 'bqskit.ft.cliffordt.profiling',
+    'RZtoCliffordTSynthesisPass': 'bqskit.ft.cliffordt.gridsynth',
+    'ReplacementRule': 'bqskit.ft.rules.replacement',
+    'ReplacementRuleSet': 'bqskit.ft.rules.replacement',
+    'ResourceEstimationPass': 'bqskit.ft.cliffordt.resources',
+    'VerificationResult': 'bqskit.ft.cliffordt.verification',
+    'WindowedCompilationPass': 'bqskit.ft.cliffordt.windowed',
+    'compile_template': 'bqskit.ft.cliffordt.template',
+    'estimate_resources': 'bqskit.ft.cliffordt.resources',
+    'profile_workflow': 'bqskit.ft.cliffordt.profiling',
+    'resume_compilation': 'bqskit.ft.cliffordt.checkpoint',
+    'schedule_magic_states': 'bqskit.ft.cliffordt.scheduling',
+    'verify_equivalence': 'bqskit.ft.cliffordt.verification',
+}
+"""The module each public name is imported from on first access."""
+
+
+def __getattr__(name: str) -> Any:
+    # Lazy imports
+    if name in _lazy_imports:
+        value = getattr(import_module(_lazy_imports[name]), name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f'module {__name__} has no attribute {name}')
 
 
 __all__ = [
+    'BatchedSingleQubitPass',
+    'BudgetedRotationSynthesisPass',
+    'CachedSynthesisPass',
+    'CheckpointPass',
+    'CliffordSynthesisPass',
+    'CliffordTCircuit',
     'CliffordTModel',
+    'CliffordTOptions',
+    'CliffordTResources',
+    'CliffordTSchedule',
+    'CliffordTTemplate',
+    'EquivalenceVerificationPass',
     'FaultTolerantModel',
+    'ForEachUniqueBlockPass',
+    'GilesSelingerSynthesisPass',
+    'MagicStateSchedulingPass',
+    'MatsumotoAmanoSynthesisPass',
+    'MeasureErrorPass',
+    'PauliRotationCircuit',
+    'PauliRotationPass',
+    'PeepholeOptimizationPass',
+    'PhaseFoldingPass',
+    'ProfiledPass',
+    'RZtoCliffordTSynthesisPass',
     'ReplacementRule',
+    'ReplacementRuleSet',
+    'ResourceEstimationPass',
+    'VerificationResult',
+    'WindowedCompilationPass',
+    'compile_template',
+    'estimate_resources',
+    'profile_workflow',
+    'resume_compilation',
+    'schedule_magic_states',
+    'verify_equivalence',
 ]
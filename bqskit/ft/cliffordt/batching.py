@@ -0,0 +1,190 @@
+"""
+This module implements batched execution over single-qubit blocks.
+
+Late in the Clifford+T workflows, every single-qubit gate group is run
+through a small pass, such as a replacement rule lookup or a ZXZXZ
+decomposition, whose result depends only on the group's unitary. Running
+these as one runtime task per group spends most of the time on task
+overhead and serialization. Here the groups' unitaries are stacked into
+one array, deduplicated with a single `np.unique`, and split into chunks
+that each worker processes in a tight loop.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.machine import MachineModel
+from bqskit.compiler.passdata import PassData
+from bqskit.compiler.workflow import Workflow
+from bqskit.compiler.workflow import WorkflowLike
+from bqskit.ft.rules.replacement import _distance
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.unitary import ConstantUnitaryGate
+from bqskit.ir.operation import Operation
+from bqskit.ir.point import CircuitPoint
+from bqskit.runtime import get_runtime
+
+
+_logger = logging.getLogger(__name__)
+
+
+def _is_single_qubit(op: Operation) -> bool:
+    return op.num_qudits == 1
+
+
+async def _run_chunk(
+    workflow: Workflow,
+    utrys: npt.NDArray[np.complex128],
+    model: MachineModel,
+) -> list[tuple[Circuit, float] | None]:
+    """
+    Run `workflow` on a one-qubit circuit for each unitary in `utrys`.
+
+    Returns the resulting circuits and their distances from the unitaries,
+    with None for those the workflow left unchanged.
+    """
+    results: list[tuple[Circuit, float] | None] = []
+    for utry in utrys:
+        gate = ConstantUnitaryGate(utry)
+        circuit = Circuit(1)
+        circuit.append_gate(gate, 0)
+        data = PassData(circuit)
+        data.model = model
+        await workflow.run(circuit, data)
+        if circuit.num_operations == 1 and circuit[0, 0].gate is gate:
+            results.append(None)
+        else:
+            distance = _distance(circuit.get_unitary(), utry)
+            results.append((circuit, distance))
+    return results
+
+
+class BatchedSingleQubitPass(BasePass):
+    """
+    The BatchedSingleQubitPass class.
+
+    Run a workflow on every single-qubit block, as
+    :class:`ForEachBlockPass` would, but in chunks. The workflow sees a
+    one-qubit circuit holding the block's unitary as a single
+    :class:`ConstantUnitaryGate`, so it must only depend on that unitary.
+    Blocks with equal unitaries are run once, and blocks the workflow
+    leaves unchanged are kept as they are. The distance of each replaced
+    block from its unitary is added to the error in the pass data. The
+    number of blocks, distinct unitaries and replaced blocks are added
+    up in the pass data under `batched_single_qubit`.
+    """
+
+    def __init__(
+        self,
+        loop_body: WorkflowLike,
+        collection_filter: Callable[[Operation], bool] | None = None,
+        chunk_size: int = 1024,
+    ) -> None:
+        """
+        Construct a BatchedSingleQubitPass.
+
+        Args:
+            loop_body (WorkflowLike): The workflow to run on every block.
+
+            collection_filter (Callable[[Operation], bool] | None): A
+                predicate choosing the single-qubit operations to run the
+                workflow on. Defaults to all of them. (Default: None)
+
+            chunk_size (int): The number of distinct blocks sent to a
+                worker at once. If all blocks fit in one chunk, they are
+                run in this task. (Default: 1024)
+        """
+        if collection_filter is not None and not callable(collection_filter):
+            raise TypeError(
+                'Expected callable for collection_filter'
+                f', got {type(collection_filter)}.',
+            )
+
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError(
+                f'Expected positive integer for chunk_size, got {chunk_size}.',
+            )
+
+        self.workflow = Workflow(loop_body)
+        self.collection_filter = collection_filter or _is_single_qubit
+        self.chunk_size = chunk_size
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        points: list[CircuitPoint] = []
+        locations: list[Sequence[int]] = []
+        utrys = []
+        for cycle, op in circuit.operations_with_cycles():
+            if op.num_qudits != 1 or circuit.radixes[op.location[0]] != 2:
+                continue
+            if not self.collection_filter(op):
+                continue
+            points.append(CircuitPoint(cycle, op.location[0]))
+            locations.append(op.location)
+            utrys.append(op.get_unitary())
+
+        if len(points) == 0:
+            return
+
+        # Deduplicate on the exact bytes of each unitary
+        stacked = np.ascontiguousarray(utrys, dtype=np.complex128)
+        rows = stacked.reshape(len(points), -1).view(np.dtype((np.void, 64)))
+        _, firsts, inverse = np.unique(
+            rows.ravel(),
+            return_index=True,
+            return_inverse=True,
+        )
+        distinct = stacked[firsts]
+
+        model = MachineModel(1, gate_set=data.gate_set)
+        chunks = [
+            distinct[i:i + self.chunk_size]
+            for i in range(0, len(distinct), self.chunk_size)
+        ]
+        if len(chunks) == 1:
+            results = await _run_chunk(self.workflow, chunks[0], model)
+        else:
+            chunk_results = await get_runtime().map(
+                _run_chunk,
+                [self.workflow] * len(chunks),
+                chunks,
+                [model] * len(chunks),
+            )
+            results = [r for chunk in chunk_results for r in chunk]
+
+        # Blocks with the same unitary share one gate
+        replacements = [
+            None if result is None
+            else (CircuitGate(result[0], True), result[0].params, result[1])
+            for result in results
+        ]
+        replace_points, replace_ops = [], []
+        for point, location, index in zip(points, locations, inverse):
+            replacement = replacements[index]
+            if replacement is None:
+                continue
+            gate, params, distance = replacement
+            replace_points.append(point)
+            replace_ops.append(Operation(gate, location, params))
+            data.update_error_mul(distance)
+
+        circuit.batch_replace(replace_points, replace_ops)
+        counts = data.setdefault(
+            'batched_single_qubit',
+            {'blocks': 0, 'distinct': 0, 'replaced': 0},
+        )
+        counts['blocks'] += len(points)
+        counts['distinct'] += len(distinct)
+        counts['replaced'] += len(replace_ops)
+        _logger.debug(
+            f'Replaced {len(replace_ops)} of {len(points)} single-qubit'
+            f' blocks from {len(distinct)} distinct unitaries'
+            f' in {len(chunks)} chunks.',
+        )
@@ -0,0 +1,399 @@
+"""
+This module implements block synthesis with reuse of equivalent blocks.
+
+Structured circuits repeat the same block unitary many times, often up to
+global phase and an ordering of the block's qudits. Blocks are keyed by a
+fingerprint of their unitary after removing both: the qudits are ordered
+to minimize the rounded, phase-normalized entries, and the fingerprint is
+a 128-bit hash of those entries, so it agrees across worker processes.
+Unitaries that round to the same entries differ by far less than any
+synthesis epsilon, so equal fingerprints are treated as equal blocks.
+
+Synthesized circuits are kept in that canonical qudit order and relabeled
+for every block that reuses them. :class:`ForEachUniqueBlockPass` runs a
+workflow once per distinct block of a circuit, spreading only the distinct
+blocks over the workers, and :class:`CachedSynthesisPass` reuses results
+across runs within a process.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from itertools import permutations
+from typing import Any
+from typing import Hashable
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.compiler.workflow import Workflow
+from bqskit.compiler.workflow import WorkflowLike
+from bqskit.ft.cliffordt.checkpoint import finished_block
+from bqskit.ft.cliffordt.checkpoint import save_block
+from bqskit.ft.cliffordt.gridsynth import SynthesisCache
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.operation import Operation
+from bqskit.ir.point import CircuitPoint
+from bqskit.passes.control.foreach import default_collection_filter
+from bqskit.passes.control.foreach import ForEachBlockPass
+from bqskit.qis.graph import CouplingGraph
+from bqskit.qis.unitary.unitarymatrix import UnitaryMatrix
+from bqskit.utils.typing import is_real_number
+
+
+_logger = logging.getLogger(__name__)
+
+block_cache: SynthesisCache[tuple[Operation, ...]] = SynthesisCache(1024)
+"""The in-process cache shared by every CachedSynthesisPass."""
+
+
+def block_fingerprint(
+    utry: npt.ArrayLike,
+    radixes: Sequence[int],
+    decimals: int = 10,
+    max_permuted: int = 4,
+) -> tuple[bytes, tuple[int, ...]]:
+    """
+    Return a fingerprint of `utry` that ignores phase and qudit order.
+
+    Args:
+        utry (npt.ArrayLike): The unitary to fingerprint.
+
+        radixes (Sequence[int]): The radixes of its qudits.
+
+        decimals (int): The number of decimals entries are rounded to.
+            (Default: 10)
+
+        max_permuted (int): Only unitaries on at most this many qudits
+            are canonicalized over qudit orderings. (Default: 4)
+
+    Returns:
+        (tuple[bytes, tuple[int, ...]]): The fingerprint, and the
+            ordering `p` it was computed in: canonical qudit `i` is qudit
+            `p[i]` of `utry`.
+    """
+    utry = np.asarray(utry, dtype=np.complex128)
+    num_qudits = len(radixes)
+    tensor = utry.reshape(tuple(radixes) * 2)
+    threshold = 0.5 / np.sqrt(utry.shape[0])
+
+    if num_qudits <= max_permuted:
+        orders: Any = permutations(range(num_qudits))
+    else:
+        orders = [tuple(range(num_qudits))]
+
+    best: tuple[bytes, tuple[int, ...]] | None = None
+    for order in orders:
+        axes = list(order) + [num_qudits + q for q in order]
+        flat = tensor.transpose(axes).reshape(-1)
+
+        # Remove the global phase using the first entry that is large
+        pivot = flat[np.argmax(np.abs(flat) > threshold)]
+        flat = flat * (np.conj(pivot) / np.abs(pivot))
+
+        scaled = np.round(flat.view(np.float64) * 10.0 ** decimals)
+        radix_bytes = bytes(radixes[q] for q in order)
+        data = radix_bytes + scaled.astype(np.int64).tobytes()
+        if best is None or data < best[0]:
+            best = (data, tuple(order))
+
+    assert best is not None
+    digest = hashlib.blake2b(best[0], digest_size=16).digest()
+    return digest, best[1]
+
+
+def _canonical_edges(
+    graph: CouplingGraph,
+    location: Sequence[int],
+    order: Sequence[int],
+) -> frozenset[tuple[int, int]]:
+    """Return the coupling among `location`, in canonical qudit labels."""
+    edges = set()
+    for i in range(len(order)):
+        for j in range(i + 1, len(order)):
+            a, b = location[order[i]], location[order[j]]
+            if (min(a, b), max(a, b)) in graph:
+                edges.add((i, j))
+    return frozenset(edges)
+
+
+def _to_canonical(
+    ops: Sequence[Operation],
+    order: Sequence[int],
+) -> tuple[Operation, ...]:
+    """Relabel `ops` from a block's qudits to canonical qudits."""
+    canonical = {q: i for i, q in enumerate(order)}
+    return tuple(
+        Operation(op.gate, [canonical[q] for q in op.location], op.params)
+        for op in ops
+    )
+
+
+def _from_canonical(
+    ops: Sequence[Operation],
+    order: Sequence[int],
+    radixes: Sequence[int],
+) -> Circuit:
+    """Build a block's circuit from `ops` on canonical qudits."""
+    circuit = Circuit(len(radixes), radixes)
+    for op in ops:
+        location = [order[q] for q in op.location]
+        circuit.append(Operation(op.gate, location, op.params))
+    return circuit
+
+
+class CachedSynthesisPass(BasePass):
+    """
+    The CachedSynthesisPass class.
+
+    Run a synthesis workflow on a block, reusing the result of an earlier
+    block with the same unitary up to global phase and qudit order. The
+    cache is per process and least-recently-used. Each run records a hit
+    or miss in the pass data under `block_synthesis_cache`. Blocks can
+    also be saved to a checkpoint directory, to be reused after a crash.
+    """
+
+    def __init__(
+        self,
+        synthesis: WorkflowLike,
+        synthesis_epsilon: float = 1e-8,
+        cache_size: int = 1024,
+        decimals: int = 10,
+        checkpoint: str | None = None,
+        checkpoint_interval: int = 16,
+    ) -> None:
+        """
+        Construct a CachedSynthesisPass.
+
+        Args:
+            synthesis (WorkflowLike): The synthesis workflow to run on
+                misses.
+
+            synthesis_epsilon (float): The epsilon of the synthesis
+                workflow. Results are only reused between passes with
+                the same epsilon. (Default: 1e-8)
+
+            cache_size (int): The number of blocks the process-wide
+                cache keeps at least. It grows to the largest size any
+                pass asks for, and is not used if this is 0.
+                (Default: 1024)
+
+            decimals (int): The number of decimals unitaries are rounded
+                to when fingerprinted. (Default: 10)
+
+            checkpoint (str | None): If given, a checkpoint directory that
+                synthesized blocks are saved to, and reused from across
+                processes and runs, see
+                :mod:`bqskit.ft.cliffordt.checkpoint`. (Default: None)
+
+            checkpoint_interval (int): The number of blocks each process
+                synthesizes between saves to `checkpoint`. (Default: 16)
+        """
+        if not is_real_number(synthesis_epsilon):
+            raise TypeError(
+                'Expected float for synthesis_epsilon'
+                f', got {type(synthesis_epsilon)}.',
+            )
+
+        if not isinstance(cache_size, int) or cache_size < 0:
+            raise ValueError(
+                'Expected non-negative integer for cache_size'
+                f', got {cache_size}.',
+            )
+
+        if not isinstance(decimals, int) or decimals <= 0:
+            raise ValueError(
+                f'Expected positive integer for decimals, got {decimals}.',
+            )
+
+        if checkpoint is not None and not isinstance(checkpoint, str):
+            raise TypeError(
+                f'Expected str for checkpoint, got {type(checkpoint)}.',
+            )
+
+        if not isinstance(checkpoint_interval, int) or checkpoint_interval < 1:
+            raise ValueError(
+                'Expected positive integer for checkpoint_interval'
+                f', got {checkpoint_interval}.',
+            )
+
+        self.workflow = Workflow(synthesis)
+        self.synthesis_epsilon = synthesis_epsilon
+        self.cache_size = cache_size
+        self.decimals = decimals
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        target = data.target
+        cached = self.cache_size > 0 or self.checkpoint is not None
+        if not isinstance(target, UnitaryMatrix) or not cached:
+            await self.workflow.run(circuit, data)
+            return
+
+        block_cache.reserve(self.cache_size)
+        fingerprint, order = block_fingerprint(
+            target,
+            circuit.radixes,
+            self.decimals,
+        )
+        location = list(range(circuit.num_qudits))
+        key: Hashable = (
+            fingerprint,
+            _canonical_edges(data.connectivity, location, order),
+            frozenset(data.gate_set),
+            self.synthesis_epsilon,
+            self.decimals,
+        )
+        counts = data.setdefault(
+            'block_synthesis_cache', {'hits': 0, 'misses': 0},
+        )
+
+        ops = block_cache.get(key) if self.cache_size > 0 else None
+        if ops is None and self.checkpoint is not None:
+            ops = finished_block(self.checkpoint, key)
+        if ops is not None:
+            counts['hits'] += 1
+            circuit.become(
+                _from_canonical(ops, order, circuit.radixes),
+                False,
+            )
+            return
+
+        counts['misses'] += 1
+        await self.workflow.run(circuit, data)
+        ops = _to_canonical(list(circuit), order)
+        if self.cache_size > 0:
+            block_cache.put(key, ops)
+        if self.checkpoint is not None:
+            save_block(self.checkpoint, key, ops, self.checkpoint_interval)
+
+
+class ForEachUniqueBlockPass(BasePass):
+    """
+    The ForEachUniqueBlockPass class.
+
+    Like :class:`ForEachBlockPass`, but blocks with the same unitary up to
+    global phase and qudit order, and the same coupling, are only run
+    through the workflow once. The rest reuse that result, relabeled.
+    Blocks reused this way are added to the hits, and the blocks' own
+    `block_synthesis_cache` counts are summed, in the pass data under
+    `block_synthesis_cache`.
+    """
+
+    def __init__(
+        self,
+        loop_body: WorkflowLike,
+        calculate_error_bound: bool = False,
+        decimals: int = 10,
+    ) -> None:
+        """
+        Construct a ForEachUniqueBlockPass.
+
+        Args:
+            loop_body (WorkflowLike): The workflow to execute on every
+                distinct block.
+
+            calculate_error_bound (bool): See :class:`ForEachBlockPass`.
+                A reused block counts the error of its original.
+                (Default: False)
+
+            decimals (int): The number of decimals unitaries are rounded
+                to when fingerprinted. (Default: 10)
+        """
+        if not isinstance(decimals, int) or decimals <= 0:
+            raise ValueError(
+                f'Expected positive integer for decimals, got {decimals}.',
+            )
+
+        self.workflow = Workflow(loop_body)
+        self.calculate_error_bound = calculate_error_bound
+        self.decimals = decimals
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        connectivity = data.connectivity
+        blocks: list[tuple[int, Operation, tuple[int, ...], int]] = []
+        groups: dict[Hashable, int] = {}
+        representatives = Circuit(circuit.num_qudits, circuit.radixes)
+        points: list[CircuitPoint] = []
+        orders: list[tuple[int, ...]] = []
+        for cycle, op in circuit.operations_with_cycles():
+            if not default_collection_filter(op):
+                continue
+
+            radixes = [circuit.radixes[q] for q in op.location]
+            fingerprint, order = block_fingerprint(
+                op.get_unitary(),
+                radixes,
+                self.decimals,
+            )
+            edges = _canonical_edges(connectivity, op.location, order)
+            group = groups.setdefault((fingerprint, edges), len(groups))
+            if group == len(points):
+                rep_cycle = representatives.append(op)
+                points.append(CircuitPoint(rep_cycle, op.location[0]))
+                orders.append(order)
+            blocks.append((cycle, op, order, group))
+
+        if len(blocks) == 0:
+            return
+
+        # Run the workflow on one block from each group
+        rep_data = PassData(representatives)
+        rep_data.model = data.model
+        rep_data.seed = data.seed
+        for key in data:
+            if key.startswith(ForEachBlockPass.pass_down_key_prefix):
+                rep_data[key] = data[key]
+        foreach = ForEachBlockPass(self.workflow, self.calculate_error_bound)
+        await foreach.run(representatives, rep_data)
+        block_datas = {
+            block_data['point']: block_data
+            for block_data in rep_data[ForEachBlockPass.key][-1]
+        }
+
+        results: list[tuple[Operation, ...]] = []
+        for point, order in zip(points, orders):
+            op = representatives[point]
+            if isinstance(op.gate, CircuitGate):
+                subcircuit = op.gate._circuit.copy()
+                subcircuit.set_params(op.params)
+            else:
+                subcircuit = Circuit.from_operation(op)
+            results.append(_to_canonical(list(subcircuit), order))
+
+        replace_points, replace_ops = [], []
+        error_sum = 0.0
+        for cycle, op, order, group in blocks:
+            radixes = [circuit.radixes[q] for q in op.location]
+            subcircuit = _from_canonical(results[group], order, radixes)
+            replace_points.append(CircuitPoint(cycle, op.location[0]))
+            replace_ops.append(
+                Operation(
+                    CircuitGate(subcircuit, True),
+                    op.location,
+                    subcircuit.params,
+                ),
+            )
+            error_sum += block_datas[points[group]].error
+
+        circuit.batch_replace(replace_points, replace_ops)
+        data.update_error_mul(error_sum)
+
+        counts = data.setdefault(
+            'block_synthesis_cache', {'hits': 0, 'misses': 0},
+        )
+        counts['hits'] += len(blocks) - len(points)
+        for block_data in block_datas.values():
+            block_counts = block_data.get('block_synthesis_cache', {})
+            counts['hits'] += block_counts.get('hits', 0)
+            counts['misses'] += block_counts.get('misses', 0)
+        _logger.debug(
+            f'Ran {len(points)} distinct blocks for {len(blocks)} blocks.',
+        )
@@ -0,0 +1,273 @@
+"""
+This module implements allocation of a global error budget to rotations.
+
+Every rotation left at the end of a Clifford+T workflow is either rounded
+to the nearest multiple of pi/4, which costs no T gates but an error of
+`|sin(r / 2)|` for a residual `r`, or approximated by gridsynth, which
+costs about `3 * log2(1 / epsilon)` T gates for an error `epsilon`. Given
+a total error for the rotations, the allocation rounds the rotations with
+the smallest residuals and splits what is left evenly between the rest,
+choosing how many to round to minimize the estimated T count. An even
+split is optimal for the rest, because every approximated rotation has
+the same logarithmic cost.
+
+Errors are measured as by :func:`UnitaryMatrix.get_distance_from` and
+combined as in :class:`PassData`, where they add up to first order.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.compiler.workflow import Workflow
+from bqskit.compiler.workflow import WorkflowLike
+from bqskit.ft.cliffordt.gridsynth import rz_cache
+from bqskit.ft.cliffordt.gridsynth import synthesize_rz
+from bqskit.ft.cliffordt.rotationcache import open_rotation_cache
+from bqskit.ft.cliffordt.rounding import discrete_z_gates
+from bqskit.ft.rules.replacement import _distance
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.parameterized.rz import RZGate
+from bqskit.ir.operation import Operation
+from bqskit.utils.typing import is_real_number
+
+
+_logger = logging.getLogger(__name__)
+
+
+def estimate_t_cost(epsilon: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """Return the estimated T count of approximating a rotation."""
+    epsilon = np.asarray(epsilon, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.maximum(3 * np.log2(1 / epsilon), 0.0)
+
+
+def allocate_rotation_budget(
+    angles: npt.ArrayLike,
+    budget: float,
+) -> tuple[npt.NDArray[np.bool_], float]:
+    """
+    Split `budget` between rounding and approximating rotations.
+
+    Args:
+        angles (npt.ArrayLike): The rotation angles.
+
+        budget (float): The total error allowed for the rotations.
+
+    Returns:
+        (tuple[npt.NDArray[np.bool_], float]): Which rotations to round
+            to a multiple of pi/4, and the error allowed for each of the
+            others. The rounding errors and the errors of the others add
+            up to at most `budget`.
+    """
+    angles = np.asarray(angles, dtype=np.float64).reshape(-1)
+    n = len(angles)
+    residuals = angles - np.round(angles / (np.pi / 4)) * (np.pi / 4)
+    costs = np.abs(np.sin(residuals / 2))
+    order = np.argsort(costs, kind='stable')
+
+    # Round the k cheapest rotations, for each feasible k
+    spent = np.concatenate([[0.0], np.cumsum(costs[order])])
+    left = budget - spent
+    remaining = n - np.arange(n + 1)
+    feasible = left > 0
+    feasible[-1] = spent[-1] <= budget
+    with np.errstate(divide='ignore', invalid='ignore'):
+        epsilons = np.where(remaining > 0, left / remaining, np.inf)
+    t_costs = np.where(feasible, remaining * estimate_t_cost(epsilons), np.inf)
+    t_costs[-1] = 0.0 if feasible[-1] else np.inf
+    k = int(np.argmin(t_costs)) if np.any(feasible) else 0
+
+    rounded = np.zeros(n, dtype=bool)
+    rounded[order[:k]] = True
+    epsilon = float(epsilons[k]) if k < n else budget
+    return rounded, epsilon
+
+
+class MeasureErrorPass(BasePass):
+    """
+    The MeasureErrorPass class.
+
+    Run a workflow and add how far it moved the circuit's unitary to the
+    error in the pass data. Used as the loop body of a
+    :class:`ForEachBlockPass`, it bounds the error of every block as
+    `calculate_error_bound` does, but without the floor of about 1e-8
+    that :func:`UnitaryMatrix.get_distance_from` puts on each block,
+    which adds up over many unchanged blocks.
+    """
+
+    def __init__(self, loop_body: WorkflowLike) -> None:
+        """
+        Construct a MeasureErrorPass.
+
+        Args:
+            loop_body (WorkflowLike): The workflow whose error is measured.
+        """
+        self.workflow = Workflow(loop_body)
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        before = circuit.get_unitary()
+        await self.workflow.run(circuit, data)
+        data.update_error_mul(_distance(circuit.get_unitary(), before))
+
+
+class BudgetedRotationSynthesisPass(BasePass):
+    """
+    The BudgetedRotationSynthesisPass class.
+
+    Replace every `RZGate` with Clifford+T gates within a total error
+    budget for the whole circuit. The error already accumulated in the
+    pass data counts against the budget, and the rest is allocated to
+    the rotations by :func:`allocate_rotation_budget`. The allocation and
+    the error consumed are stored in the pass data under `error_budget`.
+
+    If the earlier passes used up the budget, the rotations are still
+    synthesized, at 1% of the budget between them, and the record marks
+    the budget as exceeded: `exceeded` is True and `overrun` is how far
+    the consumed error is past the total.
+
+    A workflow that compiles a circuit in parts gives each part its share
+    of the budget, as a fraction stored under `share_key` in the part's
+    pass data, and the same share of the error accumulated before it
+    split the circuit, under `spent_key`; see
+    :class:`WindowedCompilationPass`.
+    """
+
+    share_key = 'error_budget_share'
+
+    spent_key = 'error_budget_spent'
+
+    def __init__(
+        self,
+        error_budget: float,
+        cache_size: int = 4096,
+        cache_path: str | None = None,
+    ) -> None:
+        """
+        Construct a BudgetedRotationSynthesisPass.
+
+        Args:
+            error_budget (float): The total error allowed for the circuit.
+
+            cache_size (int): See :class:`RZtoCliffordTSynthesisPass`.
+                (Default: 4096)
+
+            cache_path (str | None): See
+                :class:`RZtoCliffordTSynthesisPass`. (Default: None)
+        """
+        if not is_real_number(error_budget):
+            raise TypeError(
+                f'Expected float for error_budget, got {type(error_budget)}.',
+            )
+
+        if not 0 < error_budget < 1:
+            raise ValueError(
+                f'Expected error_budget in (0, 1), got {error_budget}.',
+            )
+
+        if not isinstance(cache_size, int) or cache_size < 0:
+            raise ValueError(
+                'Expected non-negative integer for cache_size'
+                f', got {cache_size}.',
+            )
+
+        if cache_path is not None and not isinstance(cache_path, str):
+            raise TypeError(
+                f'Expected str for cache_path, got {type(cache_path)}.',
+            )
+
+        self.error_budget = error_budget
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        points, locations, angles = [], [], []
+        for cycle, op in circuit.operations_with_cycles():
+            if isinstance(op.gate, RZGate):
+                points.append((cycle, op.location[0]))
+                locations.append(op.location)
+                angles.append(op.params[0])
+
+        total = self.error_budget * data.get(self.share_key, 1.0)
+        earlier = data.get(self.spent_key, 0.0)
+        spent = data.error + earlier
+        budget = total - spent
+        if budget <= 0:
+            _logger.warning(
+                f'Error budget {total} was used up before'
+                f' rotation synthesis, by {spent}; allocating 1% of it'
+                ' to the rotations.',
+            )
+            budget = total / 100
+
+        record = data.setdefault('error_budget', {})
+        record.update({
+            'total': total,
+            'before_rotations': spent,
+            'allocated': budget,
+            'rounded': 0,
+            'synthesized': 0,
+            'epsilon': budget,
+        })
+        if len(angles) == 0 or RZGate() in data.gate_set:
+            _record_consumed(record, spent)
+            return
+
+        cache = rz_cache if self.cache_size > 0 else None
+        rz_cache.reserve(self.cache_size)
+        store = None
+        if self.cache_path is not None:
+            store = open_rotation_cache(self.cache_path)
+        rounded, epsilon = allocate_rotation_budget(angles, budget)
+        discrete = discrete_z_gates()
+        ops = []
+        for angle, location, round_it in zip(angles, locations, rounded):
+            if round_it:
+                turns = int(np.round(angle / (math.pi / 4))) % 8
+                gate = discrete[turns]
+            else:
+                subcircuit = Circuit(1)
+                gates = synthesize_rz(angle, epsilon, cache, store)
+                for g in gates or (IdentityGate(),):
+                    subcircuit.append_gate(g, 0)
+                gate = CircuitGate(subcircuit)
+            utry = RZGate().get_unitary([angle])
+            data.update_error_mul(gate.get_unitary().get_distance_from(utry))
+            ops.append(Operation(gate, location))
+
+        circuit.batch_replace(points, ops)
+        record.update({
+            'rounded': int(np.sum(rounded)),
+            'synthesized': int(len(angles) - np.sum(rounded)),
+            'epsilon': epsilon,
+        })
+        _record_consumed(record, float(data.error) + earlier)
+        _logger.debug(
+            f'Rounded {record["rounded"]} and synthesized'
+            f' {record["synthesized"]} rotations at {epsilon:.3g}.',
+        )
+
+
+def _record_consumed(record: dict[str, Any], consumed: float) -> None:
+    """Store the error consumed and how far it is past the budget."""
+    overrun = max(consumed - record['total'], 0.0)
+    record.update({
+        'consumed': consumed,
+        'exceeded': overrun > 0,
+        'overrun': overrun,
+    })
+    if overrun > 0:
+        _logger.warning(
+            f'Exceeded the error budget {record["total"]} by'
+            f' {overrun:.3g}.',
+        )
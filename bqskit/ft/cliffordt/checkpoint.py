@@ -0,0 +1,405 @@
+"""
+This module implements checkpointing of long Clifford+T compilations.
+
+A :class:`CheckpointPass` runs the stages of a workflow and, after chosen
+stages, saves a snapshot of the circuit and pass data to a checkpoint
+directory. Compilations are told apart by a key computed from the input
+circuit, target, gate set, seed, and the stages with their parameters, so
+one directory can hold checkpoints of many compilations. Running the same
+compilation again with the same directory starts after the last saved
+stage, and a compilation that finished returns its saved result without
+running anything. :func:`resume_compilation` reruns a compilation from
+its directory alone.
+
+Inside the block synthesis stages, :class:`CachedSynthesisPass` also saves
+the blocks it synthesizes to the directory, every `interval` blocks per
+worker. A resumed stage reuses them instead of synthesizing them again,
+so at most `interval` blocks per worker are lost with a crashed stage.
+Saved blocks are split into shards by a hash of their key, and a process
+only reads the shards of the blocks it looks up, keeping the most
+recently used ones in memory.
+
+Snapshots are pickled and compressed, and written to a temporary file
+that atomically replaces the previous one, so a crash while writing keeps
+the last complete snapshot. The target is saved once with the input and
+left out of the stage snapshots.
+"""
+from __future__ import annotations
+
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import zlib
+from collections import OrderedDict
+from typing import Any
+from typing import Hashable
+from typing import Iterable
+from typing import Sequence
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gates.circuitgate import CircuitGate
+
+if TYPE_CHECKING:
+    from bqskit.compiler.compiler import Compiler
+
+
+_logger = logging.getLogger(__name__)
+
+_num_shards = 64
+"""The number of shards the saved blocks of a directory are split into."""
+
+_max_loaded_shards = 16
+"""The number of shards kept in `_loaded_shards`."""
+
+_loaded_shards: OrderedDict[tuple[str, str], dict[Hashable, Any]] = (
+    OrderedDict()
+)
+"""The most recently used shards of saved blocks, per directory."""
+
+_pending_blocks: dict[str, dict[Hashable, Any]] = {}
+"""The block results of this process not saved yet, per directory."""
+
+
+def _write(path: str, obj: Any) -> None:
+    """Atomically replace the file at `path` with `obj`, compressed."""
+    payload = zlib.compress(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), 1)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(dir=directory, prefix='.checkpoint')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def _read(path: str) -> Any:
+    """Return the object saved at `path`, or None if there is none."""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+
+
+def _hash_circuit(h: Any, circuit: Circuit) -> None:
+    """Add the operations of `circuit`, recursively, to the hash `h`."""
+    h.update(repr(circuit.radixes).encode())
+    for op in circuit:
+        h.update(f'{op.gate.name}{op.location}'.encode())
+        h.update(np.asarray(op.params, dtype=np.float64).tobytes())
+        if isinstance(op.gate, CircuitGate):
+            _hash_circuit(h, op.gate._circuit)
+
+
+def compilation_key(
+    circuit: Circuit,
+    data: PassData,
+    passes: Sequence[BasePass],
+) -> str:
+    """Return the key of compiling `circuit` with `data` by `passes`."""
+    h = hashlib.blake2b(digest_size=16)
+    _hash_circuit(h, circuit)
+    # Circuit targets are the circuit itself, avoid evaluating them
+    if not isinstance(data._target, Circuit):
+        h.update(pickle.dumps(data._target, pickle.HIGHEST_PROTOCOL))
+    h.update(repr(sorted(str(g) for g in data.gate_set)).encode())
+    h.update(repr(data.seed).encode())
+    _hash_parameters(h, list(passes), set())
+    return h.hexdigest()
+
+
+def _hash_parameters(h: Any, obj: Any, seen: set[int]) -> None:
+    """
+    Add `obj` and, recursively, its attributes to the hash `h`.
+
+    Unlike pickling, this hashes sets and dictionaries independent of
+    their order, and functions by name, so the same passes hash the same
+    in every process. Objects other than containers are added to `seen`,
+    by id, and hashed by a marker when they come up again.
+    """
+    if obj is None or isinstance(obj, (bool, int, float, complex, str)):
+        h.update(f'{type(obj).__name__}:{obj!r};'.encode())
+    elif isinstance(obj, bytes):
+        h.update(obj)
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype.str, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, Circuit):
+        _hash_circuit(h, obj)
+    elif callable(obj) and hasattr(obj, '__qualname__'):
+        h.update(f'{obj.__module__}.{obj.__qualname__};'.encode())
+    elif id(obj) in seen:
+        h.update(b'^')
+    elif isinstance(obj, (tuple, list)):
+        h.update(b'(')
+        for item in obj:
+            _hash_parameters(h, item, seen)
+        h.update(b')')
+    elif isinstance(obj, (set, frozenset, dict)):
+        items = obj.items() if isinstance(obj, dict) else obj
+        digests = []
+        for item in items:
+            item_hash = hashlib.blake2b(digest_size=16)
+            _hash_parameters(item_hash, item, seen)
+            digests.append(item_hash.digest())
+        h.update(b'{' + b''.join(sorted(digests)) + b'}')
+    else:
+        seen.add(id(obj))
+        h.update(f'{type(obj).__module__}.{type(obj).__qualname__}'.encode())
+        state = getattr(obj, '__dict__', None)
+        if state is None:
+            state = {
+                name: getattr(obj, name)
+                for name in getattr(type(obj), '__slots__', ())
+                if hasattr(obj, name)
+            }
+        _hash_parameters(h, state, seen)
+
+
+def _stable_hash(h: Any, obj: Any) -> None:
+    """Add `obj` to the hash `h` the same way in every process."""
+    if isinstance(obj, (set, frozenset)):
+        digests = []
+        for item in obj:
+            item_hash = hashlib.blake2b(digest_size=16)
+            _stable_hash(item_hash, item)
+            digests.append(item_hash.digest())
+        h.update(b'{' + b''.join(sorted(digests)) + b'}')
+    elif isinstance(obj, (tuple, list)):
+        h.update(b'(')
+        for item in obj:
+            _stable_hash(h, item)
+            h.update(b',')
+        h.update(b')')
+    elif isinstance(obj, bytes):
+        h.update(obj)
+    else:
+        h.update(str(obj).encode())
+
+
+def _shard(key: Hashable) -> str:
+    """Return the name of the shard the block with `key` is saved in."""
+    h = hashlib.blake2b(digest_size=16)
+    _stable_hash(h, key)
+    return f'{h.digest()[0] % _num_shards:02x}'
+
+
+def _load_shard(directory: str, shard: str) -> dict[Hashable, Any]:
+    """Return the block results saved in a shard of `directory`."""
+    name = (directory, shard)
+    blocks = _loaded_shards.get(name)
+    if blocks is None:
+        blocks = {}
+        pattern = os.path.join(directory, f'blocks-{shard}-*.ckpt')
+        for path in glob.glob(pattern):
+            saved = _read(path)
+            if saved is not None:
+                blocks.update(saved)
+        if blocks:
+            _logger.debug(f'Loaded {len(blocks)} blocks of shard {shard}.')
+        _loaded_shards[name] = blocks
+        while len(_loaded_shards) > _max_loaded_shards:
+            _loaded_shards.popitem(last=False)
+    _loaded_shards.move_to_end(name)
+    return blocks
+
+
+def finished_block(directory: str, key: Hashable) -> Any | None:
+    """
+    Return the result saved in `directory` for the block with `key`.
+
+    Only the shard of `key` is read, on its first use in this process,
+    and it stays loaded until it is one of the least recently used. The
+    results this process saved since are returned as well.
+
+    Returns:
+        (Any | None): The result, or None if none was saved.
+    """
+    pending = _pending_blocks.get(directory, {})
+    if key in pending:
+        return pending[key]
+    return _load_shard(directory, _shard(key)).get(key)
+
+
+def save_block(
+    directory: str,
+    key: Hashable,
+    result: Any,
+    interval: int,
+) -> None:
+    """
+    Record the `result` of the block with `key` for `directory`.
+
+    Results are written to the files of their shards once this process
+    has `interval` of them pending, see :func:`flush_blocks`.
+    """
+    pending = _pending_blocks.setdefault(directory, {})
+    pending[key] = result
+    if len(pending) >= interval:
+        flush_blocks(directory)
+
+
+def flush_blocks(directory: str) -> None:
+    """Write the block results this process has pending for `directory`."""
+    pending = _pending_blocks.pop(directory, None)
+    if not pending:
+        return
+
+    shards: dict[str, dict[Hashable, Any]] = {}
+    for key, result in pending.items():
+        shards.setdefault(_shard(key), {})[key] = result
+
+    os.makedirs(directory, exist_ok=True)
+    for shard, blocks in shards.items():
+        fd, path = tempfile.mkstemp(
+            dir=directory,
+            prefix=f'blocks-{shard}-{os.getpid()}-',
+            suffix='.ckpt',
+        )
+        os.close(fd)
+        _write(path, blocks)
+        loaded = _loaded_shards.get((directory, shard))
+        if loaded is not None:
+            loaded.update(blocks)
+
+
+class CheckpointPass(BasePass):
+    """
+    The CheckpointPass class.
+
+    Runs a list of passes as stages, saving a snapshot to a directory
+    after chosen stages, and resuming after the last saved stage if the
+    directory has one for the same compilation, see
+    :mod:`bqskit.ft.cliffordt.checkpoint`.
+    """
+
+    def __init__(
+        self,
+        passes: Iterable[BasePass],
+        directory: str,
+        stages: Iterable[int] | None = None,
+    ) -> None:
+        """
+        Construct a CheckpointPass.
+
+        Args:
+            passes (Iterable[BasePass]): The stages to run.
+
+            directory (str): The directory snapshots are saved to. It is
+                created if it does not exist.
+
+            stages (Iterable[int] | None): The indices of the stages after
+                which a snapshot is saved. The last stage is always
+                saved. If None, every stage is saved. (Default: None)
+        """
+        if not isinstance(directory, str):
+            raise TypeError(
+                f'Expected str for directory, got {type(directory)}.',
+            )
+
+        self.passes = list(passes)
+        if not all(isinstance(p, BasePass) for p in self.passes):
+            raise TypeError('Expected a sequence of BasePass objects.')
+
+        if stages is not None:
+            stages = set(stages)
+            for stage in stages:
+                if not 0 <= stage < len(self.passes):
+                    raise ValueError(
+                        f'Expected stages in [0, {len(self.passes)}),'
+                        f' got {stage}.',
+                    )
+
+        self.directory = directory
+        self.stages = stages
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        os.makedirs(self.directory, exist_ok=True)
+        key = compilation_key(circuit, data, self.passes)
+        stage_path = os.path.join(self.directory, f'{key}.stage.ckpt')
+        input_path = os.path.join(self.directory, f'{key}.input.ckpt')
+
+        start = 0
+        snapshot = _read(stage_path)
+        if snapshot is not None:
+            circuit.become(snapshot['circuit'], False)
+            data.update(snapshot['data'])
+            start = snapshot['stage'] + 1
+            _logger.info(
+                f'Resuming compilation {key} after stage {start - 1}.',
+            )
+        elif not os.path.exists(input_path):
+            _write(input_path, (self, circuit, data))
+
+        last = len(self.passes) - 1
+        for stage in range(start, len(self.passes)):
+            await self.passes[stage].run(circuit, data)
+            if self.stages is None or stage in self.stages or stage == last:
+                flush_blocks(self.directory)
+                # The target is saved with the input and never changes
+                saved = {k: data[k] for k in data if k != 'target'}
+                snapshot = {'stage': stage, 'circuit': circuit, 'data': saved}
+                _write(stage_path, snapshot)
+                _logger.debug(f'Saved stage {stage} of compilation {key}.')
+
+
+def resume_compilation(
+    directory: str,
+    key: str | None = None,
+    compiler: Compiler | None = None,
+    request_data: bool = False,
+) -> Circuit | tuple[Circuit, PassData]:
+    """
+    Resume a checkpointed compilation from its directory.
+
+    Args:
+        directory (str): The checkpoint directory of the compilation.
+
+        key (str | None): The key of the compilation to resume. If None,
+            the directory must hold exactly one compilation.
+            (Default: None)
+
+        compiler (Compiler | None): The compiler to run it on. If None,
+            a compiler is started and closed again. (Default: None)
+
+        request_data (bool): If True, also return the pass data.
+            (Default: False)
+
+    Returns:
+        (Circuit | tuple[Circuit, PassData]): The compiled circuit, and
+            the pass data if `request_data` is True.
+
+    Raises:
+        ValueError: If `key` is None and the directory does not hold
+            exactly one compilation, or if it has none with `key`.
+    """
+    if key is None:
+        pattern = os.path.join(directory, '*.input.ckpt')
+        keys = [os.path.basename(p)[:-11] for p in glob.glob(pattern)]
+        if len(keys) != 1:
+            raise ValueError(
+                f'Expected one compilation in {directory}, got {len(keys)}.',
+            )
+        key = keys[0]
+
+    saved = _read(os.path.join(directory, f'{key}.input.ckpt'))
+    if saved is None:
+        raise ValueError(f'No compilation {key} in {directory}.')
+    workflow, circuit, data = saved
+
+    from bqskit.compiler.compiler import Compiler
+    if compiler is None:
+        with Compiler() as compiler:
+            return compiler.compile(circuit, workflow, request_data, data=data)
+    return compiler.compile(circuit, workflow, request_data, data=data)
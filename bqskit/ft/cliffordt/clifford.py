@@ -0,0 +1,546 @@
+"""
+This module implements stabilizer tableaux and Clifford circuit synthesis.
+
+A Clifford operator `U` is determined, up to global phase, by its action
+`P -> U P U^dagger` on the Pauli generators `X_i` and `Z_i`. Each image
+is a signed Pauli string, and together they form the stabilizer tableau.
+Tableaux are built from a circuit's gate list when every gate is
+Clifford, and from its unitary otherwise.
+
+Single- and two-qubit Cliffords are synthesized from a lookup table of
+all 24 and 11,520 of them, respectively, each with a minimal CNOT count.
+The two-qubit table is shipped with the package.
+Wider Cliffords are synthesized by decoupling one qubit at a time.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+from functools import lru_cache
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.cx import CNOTGate
+from bqskit.ir.gates.constant.h import HGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.sx import SqrtXGate
+from bqskit.ir.gates.constant.x import XGate
+from bqskit.ir.gates.constant.y import YGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.ir.operation import Operation
+from bqskit.passes.control.predicate import PassPredicate
+from bqskit.qis.unitary.unitarymatrix import UnitaryLike
+from bqskit.qis.unitary.unitarymatrix import UnitaryMatrix
+
+
+_logger = logging.getLogger(__name__)
+
+_single_paulis = np.array([
+    [[1, 0], [0, 1]],
+    [[0, 1], [1, 0]],
+    [[1, 0], [0, -1]],
+    [[0, -1j], [1j, 0]],
+], dtype=np.complex128)
+"""I, X, Z, and Y, so that code `x + 2 z` has the X and Z bits `x, z`."""
+
+_Row = tuple[tuple[int, ...], int]
+
+
+@lru_cache(maxsize=None)
+def _paulis(num_qudits: int) -> npt.NDArray[np.complex128]:
+    """Return every Pauli string, indexed by base-4 codes, qudit 0 first."""
+    paulis = np.ones((1, 1, 1), dtype=np.complex128)
+    for _ in range(num_qudits):
+        paulis = np.einsum('pab,qcd->pqacbd', paulis, _single_paulis)
+        dim = paulis.shape[2] * paulis.shape[3]
+        paulis = paulis.reshape(-1, dim, dim)
+    return paulis
+
+
+def _conjugation_table(
+    utry: UnitaryLike,
+    tolerance: float,
+) -> list[tuple[int, int]] | None:
+    """
+    Return the action of `utry` on the Pauli strings of its qudits.
+
+    Entry `p` holds the index and sign bit of `U P_p U^dagger`, or the
+    result is None if some image is not a signed Pauli string.
+    """
+    utry = np.asarray(utry, dtype=np.complex128)
+    dim = utry.shape[0]
+    num_qudits = dim.bit_length() - 1
+    paulis = _paulis(num_qudits)
+    images = utry @ paulis @ utry.conj().T
+    coefficients = np.einsum('qab,pba->pq', paulis, images) / dim
+    indices = np.argmax(np.abs(coefficients), axis=1)
+    rows = np.arange(len(indices))
+    values = coefficients[rows, indices]
+
+    # The largest coefficient only moves from one quadratically in the
+    # distance from a Clifford, so the rest of each row is checked
+    rest = coefficients.copy()
+    rest[rows, indices] = 0
+    if np.max(np.linalg.norm(rest, axis=1)) > tolerance:
+        return None
+    if not np.allclose(np.abs(values.real), 1, rtol=0, atol=tolerance):
+        return None
+    if not np.allclose(values.imag, 0, rtol=0, atol=tolerance):
+        return None
+    return [(int(i), int(v < 0)) for i, v in zip(indices, values.real)]
+
+
+@lru_cache(maxsize=None)
+def _gate_table(gate: Gate) -> list[tuple[int, int]] | None:
+    """Return the conjugation table of a constant gate, cached."""
+    return _conjugation_table(gate.get_unitary(), 1e-8)
+
+
+class CliffordTableau:
+    """
+    The stabilizer tableau of a Clifford operator, up to global phase.
+
+    Row `i` holds the image of `X_i` and row `n + i` the image of `Z_i`
+    as a pair of per-qudit Pauli codes (0, 1, 2, 3 for I, X, Z, Y) and a
+    sign bit.
+    """
+
+    __slots__ = ('num_qudits', 'rows')
+
+    def __init__(self, num_qudits: int, rows: Sequence[_Row]) -> None:
+        self.num_qudits = num_qudits
+        self.rows = tuple(rows)
+
+    @staticmethod
+    def identity(num_qudits: int) -> CliffordTableau:
+        """Return the tableau of the identity."""
+        rows = []
+        for code in (1, 2):
+            for qudit in range(num_qudits):
+                codes = [0] * num_qudits
+                codes[qudit] = code
+                rows.append((tuple(codes), 0))
+        return CliffordTableau(num_qudits, rows)
+
+    @staticmethod
+    def from_unitary(
+        utry: UnitaryLike,
+        tolerance: float = 1e-8,
+    ) -> CliffordTableau | None:
+        """Return the tableau of a qubit unitary, or None if not Clifford."""
+        utry = np.asarray(utry, dtype=np.complex128)
+        num_qudits = utry.shape[0].bit_length() - 1
+        if utry.shape[0] != 2 ** num_qudits:
+            return None
+        table = _conjugation_table(utry, tolerance)
+        if table is None:
+            return None
+
+        tableau = CliffordTableau.identity(num_qudits)
+        rows = []
+        for codes, _ in tableau.rows:
+            index, sign = table[_index(codes)]
+            rows.append((_codes(index, num_qudits), sign))
+        return CliffordTableau(num_qudits, rows)
+
+    @staticmethod
+    def from_circuit(
+        circuit: Circuit,
+        tolerance: float = 1e-8,
+    ) -> CliffordTableau | None:
+        """
+        Return the tableau of a qubit circuit, or None if not Clifford.
+
+        The tableau is built gate by gate when every operation is Clifford.
+        Otherwise, the circuit may still be Clifford as a whole, so its
+        unitary is checked instead.
+        """
+        if any(radix != 2 for radix in circuit.radixes):
+            return None
+
+        tableau: CliffordTableau | None
+        tableau = CliffordTableau.identity(circuit.num_qudits)
+        for op in circuit:
+            tableau = tableau.apply(op, tolerance)
+            if tableau is None:
+                break
+
+        if tableau is None and circuit.num_qudits <= 4:
+            return CliffordTableau.from_unitary(
+                circuit.get_unitary(),
+                tolerance,
+            )
+        return tableau
+
+    def apply(
+        self,
+        op: Operation,
+        tolerance: float = 1e-8,
+    ) -> CliffordTableau | None:
+        """Return the tableau after `op`, or None if `op` is not Clifford."""
+        if op.num_params == 0 and not isinstance(op.gate, CircuitGate):
+            table = _gate_table(op.gate)
+        else:
+            table = _conjugation_table(op.get_unitary(), tolerance)
+        if table is None:
+            return None
+
+        rows = []
+        for codes, sign in self.rows:
+            local = _index(tuple(codes[q] for q in op.location))
+            index, flip = table[local]
+            new_codes = list(codes)
+            for q, code in zip(op.location, _codes(index, len(op.location))):
+                new_codes[q] = code
+            rows.append((tuple(new_codes), sign ^ flip))
+        return CliffordTableau(self.num_qudits, rows)
+
+    def key(self) -> int:
+        """Return an integer that uniquely packs this tableau."""
+        key = 0
+        for codes, sign in self.rows:
+            for code in codes:
+                key = (key << 2) | code
+            key = (key << 1) | sign
+        return key
+
+    def is_identity(self) -> bool:
+        """Return True if this is the tableau of the identity."""
+        return self == CliffordTableau.identity(self.num_qudits)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CliffordTableau):
+            return NotImplemented
+        return self.num_qudits == other.num_qudits and self.rows == other.rows
+
+    def __hash__(self) -> int:
+        return hash(self.rows)
+
+    def __repr__(self) -> str:
+        letters = 'IXZY'
+        rows = [
+            ('-' if sign else '+') + ''.join(letters[c] for c in codes)
+            for codes, sign in self.rows
+        ]
+        return f'CliffordTableau({", ".join(rows)})'
+
+
+def _index(codes: Sequence[int]) -> int:
+    """Return the base-4 index of a Pauli string, qudit 0 first."""
+    index = 0
+    for code in codes:
+        index = 4 * index + code
+    return index
+
+
+def _codes(index: int, num_qudits: int) -> tuple[int, ...]:
+    """Return the per-qudit Pauli codes of a base-4 index."""
+    codes = []
+    for _ in range(num_qudits):
+        codes.append(index % 4)
+        index //= 4
+    return tuple(reversed(codes))
+
+
+_local_generators: list[Gate] = [
+    HGate(), SGate(), SdgGate(), XGate(), YGate(), ZGate(), SqrtXGate(),
+]
+
+
+class _CliffordTable:
+    """All Cliffords on one or two qubits, each with a minimal CNOT count."""
+
+    def __init__(
+        self,
+        num_qudits: int,
+        keys: npt.NDArray[np.uint64],
+        offsets: npt.NDArray[np.uint32],
+        codes: npt.NDArray[np.uint8],
+    ) -> None:
+        """
+        Construct a table from its packed arrays.
+
+        Entry `i` is the Clifford with tableau key `keys[i]`, in sorted
+        order, and is implemented by the moves indexed by
+        `codes[offsets[i]:offsets[i + 1]]`.
+        """
+        self.num_qudits = num_qudits
+        self.moves = _table_moves(num_qudits)
+        self.keys = keys
+        self.offsets = offsets
+        self.codes = codes
+
+    @staticmethod
+    def build(num_qudits: int) -> _CliffordTable:
+        """Enumerate every Clifford, shortest in CNOT count first."""
+        moves = _table_moves(num_qudits)
+
+        # A key packs each row as its Pauli index and sign bit, so a move
+        # maps every row independently through a small lookup table
+        bits = 2 * num_qudits + 1
+        mask = (1 << bits) - 1
+        shifts = range(bits * (2 * num_qudits - 1), -1, -bits)
+        row_maps = []
+        for gate, location in moves:
+            op = Operation(gate, location)
+            row_map = []
+            for value in range(1 << bits):
+                row = (_codes(value >> 1, num_qudits), value & 1)
+                result = CliffordTableau(num_qudits, [row]).apply(op)
+                assert result is not None
+                (codes, sign), = result.rows
+                row_map.append((_index(codes) << 1) | sign)
+            row_maps.append(row_map)
+
+        # Dijkstra over (CNOT count, gate count) from the identity
+        start = CliffordTableau.identity(num_qudits).key()
+        parents: dict[int, tuple[int, int]] = {}
+        heap = [(0, 0, start, start, -1)]
+        while heap:
+            cnots, length, key, parent, move = heapq.heappop(heap)
+            if key in parents:
+                continue
+            parents[key] = (parent, move)
+            for move, row_map in enumerate(row_maps):
+                next_key = 0
+                for shift in shifts:
+                    next_key <<= bits
+                    next_key |= row_map[(key >> shift) & mask]
+                if next_key not in parents:
+                    cost = cnots + (moves[move][0].num_qudits == 2)
+                    heapq.heappush(
+                        heap,
+                        (cost, length + 1, next_key, key, move),
+                    )
+
+        words: dict[int, tuple[int, ...]] = {}
+        for key in parents:
+            path, node = [], key
+            while node != start:
+                node, move = parents[node]
+                path.append(move)
+            words[key] = tuple(reversed(path))
+
+        # Pack the words into flat arrays sorted by key
+        keys = sorted(words)
+        lengths = [len(words[key]) for key in keys]
+        return _CliffordTable(
+            num_qudits,
+            np.array(keys, dtype=np.uint64),
+            np.concatenate([[0], np.cumsum(lengths)]).astype(np.uint32),
+            np.array(
+                [move for key in keys for move in words[key]],
+                dtype=np.uint8,
+            ),
+        )
+
+    @staticmethod
+    def load(path: str) -> _CliffordTable:
+        """Load a table saved by :meth:`save`."""
+        with np.load(path) as data:
+            return _CliffordTable(
+                int(data['num_qudits']),
+                data['keys'],
+                data['offsets'],
+                data['codes'],
+            )
+
+    def save(self, path: str) -> None:
+        """Save this table's packed arrays to `path`."""
+        np.savez_compressed(
+            path,
+            num_qudits=self.num_qudits,
+            keys=self.keys,
+            offsets=self.offsets,
+            codes=self.codes,
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, tableau: CliffordTableau) -> Circuit:
+        """Return a circuit for `tableau` with minimal CNOT count."""
+        key = tableau.key()
+        position = int(np.searchsorted(self.keys, key))
+        assert position < len(self.keys) and self.keys[position] == key
+        start, end = self.offsets[position], self.offsets[position + 1]
+        circuit = Circuit(self.num_qudits)
+        for move in self.codes[start:end]:
+            gate, location = self.moves[move]
+            circuit.append_gate(gate, location)
+        return circuit
+
+
+def _table_moves(num_qudits: int) -> list[tuple[Gate, tuple[int, ...]]]:
+    """Return the gates a table's words are made of, by code."""
+    moves: list[tuple[Gate, tuple[int, ...]]] = [
+        (gate, (q,))
+        for q in range(num_qudits)
+        for gate in _local_generators
+    ]
+    if num_qudits == 2:
+        moves += [(CNOTGate(), (0, 1)), (CNOTGate(), (1, 0))]
+    return moves
+
+
+_table_path = os.path.join(os.path.dirname(__file__), 'clifford2.npz')
+"""
+The packed two-qubit table. It takes seconds to build, so it is shipped
+with the package rather than built by every worker. Regenerate it with
+`_CliffordTable.build(2).save(_table_path)` if the moves change.
+"""
+
+
+@lru_cache(maxsize=None)
+def clifford_table(num_qudits: int) -> _CliffordTable:
+    """Return the lookup table of all one- or two-qubit Cliffords."""
+    if num_qudits not in (1, 2):
+        raise ValueError(f'Expected 1 or 2 qubits, got {num_qudits}.')
+    if num_qudits == 2:
+        return _CliffordTable.load(_table_path)
+    return _CliffordTable.build(num_qudits)
+
+
+def synthesize_clifford(tableau: CliffordTableau) -> Circuit:
+    """
+    Return a Clifford+T circuit implementing `tableau` up to global phase.
+
+    One- and two-qubit Cliffords use the lookup table and have a minimal
+    CNOT count. Wider Cliffords are decoupled one qubit at a time, which
+    uses at most `O(n^2)` CNOTs but is not optimal.
+    """
+    if tableau.num_qudits in (1, 2):
+        circuit = clifford_table(tableau.num_qudits).lookup(tableau)
+    else:
+        circuit = _decouple(tableau)
+
+    if circuit.num_operations == 0:
+        circuit.append_gate(IdentityGate(tableau.num_qudits), list(
+            range(tableau.num_qudits),
+        ))
+    return circuit
+
+
+def _decouple(tableau: CliffordTableau) -> Circuit:
+    """Reduce `tableau` to the identity and return the inverse circuit."""
+    n = tableau.num_qudits
+    applied: list[tuple[Gate, tuple[int, ...]]] = []
+
+    def apply(gate: Gate, *location: int) -> None:
+        nonlocal tableau
+        result = tableau.apply(Operation(gate, location))
+        assert result is not None
+        tableau = result
+        applied.append((gate, location))
+
+    for q in range(n):
+        # Map the image of X_q to X_q: first make every factor I or X
+        for j in range(q, n):
+            code = tableau.rows[q][0][j]
+            if code == 2:
+                apply(HGate(), j)
+            elif code == 3:
+                apply(SdgGate(), j)
+        codes = tableau.rows[q][0]
+        if codes[q] == 0:
+            j = next(j for j in range(q + 1, n) if codes[j] == 1)
+            apply(CNOTGate(), j, q)
+        for k in range(q + 1, n):
+            if tableau.rows[q][0][k] == 1:
+                apply(CNOTGate(), q, k)
+
+        # Map the image of Z_q to Z_q without disturbing X_q
+        for k in range(q + 1, n):
+            code = tableau.rows[n + q][0][k]
+            if code == 1:
+                apply(HGate(), k)
+            elif code == 3:
+                apply(SdgGate(), k)
+                apply(HGate(), k)
+            if code != 0:
+                apply(CNOTGate(), k, q)
+        if tableau.rows[n + q][0][q] == 3:
+            apply(HGate(), q)
+            apply(SGate(), q)
+            apply(HGate(), q)
+
+    for q in range(n):
+        if tableau.rows[q][1]:
+            apply(ZGate(), q)
+        if tableau.rows[n + q][1]:
+            apply(XGate(), q)
+    assert tableau.is_identity()
+
+    # The applied gates undo the Clifford, so invert them in reverse
+    inverses = {SGate(): SdgGate(), SdgGate(): SGate()}
+    circuit = Circuit(n)
+    for gate, location in reversed(applied):
+        circuit.append_gate(inverses.get(gate, gate), location)
+    return circuit
+
+
+class CliffordSynthesisPass(BasePass):
+    """
+    The CliffordSynthesisPass class.
+
+    Replace qubit circuits that implement a Clifford operator, up to
+    global phase, with a directly synthesized Clifford circuit. Circuits
+    that are not Clifford are left unchanged.
+    """
+
+    def __init__(self, tolerance: float = 1e-8) -> None:
+        """
+        Construct a CliffordSynthesisPass.
+
+        Args:
+            tolerance (float): The largest deviation from a signed Pauli
+                string of a conjugated Pauli's expansion. (Default: 1e-8)
+        """
+        self.tolerance = tolerance
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        tableau = CliffordTableau.from_circuit(circuit, self.tolerance)
+        if tableau is None:
+            _logger.debug('Circuit is not Clifford.')
+            return
+
+        circuit.become(synthesize_clifford(tableau))
+
+
+class CliffordPredicate(PassPredicate):
+    """
+    The CliffordPredicate class.
+
+    The CliffordPredicate returns True if the circuit implements a
+    Clifford operator up to global phase. It returns False for state
+    and state system targets, as the circuit does not implement those
+    until it is synthesized.
+    """
+
+    def __init__(self, tolerance: float = 1e-8) -> None:
+        """
+        Construct a CliffordPredicate.
+
+        Args:
+            tolerance (float): See :class:`CliffordSynthesisPass`.
+                (Default: 1e-8)
+        """
+        self.tolerance = tolerance
+
+    def get_truth_value(self, circuit: Circuit, data: PassData) -> bool:
+        """Call this predicate, see :class:`PassPredicate` for more info."""
+        if not isinstance(data.target, UnitaryMatrix):
+            return False
+        tableau = CliffordTableau.from_circuit(circuit, self.tolerance)
+        return tableau is not None
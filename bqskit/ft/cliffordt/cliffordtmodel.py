@@ -1,19 +1,138 @@
 """This module implements a generic FaultTolerantModel class."""
 from __future__ import annotations
 
+import math
+from functools import lru_cache
+from typing import Mapping
 from typing import Sequence
+from typing import TYPE_CHECKING
 
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
 from bqskit.compiler.registry import register_workflow
+from bqskit.compiler.workflow import Workflow
 from bqskit.ft.cliffordt.cliffordtgates import clifford_gates
-from bqskit.ft.cliffordt.defaultworkflow import build_circuit_workflow
-from bqskit.ft.cliffordt.defaultworkflow import build_statemap_workflow
-from bqskit.ft.cliffordt.defaultworkflow import build_stateprep_workflow
-from bqskit.ft.cliffordt.defaultworkflow import build_unitary_workflow
+from bqskit.ft.cliffordt.options import CliffordTOptions
 from bqskit.ft.ftmodel import FaultTolerantModel
+from bqskit.ir.circuit import Circuit
 from bqskit.ir.gate import Gate
 from bqskit.ir.gates.constant.t import TGate
 from bqskit.ir.gates.constant.tdg import TdgGate
 from bqskit.ir.gates.parameterized.rz import RZGate
+from bqskit.utils.typing import is_real_number
+
+if TYPE_CHECKING:
+    from bqskit.compiler.compiler import Compiler
+    from bqskit.ft.cliffordt.template import CliffordTTemplate
+
+
+target_types = ('circuit', 'unitary', 'statemap', 'stateprep')
+"""The target types CliffordTModel registers workflows for."""
+
+
+@lru_cache(maxsize=None)
+def default_workflow(
+    target_type: str,
+    optimization_level: int,
+    synthesis_epsilon: float = 1e-8,
+    options: CliffordTOptions | None = None,
+) -> Workflow:
+    """
+    Build the default Clifford+T workflow for a target type.
+
+    Workflows are built on first use and shared by every caller asking
+    for the same arguments.
+
+    Args:
+        target_type (str): One of 'circuit', 'unitary', 'statemap', or
+            'stateprep'.
+
+        optimization_level (int): The optimization level.
+
+        synthesis_epsilon (float): The maximum distance between target
+            and circuit unitary allowed to declare successful synthesis.
+            (Default: 1e-8)
+
+        options (CliffordTOptions | None): The optional features of the
+            workflow, see :class:`CliffordTOptions`. If None, they are
+            all off. (Default: None)
+
+    Returns:
+        (Workflow): The workflow.
+
+    Raises:
+        ValueError: If `target_type` is not a known target type.
+    """
+    from bqskit.ft.cliffordt import defaultworkflow
+
+    builders = {
+        'circuit': defaultworkflow.build_circuit_workflow,
+        'unitary': defaultworkflow.build_unitary_workflow,
+        'statemap': defaultworkflow.build_statemap_workflow,
+        'stateprep': defaultworkflow.build_stateprep_workflow,
+    }
+    if target_type not in builders:
+        raise ValueError(
+            f'Expected target_type in {target_types}, got {target_type}.',
+        )
+    return builders[target_type](
+        optimization_level,
+        synthesis_epsilon,
+        options=options,
+    )
+
+
+class DefaultWorkflowPass(BasePass):
+    """
+    The DefaultWorkflowPass class.
+
+    Runs the :func:`default_workflow` for its arguments, building it the
+    first time it runs in each process.
+    """
+
+    def __init__(
+        self,
+        target_type: str,
+        optimization_level: int,
+        synthesis_epsilon: float = 1e-8,
+        options: CliffordTOptions | None = None,
+    ) -> None:
+        """Construct a DefaultWorkflowPass, see :func:`default_workflow`."""
+        if target_type not in target_types:
+            raise ValueError(
+                f'Expected target_type in {target_types}, got {target_type}.',
+            )
+
+        if not is_real_number(synthesis_epsilon):
+            raise TypeError(
+                'Expected float for synthesis_epsilon'
+                f', got {type(synthesis_epsilon)}.',
+            )
+
+        if options is not None and not isinstance(options, CliffordTOptions):
+            raise TypeError(
+                'Expected CliffordTOptions for options'
+                f', got {type(options)}.',
+            )
+
+        self.target_type = target_type
+        self.optimization_level = optimization_level
+        self.synthesis_epsilon = synthesis_epsilon
+        self.options = options if options is not None else CliffordTOptions()
+
+    @property
+    def workflow(self) -> Workflow:
+        """The workflow this pass runs."""
+        return default_workflow(
+            self.target_type,
+            self.optimization_level,
+            self.synthesis_epsilon,
+            self.options,
+        )
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        await self.workflow.run(circuit, data)
 
 
 class CliffordTModel(FaultTolerantModel):
@@ -22,8 +141,11 @@ class CliffordTModel(FaultTolerantModel):
         self,
         num_qudits: int,
         clifford_gates: Sequence[Gate] = clifford_gates,
-        non_clifford_gates: Sequence[Gate] = [TGate(), TdgGate(), RZGate()],
+        non_clifford_gates: Sequence[Gate] = [TGate(), TdgGate()],
         radixes: Sequence[int] = [],
+        synthesis_epsilon: float = 1e-8,
+        gate_costs: Mapping[Gate, float] = {},
+        options: CliffordTOptions | None = None,
     ) -> None:
         """
         Construct a FaultTolerantModel of an error corrected machine.
@@ -38,14 +160,34 @@ class CliffordTModel(FaultTolerantModel):
                 SdgGate(), SqrtXGate(), CNOTGate(), CZGate()])
 
             non_clifford_gates (Sequence[Gate]): A list of non-Clifford
-                gates to allow in the model. If RZGates are not desired,
-                RZtoCliffordTSynthesis should be used.
-                (Default: [TGate(), TdgGate(), RZGate()])
+                gates to allow in the model. If RZGate is included,
+                rotations are kept as is; otherwise they are approximated
+                by RZtoCliffordTSynthesisPass.
+                (Default: [TGate(), TdgGate()])
 
             radixes (Sequence[int]): The radixes of the qudits. If empty,
                 qudits are assumed to be qubits. Currently only qubits
                 are supported. (Default: [])
 
+            synthesis_epsilon (float): The synthesis epsilon of the
+                registered workflows. (Default: 1e-8)
+
+            gate_costs (Mapping[Gate, float]): The cost of each gate,
+                see :class:`FaultTolerantModel`. Rotations that are not
+                in the model cost as many T gates as their approximation
+                to within `synthesis_epsilon` is expected to take.
+                (Default: {})
+
+            options (CliffordTOptions | None): The optional features of
+                the registered workflows, such as windowed compilation,
+                an error budget, profiling, checkpoints, Pauli-rotation
+                merging and verification. See :class:`CliffordTOptions`.
+                If None, they are all off. (Default: None)
+
+        Note:
+            The registered workflows are only built when a compilation
+            first runs them, and are shared across models.
+
         TODO:
             - Add support for radices >2
         """
@@ -54,29 +196,48 @@ class CliffordTModel(FaultTolerantModel):
             clifford_gates=clifford_gates,
             non_clifford_gates=non_clifford_gates,
             radixes=radixes,
+            gate_costs=gate_costs,
         )
+        self.synthesis_epsilon = synthesis_epsilon
+        self.options = options if options is not None else CliffordTOptions()
+
+        # Gridsynth takes about 3 log2(1 / epsilon) T gates per rotation
+        t_cost = self.gate_cost(TGate())
+        self.rotation_cost = t_cost * 3 * math.log2(1 / synthesis_epsilon)
+        if RZGate() not in self.gate_costs:
+            self.gate_costs[RZGate()] = self.rotation_cost
+
         for opt_level in [1, 2, 3, 4]:
-            register_workflow(
-                self,
-                build_circuit_workflow(opt_level),
-                opt_level,
-                'circuit',
-            )
-            register_workflow(
-                self,
-                build_unitary_workflow(opt_level),
-                opt_level,
-                'unitary',
-            )
-            register_workflow(
-                self,
-                build_statemap_workflow(opt_level),
-                opt_level,
-                'statemap',
-            )
-            register_workflow(
-                self,
-                build_stateprep_workflow(opt_level),
-                opt_level,
-                'stateprep',
-            )
+            for target_type in target_types:
+                register_workflow(
+                    self,
+                    DefaultWorkflowPass(
+                        target_type,
+                        opt_level,
+                        synthesis_epsilon,
+                        self.options,
+                    ),
+                    opt_level,
+                    target_type,
+                )
+
+    def compile_template(
+        self,
+        circuit: Circuit,
+        optimization_level: int = 1,
+        compiler: Compiler | None = None,
+        seed: int | None = None,
+    ) -> CliffordTTemplate:
+        """
+        Compile `circuit` once, leaving its rotations to bind later.
+
+        See :func:`~bqskit.ft.cliffordt.template.compile_template`.
+        """
+        from bqskit.ft.cliffordt.template import compile_template
+        return compile_template(
+            circuit,
+            self,
+            optimization_level,
+            compiler,
+            seed,
+        )
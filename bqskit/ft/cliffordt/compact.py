@@ -0,0 +1,410 @@
+"""
+This module implements a compact, array-backed Clifford+T circuit.
+
+A :class:`CliffordTCircuit` stores each operation as a one-byte opcode
+into a fixed gate alphabet, a row of a packed `(n, 2)` qubit array, and,
+for RZ gates only, an angle. Single-qubit operations repeat their qubit
+in both columns. This takes a few bytes per operation instead of the
+several hundred held by an :class:`Operation`, and lets counting and
+export work on whole arrays at once.
+"""
+from __future__ import annotations
+
+import io
+import os
+from typing import Any
+from typing import Iterator
+from typing import Sequence
+from typing import TextIO
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.ft.cliffordt.cliffordtgates import clifford_gates
+from bqskit.ft.cliffordt.cliffordtgates import rz_gates
+from bqskit.ft.cliffordt.cliffordtgates import t_gates
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.operation import Operation
+from bqskit.qis.unitary.unitary import RealVector
+
+
+alphabet: tuple[Gate, ...] = (
+    IdentityGate(),
+    *clifford_gates,
+    *t_gates,
+    *rz_gates,
+)
+"""The gates a CliffordTCircuit can hold, indexed by opcode."""
+
+_codes = {gate: code for code, gate in enumerate(alphabet)}
+
+_arities = np.array([gate.num_qudits for gate in alphabet], dtype=np.uint8)
+
+_parameterized = np.array([gate.num_params > 0 for gate in alphabet])
+
+_rz_code = _codes[rz_gates[0]]
+
+
+def _qubit_dtype(num_qudits: int) -> type[np.unsignedinteger[Any]]:
+    """Return the smallest unsigned type that indexes `num_qudits`."""
+    if num_qudits <= 1 << 8:
+        return np.uint8
+    if num_qudits <= 1 << 16:
+        return np.uint16
+    return np.uint32
+
+
+class CliffordTCircuit:
+    """
+    A compact circuit over a fixed Clifford+T gate alphabet.
+
+    Operations are kept in the order they were appended, which is a valid
+    simulation order. Convert from and to a :class:`Circuit` with
+    :meth:`from_circuit` and :meth:`to_circuit`.
+    """
+
+    def __init__(self, num_qudits: int, capacity: int = 0) -> None:
+        """
+        Construct an empty CliffordTCircuit.
+
+        Args:
+            num_qudits (int): The number of qubits in the circuit.
+
+            capacity (int): The number of operations to allocate room
+                for up front. (Default: 0)
+        """
+        if not isinstance(num_qudits, int) or num_qudits <= 0:
+            raise ValueError(
+                'Expected positive integer for num_qudits'
+                f', got {num_qudits}.',
+            )
+
+        if not isinstance(capacity, int) or capacity < 0:
+            raise ValueError(
+                'Expected non-negative integer for capacity'
+                f', got {capacity}.',
+            )
+
+        self.num_qudits = num_qudits
+        self._size = 0
+        self._num_angles = 0
+        self._opcodes = np.zeros(capacity, dtype=np.uint8)
+        self._qubits = np.zeros((capacity, 2), _qubit_dtype(num_qudits))
+        self._angles = np.zeros(0, dtype=np.float64)
+
+    @property
+    def num_operations(self) -> int:
+        """The number of operations in the circuit."""
+        return self._size
+
+    @property
+    def opcodes(self) -> npt.NDArray[np.uint8]:
+        """A read-only view of the opcodes into :data:`alphabet`."""
+        view = self._opcodes[:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def qubits(self) -> npt.NDArray[np.unsignedinteger[Any]]:
+        """A read-only view of the `(n, 2)` qubit array."""
+        view = self._qubits[:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def angles(self) -> npt.NDArray[np.float64]:
+        """A read-only view of the RZ angles, in operation order."""
+        view = self._angles[:self._num_angles]
+        view.flags.writeable = False
+        return view
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, size: int, num_angles: int) -> None:
+        """Grow the arrays geometrically to hold the given sizes."""
+        if size > len(self._opcodes):
+            capacity = max(size, 2 * len(self._opcodes), 16)
+            self._opcodes = np.resize(self._opcodes, capacity)
+            self._qubits = np.resize(self._qubits, (capacity, 2))
+        if num_angles > len(self._angles):
+            capacity = max(num_angles, 2 * len(self._angles), 16)
+            self._angles = np.resize(self._angles, capacity)
+
+    def append_gate(
+        self,
+        gate: Gate,
+        location: Sequence[int],
+        params: RealVector = [],
+    ) -> None:
+        """
+        Append `gate` at `location` to the end of the circuit.
+
+        Raises:
+            ValueError: If `gate` is not in :data:`alphabet`, or if the
+                location or parameters do not fit it.
+        """
+        code = _codes.get(gate)
+        if code is None:
+            raise ValueError(f'Expected a Clifford+T gate, got {gate}.')
+
+        if len(location) != gate.num_qudits or not all(
+            0 <= q < self.num_qudits for q in location
+        ) or len(set(location)) != len(location):
+            raise ValueError(f'Invalid location {location} for {gate}.')
+
+        if len(params) != gate.num_params:
+            raise ValueError(
+                f'Expected {gate.num_params} params for {gate}'
+                f', got {len(params)}.',
+            )
+
+        self._reserve(self._size + 1, self._num_angles + len(params))
+        self._opcodes[self._size] = code
+        self._qubits[self._size] = (location[0], location[-1])
+        self._size += 1
+        if len(params) > 0:
+            self._angles[self._num_angles] = params[0]
+            self._num_angles += 1
+
+    @staticmethod
+    def from_arrays(
+        num_qudits: int,
+        opcodes: npt.ArrayLike,
+        qubits: npt.ArrayLike,
+        angles: npt.ArrayLike = (),
+    ) -> CliffordTCircuit:
+        """
+        Build a circuit from whole arrays, see :attr:`opcodes`.
+
+        Raises:
+            ValueError: If the arrays are inconsistent with each other or
+                with `num_qudits`.
+        """
+        opcodes = np.asarray(opcodes)
+        qubits = np.asarray(qubits).reshape(-1, 2)
+        angles = np.asarray(angles, dtype=np.float64).reshape(-1)
+        if len(opcodes) != len(qubits):
+            raise ValueError('Expected one row of qubits per opcode.')
+
+        if len(opcodes) > 0:
+            if opcodes.min() < 0 or opcodes.max() >= len(alphabet):
+                raise ValueError('Opcode out of range.')
+
+            if qubits.min() < 0 or qubits.max() >= num_qudits:
+                raise ValueError('Qubit index out of range.')
+
+        opcodes = opcodes.astype(np.uint8)
+        single = _arities[opcodes] == 1
+        if np.any(qubits[single, 0] != qubits[single, 1]):
+            raise ValueError('Single-qubit rows must repeat their qubit.')
+
+        if np.any(qubits[~single, 0] == qubits[~single, 1]):
+            raise ValueError('Two-qubit rows must use distinct qubits.')
+
+        if np.count_nonzero(opcodes == _rz_code) != len(angles):
+            raise ValueError('Expected one angle per RZ operation.')
+
+        circuit = CliffordTCircuit(num_qudits)
+        circuit._opcodes = opcodes
+        circuit._qubits = qubits.astype(_qubit_dtype(num_qudits))
+        circuit._angles = angles.copy()
+        circuit._size = len(opcodes)
+        circuit._num_angles = len(angles)
+        return circuit
+
+    @staticmethod
+    def from_circuit(circuit: Circuit) -> CliffordTCircuit:
+        """
+        Convert a qubit `circuit` over :data:`alphabet` to compact form.
+
+        Raises:
+            ValueError: If `circuit` has qudits or gates outside of
+                :data:`alphabet`.
+        """
+        if not circuit.is_qubit_only():
+            raise ValueError('Expected a qubit-only circuit.')
+
+        size = circuit.num_operations
+        opcodes = np.zeros(size, dtype=np.uint8)
+        qubits = np.zeros((size, 2), _qubit_dtype(circuit.num_qudits))
+        angles = []
+        for index, op in enumerate(circuit):
+            code = _codes.get(op.gate)
+            if code is None:
+                raise ValueError(f'Expected a Clifford+T gate, got {op.gate}.')
+            opcodes[index] = code
+            qubits[index] = (op.location[0], op.location[-1])
+            if code == _rz_code:
+                angles.append(op.params[0])
+
+        compact = CliffordTCircuit(circuit.num_qudits)
+        compact._opcodes = opcodes
+        compact._qubits = qubits
+        compact._angles = np.array(angles, dtype=np.float64)
+        compact._size = size
+        compact._num_angles = len(angles)
+        return compact
+
+    def __iter__(self) -> Iterator[Operation]:
+        """Yield every operation in order."""
+        angles = iter(self.angles.tolist())
+        qubits = self.qubits.tolist()
+        for code, (a, b) in zip(self.opcodes.tolist(), qubits):
+            gate = alphabet[code]
+            location = (a, b) if _arities[code] == 2 else (a,)
+            params = [next(angles)] if _parameterized[code] else []
+            yield Operation(gate, location, params)
+
+    def to_circuit(self) -> Circuit:
+        """Convert this circuit to a :class:`Circuit`."""
+        circuit = Circuit(self.num_qudits)
+        for op in self:
+            circuit.append(op)
+        return circuit
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CliffordTCircuit):
+            return NotImplemented
+
+        return (
+            self.num_qudits == other.num_qudits
+            and np.array_equal(self.opcodes, other.opcodes)
+            and np.array_equal(self.qubits, other.qubits)
+            and np.array_equal(self.angles, other.angles)
+        )
+
+    @property
+    def gate_counts(self) -> dict[Gate, int]:
+        """The number of times each gate occurs in the circuit."""
+        counts = np.bincount(self.opcodes, minlength=len(alphabet))
+        return {
+            alphabet[code]: int(count)
+            for code, count in enumerate(counts)
+            if count > 0
+        }
+
+    def count(self, gate: Gate) -> int:
+        """Return the number of times `gate` occurs in the circuit."""
+        code = _codes.get(gate)
+        if code is None:
+            return 0
+        return int(np.count_nonzero(self.opcodes == code))
+
+    @property
+    def depth(self) -> int:
+        """
+        The circuit depth.
+
+        Runs of single-qubit gates are counted per qubit with array
+        operations, so only two-qubit gates are visited one at a time.
+        """
+        if self._size == 0:
+            return 0
+
+        opcodes, qubits = self.opcodes, self.qubits.astype(np.int64)
+        double = np.flatnonzero(_arities[opcodes] == 2)
+        single = np.flatnonzero(_arities[opcodes] == 1)
+
+        # Events are single-qubit gates and both ends of two-qubit gates;
+        # count the single-qubit gates on each qubit before each event
+        event_qubits = np.concatenate([
+            qubits[single, 0], qubits[double, 0], qubits[double, 1],
+        ])
+        event_index = np.concatenate([single, double, double])
+        is_single = np.zeros(len(event_index), dtype=np.int64)
+        is_single[:len(single)] = 1
+        order = np.lexsort((event_index, event_qubits))
+        running = np.cumsum(is_single[order])
+        group_starts = np.searchsorted(
+            event_qubits[order], event_qubits[order],
+        )
+        before = np.empty_like(running)
+        before[order] = running - np.concatenate([[0], running])[group_starts]
+
+        ends = before[len(single):].reshape(2, -1).T.tolist()
+        totals = np.bincount(qubits[single, 0], minlength=self.num_qudits)
+        levels = [0] * self.num_qudits
+        marks = [0] * self.num_qudits
+        for (a, b), (count_a, count_b) in zip(
+            qubits[double].tolist(), ends,
+        ):
+            level = max(
+                levels[a] + count_a - marks[a],
+                levels[b] + count_b - marks[b],
+            ) + 1
+            levels[a] = levels[b] = level
+            marks[a], marks[b] = count_a, count_b
+
+        return max(
+            level + int(total) - mark
+            for level, total, mark in zip(levels, totals, marks)
+        )
+
+    def write_qasm(self, f: TextIO, chunk_size: int = 1 << 16) -> None:
+        """
+        Write the circuit as OpenQASM 2.0 to `f`, a chunk at a time.
+
+        The output matches :meth:`Circuit.to` with `'qasm'` for the same
+        operations in the same order.
+        """
+        f.write('OPENQASM 2.0;\ninclude "qelib1.inc";\n')
+        f.write(f'qreg q[{self.num_qudits}];\n')
+        for code in np.unique(self.opcodes).tolist():
+            f.write(alphabet[code].get_qasm_gate_def())
+
+        names = [gate.qasm_name + ' ' for gate in alphabet]
+        registers = [f'q[{q}]' for q in range(self.num_qudits)]
+        angles = iter(self.angles.tolist())
+        for start in range(0, self._size, chunk_size):
+            stop = start + chunk_size
+            lines = []
+            for code, (a, b) in zip(
+                self._opcodes[start:stop].tolist(),
+                self._qubits[start:stop].tolist(),
+            ):
+                if code == _rz_code:
+                    lines.append(f'rz({next(angles)}) {registers[a]};\n')
+                elif _arities[code] == 2:
+                    lines.append(
+                        f'{names[code]}{registers[a]}, {registers[b]};\n',
+                    )
+                else:
+                    lines.append(f'{names[code]}{registers[a]};\n')
+            f.write(''.join(lines))
+
+    def to_qasm(self) -> str:
+        """Return the circuit as OpenQASM 2.0, see :meth:`write_qasm`."""
+        f = io.StringIO()
+        self.write_qasm(f)
+        return f.getvalue()
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Write the circuit's arrays to a `.npz` file at `path`."""
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                num_qudits=self.num_qudits,
+                gates=np.array([gate.qasm_name for gate in alphabet]),
+                opcodes=self.opcodes,
+                qubits=self.qubits,
+                angles=self.angles,
+            )
+
+    @staticmethod
+    def load(path: str | os.PathLike[str]) -> CliffordTCircuit:
+        """Read a circuit written by :meth:`save`."""
+        names = {gate.qasm_name: code for code, gate in enumerate(alphabet)}
+        with np.load(path) as arrays:
+            try:
+                codes = np.array([names[str(n)] for n in arrays['gates']])
+            except KeyError as e:
+                raise ValueError(f'Unknown gate {e} in {path}.') from None
+            return CliffordTCircuit.from_arrays(
+                int(arrays['num_qudits']),
+                codes[arrays['opcodes']],
+                arrays['qubits'],
+                arrays['angles'],
+            )
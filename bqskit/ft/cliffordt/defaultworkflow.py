@@ -3,9 +3,28 @@ from __future__ import annotations
 from bqskit.compiler.basepass import BasePass
 from bqskit.compiler.compile import build_multi_qudit_retarget_workflow
 from bqskit.compiler.workflow import Workflow
+from bqskit.ft.cliffordt.batching import BatchedSingleQubitPass
+from bqskit.ft.cliffordt.blockcache import CachedSynthesisPass
+from bqskit.ft.cliffordt.blockcache import ForEachUniqueBlockPass
+from bqskit.ft.cliffordt.budget import BudgetedRotationSynthesisPass
+from bqskit.ft.cliffordt.budget import MeasureErrorPass
+from bqskit.ft.cliffordt.checkpoint import CheckpointPass
+from bqskit.ft.cliffordt.clifford import CliffordPredicate
+from bqskit.ft.cliffordt.clifford import CliffordSynthesisPass
+from bqskit.ft.cliffordt.gilesselinger import GilesSelingerPredicate
+from bqskit.ft.cliffordt.gilesselinger import GilesSelingerSynthesisPass
+from bqskit.ft.cliffordt.gridsynth import RZtoCliffordTSynthesisPass
+from bqskit.ft.cliffordt.matsumotoamano import MatsumotoAmanoSynthesisPass
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.paulirotation import PauliRotationPass
+from bqskit.ft.cliffordt.peephole import PeepholeOptimizationPass
+from bqskit.ft.cliffordt.phasefolding import PhaseFoldingPass
+from bqskit.ft.cliffordt.profiling import profile_workflow
+from bqskit.ft.cliffordt.resources import ResourceEstimationPass
 from bqskit.ft.cliffordt.rounding import RoundToDiscreteZPass
-from bqskit.ft.rules.replacement import construct_unitary_match_rule
-from bqskit.ft.rules.replacement import ReplacementRule
+from bqskit.ft.cliffordt.verification import EquivalenceVerificationPass
+from bqskit.ft.cliffordt.windowed import WindowedCompilationPass
+from bqskit.ft.rules.replacement import ReplacementRuleSet
 from bqskit.ir.gates.constant.h import HGate
 from bqskit.ir.gates.constant.identity import IdentityGate
 from bqskit.ir.gates.constant.s import SGate
@@ -16,8 +35,10 @@ from bqskit.ir.gates.constant.tdg import TdgGate
 from bqskit.ir.gates.constant.x import XGate
 from bqskit.ir.gates.constant.y import YGate
 from bqskit.ir.gates.constant.z import ZGate
+from bqskit.ir.gates.parameterized.rz import RZGate
 from bqskit.ir.operation import Operation
 from bqskit.passes.control.foreach import ForEachBlockPass
+from bqskit.passes.control.ifthenelse import IfThenElsePass
 from bqskit.passes.partitioning.quick import QuickPartitioner
 from bqskit.passes.partitioning.single import GroupSingleQuditGatePass
 from bqskit.passes.processing.scan import ScanningGateRemovalPass
@@ -29,39 +50,65 @@ from bqskit.passes.util.unfold import UnfoldPass
 from bqskit.utils.typing import is_real_number
 
 
-h_repl_rule = construct_unitary_match_rule(HGate().get_unitary())
-i_repl_rule = construct_unitary_match_rule(IdentityGate().get_unitary())
-x_repl_rule = construct_unitary_match_rule(XGate().get_unitary())
-sqrtx_repl_rule = construct_unitary_match_rule(SqrtXGate().get_unitary())
-y_repl_rule = construct_unitary_match_rule(YGate().get_unitary())
-z_repl_rule = construct_unitary_match_rule(ZGate().get_unitary())
-s_repl_rule = construct_unitary_match_rule(SGate().get_unitary())
-sdg_repl_rule = construct_unitary_match_rule(SdgGate().get_unitary())
-t_repl_rule = construct_unitary_match_rule(TGate().get_unitary())
-tdg_repl_rule = construct_unitary_match_rule(TdgGate().get_unitary())
-
-
 def single_qudit_filter(op: Operation) -> bool:
     return op.num_qudits == 1 and op.num_params > 0
 
 
+def non_rz_filter(op: Operation) -> bool:
+    return single_qudit_filter(op) and not isinstance(op.gate, RZGate)
+
+
+replaceable_gates = [
+    HGate(),
+    XGate(),
+    SqrtXGate(),
+    YGate(),
+    ZGate(),
+    SGate(),
+    SdgGate(),
+    TGate(),
+    TdgGate(),
+    IdentityGate(),
+]
+
+
 def clifford_replace() -> BasePass:
-    return ForEachBlockPass(
-        [
-            ReplacementRule(h_repl_rule, HGate()),
-            ReplacementRule(x_repl_rule, XGate()),
-            ReplacementRule(sqrtx_repl_rule, SqrtXGate()),
-            ReplacementRule(y_repl_rule, YGate()),
-            ReplacementRule(z_repl_rule, ZGate()),
-            ReplacementRule(s_repl_rule, SGate()),
-            ReplacementRule(sdg_repl_rule, SdgGate()),
-            ReplacementRule(t_repl_rule, TGate()),
-            ReplacementRule(tdg_repl_rule, TdgGate()),
-            ReplacementRule(i_repl_rule, IdentityGate()),
-        ],
+    """
+    Replace single-qubit blocks equal to one of `replaceable_gates`.
+
+    Each block's unitary is looked up once in a :class:`ReplacementRuleSet`.
+    The workflows use :func:`normal_form_replace`, which also replaces
+    the exact Clifford+T blocks that are none of these gates.
+    """
+    return BatchedSingleQubitPass(
+        ReplacementRuleSet([(g, g) for g in replaceable_gates]),
         collection_filter=single_qudit_filter,
     )
 
+
+def normal_form_replace(synthesis_epsilon: float = 1e-8) -> BasePass:
+    # A unitary within a distance d of a Clifford+T operator has a Bloch
+    # matrix within about 2 d of it, entry by entry
+    tolerance = max(synthesis_epsilon / 2, 1e-11)
+    return BatchedSingleQubitPass(
+        MatsumotoAmanoSynthesisPass(tolerance=tolerance),
+        collection_filter=single_qudit_filter,
+    )
+
+
+checkpointed_stages = (
+    BatchedSingleQubitPass,
+    BudgetedRotationSynthesisPass,
+    ForEachBlockPass,
+    ForEachUniqueBlockPass,
+    IfThenElsePass,
+    MeasureErrorPass,
+    RZtoCliffordTSynthesisPass,
+    WindowedCompilationPass,
+)
+"""The stages of the workflows a checkpoint is saved after."""
+
+
 def build_cliffordt_workflow(
     optimization_level: int,
     synthesis_epsilon: float = 1e-8,
@@ -70,42 +117,136 @@ def build_cliffordt_workflow(
     error_sim_size: int = 8,
     circuit_target: bool = False,
     seed: int | None = None,
+    options: CliffordTOptions | None = None,
 ) -> list[BasePass]:
-    """Build a workflow for Clifford+T compilation."""
-    passes = [SetRandomSeedPass(seed)] if seed is not None else []
+    """
+    Build a workflow for Clifford+T compilation.
+
+    The optional features, such as windowed compilation of circuit
+    targets, an error budget, profiling, checkpoints, Pauli-rotation
+    merging, verification and a persistent rotation cache, are turned
+    on by `options`, see :class:`CliffordTOptions`. If None, they are
+    all off.
+    """
+    if options is None:
+        options = CliffordTOptions()
+
+    # A budget is only spent on the rotations after every other stage's
+    # error is taken out of it, so the stages have to measure their error
+    budgeted = options.error_budget is not None
+    if budgeted and error_threshold is None:
+        error_threshold = options.error_budget
+        error_sim_size = max_synthesis_size
+
+    passes: list[BasePass] = []
     if circuit_target:
         passes += [UnfoldPass()]
-        passes += build_multi_qudit_retarget_workflow(
-            optimization_level=optimization_level,
-            synthesis_epsilon=synthesis_epsilon,
-            max_synthesis_size=max_synthesis_size,
-            error_threshold=error_threshold,
-            error_sim_size=error_sim_size,
+        passes += list(
+            build_multi_qudit_retarget_workflow(
+                optimization_level=optimization_level,
+                synthesis_epsilon=synthesis_epsilon,
+                max_synthesis_size=max_synthesis_size,
+                error_threshold=error_threshold,
+                error_sim_size=error_sim_size,
+            ),
         )
         passes += [UnfoldPass()]
         passes += [QuickPartitioner(block_size=max_synthesis_size)]
 
     if not circuit_target or optimization_level >= 3:
-        passes += build_search_synthesis_workflow(
+        synthesis = build_search_synthesis_workflow(
             optimization_level, synthesis_epsilon,
         )
+        if circuit_target:
+            block_synthesis: BasePass = CachedSynthesisPass(
+                synthesis,
+                synthesis_epsilon,
+                checkpoint=options.checkpoint,
+            )
+            if budgeted:
+                block_synthesis = MeasureErrorPass(block_synthesis)
+            synthesis = [ForEachUniqueBlockPass(block_synthesis), UnfoldPass()]
+        elif budgeted:
+            synthesis = [MeasureErrorPass(synthesis)]
+        passes += synthesis
+
+    gate_removal: BasePass = ScanningGateRemovalPass()
+    if budgeted:
+        gate_removal = MeasureErrorPass(gate_removal)
 
     passes += [
         GroupSingleQuditGatePass(),
-        clifford_replace(),
+        normal_form_replace(synthesis_epsilon),
         UnfoldPass(),
+        PhaseFoldingPass(),
         RoundToDiscreteZPass(synthesis_epsilon),
+        PeepholeOptimizationPass(),
         QuickPartitioner(2),
-        ForEachBlockPass([ScanningGateRemovalPass()]),
+        ForEachBlockPass([gate_removal]),
         UnfoldPass(),
         GroupSingleQuditGatePass(),
-        clifford_replace(),
+        normal_form_replace(synthesis_epsilon),
         UnfoldPass(),
-        RoundToDiscreteZPass(synthesis_epsilon),
+        # What is left of the single-qudit gates becomes Z rotations, the
+        # only gates the final rotation synthesis replaces
+        BatchedSingleQubitPass(
+            [ZXZXZDecomposition()],
+            collection_filter=non_rz_filter,
+        ),
         UnfoldPass(),
+        PhaseFoldingPass(),
+    ]
+    if options.pauli_rotations:
+        passes += [PauliRotationPass(synthesis_epsilon)]
+    if options.error_budget is None:
+        passes += [
+            RoundToDiscreteZPass(synthesis_epsilon),
+            RZtoCliffordTSynthesisPass(
+                synthesis_epsilon,
+                cache_path=options.rotation_cache,
+            ),
+        ]
+    else:
+        passes += [
+            BudgetedRotationSynthesisPass(
+                options.error_budget,
+                cache_path=options.rotation_cache,
+            ),
+        ]
+    passes += [UnfoldPass(), PeepholeOptimizationPass()]
+
+    if circuit_target and options.window_size is not None:
+        passes = [WindowedCompilationPass(passes, options.window_size)]
+
+    if seed is not None:
+        passes.insert(0, SetRandomSeedPass(seed))
+
+    passes += [
         # Finalizing
+        ResourceEstimationPass(),
         LogErrorPass(),
     ]
+
+    # Save after the retarget, block synthesis, replacement, cleanup and
+    # rotation synthesis stages; the passes between them are cheap to redo
+    stages = [
+        i for i, p in enumerate(passes)
+        if isinstance(p, checkpointed_stages)
+    ]
+
+    if options.profile:
+        profile = options.profile
+        trace_file = profile if isinstance(profile, str) else None
+        passes = profile_workflow(passes, trace_file)
+
+    if options.checkpoint is not None:
+        passes = [CheckpointPass(passes, options.checkpoint, stages)]
+
+    if options.verify is True:
+        passes = [EquivalenceVerificationPass(passes)]
+    elif options.verify:
+        passes = [EquivalenceVerificationPass(passes, options.verify)]
+
     return passes
 
 
@@ -125,7 +266,9 @@ def build_search_synthesis_workflow(
             Set to 0 for exact synthesis. (Default: 1e-8)
 
     Returns:
-        (list[BasePass]): Synthesis passes.
+        (list[BasePass]): Synthesis passes. Clifford targets and
+            exact Clifford+T targets of up to three qubits are
+            synthesized directly, skipping the search.
 
     Raises:
         ValueError: If the optimization level is not 1, 2, 3, or 4.
@@ -149,9 +292,17 @@ def build_search_synthesis_workflow(
             f', got {type(synthesis_epsilon)}.',
         )
 
-    synthesis = QSearchSynthesisPass(success_threshold=synthesis_epsilon)
+    synthesis = IfThenElsePass(
+        CliffordPredicate(),
+        CliffordSynthesisPass(),
+        IfThenElsePass(
+            GilesSelingerPredicate(),
+            GilesSelingerSynthesisPass(),
+            QSearchSynthesisPass(success_threshold=synthesis_epsilon),
+        ),
+    )
     group = GroupSingleQuditGatePass()
-    foreach = ForEachBlockPass(
+    foreach = BatchedSingleQubitPass(
         [ZXZXZDecomposition()], collection_filter=single_qudit_filter,
     )
 
@@ -170,6 +321,7 @@ def build_circuit_workflow(
     error_threshold: float | None = None,
     error_sim_size: int = 8,
     seed: int | None = None,
+    options: CliffordTOptions | None = None,
 ) -> Workflow:
     """Build standard workflow for circuit compilation."""
     workflow = build_cliffordt_workflow(
@@ -180,6 +332,7 @@ def build_circuit_workflow(
         error_sim_size,
         circuit_target=True,
         seed=seed,
+        options=options,
     )
     return Workflow(
         workflow, name='Off-the-Shelf Clifford+T Circuit Compilation',
@@ -193,6 +346,7 @@ def build_unitary_workflow(
     error_threshold: float | None = None,
     error_sim_size: int = 8,
     seed: int | None = None,
+    options: CliffordTOptions | None = None,
 ) -> Workflow:
     """Build standard workflow for circuit compilation."""
     workflow = build_cliffordt_workflow(
@@ -203,6 +357,7 @@ def build_unitary_workflow(
         error_sim_size=error_sim_size,
         circuit_target=False,
         seed=seed,
+        options=options,
     )
     return Workflow(
         workflow, name='Off-the-Shelf Clifford+T Unitary Compilation',
@@ -216,6 +371,7 @@ def build_statemap_workflow(
     error_threshold: float | None = None,
     error_sim_size: int = 8,
     seed: int | None = None,
+    options: CliffordTOptions | None = None,
 ) -> Workflow:
     """Build standard workflow for circuit compilation."""
     workflow = build_cliffordt_workflow(
@@ -226,6 +382,7 @@ def build_statemap_workflow(
         error_sim_size,
         circuit_target=False,
         seed=seed,
+        options=options,
     )
     return Workflow(
         workflow, name='Off-the-Shelf Clifford+T StateSystem Compilation',
@@ -239,6 +396,7 @@ def build_stateprep_workflow(
     error_threshold: float | None = None,
     error_sim_size: int = 8,
     seed: int | None = None,
+    options: CliffordTOptions | None = None,
 ) -> Workflow:
     """Build standard workflow for circuit compilation."""
     workflow = build_cliffordt_workflow(
@@ -249,6 +407,7 @@ def build_stateprep_workflow(
         error_sim_size,
         circuit_target=False,
         seed=seed,
+        options=options,
     )
     return Workflow(
         workflow, name='Off-the-Shelf Clifford+T StateVector Compilation',
@@ -0,0 +1,532 @@
+"""
+This module implements the GilesSelingerSynthesisPass.
+
+A multi-qubit Clifford+T unitary has entries in the ring Z[1/sqrt(2), i],
+so it can be synthesized exactly by integer arithmetic instead of by
+numerical search. Following Giles and Selinger, each column is reduced to
+a unit vector by two-level Hadamards, which lower the column's
+denominator exponent, and single-qubit T powers, which align entries
+before each Hadamard. What remains is a diagonal of eighth roots of unity.
+Two-level rotations fold its phases onto a single basis state, and that
+phase is synthesized as a phase polynomial over CNOT and T gates when the
+determinant allows it without an ancilla.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable
+
+import numpy as np
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.ring import DyadicMatrix
+from bqskit.ft.cliffordt.ring import min_dyadic_exponents
+from bqskit.ft.cliffordt.ring import ZOmega
+from bqskit.ft.cliffordt.ring import ZRootTwo
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.constant.cx import CNOTGate
+from bqskit.ir.gates.constant.h import HGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.tdg import TdgGate
+from bqskit.ir.gates.constant.x import XGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.passes.control.predicate import PassPredicate
+from bqskit.qis.unitary.unitarymatrix import UnitaryLike
+from bqskit.qis.unitary.unitarymatrix import UnitaryMatrix
+
+
+_logger = logging.getLogger(__name__)
+
+_Entry = tuple[ZOmega, int]
+"""A ring element `w / sqrt(2)^k` with `k` as small as possible."""
+
+_Op = tuple[Gate, tuple[int, ...]]
+
+_OMEGA = ZOmega(0, 0, 1, 0)
+_SQRT2 = ZOmega(-1, 0, 1, 0)
+_I = ZOmega(0, 1, 0, 0)
+_ZERO: _Entry = (ZOmega(), 0)
+
+_inverses: dict[Gate, Gate] = {
+    SGate(): SdgGate(),
+    SdgGate(): SGate(),
+    TGate(): TdgGate(),
+    TdgGate(): TGate(),
+}
+
+
+def _phase_word(m: int) -> list[Gate]:
+    """Return gates multiplying |1> by `w^m`."""
+    return [
+        [], [TGate()], [SGate()], [SGate(), TGate()],
+        [ZGate()], [ZGate(), TGate()], [SdgGate()], [TdgGate()],
+    ][m % 8]
+
+
+def _reduce(w: ZOmega, k: int) -> _Entry:
+    """Return `w / sqrt(2)^k` with the smallest possible exponent."""
+    if w.is_zero():
+        return _ZERO
+    while k > 0 and w.is_divisible_by_sqrt2():
+        w, k = w.div_sqrt2(), k - 1
+    return w, k
+
+
+def _numerator(entry: _Entry, k: int) -> ZOmega:
+    """Return the numerator of `entry` over `sqrt(2)^k`."""
+    w, exponent = entry
+    for _ in range(k - exponent):
+        w = w * _SQRT2
+    return w
+
+
+def _is_odd(w: ZOmega) -> bool:
+    """Return True if `w` is not divisible by `1 + w`, a prime over 2."""
+    return (w.a + w.b + w.c + w.d) % 2 == 1
+
+
+def _valuation(w: ZOmega, limit: int) -> int:
+    """Return how often `1 + w` divides `w`, up to `limit`."""
+    count = 0
+    while count < limit and not w.is_zero() and w.is_divisible_by_sqrt2():
+        w = w.div_sqrt2()
+        count += 2
+    if w.is_zero():
+        return limit
+    return min(count + (not _is_odd(w)), limit)
+
+
+def _embed(matrix: DyadicMatrix, i: int, j: int, k: int) -> ZOmega:
+    """Return the numerator of `matrix[i, j]` over `sqrt(2)^k` in Z[w]."""
+    z = ZRootTwo(matrix.a[i, j], matrix.b[i, j])
+    return _numerator((ZOmega.from_zroottwo(z), matrix.k), k)
+
+
+def recognize_unitary(
+    utry: UnitaryLike,
+    max_exponent: int = 32,
+    tolerance: float = 1e-11,
+) -> list[list[_Entry]] | None:
+    """
+    Recognize a unitary over Z[1/sqrt(2), i] up to global phase.
+
+    An exact unitary has determinant `w^m`, so `U` can only be exact
+    after multiplying by one of `8 * N` roots of `w^m / det(U)`; those
+    that differ by a power of `w` are equivalent. Each remaining phase
+    is first tested on the largest entry alone.
+
+    Args:
+        utry (UnitaryLike): The unitary to recognize.
+
+        max_exponent (int): The largest denominator exponent to consider
+            for any entry. (Default: 32)
+
+        tolerance (float): The largest allowed deviation of the real or
+            imaginary part of any entry. (Default: 1e-11)
+
+    Returns:
+        (list[list[_Entry]] | None): The exact entries as rows of
+            `(w, k)` pairs, or None if `utry` is not recognized.
+    """
+    utry = np.asarray(utry, dtype=np.complex128)
+    dim = utry.shape[0]
+    angle = np.angle(np.linalg.det(utry))
+    phases = np.exp(1j * (np.arange(dim) * np.pi / 4 - angle) / dim)
+
+    largest = utry.flat[np.argmax(np.abs(utry))]
+    values = np.concatenate([(largest * phases).real, (largest * phases).imag])
+    exponents = min_dyadic_exponents(values, max_exponent, tolerance)
+    found = (exponents[:dim] >= 0) & (exponents[dim:] >= 0)
+
+    for candidate in np.flatnonzero(found):
+        matrix = utry * phases[candidate]
+        real = DyadicMatrix.from_float(matrix.real, max_exponent, tolerance)
+        imag = DyadicMatrix.from_float(matrix.imag, max_exponent, tolerance)
+        if real is None or imag is None:
+            continue
+
+        k = max(real.k, imag.k)
+        rows = []
+        for i in range(dim):
+            row = []
+            for j in range(dim):
+                x = _embed(real, i, j, k)
+                y = _embed(imag, i, j, k)
+                row.append(_reduce(x + _I * y, k))
+            rows.append(row)
+        return rows
+
+    return None
+
+
+class _Reduction:
+    """Left-multiply an exact unitary by gates until it is diagonal."""
+
+    def __init__(self, rows: list[list[_Entry]], num_qudits: int) -> None:
+        self.rows = rows
+        self.num_qudits = num_qudits
+        self.ops: list[_Op] = []
+
+    def bit(self, level: int, qudit: int) -> int:
+        return (level >> (self.num_qudits - 1 - qudit)) & 1
+
+    def phase(self, qudit: int, m: int) -> None:
+        """Apply `T^m` to `qudit`."""
+        factor = _OMEGA ** (m % 8)
+        for level, row in enumerate(self.rows):
+            if self.bit(level, qudit):
+                self.rows[level] = [(w * factor, k) for w, k in row]
+        self.ops.extend((gate, (qudit,)) for gate in _phase_word(m))
+
+    def hadamard(self, a: int, b: int) -> None:
+        """Apply a Hadamard to levels `a < b`."""
+        new_a, new_b = [], []
+        for x, y in zip(self.rows[a], self.rows[b]):
+            k = max(x[1], y[1])
+            x_num, y_num = _numerator(x, k), _numerator(y, k)
+            new_a.append(_reduce(x_num + y_num, k + 1))
+            new_b.append(_reduce(x_num - y_num, k + 1))
+        self.rows[a], self.rows[b] = new_a, new_b
+
+        # (S H T) X (S H T)^dagger = H, so this controls a Hadamard
+        def core(controls: list[int], target: int) -> list[_Op]:
+            ops: list[_Op] = [(SdgGate(), (target,)), (HGate(), (target,))]
+            ops += [(TdgGate(), (target,))]
+            ops += _controlled_x(controls, target)
+            ops += [(TGate(), (target,)), (HGate(), (target,))]
+            ops += [(SGate(), (target,))]
+            return ops
+        self.two_level(a, b, core)
+
+    def swap(self, a: int, b: int) -> None:
+        """Apply an X to levels `a < b`."""
+        self.rows[a], self.rows[b] = self.rows[b], self.rows[a]
+        self.two_level(a, b, _controlled_x)
+
+    def rotate(self, a: int, b: int, m: int) -> None:
+        """Multiply level `a < b` by `w^m` and level `b` by `w^-m`."""
+        for level, factor in ((a, _OMEGA ** (m % 8)), (b, _OMEGA ** (-m % 8))):
+            self.rows[level] = [(w * factor, k) for w, k in self.rows[level]]
+
+        # T^-m X T^m X is diag(w^m, w^-m), and T^-m T^m is the identity
+        def core(controls: list[int], target: int) -> list[_Op]:
+            ops = _controlled_x(controls, target)
+            ops += [(gate, (target,)) for gate in _phase_word(m)]
+            ops += _controlled_x(controls, target)
+            ops += [(gate, (target,)) for gate in _phase_word(-m)]
+            return ops
+        self.two_level(a, b, core)
+
+    def two_level(
+        self,
+        a: int,
+        b: int,
+        core: Callable[[list[int], int], list[_Op]],
+    ) -> None:
+        """
+        Emit a two-level operation on levels `a < b`.
+
+        The levels are first brought to differ only in their most
+        significant differing qudit `t` by CNOTs from `t`. Then `core`
+        builds the gate on `t` controlled on the remaining qudits, which
+        are flipped where `a` has a zero.
+        """
+        n = self.num_qudits
+        differ = [q for q in range(n) if self.bit(a, q) != self.bit(b, q)]
+        target, others = differ[0], differ[1:]
+        controls = [q for q in range(n) if q != target]
+        flips = [q for q in controls if not self.bit(a, q)]
+
+        ops: list[_Op] = [(CNOTGate(), (target, q)) for q in others]
+        ops += [(XGate(), (q,)) for q in flips]
+        ops += core(controls, target)
+        ops += [(XGate(), (q,)) for q in flips]
+        ops += [(CNOTGate(), (target, q)) for q in reversed(others)]
+        self.ops.extend(ops)
+
+    def pair(self, col: int, i: int, j: int) -> None:
+        """Align entries `i` and `j` of column `col` and mix them."""
+        a, b = min(i, j), max(i, j)
+        k = max(self.rows[a][col][1], self.rows[b][col][1])
+        x = _numerator(self.rows[a][col], k)
+        y = _numerator(self.rows[b][col], k)
+
+        def score(m: int) -> int:
+            z = y * _OMEGA ** m
+            return min(_valuation(x + z, 4), _valuation(x - z, 4))
+
+        m = max(range(8), key=score)
+        target = next(
+            q for q in range(self.num_qudits)
+            if self.bit(a, q) != self.bit(b, q)
+        )
+        if m != 0:
+            self.phase(target, m)
+        self.hadamard(a, b)
+
+    def reduce_column(self, col: int) -> bool:
+        """Reduce column `col` to a multiple of its unit vector."""
+        levels = range(col, len(self.rows))
+        while True:
+            k = max(self.rows[i][col][1] for i in levels)
+            if k == 0:
+                break
+
+            # Odd entries pair up into entries divisible by 1 + w, which
+            # then pair up into entries divisible by sqrt(2)
+            for stage in range(2):
+                top = [
+                    i for i in levels
+                    if self.rows[i][col][1] == k
+                    and _is_odd(self.rows[i][col][0]) == (stage == 0)
+                ]
+                if len(top) % 2 == 1:
+                    return False
+                for i, j in zip(top[::2], top[1::2]):
+                    self.pair(col, i, j)
+
+            if max(self.rows[i][col][1] for i in levels) >= k:
+                return False
+
+        nonzero = [i for i in levels if not self.rows[i][col][0].is_zero()]
+        if len(nonzero) != 1:
+            return False
+        if nonzero[0] != col:
+            self.swap(col, nonzero[0])
+        return True
+
+
+def _controlled_x(controls: list[int], target: int) -> list[_Op]:
+    """Return an exact Clifford+T circuit for a multi-controlled X."""
+    if len(controls) == 0:
+        return [(XGate(), (target,))]
+    if len(controls) == 1:
+        return [(CNOTGate(), (controls[0], target))]
+    if len(controls) != 2:
+        raise ValueError(f'Expected at most 2 controls, got {len(controls)}.')
+
+    c1, c2 = controls
+    return [
+        (HGate(), (target,)), (CNOTGate(), (c2, target)),
+        (TdgGate(), (target,)), (CNOTGate(), (c1, target)),
+        (TGate(), (target,)), (CNOTGate(), (c2, target)),
+        (TdgGate(), (target,)), (CNOTGate(), (c1, target)),
+        (TGate(), (c2,)), (TGate(), (target,)), (HGate(), (target,)),
+        (CNOTGate(), (c1, c2)), (TGate(), (c1,)), (TdgGate(), (c2,)),
+        (CNOTGate(), (c1, c2)),
+    ]
+
+
+def _phase_polynomial(
+    exponents: list[int],
+    num_qudits: int,
+) -> list[_Op] | None:
+    """
+    Synthesize `diag(w^e)` up to global phase over CNOT and T gates.
+
+    The phase function is expanded as a sum of parities with integer
+    coefficients, which exist exactly when every nontrivial Walsh
+    coefficient is divisible by `2^(n - 1)`.
+    """
+    ops: list[_Op] = []
+    half = 2 ** (num_qudits - 1)
+    for mask in range(1, 2 ** num_qudits):
+        walsh = sum(
+            e if bin(mask & level).count('1') % 2 == 0 else -e
+            for level, e in enumerate(exponents)
+        )
+        if walsh % half != 0:
+            return None
+        coefficient = (-walsh // half) % 8
+        if coefficient == 0:
+            continue
+
+        qudits = [
+            q for q in range(num_qudits)
+            if (mask >> (num_qudits - 1 - q)) & 1
+        ]
+        target = qudits[-1]
+        parity = [(CNOTGate(), (q, target)) for q in qudits[:-1]]
+        ops += parity
+        ops += [(gate, (target,)) for gate in _phase_word(coefficient)]
+        ops += list(reversed(parity))
+    return ops
+
+
+def giles_selinger_decompose(
+    rows: list[list[_Entry]],
+    num_qudits: int,
+) -> list[_Op] | None:
+    """
+    Decompose an exact unitary into Clifford+T gates without ancillas.
+
+    Args:
+        rows (list[list[_Entry]]): The exact unitary, as returned by
+            :func:`recognize_unitary`. It is modified in place.
+
+        num_qudits (int): The number of qubits, at most 3.
+
+    Returns:
+        (list[_Op] | None): The gates and locations in circuit order, or
+            None if the unitary is not exactly unitary or needs an
+            ancilla.
+    """
+    reduction = _Reduction(rows, num_qudits)
+    for col in range(len(rows)):
+        if not reduction.reduce_column(col):
+            return None
+
+    powers = [_OMEGA ** m for m in range(8)]
+    exponents = []
+    for level, row in enumerate(rows):
+        if any(not w.is_zero() for j, (w, _) in enumerate(row) if j != level):
+            return None
+        w, k = row[level]
+        if k != 0 or w not in powers:
+            return None
+        exponents.append(powers.index(w))
+
+    # Fold every phase onto level 0 through neighbours with one bit fewer
+    for level in range(len(rows) - 1, 0, -1):
+        if exponents[level] % 8 != 0:
+            neighbour = level & (level - 1)
+            reduction.rotate(neighbour, level, exponents[level])
+            exponents[neighbour] += exponents[level]
+            exponents[level] = 0
+
+    diagonal = _phase_polynomial(exponents, num_qudits)
+    if diagonal is None:
+        return None
+
+    # The reduction computed G U = D, so U = G^-1 D
+    inverse = [(_inverses.get(g, g), q) for g, q in reversed(reduction.ops)]
+    return diagonal + inverse
+
+
+class GilesSelingerSynthesisPass(BasePass):
+    """
+    The GilesSelingerSynthesisPass class.
+
+    Replace circuits of at most three qubits whose unitary has entries in
+    Z[1/sqrt(2), i], up to global phase, with an exact Clifford+T
+    circuit. Circuits that are not exact, that are wider, or that would
+    need an ancilla are left unchanged.
+    """
+
+    key = 'giles_selinger_synthesis'
+    """The data key of a result found by :class:`GilesSelingerPredicate`."""
+
+    def __init__(
+        self,
+        max_exponent: int = 32,
+        tolerance: float = 1e-11,
+    ) -> None:
+        """
+        Construct a GilesSelingerSynthesisPass.
+
+        Args:
+            max_exponent (int): The largest denominator exponent to
+                recognize in any unitary entry. (Default: 32)
+
+            tolerance (float): The largest deviation of a unitary entry
+                from its exact value. Exactness is confirmed in integer
+                arithmetic after recognition. (Default: 1e-11)
+        """
+        if not isinstance(max_exponent, int) or max_exponent < 0:
+            raise ValueError(
+                'Expected non-negative integer for max_exponent'
+                f', got {max_exponent}.',
+            )
+
+        self.max_exponent = max_exponent
+        self.tolerance = tolerance
+
+    def synthesize(self, utry: UnitaryLike) -> Circuit | None:
+        """Return an exact circuit for `utry`, or None if there is none."""
+        utry = np.asarray(utry, dtype=np.complex128)
+        num_qudits = utry.shape[0].bit_length() - 1
+        if utry.shape[0] != 2 ** num_qudits or num_qudits > 3:
+            return None
+
+        rows = recognize_unitary(utry, self.max_exponent, self.tolerance)
+        if rows is None:
+            return None
+
+        ops = giles_selinger_decompose(rows, num_qudits)
+        if ops is None:
+            return None
+
+        circuit = Circuit(num_qudits)
+        for gate, location in ops:
+            circuit.append_gate(gate, location)
+        if circuit.num_operations == 0:
+            circuit.append_gate(
+                IdentityGate(num_qudits),
+                list(range(num_qudits)),
+            )
+        return circuit
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        if any(radix != 2 for radix in circuit.radixes):
+            raise ValueError('Cannot synthesize a non-qubit circuit.')
+
+        utry = circuit.get_unitary()
+        found = data.pop(self.key, None)
+        if found is not None and np.array_equal(found[0], utry):
+            result = found[1]
+        else:
+            result = self.synthesize(utry)
+        if result is None:
+            _logger.debug('Circuit is not exactly Clifford+T.')
+            return
+
+        circuit.become(result)
+
+
+class GilesSelingerPredicate(PassPredicate):
+    """
+    The GilesSelingerPredicate class.
+
+    The GilesSelingerPredicate returns True if the
+    :class:`GilesSelingerSynthesisPass` can synthesize the circuit.
+    Deciding that takes the synthesis itself, so its result is stored in
+    the pass data for the GilesSelingerSynthesisPass that follows. It
+    returns False for state and state system targets, as the circuit
+    does not implement those until it is synthesized.
+    """
+
+    def __init__(
+        self,
+        max_exponent: int = 32,
+        tolerance: float = 1e-11,
+    ) -> None:
+        """
+        Construct a GilesSelingerPredicate.
+
+        Args:
+            max_exponent (int): See :class:`GilesSelingerSynthesisPass`.
+                (Default: 32)
+
+            tolerance (float): See :class:`GilesSelingerSynthesisPass`.
+                (Default: 1e-11)
+        """
+        self.synthesis = GilesSelingerSynthesisPass(max_exponent, tolerance)
+
+    def get_truth_value(self, circuit: Circuit, data: PassData) -> bool:
+        """Call this predicate, see :class:`PassPredicate` for more info."""
+        if any(radix != 2 for radix in circuit.radixes):
+            return False
+        if not isinstance(data.target, UnitaryMatrix):
+            return False
+        utry = circuit.get_unitary()
+        result = self.synthesis.synthesize(utry)
+        if result is None:
+            return False
+        data[GilesSelingerSynthesisPass.key] = (utry, result)
+        return True
@@ -0,0 +1,1035 @@
+"""
+This module implements approximate Clifford+T synthesis of Z rotations.
+
+The algorithm follows Ross and Selinger's number-theoretic approach. A
+single-qubit Clifford+T unitary has the form
+
+    U = [[u, -t^dagger], [t, u^dagger]] / sqrt(2)^k
+
+for `u` and `t` in Z[w]. For each denominator exponent `k`, candidates
+for `u` are enumerated from the lattice points of a small region around
+`exp(-i * theta / 2)`, and `t` is recovered by solving the norm equation
+`t^dagger t = 2^k - u^dagger u`. The first solution found is converted to
+gates with the T-optimal Matsumoto-Amano normal form.
+
+The candidate region is a four-dimensional ellipsoid that shrinks by
+`sqrt(2)` at each level, so its lattice is LLL-reduced once per angle and
+rescaled for every `k`.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import random
+from collections import OrderedDict
+from decimal import Decimal
+from decimal import localcontext
+from fractions import Fraction
+from typing import Callable
+from typing import Generic
+from typing import Hashable
+from typing import Iterator
+from typing import Sequence
+from typing import TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.matsumotoamano import matsumoto_amano_decompose
+from bqskit.ft.cliffordt.ring import DyadicMatrix
+from bqskit.ft.cliffordt.ring import LAMBDA
+from bqskit.ft.cliffordt.ring import ZOmega
+from bqskit.ft.cliffordt.ring import ZRootTwo
+from bqskit.ft.cliffordt.rotationcache import open_rotation_cache
+from bqskit.ft.cliffordt.rotationcache import RotationCache
+from bqskit.ft.rules.replacement import _distance
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.tdg import TdgGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.ir.gates.parameterized.rz import RZGate
+from bqskit.ir.operation import Operation
+from bqskit.utils.typing import is_real_number
+
+
+_logger = logging.getLogger(__name__)
+
+_V = TypeVar('_V')
+
+
+class SynthesisCache(Generic[_V]):
+    """A least-recently-used cache that counts its hits and misses."""
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        """
+        Construct an empty SynthesisCache.
+
+        Args:
+            maxsize (int): The number of entries kept before the least
+                recently used one is evicted. (Default: 4096)
+        """
+        if not isinstance(maxsize, int) or maxsize < 0:
+            raise ValueError(
+                f'Expected non-negative integer for maxsize, got {maxsize}.',
+            )
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, _V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> _V | None:
+        """Return the entry for `key`, or None, and record the lookup."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, value: _V) -> None:
+        """Insert an entry, evicting the least recently used if full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def resize(self, maxsize: int) -> None:
+        """Change the capacity, evicting entries if it shrinks."""
+        self.maxsize = maxsize
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def reserve(self, maxsize: int) -> None:
+        """Grow the capacity to at least `maxsize`, never shrinking it."""
+        self.maxsize = max(self.maxsize, maxsize)
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were hits."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+rz_cache: SynthesisCache[tuple[Gate, ...]] = SynthesisCache()
+"""The in-process cache shared by every RZtoCliffordTSynthesisPass."""
+
+
+def _eighth_turns(angle: float) -> tuple[float, int]:
+    """Split `angle` into a residual in [-pi/8, pi/8) and eighth turns."""
+    turns = math.floor(angle / (math.pi / 4) + 0.5)
+    residual = angle - turns * (math.pi / 4)
+    return residual, turns % 8
+
+
+_eighth_turn_gates: list[tuple[Gate, ...]] = [
+    (),
+    (TGate(),),
+    (SGate(),),
+    (SGate(), TGate()),
+    (ZGate(),),
+    (SdgGate(), TdgGate()),
+    (SdgGate(),),
+    (TdgGate(),),
+]
+
+
+def synthesize_rz(
+    angle: float,
+    epsilon: float,
+    cache: SynthesisCache[tuple[Gate, ...]] | None = rz_cache,
+    store: RotationCache | None = None,
+) -> tuple[Gate, ...]:
+    """
+    Approximate `RZGate` at `angle` with Clifford+T gates.
+
+    Multiples of pi/4 are split off exactly as T, S, and Z gates, so the
+    cache is keyed on the residual angle in [-pi/8, pi/8), rounded to
+    absorb floating-point error from the split, and `epsilon`.
+
+    Args:
+        angle (float): The rotation angle.
+
+        epsilon (float): The largest allowed distance, as measured by
+            :func:`UnitaryMatrix.get_distance_from`, between the result
+            and the rotation.
+
+        cache (SynthesisCache | None): The cache to consult and fill,
+            or None to always synthesize. (Default: the module cache)
+
+        store (RotationCache | None): A persistent cache to consult on
+            misses in `cache`, and fill with new results. (Default: None)
+
+    Returns:
+        (tuple[Gate, ...]): The gates in circuit order, up to global phase.
+    """
+    residual, turns = _eighth_turns(float(angle))
+    key = (round(residual, 15), float(epsilon))
+    gates = None if cache is None else cache.get(key)
+    if gates is None and store is not None:
+        gates = store.get(residual, epsilon)
+        if gates is not None and cache is not None:
+            cache.put(key, gates)
+    if gates is None:
+        gates = tuple(gridsynth(residual, epsilon))
+        if cache is not None:
+            cache.put(key, gates)
+        if store is not None:
+            store.put(residual, epsilon, gates)
+    return _eighth_turn_gates[turns] + gates
+
+
+def gridsynth(
+    angle: float,
+    epsilon: float,
+    factoring_effort: int = 2000,
+    search_budget: int | None = 50000,
+) -> list[Gate]:
+    """
+    Approximate `RZGate` at `angle` with a T-optimal Clifford+T sequence.
+
+    Angles within a few `epsilon` of a multiple of pi/4 need more T gates
+    than others, and the search for them visits more nodes. If it visits
+    more than `search_budget`, the rotation is instead nudged by a
+    distance of `epsilon / 2` away from the multiple and approximated to
+    within `epsilon / 2`, which costs a few more T gates.
+
+    Args:
+        angle (float): The rotation angle.
+
+        epsilon (float): The largest allowed distance between the result
+            and the rotation. Must be in (0, 1).
+
+        factoring_effort (int): The number of Pollard-Brent iterations
+            spent factoring each candidate's norm before moving on to the
+            next candidate. (Default: 2000)
+
+        search_budget (int | None): The number of lattice search nodes
+            visited before falling back to nudging the rotation, or
+            None to never nudge. (Default: 50000)
+
+    Returns:
+        (list[Gate]): The gates in circuit order, up to global phase.
+
+    Raises:
+        ValueError: If `epsilon` is not in (0, 1).
+
+        RuntimeError: If no approximation is found, which only happens if
+            factoring repeatedly exhausts its effort.
+    """
+    if not 0 < epsilon < 1:
+        raise ValueError(f'Expected epsilon in (0, 1), got {epsilon}.')
+
+    angle, epsilon = float(angle), float(epsilon)
+    solution = _approximate(angle, epsilon, factoring_effort, search_budget)
+    if solution is None:
+        # RZ(angle) is within epsilon / 2 of RZ(nudged), which is further
+        # from the axis, so approximating it to within epsilon / 2 does
+        _logger.debug(f'Nudging degenerate rotation RZ({angle}).')
+        half = epsilon / 2
+        nudge = math.copysign(2 * math.asin(half), angle)
+        return gridsynth(angle + nudge, half, factoring_effort, None)
+
+    u, t, k = solution
+    gates = matsumoto_amano_decompose(_bloch_matrix(u, t, k))
+    assert gates is not None
+    return gates
+
+
+def _approximate(
+    angle: float,
+    epsilon: float,
+    factoring_effort: int,
+    search_budget: int | None,
+) -> tuple[ZOmega, ZOmega, int] | None:
+    """
+    Return `u`, `t`, and `k` for the least `k` with a solution, or None
+    if the lattice search visits more than `search_budget` nodes.
+    """
+    budget = [search_budget if search_budget is not None else math.inf]
+    digits = 4 * max(0, -math.floor(math.log10(epsilon))) + 30
+    with localcontext() as ctx:
+        ctx.prec = digits
+        region = _Region(angle, epsilon)
+        max_k = 4 * math.ceil(math.log2(1 / epsilon)) + 32
+        for k in range(max_k + 1):
+            for u in region.candidates(k, budget):
+                xi = ZRootTwo(2 ** k) - u.norm_sq()
+                t = solve_norm_equation(xi, factoring_effort)
+                if t is not None:
+                    return u, t, k
+            if budget[0] < 0:
+                return None
+    raise RuntimeError(
+        f'Failed to approximate RZ({angle}) to within {epsilon}.',
+    )
+
+
+class _Region:
+    """
+    The lattice points `u` in Z[w] with `u / sqrt(2)^k` in the epsilon
+    region around `exp(-i * angle / 2)` and `|u^bullet| <= sqrt(2)^k`.
+
+    The epsilon region is the segment of the unit disk where
+    `Re(z * exp(i * angle / 2)) >= 1 - epsilon^2 / 2`. Writing `u` in the
+    integral basis 1, w, w^2, w^3, an ellipse around the segment and the
+    unit disk of the Galois conjugate bound a positive definite quadratic
+    form in four integer coordinates, `|M a / sqrt(2)^k - c|^2 <= 1`.
+    Must be used within a Decimal context of sufficient precision.
+
+    Every valid point satisfies such a form for each ellipse around the
+    segment and each weighting of the two disks, so the search intersects
+    the intervals allowed by several of them. This matters for angles
+    near the direction of a small element of Z[w]: there the lattice has
+    very short vectors, and any single ellipsoid holds sheets of points
+    just outside the segment.
+    """
+
+    _bits = 64
+
+    _forms = (
+        (0, 0.5), (0, 0.1), (0, 0.9), (1, 0.5), (1, 0.9), (4, 0.9),
+    )
+    """Pairs of the segment ellipse parameter and the weight of its disk."""
+
+    def __init__(self, angle: float, epsilon: float) -> None:
+        self.cos, self.sin = _cos_sin(Decimal(angle) / 2)
+        self.epsilon = Decimal(epsilon)
+        self.root2 = Decimal(2).sqrt()
+        r = 1 / self.root2
+        d = self.epsilon * self.epsilon / 2
+
+        # Real and imaginary parts of u and its conjugate per coordinate
+        re_u = [Decimal(1), r, Decimal(0), -r]
+        im_u = [Decimal(0), r, Decimal(1), r]
+        re_ub = [Decimal(1), -r, Decimal(0), r]
+        im_ub = [Decimal(0), -r, Decimal(1), -r]
+
+        # Segment coordinates x = (p_r - 1 + d) / d and y = p_i / epsilon
+        # of p = u * exp(i * angle / 2), in which the segment lies within
+        # 0 <= x <= 1 - y^2
+        x_row = [(self.cos * a - self.sin * b) / d for a, b in zip(re_u, im_u)]
+        y_row = [
+            (self.sin * a + self.cos * b) / self.epsilon
+            for a, b in zip(re_u, im_u)
+        ]
+        x_offset = (1 - d) / d
+
+        forms = []
+        for beta, weight in self._forms:
+            cx, ax, ay = _segment_ellipse(Decimal(beta))
+            w1, w2 = Decimal(weight).sqrt(), (1 - Decimal(weight)).sqrt()
+            rows = [
+                [w1 * v / ax for v in x_row],
+                [w1 * v / ay for v in y_row],
+                [w2 * v for v in re_ub],
+                [w2 * v for v in im_ub],
+            ]
+            target = [w1 * (x_offset + cx) / ax] + [Decimal(0)] * 3
+            forms.append((rows, target))
+
+        # LLL-reduce the lattice of the first form
+        scale = Decimal(2 ** self._bits)
+        columns = [
+            [int((row[j] * scale).to_integral_value()) for row in forms[0][0]]
+            for j in range(4)
+        ]
+        self.transform = _lll(columns)[1]
+
+        # Express every form in the reduced coordinates
+        self.triangulars = []
+        self.centers = []
+        for rows, target in forms:
+            reduced = [
+                [
+                    sum((row[i] * t[i] for i in range(4)), Decimal(0))
+                    for t in self.transform
+                ]
+                for row in rows
+            ]
+            self.centers.append(_solve(reduced, target))
+            triangular = _cholesky(reduced)
+            self.triangulars.append(np.array(triangular, dtype=np.float64))
+
+    def candidates(self, k: int, budget: list[float]) -> Iterator[ZOmega]:
+        """Enumerate valid `u` at denominator exponent `k`."""
+        s = self.root2 ** k
+        centers = [[x * s for x in center] for center in self.centers]
+        base = [
+            int(x.to_integral_value(rounding='ROUND_FLOOR'))
+            for x in centers[0]
+        ]
+        offsets = [
+            np.array([float(x - b) for x, b in zip(center, base)])
+            for center in centers
+        ]
+        triangulars = [r / float(s) for r in self.triangulars]
+
+        def bounds(offset: list[int]) -> tuple[int, int]:
+            w = [b + o for b, o in zip(base, offset)]
+            w[0] = base[0]
+            a = [
+                sum(w[j] * self.transform[j][i] for j in range(4))
+                for i in range(4)
+            ]
+            return self._bounds(a, self.transform[0], k)
+
+        search = _fincke_pohst(triangulars, offsets, 1.0, budget, bounds)
+        for offset in search:
+            w = [b + o for b, o in zip(base, offset)]
+            a = [
+                sum(w[j] * self.transform[j][i] for j in range(4))
+                for i in range(4)
+            ]
+            u = ZOmega(a[3], a[2], a[1], a[0])
+
+            # Confirm |u|^2 <= 2^k and |u^bullet|^2 <= 2^k exactly
+            xi = ZRootTwo(2 ** k) - u.norm_sq()
+            if xi.sign() < 0 or xi.conj().sign() < 0:
+                continue
+
+            # Confirm Re(u * exp(i * angle / 2)) >= (1 - epsilon^2 / 2) s
+            re = a[0] + (a[1] - a[3]) / self.root2
+            im = a[2] + (a[1] + a[3]) / self.root2
+            projection = self.cos * re - self.sin * im
+            if projection < s * (1 - self.epsilon * self.epsilon / 2):
+                continue
+
+            yield u
+
+    def _bounds(
+        self,
+        a: list[int],
+        step: list[int],
+        k: int,
+    ) -> tuple[int, int]:
+        """
+        Return the range of integers `x` for which `a + x * step` can be a
+        valid `u` at denominator exponent `k`.
+
+        The segment is the part of the unit disk on one side of a chord,
+        so with every other coordinate fixed, the valid points lie within
+        the interval allowed by the chord and the two disks. Bounding the
+        last coordinate of the search by it, rather than by the ellipsoids
+        alone, skips the lines of points that lie just outside the
+        segment or the conjugate disk. They are numerous for angles near
+        a multiple of pi/4, whose segment ends near the lattice point 1.
+        """
+        with localcontext() as ctx:
+            ctx.prec += 10
+            r = 1 / self.root2
+            s = self.root2 ** k
+            low, high = -Decimal('Infinity'), Decimal('Infinity')
+            for sign in (1, -1):
+                re = a[0] + sign * (a[1] - a[3]) * r
+                im = a[2] + sign * (a[1] + a[3]) * r
+                re_step = step[0] + sign * (step[1] - step[3]) * r
+                im_step = step[2] + sign * (step[1] + step[3]) * r
+
+                # The disk |u|^2 <= 2^k, or its conjugate
+                quad = re_step * re_step + im_step * im_step
+                half = re * re_step + im * im_step
+                excess = re * re + im * im - 2 ** k
+                discriminant = half * half - quad * excess
+                if discriminant < 0:
+                    return 1, 0
+                root = discriminant.sqrt()
+                low = max(low, (-half - root) / quad)
+                high = min(high, (-half + root) / quad)
+
+                if sign == 1:
+                    # The chord Re(u * exp(i * angle / 2)) >= (1 - d) s
+                    bound = s * (1 - self.epsilon * self.epsilon / 2)
+                    slope = self.cos * re_step - self.sin * im_step
+                    gap = bound - (self.cos * re - self.sin * im)
+                    if slope > 0:
+                        low = max(low, gap / slope)
+                    elif slope < 0:
+                        high = min(high, gap / slope)
+                    elif gap > 0:
+                        return 1, 0
+
+            # Widen by a little, as the exact checks follow
+            margin = Decimal('1e-6')
+            first = (low - margin).to_integral_value(rounding='ROUND_CEILING')
+            last = (high + margin).to_integral_value(rounding='ROUND_FLOOR')
+            return int(first), int(last)
+
+
+def _segment_ellipse(beta: Decimal) -> tuple[Decimal, Decimal, Decimal]:
+    """
+    Return the center and semi-axes of an ellipse around the segment.
+
+    In segment coordinates, the smallest ellipse around the segment has
+    center 1/3 and semi-axes 2/3 and 2/sqrt(3). Adding `beta` times the
+    parabola `x - 1 + y^2`, which is nonpositive on the segment, gives
+    a family of ellipses that hug the curved side more tightly.
+    """
+    c, a, b_sq = Decimal(1) / 3, Decimal(2) / 3, Decimal(4) / 3
+    cx = c - beta * a * a / 2
+    r = (1 - c * c / (a * a) + beta + cx * cx / (a * a)).sqrt()
+    return cx, a * r, r / (1 / b_sq + beta).sqrt()
+
+
+def _cos_sin(x: Decimal) -> tuple[Decimal, Decimal]:
+    """Return the cosine and sine of `x` at the current Decimal precision."""
+    with localcontext() as ctx:
+        ctx.prec += 5
+        # Halve the argument until the series converges quickly
+        halvings = 0
+        while abs(x) > Decimal('0.01'):
+            x /= 2
+            halvings += 1
+        term, cos, sin = Decimal(1), Decimal(0), Decimal(0)
+        n = 0
+        epsilon = Decimal(10) ** -(ctx.prec + 2)
+        while abs(term) > epsilon or n < 2:
+            if n % 4 == 0:
+                cos += term
+            elif n % 4 == 1:
+                sin += term
+            elif n % 4 == 2:
+                cos -= term
+            else:
+                sin -= term
+            n += 1
+            term = term * x / n
+        for _ in range(halvings):
+            cos, sin = cos * cos - sin * sin, 2 * sin * cos
+    return +cos, +sin
+
+
+def _lll(
+    basis: Sequence[Sequence[int]],
+    delta: Fraction = Fraction(99, 100),
+) -> tuple[list[list[int]], list[list[int]]]:
+    """
+    LLL-reduce linearly independent integer row vectors.
+
+    This is Cohen's integral LLL (Algorithm 2.6.7), which keeps the
+    Gram-Schmidt data as exact integers and so needs no rational
+    arithmetic.
+
+    Returns:
+        (tuple[list[list[int]], list[list[int]]]): The reduced vectors
+            and the unimodular transform, whose row `j` holds the
+            coefficients of reduced vector `j` in the input basis.
+    """
+    n = len(basis)
+    # One-indexed to follow the reference algorithm
+    b: list[list[int]] = [[]] + [list(v) for v in basis]
+    h: list[list[int]] = [[]] + [
+        [int(i == j) for j in range(n)] for i in range(n)
+    ]
+    d = [1] + [0] * n
+    lam = [[0] * (n + 1) for _ in range(n + 1)]
+    num, den = delta.numerator, delta.denominator
+
+    def dot(x: list[int], y: list[int]) -> int:
+        return sum(p * q for p, q in zip(x, y))
+
+    def reduce(k: int, m: int) -> None:
+        if 2 * abs(lam[k][m]) > d[m]:
+            q = (2 * lam[k][m] + d[m]) // (2 * d[m])
+            b[k] = [x - q * y for x, y in zip(b[k], b[m])]
+            h[k] = [x - q * y for x, y in zip(h[k], h[m])]
+            lam[k][m] -= q * d[m]
+            for i in range(1, m):
+                lam[k][i] -= q * lam[m][i]
+
+    def swap(k: int, k_max: int) -> None:
+        b[k], b[k - 1] = b[k - 1], b[k]
+        h[k], h[k - 1] = h[k - 1], h[k]
+        for j in range(1, k - 1):
+            lam[k][j], lam[k - 1][j] = lam[k - 1][j], lam[k][j]
+        mu = lam[k][k - 1]
+        new = (d[k - 2] * d[k] + mu * mu) // d[k - 1]
+        for i in range(k + 1, k_max + 1):
+            t = lam[i][k]
+            lam[i][k] = (d[k] * lam[i][k - 1] - mu * t) // d[k - 1]
+            lam[i][k - 1] = (new * t + mu * lam[i][k]) // d[k]
+        d[k - 1] = new
+
+    d[1] = dot(b[1], b[1])
+    k, k_max = 2, 1
+    while k <= n:
+        if k > k_max:
+            k_max = k
+            for j in range(1, k + 1):
+                u = dot(b[k], b[j])
+                for i in range(1, j):
+                    u = (d[i] * u - lam[k][i] * lam[j][i]) // d[i - 1]
+                if j < k:
+                    lam[k][j] = u
+                else:
+                    d[k] = u
+        while True:
+            reduce(k, k - 1)
+            lhs = den * d[k] * d[k - 2]
+            rhs = num * d[k - 1] ** 2 - den * lam[k][k - 1] ** 2
+            if lhs >= rhs:
+                break
+            swap(k, k_max)
+            k = max(2, k - 1)
+        for m in range(k - 2, 0, -1):
+            reduce(k, m)
+        k += 1
+    return b[1:], h[1:]
+
+
+def _solve(
+    matrix: list[list[Decimal]],
+    vector: list[Decimal],
+) -> list[Decimal]:
+    """Solve a nonsingular linear system by Gauss-Jordan elimination."""
+    n = len(vector)
+    rows = [list(row) + [v] for row, v in zip(matrix, vector)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(n):
+            if r != col and rows[r][col] != 0:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [x - factor * y for x, y in zip(rows[r], rows[col])]
+    return [rows[i][n] / rows[i][i] for i in range(n)]
+
+
+def _cholesky(matrix: list[list[Decimal]]) -> list[list[Decimal]]:
+    """Return upper triangular `R` with `R^T R = M^T M` for square `M`."""
+    n = len(matrix)
+    with localcontext() as ctx:
+        # The Gram matrix squares the condition number of `matrix`
+        ctx.prec *= 2
+        gram = [
+            [
+                sum((row[i] * row[j] for row in matrix), Decimal(0))
+                for j in range(n)
+            ]
+            for i in range(n)
+        ]
+        r = [[Decimal(0)] * n for _ in range(n)]
+        for i in range(n):
+            diagonal = gram[i][i] - sum(r[m][i] ** 2 for m in range(i))
+            r[i][i] = diagonal.sqrt()
+            for j in range(i + 1, n):
+                dot = sum(r[m][i] * r[m][j] for m in range(i))
+                r[i][j] = (gram[i][j] - dot) / r[i][i]
+    return r
+
+
+def _fincke_pohst(
+    triangulars: Sequence[npt.NDArray[np.float64]],
+    centers: Sequence[npt.NDArray[np.float64]],
+    radius_sq: float,
+    budget: list[float],
+    bounds: Callable[[list[int]], tuple[int, int]] | None = None,
+) -> Iterator[list[int]]:
+    """
+    Enumerate integer `x` with `|R (x - c)|^2 <= radius_sq` for every
+    upper triangular `R` and center `c` in `triangulars` and `centers`.
+
+    Each coordinate ranges over the intersection of the intervals allowed
+    by every form, from the last coordinate to the first. The single
+    entry of `budget` is decremented for every node of the search tree,
+    and the enumeration stops early once it reaches zero. If `bounds`
+    is given, it maps `x`, with every coordinate but the first fixed, to
+    an inclusive range the first coordinate is also kept within.
+    """
+    n = len(centers[0])
+    x = [0] * n
+    slack = radius_sq * (1 + 1e-9)
+    forms = list(zip(triangulars, centers))
+
+    def recurse(i: int, partials: list[float]) -> Iterator[list[int]]:
+        mids = []
+        low, high = -math.inf, math.inf
+        for (r, c), partial in zip(forms, partials):
+            shift = sum(r[i, j] * (x[j] - c[j]) for j in range(i + 1, n))
+            mid = c[i] - shift / r[i, i]
+            width = math.sqrt(max(slack - partial, 0.0)) / abs(r[i, i])
+            low = max(low, mid - width)
+            high = min(high, mid + width)
+            mids.append(mid)
+
+        first, last = math.ceil(low), math.floor(high)
+        if i == 0 and bounds is not None and first <= last:
+            extra = bounds(x)
+            first, last = max(first, extra[0]), min(last, extra[1])
+
+        for value in range(first, last + 1):
+            budget[0] -= 1
+            if budget[0] < 0:
+                return
+            x[i] = value
+            if i == 0:
+                yield list(x)
+                continue
+            steps = [
+                p + (r[i, i] * (value - mid)) ** 2
+                for (r, _), mid, p in zip(forms, mids, partials)
+            ]
+            yield from recurse(i - 1, steps)
+
+    yield from recurse(n - 1, [0.0] * len(forms))
+
+
+def _bloch_matrix(u: ZOmega, t: ZOmega, k: int) -> DyadicMatrix:
+    """Return the exact Bloch matrix of `[[u, -t^*], [t, u^*]] / sqrt(2)^k`."""
+    zero, one = ZOmega(), ZOmega(0, 0, 0, 1)
+    i = ZOmega(0, 1, 0, 0)
+    utry = [[u, -t.conj()], [t, u.conj()]]
+    adjoint = [[u.conj(), t.conj()], [-t, u]]
+    paulis = [
+        [[zero, one], [one, zero]],
+        [[zero, -i], [i, zero]],
+        [[one, zero], [zero, -one]],
+    ]
+
+    def matmul(
+        x: list[list[ZOmega]],
+        y: list[list[ZOmega]],
+    ) -> list[list[ZOmega]]:
+        return [
+            [x[r][0] * y[0][c] + x[r][1] * y[1][c] for c in range(2)]
+            for r in range(2)
+        ]
+
+    a = np.zeros((3, 3), dtype=object)
+    b = np.zeros((3, 3), dtype=object)
+    for col, pauli in enumerate(paulis):
+        image = matmul(matmul(utry, pauli), adjoint)
+        for row, other in enumerate(paulis):
+            product = matmul(other, image)
+            entry = (product[0][0] + product[1][1]).real_part()
+            a[row, col] = entry.a
+            b[row, col] = entry.b
+
+    # Entries are Tr(P U P U^dagger) / 2 with denominator 2 * 2^k
+    return DyadicMatrix(a, b, 2 * k + 2)
+
+
+def solve_norm_equation(
+    xi: ZRootTwo,
+    factoring_effort: int = 2000,
+) -> ZOmega | None:
+    """
+    Find `t` in Z[w] with `t^dagger t = xi`.
+
+    Args:
+        xi (ZRootTwo): The right-hand side.
+
+        factoring_effort (int): The number of Pollard-Brent iterations to
+            spend on each composite factor of the norm of `xi`.
+            (Default: 2000)
+
+    Returns:
+        (ZOmega | None): A solution, or None if there is none or the
+            norm of `xi` could not be factored within the effort.
+    """
+    if xi.sign() < 0 or xi.conj().sign() < 0:
+        return None
+    if xi == 0:
+        return ZOmega()
+
+    factors = _factor(xi.norm(), factoring_effort)
+    if factors is None:
+        return None
+
+    t = ZOmega(0, 0, 0, 1)
+    rest = xi
+    for p, exponent in factors.items():
+        if p == 2:
+            # (1 + w)^dagger (1 + w) = sqrt(2) * lambda
+            while rest.is_divisible_by_sqrt2():
+                rest = rest.div_sqrt2()
+                t = t * ZOmega(0, 0, 1, 1)
+            continue
+
+        if p % 8 in (3, 5):
+            # p is prime in Z[sqrt(2)] and splits in Z[w]
+            if exponent % 2 != 0:
+                return None
+            root = _sqrt_mod(p - 1 if p % 8 == 5 else p - 2, p)
+            if root is None:
+                return None
+            # x + i, or x + i * sqrt(2) = x + w + w^3
+            gaussian = ZOmega(0, 1, 0, root) if p % 8 == 5 else ZOmega(
+                1, 0, 1, root,
+            )
+            factor = ZOmega(0, 0, 0, p).gcd(gaussian)
+            t = t * factor ** (exponent // 2)
+            continue
+
+        # p splits in Z[sqrt(2)] as eta * eta^bullet
+        root = _sqrt_mod(2, p)
+        if root is None:
+            return None
+        eta = ZRootTwo(p).gcd(ZRootTwo(root, -1))
+        for prime in (eta, eta.conj()):
+            count = 0
+            while rest.divmod(prime)[1] == 0 and rest != 0:
+                rest = rest.divmod(prime)[0]
+                count += 1
+            if p % 8 == 7:
+                # eta stays prime in Z[w], so it must appear squared
+                if count % 2 != 0:
+                    return None
+                t = t * ZOmega.from_zroottwo(prime) ** (count // 2)
+            elif count > 0:
+                root_i = _sqrt_mod(p - 1, p)
+                if root_i is None:
+                    return None
+                gaussian = ZOmega(0, 1, 0, root_i)
+                factor = ZOmega.from_zroottwo(prime).gcd(gaussian)
+                t = t * factor ** count
+
+    # Correct by the doubly positive unit t^dagger t / xi = lambda^(2m)
+    quotient, remainder = t.norm_sq().divmod(xi)
+    if remainder != 0 or quotient.norm() != 1:
+        return None
+    m = round(math.log(float(quotient)) / (2 * math.log(float(LAMBDA))))
+    if LAMBDA ** (2 * m) != quotient:
+        return None
+    t = t * ZOmega.from_zroottwo(LAMBDA ** -m)
+    return t if t.norm_sq() == xi else None
+
+
+_small_primes = [
+    p for p in range(2, 1000)
+    if all(p % d != 0 for d in range(2, int(p ** 0.5) + 1))
+]
+
+
+def _is_probable_prime(n: int) -> bool:
+    """Return True if `n` passes Miller-Rabin for many fixed bases."""
+    if n < 2:
+        return False
+    for p in _small_primes[:25]:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in _small_primes[:20]:
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _pollard_brent(n: int, effort: int) -> int | None:
+    """Return a nontrivial factor of composite `n`, or None."""
+    rng = random.Random(n)
+    for _ in range(4):
+        y, c, m = rng.randrange(1, n), rng.randrange(1, n), 64
+        g, r, q = 1, 1, 1
+        x = ys = y
+        iterations = 0
+        while g == 1 and iterations < effort:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            iterations += r
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if 1 < g < n:
+            return g
+    return None
+
+
+def _factor(n: int, effort: int) -> dict[int, int] | None:
+    """Return the prime factorization of `n`, or None if it is too hard."""
+    factors: dict[int, int] = {}
+    for p in _small_primes:
+        while n % p == 0:
+            factors[p] = factors.get(p, 0) + 1
+            n //= p
+    stack = [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if _is_probable_prime(m):
+            factors[m] = factors.get(m, 0) + 1
+            continue
+        root = math.isqrt(m)
+        if root * root == m:
+            stack += [root, root]
+            continue
+        divisor = _pollard_brent(m, effort)
+        if divisor is None:
+            return None
+        stack += [divisor, m // divisor]
+    return factors
+
+
+def _sqrt_mod(a: int, p: int) -> int | None:
+    """Return a square root of `a` modulo odd prime `p` (Tonelli-Shanks)."""
+    a %= p
+    if a == 0:
+        return 0
+    if pow(a, (p - 1) // 2, p) != 1:
+        return None
+    q, s = p - 1, 0
+    while q % 2 == 0:
+        q //= 2
+        s += 1
+    z = 2
+    while pow(z, (p - 1) // 2, p) != p - 1:
+        z += 1
+    m, c, t, r = s, pow(z, q, p), pow(a, q, p), pow(a, (q + 1) // 2, p)
+    while t != 1:
+        i, t2 = 0, t
+        while t2 != 1:
+            t2 = t2 * t2 % p
+            i += 1
+        b = pow(c, 1 << (m - i - 1), p)
+        m, c, t, r = i, b * b % p, t * b * b % p, r * b % p
+    return r
+
+
+class RZtoCliffordTSynthesisPass(BasePass):
+    """
+    The RZtoCliffordTSynthesisPass class.
+
+    Replace every `RZGate` with a Clifford+T sequence that approximates it
+    to within `synthesis_epsilon`. Sequences are cached per process on the
+    angle and epsilon, and the cache counts are stored in the pass data
+    under `rz_synthesis_cache`. If `cache_path` is given, sequences are
+    also shared through a persistent :class:`RotationCache`, whose counts
+    are stored under `rotation_cache`.
+    """
+
+    def __init__(
+        self,
+        synthesis_epsilon: float = 1e-8,
+        cache_size: int = 4096,
+        cache_path: str | None = None,
+    ) -> None:
+        """
+        Construct a RZtoCliffordTSynthesisPass.
+
+        Args:
+            synthesis_epsilon (float): The largest allowed distance between
+                each rotation and its replacement. (Default: 1e-8)
+
+            cache_size (int): The number of sequences the process-wide
+                cache keeps at least. It grows to the largest size any
+                pass asks for, and is not used if this is 0.
+                (Default: 4096)
+
+            cache_path (str | None): The file of a persistent cache shared
+                by every worker and run, or None to not persist sequences.
+                (Default: None)
+        """
+        if not is_real_number(synthesis_epsilon):
+            raise TypeError(
+                'Expected float for synthesis_epsilon'
+                f', got {type(synthesis_epsilon)}.',
+            )
+
+        if not 0 < synthesis_epsilon < 1:
+            raise ValueError(
+                'Expected synthesis_epsilon in (0, 1)'
+                f', got {synthesis_epsilon}.',
+            )
+
+        if not isinstance(cache_size, int) or cache_size < 0:
+            raise ValueError(
+                'Expected non-negative integer for cache_size'
+                f', got {cache_size}.',
+            )
+
+        if cache_path is not None and not isinstance(cache_path, str):
+            raise TypeError(
+                f'Expected str for cache_path, got {type(cache_path)}.',
+            )
+
+        self.synthesis_epsilon = synthesis_epsilon
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        if RZGate() in data.gate_set:
+            _logger.debug('RZGate is native to the model; skipping.')
+            return
+
+        cache = rz_cache if self.cache_size > 0 else None
+        rz_cache.reserve(self.cache_size)
+        hits, misses = rz_cache.hits, rz_cache.misses
+        store = None
+        if self.cache_path is not None:
+            store = open_rotation_cache(self.cache_path)
+            store_hits, store_misses = store.hits, store.misses
+        points, ops = [], []
+        for cycle, op in circuit.operations_with_cycles():
+            if not isinstance(op.gate, RZGate):
+                continue
+
+            gates = synthesize_rz(
+                op.params[0],
+                self.synthesis_epsilon,
+                cache,
+                store,
+            )
+            subcircuit = Circuit(1)
+            for gate in gates or (IdentityGate(),):
+                subcircuit.append_gate(gate, 0)
+            data.update_error_mul(
+                _distance(subcircuit.get_unitary(), op.get_unitary()),
+            )
+            points.append((cycle, op.location[0]))
+            ops.append(Operation(CircuitGate(subcircuit), op.location))
+
+        circuit.batch_replace(points, ops)
+
+        counts = data.setdefault(
+            'rz_synthesis_cache', {'hits': 0, 'misses': 0},
+        )
+        counts['hits'] += rz_cache.hits - hits
+        counts['misses'] += rz_cache.misses - misses
+        if store is not None:
+            counts = data.setdefault(
+                'rotation_cache', {'hits': 0, 'misses': 0},
+            )
+            counts['hits'] += store.hits - store_hits
+            counts['misses'] += store.misses - store_misses
+        _logger.debug(
+            f'Synthesized {len(ops)} rotations with'
+            f' {rz_cache.hits - hits} cache hits.',
+        )
@@ -0,0 +1,198 @@
+"""This module implements the MatsumotoAmanoSynthesisPass."""
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.ring import DyadicMatrix
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.constant.h import HGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.sx import SqrtXGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.x import XGate
+from bqskit.ir.gates.constant.y import YGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.qis.unitary.unitarymatrix import UnitaryLike
+
+
+_logger = logging.getLogger(__name__)
+
+_paulis = np.array([
+    [[0, 1], [1, 0]],
+    [[0, -1j], [1j, 0]],
+    [[1, 0], [0, -1]],
+], dtype=np.complex128)
+
+
+def bloch_matrix(utry: UnitaryLike) -> npt.NDArray[np.float64]:
+    """
+    Return the SO(3) matrix of a single-qubit unitary.
+
+    Entry `(i, j)` is `Tr(P_i U P_j U^dagger) / 2` for the Paulis X, Y,
+    and Z, so column `j` is the image of `P_j` under conjugation by `U`.
+    The result does not depend on the global phase of `utry`.
+    """
+    utry = np.asarray(utry, dtype=np.complex128)
+    images = utry @ _paulis @ utry.conj().T
+    return np.einsum('iab,jba->ij', _paulis, images).real / 2
+
+
+@lru_cache(maxsize=None)
+def _syllables() -> list[tuple[DyadicMatrix, list[Gate]]]:
+    """The inverses of the normal form syllables HT, SHT, and T."""
+    syllables = []
+    for gates in ([TGate(), HGate()], [TGate(), HGate(), SGate()], [TGate()]):
+        circuit = Circuit(1)
+        for gate in gates:
+            circuit.append_gate(gate, 0)
+        matrix = DyadicMatrix.from_float(bloch_matrix(circuit.get_unitary()))
+        assert matrix is not None
+        syllables.append((matrix.T, gates))
+    return syllables
+
+
+@lru_cache(maxsize=None)
+def _cliffords() -> dict[tuple[int, ...], list[Gate]]:
+    """Map each single-qubit Clifford's SO(3) matrix to a shortest word."""
+    generators: list[Gate] = [
+        HGate(), SGate(), SdgGate(), SqrtXGate(), XGate(), YGate(), ZGate(),
+    ]
+    matrices = [
+        DyadicMatrix.from_float(bloch_matrix(g.get_unitary()))
+        for g in generators
+    ]
+    identity = DyadicMatrix.from_float(np.eye(3))
+    assert identity is not None
+    words: dict[tuple[int, ...], list[Gate]] = {identity.key(): []}
+    frontier: list[tuple[DyadicMatrix, list[Gate]]] = [(identity, [])]
+    while frontier:
+        next_frontier = []
+        for matrix, word in frontier:
+            for gate, gate_matrix in zip(generators, matrices):
+                assert gate_matrix is not None
+                product = gate_matrix @ matrix
+                if product.key() not in words:
+                    words[product.key()] = word + [gate]
+                    next_frontier.append((product, word + [gate]))
+        frontier = next_frontier
+    return words
+
+
+def matsumoto_amano_decompose(matrix: DyadicMatrix) -> list[Gate] | None:
+    """
+    Decompose an exact SO(3) matrix into Matsumoto-Amano normal form.
+
+    The normal form is `(T | e) (HT | SHT)* C` for a Clifford `C`. Each
+    syllable raises the denominator exponent of the Bloch matrix by
+    exactly one, so syllables are peeled off the left until the
+    exponent reaches zero, leaving a Clifford. The T-count of the result
+    equals the denominator exponent of `matrix` and is therefore optimal.
+
+    Args:
+        matrix (DyadicMatrix): The Bloch matrix of a Clifford+T unitary.
+
+    Returns:
+        (list[Gate] | None): The gates in circuit order (first applied
+            first), or None if `matrix` is not in the Clifford+T group.
+    """
+    peeled: list[list[Gate]] = []
+    while matrix.k > 0:
+        for inverse, gates in _syllables():
+            candidate = inverse @ matrix
+            if candidate.k == matrix.k - 1:
+                peeled.append(gates)
+                matrix = candidate
+                break
+        else:
+            return None
+
+    clifford = _cliffords().get(matrix.key())
+    if clifford is None:
+        return None
+
+    gates = list(clifford)
+    for syllable in reversed(peeled):
+        gates.extend(syllable)
+    return gates
+
+
+class MatsumotoAmanoSynthesisPass(BasePass):
+    """
+    The MatsumotoAmanoSynthesisPass class.
+
+    Replace single-qubit circuits whose unitary is exactly a Clifford+T
+    operator, up to global phase, with its T-optimal Matsumoto-Amano
+    normal form. Circuits that are not exactly Clifford+T are left
+    unchanged.
+    """
+
+    def __init__(
+        self,
+        max_t_count: int = 32,
+        tolerance: float = 1e-11,
+    ) -> None:
+        """
+        Construct a MatsumotoAmanoSynthesisPass.
+
+        Args:
+            max_t_count (int): The largest T-count to recognize. This
+                bounds the denominator exponent searched for each Bloch
+                matrix entry. (Default: 32)
+
+            tolerance (float): The largest deviation of a Bloch matrix
+                entry from its exact value. Exactness is confirmed in
+                integer arithmetic after recognition. (Default: 1e-11)
+        """
+        if not isinstance(max_t_count, int) or max_t_count < 0:
+            raise ValueError(
+                'Expected non-negative integer for max_t_count'
+                f', got {max_t_count}.',
+            )
+
+        self.max_t_count = max_t_count
+        self.tolerance = tolerance
+
+    def synthesize(self, utry: UnitaryLike) -> Circuit | None:
+        """Return the normal form circuit for `utry`, or None if inexact."""
+        matrix = DyadicMatrix.from_float(
+            bloch_matrix(utry),
+            self.max_t_count,
+            self.tolerance,
+        )
+        if matrix is None or not matrix.is_orthogonal():
+            return None
+
+        gates = matsumoto_amano_decompose(matrix)
+        if gates is None:
+            return None
+
+        circuit = Circuit(1)
+        for gate in gates:
+            circuit.append_gate(gate, 0)
+        if circuit.num_operations == 0:
+            circuit.append_gate(IdentityGate(), 0)
+        return circuit
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        if circuit.num_qudits != 1 or circuit.radixes[0] != 2:
+            raise ValueError(
+                'Cannot synthesize a normal form for a multi-qudit or'
+                ' non-qubit circuit.',
+            )
+
+        result = self.synthesize(circuit.get_unitary())
+        if result is None:
+            _logger.debug('Circuit is not exactly Clifford+T.')
+            return
+
+        circuit.become(result)
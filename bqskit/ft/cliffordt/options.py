@@ -0,0 +1,72 @@
+"""This module implements the options of the Clifford+T workflows."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class CliffordTOptions:
+    """
+    The optional features of the Clifford+T workflows.
+
+    The options are passed as one object from :class:`CliffordTModel`
+    through :func:`default_workflow` to :func:`build_cliffordt_workflow`.
+    They are frozen and hashable, so workflows built for equal options
+    are shared.
+    """
+
+    window_size: int | None = None
+    """
+    If given, circuit targets are compiled in windows of about this many
+    operations, bounding memory use for very large circuits, see
+    :class:`WindowedCompilationPass`. Other targets are compiled whole.
+    """
+
+    error_budget: float | None = None
+    """
+    If given, the total error allowed for each compilation. The final
+    rotations are then rounded or synthesized by their T cost within
+    what is left of it, see :class:`BudgetedRotationSynthesisPass`,
+    instead of each to within the synthesis epsilon. For windowed
+    compilations, the budget is split between the windows in proportion
+    to their rotations.
+    """
+
+    profile: bool | str = False
+    """
+    If True, every pass of the workflow is profiled, and the records are
+    stored under `pass_profile` in the pass data. If a path, they are
+    also appended to that file as JSON lines. See
+    :mod:`bqskit.ft.cliffordt.profiling`.
+    """
+
+    checkpoint: str | None = None
+    """
+    If given, a directory the workflow saves its progress to after each
+    of the expensive stages, and the blocks it synthesizes as it goes.
+    Running the workflow again on the same input resumes after the last
+    completed work. See :mod:`bqskit.ft.cliffordt.checkpoint`.
+    """
+
+    pauli_rotations: bool = False
+    """
+    If True, rotations are also merged as Pauli-product rotations before
+    the final rounding, which can lower the T-count at the cost of
+    CNOTs. See :mod:`bqskit.ft.cliffordt.paulirotation`.
+    """
+
+    verify: bool | float = False
+    """
+    If True, the compiled circuit is checked against its input with
+    stabilizer and Pauli propagation, which scales to hundreds of
+    qubits, and the result is stored under `cliffordt_verification` in
+    the pass data. If a float, it is the largest distance that passes.
+    See :mod:`bqskit.ft.cliffordt.verification`.
+    """
+
+    rotation_cache: str | None = None
+    """
+    If given, the file of a persistent cache of rotation sequences shared
+    between processes and runs, consulted before synthesizing each final
+    rotation. See :mod:`bqskit.ft.cliffordt.rotationcache`.
+    """
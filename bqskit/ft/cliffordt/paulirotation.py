@@ -0,0 +1,550 @@
+"""
+This module implements a Pauli-rotation representation of circuits.
+
+A circuit of Clifford gates and single-qubit rotations is rewritten as a
+list of Pauli-product rotations `exp(-i a P / 2)` followed by a single
+Clifford. Walking the circuit, the Cliffords seen so far are moved to the
+end, and every rotation is conjugated through them onto a Pauli string.
+Only the tableau of the inverse of that Clifford is kept, so each gate
+costs a few products of bit-packed Pauli strings, linear in the number of
+qubits, and each rotation a single lookup.
+
+Rotations are grouped into layers of mutually commuting rotations, each
+placed in the earliest layer it commutes with entirely. A rotation that
+reaches a layer holding its own axis merges into it instead. Angles are
+then rounded in bulk to multiples of `pi / 4`, which are T, S, and Z
+rotations, and rotations that cancel are removed.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import sys
+from functools import lru_cache
+from typing import Iterator
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.clifford import _codes
+from bqskit.ft.cliffordt.clifford import _conjugation_table
+from bqskit.ft.cliffordt.clifford import _gate_table
+from bqskit.ft.cliffordt.clifford import _index
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.cx import CNOTGate
+from bqskit.ir.gates.constant.h import HGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.tdg import TdgGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.ir.gates.parameterized.rx import RXGate
+from bqskit.ir.gates.parameterized.ry import RYGate
+from bqskit.ir.gates.parameterized.rz import RZGate
+from bqskit.ir.gates.parameterized.u1 import U1Gate
+from bqskit.ir.gates.parameterized.u3 import U3Gate
+from bqskit.ir.operation import Operation
+
+
+_logger = logging.getLogger(__name__)
+
+_Pauli = Tuple[int, int, int]
+"""The X mask, Z mask, and power of `i` of `i^r X^x Z^z`."""
+
+_rotation_codes = {
+    RXGate(): 1,
+    RZGate(): 2,
+    U1Gate(): 2,
+    RYGate(): 3,
+}
+"""The Pauli code of the axis of rotation gates, as in :mod:`clifford`."""
+
+_constant_rotations = {TGate(): np.pi / 4, TdgGate(): -np.pi / 4}
+"""The Z rotation angle of non-Clifford constant gates."""
+
+_discrete_gates: list[list[Gate]] = [
+    [],
+    [TGate()],
+    [SGate()],
+    [SGate(), TGate()],
+    [ZGate()],
+    [ZGate(), TGate()],
+    [SdgGate()],
+    [TdgGate()],
+]
+"""The gates of a Z rotation by `k pi / 4`, up to global phase."""
+
+
+if sys.version_info >= (3, 10):
+    _popcount = int.bit_count
+else:
+    def _popcount(mask: int) -> int:
+        """Return the number of set bits of `mask`."""
+        return bin(mask).count('1')
+
+
+def _multiply(a: _Pauli, b: _Pauli) -> _Pauli:
+    """Return the product `a b` of two Pauli strings."""
+    phase = a[2] + b[2] + 2 * _popcount(a[1] & b[0])
+    return a[0] ^ b[0], a[1] ^ b[1], phase % 4
+
+
+def _image(
+    rows: Sequence[_Pauli],
+    location: Sequence[int],
+    codes: Sequence[int],
+    phase: int,
+) -> _Pauli:
+    """Return the image under `rows` of `i^phase` times a local string."""
+    num_qudits = len(rows) // 2
+    result = (0, 0, phase)
+    for qudit, code in zip(location, codes):
+        if code & 1:
+            result = _multiply(result, rows[qudit])
+        if code & 2:
+            result = _multiply(result, rows[num_qudits + qudit])
+        if code == 3:
+            # Y = i X Z
+            result = (result[0], result[1], (result[2] + 1) % 4)
+    return result
+
+
+def _recipe(
+    table: Sequence[tuple[int, int]],
+    num_qudits: int,
+) -> list[tuple[int, tuple[int, ...]]]:
+    """
+    Return `G^dagger P G` for the local generators `P` of a Clifford `G`.
+
+    `table` is the conjugation table of `G`. Entry `j` holds the power of
+    `i` and the local Pauli codes of the image of `X_j`, and entry
+    `num_qudits + j` those of `Z_j`.
+    """
+    inverse = {}
+    for index, (image, sign) in enumerate(table):
+        inverse[image] = (index, sign)
+    recipe = []
+    for code in (1, 2):
+        for qudit in range(num_qudits):
+            codes = [0] * num_qudits
+            codes[qudit] = code
+            index, sign = inverse[_index(codes)]
+            recipe.append((2 * sign, _codes(index, num_qudits)))
+    return recipe
+
+
+@lru_cache(maxsize=None)
+def _gate_recipe(gate: Gate) -> list[tuple[int, tuple[int, ...]]] | None:
+    """Return the recipe of a constant gate, or None if not Clifford."""
+    table = _gate_table(gate)
+    if table is None:
+        return None
+    return _recipe(table, gate.num_qudits)
+
+
+def _operation_recipe(
+    op: Operation,
+    tolerance: float,
+) -> list[tuple[int, tuple[int, ...]]] | None:
+    """Return the recipe of `op`, or None for rotations and non-Cliffords."""
+    if op.num_params == 0:
+        return _gate_recipe(op.gate)
+    if op.gate in _rotation_codes:
+        return None
+    table = _conjugation_table(op.get_unitary(), tolerance)
+    if table is None:
+        return None
+    return _recipe(table, op.num_qudits)
+
+
+def _apply_recipe(
+    rows: list[_Pauli],
+    location: Sequence[int],
+    recipe: Sequence[tuple[int, tuple[int, ...]]],
+) -> None:
+    """
+    Prepend `G^dagger` to the inverse Clifford whose tableau is `rows`.
+
+    `recipe` is the recipe of `G` on `location`. The inverse then starts
+    with `G^dagger`, so `X_q` maps to the image under the old inverse of
+    `G^dagger X_q G`.
+    """
+    num_qudits = len(rows) // 2
+    images = [_image(rows, location, codes, phase) for phase, codes in recipe]
+    k = len(location)
+    for j, qudit in enumerate(location):
+        rows[qudit] = images[j]
+        rows[num_qudits + qudit] = images[k + j]
+
+
+def _pack(masks: Sequence[int], num_words: int) -> npt.NDArray[np.uint64]:
+    """Pack integer bit masks into rows of 64-bit words, low word first."""
+    data = b''.join(mask.to_bytes(8 * num_words, 'little') for mask in masks)
+    words = np.frombuffer(data, dtype='<u8').astype(np.uint64)
+    return words.reshape(len(masks), num_words)
+
+
+def _unpack(words: npt.NDArray[np.uint64]) -> list[int]:
+    """Return the integer bit masks of rows of 64-bit words."""
+    data = words.astype('<u8')
+    return [int.from_bytes(row.tobytes(), 'little') for row in data]
+
+
+class PauliRotationCircuit:
+    """
+    A list of Pauli-product rotations followed by a Clifford circuit.
+
+    Rotation `j` is `exp(-i angles[j] P_j / 2)`, where the Hermitian Pauli
+    string `P_j` has the X and Z bits of qubit `q` at bit `q % 64` of word
+    `q // 64` of rows `j` of :attr:`x_masks` and :attr:`z_masks`. Qubits
+    with both bits set hold a Y. The rotations are applied in order, then
+    :attr:`clifford`.
+    """
+
+    def __init__(
+        self,
+        num_qudits: int,
+        x_masks: npt.ArrayLike,
+        z_masks: npt.ArrayLike,
+        angles: npt.ArrayLike,
+        clifford: Circuit,
+    ) -> None:
+        """
+        Construct a PauliRotationCircuit.
+
+        Args:
+            num_qudits (int): The number of qubits.
+
+            x_masks (npt.ArrayLike): The packed X bits of the rotations,
+                an array of shape `(m, (num_qudits + 63) // 64)`.
+
+            z_masks (npt.ArrayLike): The packed Z bits of the rotations.
+
+            angles (npt.ArrayLike): The `m` rotation angles.
+
+            clifford (Circuit): The Clifford circuit applied last.
+        """
+        if not isinstance(num_qudits, int) or num_qudits <= 0:
+            raise ValueError(
+                'Expected positive integer for num_qudits'
+                f', got {num_qudits}.',
+            )
+
+        num_words = (num_qudits + 63) // 64
+        angles = np.asarray(angles, dtype=np.float64).reshape(-1)
+        shape = (len(angles), num_words)
+        x_masks = np.asarray(x_masks, dtype=np.uint64).reshape(shape)
+        z_masks = np.asarray(z_masks, dtype=np.uint64).reshape(shape)
+
+        if clifford.num_qudits != num_qudits:
+            raise ValueError(
+                f'Expected a Clifford circuit on {num_qudits} qubits'
+                f', got {clifford.num_qudits}.',
+            )
+
+        self.num_qudits = num_qudits
+        self.x_masks = x_masks
+        self.z_masks = z_masks
+        self.angles = angles
+        self.clifford = clifford
+
+    @property
+    def num_rotations(self) -> int:
+        """The number of rotations."""
+        return len(self.angles)
+
+    def __len__(self) -> int:
+        return self.num_rotations
+
+    @staticmethod
+    def from_circuit(
+        circuit: Circuit,
+        tolerance: float = 1e-8,
+    ) -> PauliRotationCircuit | None:
+        """
+        Move the Clifford gates of `circuit` past its rotations.
+
+        Args:
+            circuit (Circuit): A qubit circuit of Clifford gates and RZ,
+                RX, RY, U1, U3, T, and Tdg gates.
+
+            tolerance (float): See :class:`CliffordSynthesisPass`, for
+                parameterized gates that are not rotations.
+                (Default: 1e-8)
+
+        Returns:
+            (PauliRotationCircuit | None): The equivalent rotations and
+                Clifford, up to global phase, or None if `circuit` has
+                any other gate.
+        """
+        if any(radix != 2 for radix in circuit.radixes):
+            return None
+
+        n = circuit.num_qudits
+        # The images of X_q and Z_q under the inverse of the Clifford
+        rows: list[_Pauli] = [(1 << q, 0, 0) for q in range(n)]
+        rows += [(0, 1 << q, 0) for q in range(n)]
+        xs: list[int] = []
+        zs: list[int] = []
+        angles: list[float] = []
+        clifford = Circuit(n)
+
+        for op in circuit:
+            gate = op.gate
+            if isinstance(gate, CircuitGate):
+                return None
+
+            recipe = _operation_recipe(op, tolerance)
+            if recipe is None:
+                if gate in _constant_rotations:
+                    axes = [(2, _constant_rotations[gate])]
+                elif gate in _rotation_codes:
+                    axes = [(_rotation_codes[gate], op.params[0])]
+                elif isinstance(gate, U3Gate):
+                    # U3(a, b, c) = RZ(b) RY(a) RZ(c), up to global phase
+                    a, b, c = op.params
+                    axes = [(2, c), (3, a), (2, b)]
+                else:
+                    _logger.debug(f'{gate} is not Clifford or a rotation.')
+                    return None
+
+                for code, angle in axes:
+                    x, z, phase = _image(rows, op.location, [code], 0)
+                    # Normalize to the Hermitian i^(x.z) X^x Z^z, up to sign
+                    if (phase - _popcount(x & z)) % 4 == 2:
+                        angle = -angle
+                    xs.append(x)
+                    zs.append(z)
+                    angles.append(angle)
+                continue
+
+            _apply_recipe(rows, op.location, recipe)
+            clifford.append(op)
+
+        num_words = (n + 63) // 64
+        return PauliRotationCircuit(
+            n,
+            _pack(xs, num_words),
+            _pack(zs, num_words),
+            angles,
+            clifford,
+        )
+
+    def merge(self) -> PauliRotationCircuit:
+        """
+        Merge rotations about the same axis that commute between them.
+
+        Rotations are grouped into layers of mutually commuting rotations.
+        Each rotation moves back over the layers it commutes with, and
+        merges into the first one that has its axis, or otherwise joins
+        the earliest one it reached. Merged angles are summed exactly,
+        and rotations that cancel are removed.
+
+        Returns:
+            (PauliRotationCircuit): The merged rotations, in layer order.
+        """
+        layers: list[dict[tuple[int, int], int]] = []
+        unions: list[list[int]] = []
+        xs: list[int] = []
+        zs: list[int] = []
+        angles: list[float] = []
+        parts: list[list[float]] = []
+        for x, z, angle in zip(
+            _unpack(self.x_masks),
+            _unpack(self.z_masks),
+            self.angles.tolist(),
+        ):
+            axis = (x, z)
+            target = len(layers)
+            for index in range(len(layers) - 1, -1, -1):
+                if axis in layers[index]:
+                    target = index
+                    break
+                x_union, z_union = unions[index]
+                if (x & z_union) or (z & x_union):
+                    if any(
+                        _popcount((x & zs[j]) ^ (z & xs[j])) & 1
+                        for j in layers[index].values()
+                    ):
+                        break
+                target = index
+
+            if target == len(layers):
+                layers.append({})
+                unions.append([0, 0])
+            layer = layers[target]
+            if axis in layer:
+                index = layer[axis]
+                angles[index] += angle
+                parts[index].append(angle)
+                # Rotations that cancel no longer block later ones
+                if abs(math.remainder(angles[index], 2 * np.pi)) < 1e-9:
+                    angles[index] = math.fsum(parts[index])
+                    if angles[index] % (2 * np.pi) == 0:
+                        del layer[axis]
+                continue
+            layer[axis] = len(angles)
+            unions[target][0] |= x
+            unions[target][1] |= z
+            xs.append(x)
+            zs.append(z)
+            angles.append(angle)
+            parts.append([angle])
+
+        order = [j for layer in layers for j in layer.values()]
+        num_words = self.x_masks.shape[1]
+        return PauliRotationCircuit(
+            self.num_qudits,
+            _pack([xs[j] for j in order], num_words),
+            _pack([zs[j] for j in order], num_words),
+            [math.fsum(parts[j]) for j in order],
+            self.clifford,
+        )
+
+    def round(self, tolerance: float = 1e-8) -> PauliRotationCircuit:
+        """
+        Round angles within `tolerance` of a multiple of `pi / 4`.
+
+        Rounded rotations that are the identity are removed.
+        """
+        angles = np.mod(self.angles, 2 * np.pi)
+        steps = np.rint(angles / (np.pi / 4))
+        near = np.abs(angles - steps * np.pi / 4) <= tolerance
+        angles = np.where(near, steps * np.pi / 4, angles)
+        keep = ~(near & (steps % 8 == 0))
+        return PauliRotationCircuit(
+            self.num_qudits,
+            self.x_masks[keep],
+            self.z_masks[keep],
+            angles[keep],
+            self.clifford,
+        )
+
+    def count_non_clifford(self, tolerance: float = 1e-8) -> int:
+        """Return the number of rotations that are not Clifford."""
+        angles = np.mod(self.angles, np.pi / 2)
+        distance = np.minimum(angles, np.pi / 2 - angles)
+        return int(np.count_nonzero(distance > tolerance))
+
+    def paulis(self) -> Iterator[tuple[str, float]]:
+        """
+        Yield each rotation as a Pauli string and angle.
+
+        The string has one of 'I', 'X', 'Y', and 'Z' per qubit, qubit 0
+        first.
+        """
+        letters = 'IXZY'
+        for x, z, angle in zip(
+            _unpack(self.x_masks),
+            _unpack(self.z_masks),
+            self.angles,
+        ):
+            yield ''.join(
+                letters[((x >> q) & 1) | (((z >> q) & 1) << 1)]
+                for q in range(self.num_qudits)
+            ), float(angle)
+
+    def to_circuit(self, tolerance: float = 1e-8) -> Circuit:
+        """
+        Return a circuit of the rotations followed by the Clifford.
+
+        Each rotation becomes a Z rotation on one of its qubits, between
+        a change of basis and a CNOT ladder and their inverses. Angles
+        within `tolerance` of a multiple of `pi / 4` become T, S, and Z
+        gates instead of an RZ.
+        """
+        circuit = Circuit(self.num_qudits)
+        for pauli, angle in self.paulis():
+            support = [q for q, letter in enumerate(pauli) if letter != 'I']
+            if len(support) == 0:
+                continue
+
+            basis: list[Operation] = []
+            for q in support:
+                if pauli[q] == 'X':
+                    basis.append(Operation(HGate(), [q]))
+                elif pauli[q] == 'Y':
+                    basis.append(Operation(SdgGate(), [q]))
+                    basis.append(Operation(HGate(), [q]))
+            pivot = support[-1]
+            basis += [Operation(CNOTGate(), [q, pivot]) for q in support[:-1]]
+
+            step = angle / (np.pi / 4)
+            if abs(step - round(step)) * np.pi / 4 <= tolerance:
+                gates = _discrete_gates[int(round(step)) % 8]
+                rotation = [Operation(g, [pivot]) for g in gates]
+            else:
+                rotation = [Operation(RZGate(), [pivot], [angle])]
+
+            inverses = {SdgGate(): SGate()}
+            for op in basis + rotation:
+                circuit.append(op)
+            for op in reversed(basis):
+                circuit.append(
+                    Operation(inverses.get(op.gate, op.gate), op.location),
+                )
+
+        for op in self.clifford:
+            circuit.append(op)
+        return circuit
+
+
+class PauliRotationPass(BasePass):
+    """
+    The PauliRotationPass class.
+
+    Rewrite a circuit of Clifford gates and rotations as Pauli-product
+    rotations followed by a Clifford, merge and round the rotations, and
+    convert back, see :mod:`bqskit.ft.cliffordt.paulirotation`. The
+    result is only kept if it has fewer non-Clifford rotations, since
+    each rotation on `w` qubits costs `2 (w - 1)` CNOTs. Circuits with
+    other gates are left unchanged.
+
+    The number of rotations before and after merging, and of circuits
+    rewritten, are added to the pass data under `pauli_rotations`. The
+    last rotations are stored under `pauli_rotation_circuit`, as input
+    for Pauli-based computation back ends.
+    """
+
+    def __init__(self, tolerance: float = 1e-8) -> None:
+        """
+        Construct a PauliRotationPass.
+
+        Args:
+            tolerance (float): Angles within this distance of a multiple
+                of `pi / 4` are rounded to it. (Default: 1e-8)
+        """
+        if tolerance < 0:
+            raise ValueError(
+                f'Expected non-negative tolerance, got {tolerance}.',
+            )
+
+        self.tolerance = tolerance
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        rotations = PauliRotationCircuit.from_circuit(circuit)
+        if rotations is None:
+            _logger.debug('Circuit is not made of Cliffords and rotations.')
+            return
+
+        merged = rotations.merge().round(self.tolerance)
+        data['pauli_rotation_circuit'] = merged
+        counts = data.setdefault(
+            'pauli_rotations', {'rotations': 0, 'merged': 0, 'applied': 0},
+        )
+        counts['rotations'] += rotations.num_rotations
+        counts['merged'] += merged.num_rotations
+
+        before = rotations.count_non_clifford(self.tolerance)
+        after = merged.count_non_clifford(self.tolerance)
+        _logger.debug(f'Non-Clifford rotations went from {before} to {after}.')
+        if after < before:
+            counts['applied'] += 1
+            circuit.become(merged.to_circuit(self.tolerance), False)
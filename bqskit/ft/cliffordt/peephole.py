@@ -0,0 +1,222 @@
+"""
+This module implements a symbolic peephole rewriter for Clifford+T.
+
+The rewriter makes one pass over the circuit without computing any
+unitaries. Diagonal gates (T, S, Z, RZ and their inverses) are collected
+per qubit as a pending phase, in multiples of pi/4 plus any RZ angle,
+until a gate that does not commute with them arrives. The control of a
+CNOT and both ends of a CZ commute with the pending phase, so it is
+carried through them. The phase is then written out in normal form, so
+T·T becomes S, T·Tdg vanishes and S·S becomes Z.
+
+Each qubit keeps a stack of the rewritten operations on it. A
+self-inverse gate that meets an equal operation on top of the stacks of
+all of its qubits cancels with it, which uncovers the operations below
+for further cancellations, so H·X·X·H vanishes in the same pass.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from typing import Iterator
+from typing import Sequence
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.cx import CNOTGate
+from bqskit.ir.gates.constant.cz import CZGate
+from bqskit.ir.gates.constant.h import HGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.swap import SwapGate
+from bqskit.ir.gates.constant.sx import SqrtXGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.tdg import TdgGate
+from bqskit.ir.gates.constant.x import XGate
+from bqskit.ir.gates.constant.y import YGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.ir.gates.parameterized.rz import RZGate
+from bqskit.ir.operation import Operation
+
+
+_logger = logging.getLogger(__name__)
+
+_phase_steps = {
+    TGate(): 1,
+    SGate(): 2,
+    ZGate(): 4,
+    SdgGate(): 6,
+    TdgGate(): 7,
+}
+"""Constant diagonal gates as multiples of pi/4."""
+
+_phase_gates: tuple[tuple[Gate, ...], ...] = (
+    (),
+    (TGate(),),
+    (SGate(),),
+    (SGate(), TGate()),
+    (ZGate(),),
+    (SdgGate(), TdgGate()),
+    (SdgGate(),),
+    (TdgGate(),),
+)
+"""The normal form of each multiple of pi/4, indexed by it mod 8."""
+
+_self_inverse = frozenset([
+    HGate(), XGate(), YGate(), CNOTGate(), CZGate(), SwapGate(),
+])
+
+_squares = {SqrtXGate(): XGate()}
+"""Gates whose square is another gate of the set."""
+
+
+def _flat_operations(circuit: Circuit) -> Iterator[Operation]:
+    """Yield every operation, expanding circuit gates."""
+    for op in circuit:
+        if isinstance(op.gate, CircuitGate):
+            subcircuit = op.gate._circuit
+            if op.num_params > 0:
+                subcircuit = subcircuit.copy()
+                subcircuit.set_params(op.params)
+            for inner in _flat_operations(subcircuit):
+                yield Operation(
+                    inner.gate,
+                    [op.location[q] for q in inner.location],
+                    inner.params,
+                )
+        else:
+            yield op
+
+
+class PeepholeOptimizationPass(BasePass):
+    """
+    The PeepholeOptimizationPass class.
+
+    Cancel and merge Clifford+T gates with local rewrite rules in a
+    single linear pass, see :mod:`bqskit.ft.cliffordt.peephole`. Gates
+    outside the Clifford+T gate set are kept and block rewrites across
+    them. Circuit gates are unfolded.
+    """
+
+    def __init__(self, tolerance: float = 1e-12) -> None:
+        """
+        Construct a PeepholeOptimizationPass.
+
+        Args:
+            tolerance (float): RZ angles within this distance of a
+                multiple of pi/4, once merged, are written as Clifford+T
+                gates. (Default: 1e-12)
+        """
+        self.tolerance = tolerance
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        num_qudits = circuit.num_qudits
+        out: list[Operation | None] = []
+        stacks: list[list[int]] = [[] for _ in range(num_qudits)]
+
+        # Pending phase per qudit: multiples of pi/4, and an RZ angle
+        steps = [0] * num_qudits
+        angles: list[float | None] = [None] * num_qudits
+
+        def emit(op: Operation) -> None:
+            for qudit in op.location:
+                stacks[qudit].append(len(out))
+            out.append(op)
+
+        def flush(qudits: Sequence[int]) -> None:
+            for qudit in qudits:
+                angle = angles[qudit]
+                if angle is not None:
+                    angle += steps[qudit] * math.pi / 4
+                    angle %= 2 * math.pi
+                    multiple = round(angle / (math.pi / 4))
+                    if abs(angle - multiple * math.pi / 4) > self.tolerance:
+                        emit(Operation(RZGate(), (qudit,), [angle]))
+                        multiple = 0
+                    steps[qudit] = multiple
+                for gate in _phase_gates[steps[qudit] % 8]:
+                    emit(Operation(gate, (qudit,)))
+                steps[qudit] = 0
+                angles[qudit] = None
+
+        def top(op: Operation) -> int | None:
+            """Return the output index on top of all of `op`'s stacks."""
+            stack = stacks[op.location[0]]
+            if len(stack) == 0:
+                return None
+            index = stack[-1]
+            previous = out[index]
+            if (
+                previous is None
+                or previous.gate != op.gate
+                or previous.location != op.location
+                or any(stacks[q][-1:] != [index] for q in op.location)
+            ):
+                return None
+            return index
+
+        def pop(index: int) -> None:
+            op = out[index]
+            assert op is not None
+            out[index] = None
+            for qudit in op.location:
+                stacks[qudit].pop()
+
+        num_input = 0
+        for op in _flat_operations(circuit):
+            num_input += 1
+            gate = op.gate
+            if gate in _phase_steps:
+                steps[op.location[0]] += _phase_steps[gate]
+                continue
+
+            if isinstance(gate, RZGate):
+                qudit = op.location[0]
+                angles[qudit] = (angles[qudit] or 0.0) + op.params[0]
+                continue
+
+            if isinstance(gate, IdentityGate):
+                continue
+
+            # Phases commute through CNOT controls and CZs
+            if isinstance(gate, CNOTGate):
+                flush(op.location[1:])
+            elif not isinstance(gate, CZGate):
+                flush(op.location)
+
+            if gate in _self_inverse:
+                index = top(op)
+                if index is not None:
+                    pop(index)
+                    continue
+
+            elif gate in _squares:
+                index = top(op)
+                if index is not None:
+                    pop(index)
+                    square = Operation(_squares[gate], op.location)
+                    index = top(square)
+                    if index is not None:
+                        pop(index)
+                    else:
+                        emit(square)
+                    continue
+
+            emit(op)
+
+        flush(range(num_qudits))
+        optimized = Circuit(num_qudits, circuit.radixes)
+        for op in out:
+            if op is not None:
+                optimized.append(op)
+
+        _logger.debug(
+            f'Rewrote {num_input} operations into'
+            f' {optimized.num_operations}.',
+        )
+        circuit.become(optimized, False)
@@ -0,0 +1,193 @@
+"""
+This module implements the PhaseFoldingPass.
+
+Every qubit carries an affine parity of the circuit's path variables,
+which CNOT and X gates update and any other gate replaces with a fresh
+variable. A Z rotation multiplies the path sum by a phase that depends
+only on the parity of the qubit it acts on, so rotations on equal
+parities commute with everything between them and can be merged into
+one, wherever they occur in the circuit.
+"""
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gates.constant.cx import CNOTGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.swap import SwapGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.tdg import TdgGate
+from bqskit.ir.gates.constant.x import XGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.ir.gates.parameterized.rz import RZGate
+from bqskit.ir.gates.parameterized.u1 import U1Gate
+from bqskit.ir.operation import Operation
+
+
+_logger = logging.getLogger(__name__)
+
+_phase_angles = {
+    TGate(): np.pi / 4,
+    TdgGate(): -np.pi / 4,
+    SGate(): np.pi / 2,
+    SdgGate(): -np.pi / 2,
+    ZGate(): np.pi,
+}
+"""The angle `a` of constant gates equal to `diag(1, exp(i * a))`."""
+
+
+def _remap(mask: int, positions: dict[int, int]) -> int:
+    """Move each set bit of `mask` to its new position."""
+    result = 0
+    while mask:
+        low = mask & -mask
+        result |= 1 << positions[low.bit_length() - 1]
+        mask ^= low
+    return result
+
+
+def _compact(masks: list[int], terms: dict[int, int]) -> int:
+    """
+    Renumber the path variables still held by some qubit.
+
+    Terms over a variable no qubit holds can never be matched again, so
+    they are dropped from `terms`. Returns the number of live variables.
+    """
+    live = 0
+    for mask in masks:
+        live |= mask
+
+    positions: dict[int, int] = {}
+    remaining = live
+    while remaining:
+        low = remaining & -remaining
+        positions[low.bit_length() - 1] = len(positions)
+        remaining ^= low
+
+    masks[:] = [_remap(mask, positions) for mask in masks]
+    live_terms = {
+        _remap(mask, positions): term
+        for mask, term in terms.items()
+        if mask & ~live == 0
+    }
+    terms.clear()
+    terms.update(live_terms)
+    return len(positions)
+
+
+class PhaseFoldingPass(BasePass):
+    """
+    The PhaseFoldingPass class.
+
+    Merge Z rotations (RZ, U1, T, S, Z and their inverses) that act on the
+    same parity of path variables through regions of CNOT, X, and SWAP
+    gates. Each merged group becomes a single RZ at its first occurrence,
+    or disappears if its angles cancel. Rotations that merge with nothing
+    are left untouched.
+    """
+
+    def __init__(self, tolerance: float = 1e-12) -> None:
+        """
+        Construct a PhaseFoldingPass.
+
+        Args:
+            tolerance (float): Merged rotations whose angle is within
+                this distance of a multiple of 2 pi are removed.
+                (Default: 1e-12)
+        """
+        self.tolerance = tolerance
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        num_qudits = circuit.num_qudits
+        masks = [1 << q for q in range(num_qudits)]
+        flips = [0] * num_qudits
+        num_vars = num_qudits
+        limit = 2 * num_vars + 1024
+
+        # Parity mask to term index, and per term its first operation,
+        # the sign of the parity there, the total angle, and its size
+        terms: dict[int, int] = {}
+        firsts: list[int] = []
+        signs: list[int] = []
+        totals: list[float] = []
+        sizes: list[int] = []
+        merged: set[int] = set()
+
+        ops = list(circuit)
+        for index, op in enumerate(ops):
+            gate = op.gate
+            if isinstance(gate, CNOTGate):
+                control, target = op.location
+                masks[target] ^= masks[control]
+                flips[target] ^= flips[control]
+
+            elif isinstance(gate, XGate):
+                flips[op.location[0]] ^= 1
+
+            elif isinstance(gate, SwapGate):
+                a, b = op.location
+                masks[a], masks[b] = masks[b], masks[a]
+                flips[a], flips[b] = flips[b], flips[a]
+
+            elif isinstance(gate, (RZGate, U1Gate)) or gate in _phase_angles:
+                angle = op.params[0] if op.num_params else _phase_angles[gate]
+                qudit = op.location[0]
+                sign = -1 if flips[qudit] else 1
+                term = terms.get(masks[qudit])
+                if term is None:
+                    terms[masks[qudit]] = len(firsts)
+                    firsts.append(index)
+                    signs.append(sign)
+                    totals.append(sign * angle)
+                    sizes.append(1)
+                else:
+                    totals[term] += sign * angle
+                    sizes[term] += 1
+                    merged.add(index)
+
+            elif not isinstance(gate, IdentityGate):
+                for qudit in op.location:
+                    masks[qudit] = 1 << num_vars
+                    flips[qudit] = 0
+                    num_vars += 1
+                if num_vars > limit:
+                    num_vars = _compact(masks, terms)
+                    limit = 2 * num_vars + 1024
+
+        if len(merged) == 0:
+            return
+
+        replacements: dict[int, float | None] = {}
+        for first, sign, total, size in zip(firsts, signs, totals, sizes):
+            if size == 1:
+                continue
+            angle = (sign * total) % (2 * np.pi)
+            if min(angle, 2 * np.pi - angle) <= self.tolerance:
+                replacements[first] = None
+            else:
+                replacements[first] = angle
+
+        folded = Circuit(num_qudits, circuit.radixes)
+        for index, op in enumerate(ops):
+            if index in merged:
+                continue
+            if index in replacements:
+                angle = replacements[index]
+                if angle is None:
+                    continue
+                op = Operation(RZGate(), op.location, [angle])
+            folded.append(op)
+
+        _logger.debug(
+            f'Folded {len(merged) + len(replacements)} rotations'
+            f' into {sum(a is not None for a in replacements.values())}.',
+        )
+        circuit.become(folded, False)
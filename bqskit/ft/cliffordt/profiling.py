@@ -0,0 +1,193 @@
+"""
+This module implements opt-in profiling of the Clifford+T workflows.
+
+Profiling wraps each top-level pass of a workflow in a
+:class:`ProfiledPass`, which records its wall and CPU time, memory,
+and the gate counts and T-count of the circuit before and after it.
+Workflows that are not profiled are left unwrapped, so profiling costs
+nothing when it is off.
+
+Passes that keep running counts in the pass data, such as the block and
+rotation caches and :class:`BatchedSingleQubitPass`, also have the counts
+they added during the pass recorded. For the replacement rule stages,
+these are the number of blocks processed, of distinct unitaries among
+them, and of blocks a rule matched and replaced.
+
+CPU time and memory are those of the process running the workflow.
+Work that a pass sends to other workers only shows in its wall time.
+The operating system only reports the peak resident set size of the
+whole process, so `max_rss_mb` is that peak so far, and
+`max_rss_growth_mb` is how much the pass raised it; a pass that stays
+below an earlier peak shows no growth however much it allocates. For
+the peak of each pass on its own, enable :mod:`tracemalloc`, and the
+peak of the memory it traced is recorded as `traced_peak_mb`.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import resource
+import time
+import tracemalloc
+from typing import Any
+from typing import Iterable
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.resources import estimate_resources
+from bqskit.ir.circuit import Circuit
+
+
+_logger = logging.getLogger(__name__)
+
+counter_keys = (
+    'batched_single_qubit',
+    'block_synthesis_cache',
+    'pauli_rotations',
+    'rotation_cache',
+    'rz_synthesis_cache',
+)
+"""The pass data keys of running counts recorded by the profiler."""
+
+
+def _gate_counts(circuit: Circuit) -> dict[str, int]:
+    """Return the number of operations of each gate class."""
+    counts: dict[str, int] = {}
+    for gate, count in circuit.gate_counts.items():
+        name = type(gate).__name__
+        counts[name] = counts.get(name, 0) + count
+    return counts
+
+
+def _counters(data: PassData) -> dict[str, dict[str, int]]:
+    """Return a copy of the running counts in `data`."""
+    return {key: dict(data[key]) for key in counter_keys if key in data}
+
+
+class ProfiledPass(BasePass):
+    """
+    The ProfiledPass class.
+
+    Runs a pass and appends a record of it to a list in the pass data,
+    and optionally to a JSON-lines trace file, see
+    :mod:`bqskit.ft.cliffordt.profiling`.
+    """
+
+    def __init__(
+        self,
+        wrapped: BasePass,
+        index: int = 0,
+        trace_file: str | None = None,
+        key: str = 'pass_profile',
+    ) -> None:
+        """
+        Construct a ProfiledPass.
+
+        Args:
+            wrapped (BasePass): The pass to run.
+
+            index (int): The position of the pass in its workflow, to
+                tell apart passes of the same type. (Default: 0)
+
+            trace_file (str | None): If given, each record is also
+                appended to this file as one line of JSON. (Default: None)
+
+            key (str): The pass data key of the list of records.
+                (Default: 'pass_profile')
+        """
+        if not isinstance(wrapped, BasePass):
+            raise TypeError(f'Expected BasePass, got {type(wrapped)}.')
+
+        if trace_file is not None and not isinstance(trace_file, str):
+            raise TypeError(
+                f'Expected str for trace_file, got {type(trace_file)}.',
+            )
+
+        if not isinstance(key, str):
+            raise TypeError(f'Expected str for key, got {type(key)}.')
+
+        self.wrapped = wrapped
+        self.index = index
+        self.trace_file = trace_file
+        self.key = key
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        ops_before = circuit.num_operations
+        gates_before = _gate_counts(circuit)
+        t_before = estimate_resources(circuit).t_count
+        counters_before = _counters(data)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        await self.wrapped.run(circuit, data)
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        record: dict[str, Any] = {
+            'index': self.index,
+            'pass': self.wrapped.name,
+            'wall_time': wall,
+            'cpu_time': cpu,
+            'max_rss_mb': rss_after / 1024,
+            'max_rss_growth_mb': (rss_after - rss_before) / 1024,
+            'num_operations_before': ops_before,
+            'num_operations_after': circuit.num_operations,
+            't_count_before': t_before,
+            't_count_after': estimate_resources(circuit).t_count,
+            'gate_counts_before': gates_before,
+            'gate_counts_after': _gate_counts(circuit),
+        }
+        if tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            record['traced_peak_mb'] = peak / 2 ** 20
+
+        counters = {}
+        for key, counts in _counters(data).items():
+            before = counters_before.get(key, {})
+            added = {k: v - before.get(k, 0) for k, v in counts.items()}
+            if any(added.values()):
+                counters[key] = added
+        if counters:
+            record['counters'] = counters
+
+        data.setdefault(self.key, []).append(record)
+        _logger.debug(
+            f'{self.wrapped.name} took {wall:.3f} s,'
+            f' T-count {t_before} -> {record["t_count_after"]}.',
+        )
+
+        if self.trace_file is not None:
+            with open(self.trace_file, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+
+def profile_workflow(
+    passes: Iterable[BasePass],
+    trace_file: str | None = None,
+    key: str = 'pass_profile',
+) -> list[BasePass]:
+    """
+    Wrap every pass of a workflow in a :class:`ProfiledPass`.
+
+    Args:
+        passes (Iterable[BasePass]): The top-level passes to profile.
+            Passes they run internally are timed as part of them.
+
+        trace_file (str | None): If given, the records are also appended
+            to this file as JSON lines. (Default: None)
+
+        key (str): The pass data key of the list of records.
+            (Default: 'pass_profile')
+
+    Returns:
+        (list[BasePass]): The profiled passes.
+    """
+    return [
+        ProfiledPass(p, i, trace_file, key)
+        for i, p in enumerate(passes)
+    ]
@@ -0,0 +1,194 @@
+"""
+This module implements resource estimation for Clifford+T circuits.
+
+The estimate is computed in a single pass over the circuit's operations,
+holding only per-qubit counters and one counter per T layer, so it
+scales to circuits with millions of gates.
+
+T layers are assigned as in T-depth counting: every T or Tdg gate starts
+one layer after the latest T layer on its qubit, and multi-qubit gates
+synchronize the layers of the qubits they touch. The magic states
+consumed by a layer is the number of T and Tdg gates assigned to it.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Iterator
+from typing import Sequence
+
+import numpy as np
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.cliffordtgates import clifford_gates
+from bqskit.ft.cliffordt.cliffordtgates import rz_gates
+from bqskit.ft.cliffordt.cliffordtgates import t_gates
+from bqskit.ft.cliffordt.compact import alphabet
+from bqskit.ft.cliffordt.compact import CliffordTCircuit
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CliffordTResources:
+    """Resource counts of a Clifford+T circuit."""
+
+    t_count: int = 0
+    """The number of T and Tdg gates."""
+
+    t_depth: int = 0
+    """The number of T layers."""
+
+    clifford_count: int = 0
+    """The number of Clifford gates."""
+
+    rz_count: int = 0
+    """The number of residual RZ gates."""
+
+    other_count: int = 0
+    """The number of gates that are not Clifford, T, RZ, or identity."""
+
+    t_per_qudit: list[int] = field(default_factory=list)
+    """The number of T and Tdg gates on each qudit."""
+
+    magic_states_per_layer: list[int] = field(default_factory=list)
+    """The number of T and Tdg gates in each T layer."""
+
+    @property
+    def peak_magic_state_rate(self) -> int:
+        """The most magic states consumed by a single T layer."""
+        return max(self.magic_states_per_layer, default=0)
+
+
+def _flat_operations(
+    circuit: Circuit,
+) -> Iterator[tuple[Gate, Sequence[int]]]:
+    """Yield every gate with its location, expanding circuit gates."""
+    for op in circuit:
+        if isinstance(op.gate, CircuitGate):
+            inner = op.gate._circuit
+            for gate, location in _flat_operations(inner):
+                yield gate, [op.location[q] for q in location]
+        else:
+            yield op.gate, op.location
+
+
+def _compact_operations(
+    circuit: CliffordTCircuit,
+) -> Iterator[tuple[Gate, Sequence[int]]]:
+    """Yield the T gates and multi-qubit gates of a compact circuit."""
+    opcodes = circuit.opcodes
+    arities = np.array([gate.num_qudits for gate in alphabet])
+    relevant = np.isin(opcodes, [alphabet.index(g) for g in t_gates])
+    relevant |= arities[opcodes] > 1
+    indices = np.flatnonzero(relevant)
+    for code, location in zip(
+        opcodes[indices].tolist(),
+        circuit.qubits[indices].tolist(),
+    ):
+        gate = alphabet[code]
+        yield gate, location[:gate.num_qudits]
+
+
+def estimate_resources(
+    circuit: Circuit | CliffordTCircuit,
+) -> CliffordTResources:
+    """
+    Count the Clifford+T resources used by `circuit`.
+
+    Args:
+        circuit (Circuit | CliffordTCircuit): The circuit to analyze.
+            Circuit gates are counted by their contents. Compact circuits
+            are counted with array operations, and only their T and
+            multi-qubit gates are visited one at a time.
+
+    Returns:
+        (CliffordTResources): The resource counts.
+    """
+    cliffords = frozenset(clifford_gates)
+    ts = frozenset(t_gates)
+    rzs = frozenset(rz_gates)
+
+    resources = CliffordTResources(t_per_qudit=[0] * circuit.num_qudits)
+    t_per_qudit = resources.t_per_qudit
+    per_layer = resources.magic_states_per_layer
+    layers = [0] * circuit.num_qudits
+
+    operations: Iterator[tuple[Gate, Sequence[int]]]
+    if isinstance(circuit, CliffordTCircuit):
+        # Other single-qubit gates are only counted, never visited
+        for gate, count in circuit.gate_counts.items():
+            if gate.num_qudits == 1 and gate in cliffords:
+                resources.clifford_count += count
+            elif gate in rzs:
+                resources.rz_count += count
+        operations = _compact_operations(circuit)
+    else:
+        operations = _flat_operations(circuit)
+
+    for gate, location in operations:
+        if gate in ts:
+            qudit = location[0]
+            layer = layers[qudit]
+            if layer == len(per_layer):
+                per_layer.append(0)
+            per_layer[layer] += 1
+            layers[qudit] = layer + 1
+            t_per_qudit[qudit] += 1
+            continue
+
+        if gate in cliffords:
+            resources.clifford_count += 1
+        elif gate in rzs:
+            resources.rz_count += 1
+        elif not isinstance(gate, IdentityGate):
+            resources.other_count += 1
+
+        if len(location) > 1:
+            layer = max(layers[qudit] for qudit in location)
+            for qudit in location:
+                layers[qudit] = layer
+
+    resources.t_count = sum(t_per_qudit)
+    resources.t_depth = len(per_layer)
+    return resources
+
+
+class ResourceEstimationPass(BasePass):
+    """
+    The ResourceEstimationPass class.
+
+    Stores the :class:`CliffordTResources` of the circuit in the pass
+    data and logs a summary.
+    """
+
+    def __init__(self, key: str = 'cliffordt_resources') -> None:
+        """
+        Construct a ResourceEstimationPass.
+
+        Args:
+            key (str): The pass data key the resources are stored under.
+                (Default: 'cliffordt_resources')
+        """
+        if not isinstance(key, str):
+            raise TypeError(f'Expected str for key, got {type(key)}.')
+
+        self.key = key
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        resources = estimate_resources(circuit)
+        data[self.key] = resources
+        _logger.info(
+            f'T-count: {resources.t_count}, T-depth: {resources.t_depth},'
+            f' Clifford count: {resources.clifford_count}, residual RZ'
+            f' count: {resources.rz_count}, peak magic states per layer:'
+            f' {resources.peak_magic_state_rate}.',
+        )
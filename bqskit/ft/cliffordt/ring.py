@@ -0,0 +1,536 @@
+"""
+This module implements exact arithmetic for Clifford+T synthesis.
+
+Single-qubit Clifford+T unitaries have entries in the ring
+Z[1/sqrt(2), i], and their Bloch (SO(3)) representations have entries in
+Z[1/sqrt(2)]. This module provides the rings Z[sqrt(2)] and
+Z[w] = Z[exp(i * pi / 4)], a solver for one-dimensional grid problems
+over Z[sqrt(2)], and matrices over Z[1/sqrt(2)] that can be recognized
+from floating point data.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any
+from typing import Iterator
+
+import numpy as np
+import numpy.typing as npt
+
+
+SQRT2 = math.sqrt(2)
+
+
+class ZRootTwo:
+    """An element `a + b * sqrt(2)` of the ring Z[sqrt(2)]."""
+
+    __slots__ = ('a', 'b')
+
+    def __init__(self, a: int = 0, b: int = 0) -> None:
+        """Construct the ring element `a + b * sqrt(2)`."""
+        self.a = int(a)
+        self.b = int(b)
+
+    def __add__(self, other: ZRootTwo | int) -> ZRootTwo:
+        if isinstance(other, int):
+            return ZRootTwo(self.a + other, self.b)
+        return ZRootTwo(self.a + other.a, self.b + other.b)
+
+    __radd__ = __add__
+
+    def __sub__(self, other: ZRootTwo | int) -> ZRootTwo:
+        if isinstance(other, int):
+            return ZRootTwo(self.a - other, self.b)
+        return ZRootTwo(self.a - other.a, self.b - other.b)
+
+    def __neg__(self) -> ZRootTwo:
+        return ZRootTwo(-self.a, -self.b)
+
+    def __mul__(self, other: ZRootTwo | int) -> ZRootTwo:
+        if isinstance(other, int):
+            return ZRootTwo(self.a * other, self.b * other)
+        return ZRootTwo(
+            self.a * other.a + 2 * self.b * other.b,
+            self.a * other.b + self.b * other.a,
+        )
+
+    __rmul__ = __mul__
+
+    def __pow__(self, exponent: int) -> ZRootTwo:
+        if exponent < 0:
+            return self.inverse() ** -exponent
+        result, base = ZRootTwo(1), self
+        while exponent:
+            if exponent & 1:
+                result = result * base
+            base = base * base
+            exponent >>= 1
+        return result
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, int):
+            return self.a == other and self.b == 0
+        if not isinstance(other, ZRootTwo):
+            return NotImplemented
+        return self.a == other.a and self.b == other.b
+
+    def __hash__(self) -> int:
+        return hash((self.a, self.b))
+
+    def __float__(self) -> float:
+        return self.a + self.b * SQRT2
+
+    def __repr__(self) -> str:
+        return f'ZRootTwo({self.a}, {self.b})'
+
+    def conj(self) -> ZRootTwo:
+        """Return the Galois conjugate `a - b * sqrt(2)`."""
+        return ZRootTwo(self.a, -self.b)
+
+    def norm(self) -> int:
+        """Return the integer norm `a^2 - 2 * b^2`."""
+        return self.a * self.a - 2 * self.b * self.b
+
+    def inverse(self) -> ZRootTwo:
+        """Return the inverse of a unit, raising if this is not a unit."""
+        norm = self.norm()
+        if norm not in (1, -1):
+            raise ValueError(f'{self} is not a unit of Z[sqrt(2)].')
+        return self.conj() * norm
+
+    def is_divisible_by_sqrt2(self) -> bool:
+        """Return True if this element is a multiple of sqrt(2)."""
+        return self.a % 2 == 0
+
+    def div_sqrt2(self) -> ZRootTwo:
+        """Return this element divided by sqrt(2), which must divide it."""
+        if self.a % 2 != 0:
+            raise ValueError(f'{self} is not divisible by sqrt(2).')
+        return ZRootTwo(self.b, self.a // 2)
+
+    def mul_sqrt2(self) -> ZRootTwo:
+        """Return this element multiplied by sqrt(2)."""
+        return ZRootTwo(2 * self.b, self.a)
+
+    def divmod(self, other: ZRootTwo) -> tuple[ZRootTwo, ZRootTwo]:
+        """Return a Euclidean quotient and remainder."""
+        norm = other.norm()
+        if norm == 0:
+            raise ZeroDivisionError('Division by zero in Z[sqrt(2)].')
+        numerator = self * other.conj()
+        quotient = ZRootTwo(
+            _round_div(numerator.a, norm),
+            _round_div(numerator.b, norm),
+        )
+        return quotient, self - quotient * other
+
+    def gcd(self, other: ZRootTwo) -> ZRootTwo:
+        """Return a greatest common divisor, defined up to units."""
+        x, y = self, other
+        while y != 0:
+            x, y = y, x.divmod(y)[1]
+        return x
+
+    def sign(self) -> int:
+        """Return the exact sign of `a + b * sqrt(2)` as -1, 0, or 1."""
+        sa = (self.a > 0) - (self.a < 0)
+        sb = (self.b > 0) - (self.b < 0)
+        if sa == sb or sb == 0:
+            return sa
+        if sa == 0:
+            return sb
+        # Opposite signs, compare a^2 with 2 * b^2
+        diff = self.a * self.a - 2 * self.b * self.b
+        return sa if diff > 0 else -sa if diff < 0 else 0
+
+
+LAMBDA = ZRootTwo(1, 1)
+"""The fundamental unit 1 + sqrt(2) of Z[sqrt(2)]."""
+
+
+def solve_grid_problem_1d(
+    x0: float,
+    x1: float,
+    y0: float,
+    y1: float,
+) -> Iterator[ZRootTwo]:
+    """
+    Enumerate every `z` in Z[sqrt(2)] with `z` in [x0, x1] and its Galois
+    conjugate in [y0, y1].
+
+    Both intervals are first rescaled by a power of `1 + sqrt(2)` so they
+    have comparable widths, which makes the enumeration proportional to
+    the number of solutions.
+
+    Note:
+        The bounds are floats, so solutions within a few ulps of an
+        endpoint may be reported or dropped. Callers should confirm any
+        solution they rely on.
+    """
+    if x1 < x0 or y1 < y0:
+        return
+
+    # Rescale z -> z * lambda^n; the conjugate scales by (-1/lambda)^n
+    dx = max(x1 - x0, 1e-300)
+    dy = max(y1 - y0, 1e-300)
+    n = int(round(math.log(dy / dx) / (2 * math.log(float(LAMBDA)))))
+    scale = float(LAMBDA) ** n
+    cx0, cx1 = x0 * scale, x1 * scale
+    cy0, cy1 = y0 * (-1) ** n / scale, y1 * (-1) ** n / scale
+    if cy1 < cy0:
+        cy0, cy1 = cy1, cy0
+
+    slack = 1e-12 * max(1.0, abs(cx0), abs(cx1), abs(cy0), abs(cy1))
+    unscale = LAMBDA ** -n
+
+    # z - z' = 2 * b * sqrt(2) and z + z' = 2 * a
+    b_min = math.ceil((cx0 - cy1 - slack) / (2 * SQRT2))
+    b_max = math.floor((cx1 - cy0 + slack) / (2 * SQRT2))
+    for b in range(b_min, b_max + 1):
+        lo = max(cx0 - b * SQRT2, cy0 + b * SQRT2)
+        hi = min(cx1 - b * SQRT2, cy1 + b * SQRT2)
+        for a in range(math.ceil(lo - slack), math.floor(hi + slack) + 1):
+            yield ZRootTwo(a, b) * unscale
+
+
+def recognize_dyadic(
+    value: float,
+    max_k: int,
+    tol: float,
+) -> tuple[ZRootTwo, int] | None:
+    """
+    Find `(z, k)` with `z / sqrt(2)^k` within `tol` of `value`.
+
+    The Galois conjugate of the recognized number is required to lie in
+    [-1, 1], as it does for entries of orthogonal matrices over
+    Z[1/sqrt(2)]. The smallest such `k` is returned, or None if there is
+    none up to `max_k`.
+    """
+    k = int(min_dyadic_exponents(np.array([value]), max_k, tol)[0])
+    if k < 0:
+        return None
+    z = _closest_dyadic(value, k, tol)
+    return None if z is None else (z, k)
+
+
+def min_dyadic_exponents(
+    values: npt.NDArray[np.float64],
+    max_k: int,
+    tol: float,
+) -> npt.NDArray[np.int64]:
+    """
+    Return the smallest denominator exponent recognizing each value.
+
+    This is the vectorized feasibility test behind `recognize_dyadic`:
+    it solves the one-dimensional grid problem for every value and every
+    exponent up to `max_k` at once. Values with no solution get -1.
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1, 1)
+    scale = SQRT2 ** np.arange(max_k + 1, dtype=np.float64)
+    zero = np.abs(values[:, 0]) <= tol
+
+    # The interval widths have a constant ratio, so one rescaling by a
+    # power of lambda balances every problem
+    n = int(round(math.log(1 / tol) / (2 * math.log(float(LAMBDA)))))
+    lam = float(LAMBDA) ** n
+    cx0 = (values - tol) * scale * lam
+    cx1 = (values + tol) * scale * lam
+    cy = np.broadcast_to(scale / lam, cx0.shape)
+    slack = 1e-12 * np.maximum(1.0, np.abs(cx0) + np.abs(cx1))
+
+    b_min = np.ceil((cx0 - cy - slack) / (2 * SQRT2))
+    b_max = np.floor((cx1 + cy + slack) / (2 * SQRT2))
+    found = np.zeros(cx0.shape, dtype=bool)
+    for offset in range(int(max(np.max(b_max - b_min), -1)) + 1):
+        b = b_min + offset
+        lo = np.maximum(cx0 - b * SQRT2, -cy + b * SQRT2)
+        hi = np.minimum(cx1 - b * SQRT2, cy + b * SQRT2)
+        feasible = np.ceil(lo - slack) <= np.floor(hi + slack)
+        found |= feasible & (b <= b_max)
+
+    exponents = np.where(found.any(axis=1), found.argmax(axis=1), -1)
+    return np.where(zero, 0, exponents).astype(np.int64)
+
+
+def _closest_dyadic(value: float, k: int, tol: float) -> ZRootTwo | None:
+    """Return the numerator at exponent `k` closest to `value`, if any."""
+    if abs(value) <= tol:
+        return ZRootTwo(0)
+    scale = SQRT2 ** k
+    center = value * scale
+    width = tol * scale
+    best: tuple[float, ZRootTwo] | None = None
+    for z in solve_grid_problem_1d(
+        center - width, center + width, -scale, scale,
+    ):
+        error = abs(float(z) - center)
+        if best is None or error < best[0]:
+            best = (error, z)
+    return None if best is None else best[1]
+
+
+class DyadicMatrix:
+    """
+    A real matrix over Z[1/sqrt(2)], stored as `(a + b * sqrt(2)) / sqrt(2)^k`.
+
+    The integer arrays `a` and `b` share one denominator exponent `k`,
+    which is kept as small as possible.
+    """
+
+    def __init__(
+        self,
+        a: npt.ArrayLike,
+        b: npt.ArrayLike,
+        k: int = 0,
+    ) -> None:
+        """Construct the matrix `(a + b * sqrt(2)) / sqrt(2)^k`."""
+        self.a: npt.NDArray[Any] = np.array(a, dtype=object)
+        self.b: npt.NDArray[Any] = np.array(b, dtype=object)
+        self.k = int(k)
+        self.reduce()
+
+    @staticmethod
+    def from_float(
+        matrix: npt.ArrayLike,
+        max_k: int = 32,
+        tol: float = 1e-9,
+    ) -> DyadicMatrix | None:
+        """
+        Recognize a real matrix whose entries lie in Z[1/sqrt(2)].
+
+        Args:
+            matrix (npt.ArrayLike): The floating point matrix.
+
+            max_k (int): The largest denominator exponent to consider
+                for any entry. (Default: 32)
+
+            tol (float): The largest allowed deviation of any entry.
+                (Default: 1e-9)
+
+        Returns:
+            (DyadicMatrix | None): The exact matrix, or None if some
+                entry is not recognized.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        values = matrix.ravel()
+        exponents = min_dyadic_exponents(values, max_k, tol)
+        if np.any(exponents < 0):
+            return None
+
+        k = int(np.max(exponents))
+        a = np.empty(matrix.size, dtype=object)
+        b = np.empty(matrix.size, dtype=object)
+        for i, (value, zk) in enumerate(zip(values, exponents)):
+            z = _closest_dyadic(float(value), int(zk), tol)
+            if z is None:
+                return None
+            for _ in range(k - zk):
+                z = z.mul_sqrt2()
+            a[i], b[i] = z.a, z.b
+        shape = matrix.shape
+        return DyadicMatrix(a.reshape(shape), b.reshape(shape), k)
+
+    def reduce(self) -> None:
+        """Divide numerators by sqrt(2) while they all allow it."""
+        while self.k > 0 and all(x % 2 == 0 for x in self.a.flat):
+            self.a, self.b = self.b, self.a // 2
+            self.k -= 1
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.a.shape
+
+    @property
+    def T(self) -> DyadicMatrix:
+        return DyadicMatrix(self.a.T, self.b.T, self.k)
+
+    def __matmul__(self, other: DyadicMatrix) -> DyadicMatrix:
+        a = self.a @ other.a + 2 * (self.b @ other.b)
+        b = self.a @ other.b + self.b @ other.a
+        return DyadicMatrix(a, b, self.k + other.k)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DyadicMatrix):
+            return NotImplemented
+        return (
+            self.k == other.k
+            and np.array_equal(self.a, other.a)
+            and np.array_equal(self.b, other.b)
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.k, tuple(self.a.flat), tuple(self.b.flat)))
+
+    def key(self) -> tuple[int, ...]:
+        """Return a hashable key identifying this matrix."""
+        return (self.k, *self.a.flat, *self.b.flat)
+
+    def is_orthogonal(self) -> bool:
+        """Return True if this matrix is exactly orthogonal."""
+        product = self.T @ self
+        identity = np.eye(self.shape[0], dtype=int).astype(object)
+        if product.k != 0 or any(product.b.flat):
+            return False
+        return np.array_equal(product.a, identity)
+
+    def numpy(self) -> npt.NDArray[np.float64]:
+        """Return this matrix as floating point numbers."""
+        a = self.a.astype(np.float64)
+        b = self.b.astype(np.float64)
+        return (a + b * SQRT2) / SQRT2 ** self.k
+
+
+class ZOmega:
+    """
+    An element `a * w^3 + b * w^2 + c * w + d` of the ring Z[w].
+
+    Here `w = exp(i * pi / 4)`, so Z[w] contains Z[sqrt(2)] and `i`, and
+    every single-qubit Clifford+T unitary is `1 / sqrt(2)^k` times a
+    matrix over Z[w].
+    """
+
+    __slots__ = ('a', 'b', 'c', 'd')
+
+    def __init__(self, a: int = 0, b: int = 0, c: int = 0, d: int = 0) -> None:
+        """Construct the ring element `a * w^3 + b * w^2 + c * w + d`."""
+        self.a = int(a)
+        self.b = int(b)
+        self.c = int(c)
+        self.d = int(d)
+
+    @staticmethod
+    def from_zroottwo(x: ZRootTwo) -> ZOmega:
+        """Embed `x` into Z[w] using `sqrt(2) = w - w^3`."""
+        return ZOmega(-x.b, 0, x.b, x.a)
+
+    def __add__(self, other: ZOmega) -> ZOmega:
+        return ZOmega(
+            self.a + other.a,
+            self.b + other.b,
+            self.c + other.c,
+            self.d + other.d,
+        )
+
+    def __sub__(self, other: ZOmega) -> ZOmega:
+        return ZOmega(
+            self.a - other.a,
+            self.b - other.b,
+            self.c - other.c,
+            self.d - other.d,
+        )
+
+    def __neg__(self) -> ZOmega:
+        return ZOmega(-self.a, -self.b, -self.c, -self.d)
+
+    def __mul__(self, other: ZOmega | int) -> ZOmega:
+        if isinstance(other, int):
+            return ZOmega(
+                self.a * other,
+                self.b * other,
+                self.c * other,
+                self.d * other,
+            )
+        a, b, c, d = self.a, self.b, self.c, self.d
+        e, f, g, h = other.a, other.b, other.c, other.d
+        # Reduce with w^4 = -1
+        return ZOmega(
+            a * h + b * g + c * f + d * e,
+            b * h + c * g + d * f - a * e,
+            c * h + d * g - a * f - b * e,
+            d * h - a * g - b * f - c * e,
+        )
+
+    __rmul__ = __mul__
+
+    def __pow__(self, exponent: int) -> ZOmega:
+        result, base = ZOmega(0, 0, 0, 1), self
+        while exponent:
+            if exponent & 1:
+                result = result * base
+            base = base * base
+            exponent >>= 1
+        return result
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ZOmega):
+            return NotImplemented
+        return (self.a, self.b, self.c, self.d) == (
+            other.a, other.b, other.c, other.d,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.a, self.b, self.c, self.d))
+
+    def __complex__(self) -> complex:
+        real = self.d + (self.c - self.a) / SQRT2
+        imag = self.b + (self.c + self.a) / SQRT2
+        return complex(real, imag)
+
+    def __repr__(self) -> str:
+        return f'ZOmega({self.a}, {self.b}, {self.c}, {self.d})'
+
+    def is_zero(self) -> bool:
+        """Return True if this is the zero element."""
+        return not (self.a or self.b or self.c or self.d)
+
+    def conj(self) -> ZOmega:
+        """Return the complex conjugate."""
+        return ZOmega(-self.c, -self.b, -self.a, self.d)
+
+    def adj2(self) -> ZOmega:
+        """Return the Galois conjugate mapping `sqrt(2)` to `-sqrt(2)`."""
+        return ZOmega(-self.a, self.b, -self.c, self.d)
+
+    def real_part(self) -> ZRootTwo:
+        """Return this element as a ZRootTwo, which requires it be real."""
+        if self.b != 0 or self.a != -self.c:
+            raise ValueError(f'{self} is not real.')
+        return ZRootTwo(self.d, self.c)
+
+    def norm_sq(self) -> ZRootTwo:
+        """Return `|x|^2` as an element of Z[sqrt(2)]."""
+        return (self * self.conj()).real_part()
+
+    def norm(self) -> int:
+        """Return the integer norm, the product of all four conjugates."""
+        return self.norm_sq().norm()
+
+    def is_divisible_by_sqrt2(self) -> bool:
+        """Return True if this element is a multiple of sqrt(2)."""
+        return (self.a + self.c) % 2 == 0 and (self.b + self.d) % 2 == 0
+
+    def div_sqrt2(self) -> ZOmega:
+        """Return this element divided by sqrt(2), which must divide it."""
+        if not self.is_divisible_by_sqrt2():
+            raise ValueError(f'{self} is not divisible by sqrt(2).')
+        # Multiply by sqrt(2) / 2 = (w - w^3) / 2
+        x = self * ZOmega(-1, 0, 1, 0)
+        return ZOmega(x.a // 2, x.b // 2, x.c // 2, x.d // 2)
+
+    def divmod(self, other: ZOmega) -> tuple[ZOmega, ZOmega]:
+        """Return a Euclidean quotient and remainder."""
+        norm = other.norm()
+        if norm == 0:
+            raise ZeroDivisionError('Division by zero in Z[w].')
+        # x / y = x * conj(y) * (y * conj(y))^bullet / N(y)
+        conj_norm = ZOmega.from_zroottwo(other.norm_sq().conj())
+        numerator = self * other.conj() * conj_norm
+        quotient = ZOmega(
+            _round_div(numerator.a, norm),
+            _round_div(numerator.b, norm),
+            _round_div(numerator.c, norm),
+            _round_div(numerator.d, norm),
+        )
+        return quotient, self - quotient * other
+
+    def gcd(self, other: ZOmega) -> ZOmega:
+        """Return a greatest common divisor, defined up to units."""
+        x, y = self, other
+        while not y.is_zero():
+            x, y = y, x.divmod(y)[1]
+        return x
+
+
+def _round_div(numerator: int, denominator: int) -> int:
+    """Return `numerator / denominator` rounded to the nearest integer."""
+    return (2 * numerator + denominator) // (2 * denominator)
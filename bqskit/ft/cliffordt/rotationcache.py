@@ -0,0 +1,392 @@
+"""
+This module implements a persistent cache of Clifford+T rotation sequences.
+
+The cache is a single file holding an open-addressing hash table of
+fixed-size slots followed by an append-only heap of gate sequences:
+
+    header | slot table | heap
+
+Each slot holds a key, the heap offset and length of its sequence, and a
+CRC-32 of the sequence. Readers map the file and probe the table without
+taking any lock; a slot that is being written concurrently either misses
+or fails its checksum, and both are treated as a miss. Writers serialize
+on an advisory file lock, append the sequence to the heap first, and only
+then publish its slot. When the cache grows past its bounds, a writer
+compacts the newest half of the entries into a new file and atomically
+replaces the old one, which readers pick up on their next miss.
+"""
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from typing import Any
+from typing import Sequence
+
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.constant.h import HGate
+from bqskit.ir.gates.constant.identity import IdentityGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.sx import SqrtXGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.tdg import TdgGate
+from bqskit.ir.gates.constant.x import XGate
+from bqskit.ir.gates.constant.y import YGate
+from bqskit.ir.gates.constant.z import ZGate
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+_logger = logging.getLogger(__name__)
+
+_magic = b'BQFTROT1'
+_header = struct.Struct('<8sIIQ')
+"""Magic, slot count, entry count, and heap size."""
+
+_header_size = 64
+
+_slot = struct.Struct('<qdQIHxx')
+"""Angle key, epsilon, heap offset, CRC-32, and sequence length."""
+
+_alphabet: tuple[Gate, ...] = (
+    IdentityGate(),
+    HGate(),
+    SGate(),
+    SdgGate(),
+    TGate(),
+    TdgGate(),
+    XGate(),
+    YGate(),
+    ZGate(),
+    SqrtXGate(),
+)
+"""The gates a stored sequence may contain, encoded as one byte each."""
+
+_codes = {gate: code for code, gate in enumerate(_alphabet)}
+
+_steps_per_epsilon = 2 ** 16
+
+
+class RotationCache:
+    """
+    A persistent, memory-mapped cache of rotation synthesis results.
+
+    Entries map an angle and epsilon to a sequence of Clifford+T gates.
+    Angles are quantized to `epsilon / 2^16`, so a hit may be synthesized
+    for an angle that differs by at most `epsilon / 2^17`, which adds a
+    negligible amount to the approximation error.
+
+    The cache can be shared by any number of processes. Opening it only
+    maps the file, so lookups never deserialize the whole table.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        max_entries: int = 1 << 16,
+        max_bytes: int = 1 << 26,
+    ) -> None:
+        """
+        Open or create a RotationCache.
+
+        Args:
+            path (str | os.PathLike[str]): The cache file. It is created
+                if it does not exist.
+
+            max_entries (int): The number of entries kept before the
+                oldest are evicted. Fixes the table size of a new file;
+                an existing file keeps its own. (Default: 65536)
+
+            max_bytes (int): The heap size, in bytes, kept before the
+                oldest entries are evicted. (Default: 64 MiB)
+        """
+        if not isinstance(max_entries, int) or max_entries <= 0:
+            raise ValueError(
+                'Expected positive integer for max_entries'
+                f', got {max_entries}.',
+            )
+
+        if not isinstance(max_bytes, int) or max_bytes <= 0:
+            raise ValueError(
+                f'Expected positive integer for max_bytes, got {max_bytes}.',
+            )
+
+        self.path = os.fspath(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._map: mmap.mmap | None = None
+        self._identity: tuple[int, int] | None = None
+        self._slot_count = 0
+
+        if not os.path.exists(self.path):
+            self._create(self.path, _table_size(max_entries), [])
+        self._remap()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Mappings cannot cross processes; each worker maps on its own
+        return {
+            'path': self.path,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore
+
+    def __len__(self) -> int:
+        self._remap()
+        if self._map is None:
+            return 0
+        return _header.unpack_from(self._map)[2]
+
+    @staticmethod
+    def key(angle: float, epsilon: float) -> tuple[int, float] | None:
+        """Return the quantized key of a rotation, or None if too fine."""
+        steps = round(float(angle) * _steps_per_epsilon / float(epsilon))
+        if not -2 ** 63 <= steps < 2 ** 63:
+            return None
+        return steps, float(epsilon)
+
+    def get(self, angle: float, epsilon: float) -> tuple[Gate, ...] | None:
+        """Return the stored sequence for a rotation, or None."""
+        key = self.key(angle, epsilon)
+        gates = None
+        if key is not None:
+            gates = self._lookup(key)
+            if gates is None and self._remap():
+                gates = self._lookup(key)
+
+        if gates is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return gates
+
+    def put(self, angle: float, epsilon: float, gates: Sequence[Gate]) -> None:
+        """
+        Store the sequence for a rotation.
+
+        Sequences containing gates outside of the single-qubit Clifford+T
+        alphabet, or whose angle is too fine to quantize, are not stored.
+        """
+        key = self.key(angle, epsilon)
+        if key is None or any(g not in _codes for g in gates):
+            return
+        payload = bytes(_codes[g] for g in gates)
+        if len(payload) > min(0xFFFF, self.max_bytes // 2):
+            return
+
+        try:
+            # At most one compaction is needed to make room
+            for _ in range(2):
+                with _Writer(self.path) as f:
+                    self._remap()
+                    if self._lookup(key) is not None:
+                        return
+                    slots, count, heap = self._read_header(f)
+                    # An existing file may have a smaller table than asked
+                    limit = min(self.max_entries, slots // 2)
+                    if count < limit and heap + len(payload) <= self.max_bytes:
+                        self._append(f, slots, count, heap, key, payload)
+                        return
+                    self._compact(f, limit)
+        except OSError as e:
+            _logger.warning(f'Failed to write rotation cache {self.path}: {e}')
+
+    def close(self) -> None:
+        """Unmap the cache file."""
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._identity = None
+
+    def _remap(self) -> bool:
+        """Map the current file if it changed, and return True if so."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        identity = (stat.st_ino, stat.st_size)
+        if identity == self._identity:
+            return False
+
+        self.close()
+        with open(self.path, 'rb') as f:
+            if stat.st_size < _header_size:
+                return False
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, slots, _, _ = _header.unpack_from(self._map)
+        if magic != _magic:
+            self.close()
+            raise ValueError(f'{self.path} is not a rotation cache.')
+        self._slot_count = slots
+        self._identity = identity
+        return True
+
+    def _lookup(self, key: tuple[int, float]) -> tuple[Gate, ...] | None:
+        """Probe the mapped table for `key` without locking."""
+        if self._map is None:
+            return None
+        mask = self._slot_count - 1
+        start = _hash(key) & mask
+        for probe in range(self._slot_count):
+            position = _header_size + ((start + probe) & mask) * _slot.size
+            angle, epsilon, offset, crc, length = _slot.unpack_from(
+                self._map, position,
+            )
+            if epsilon == 0:
+                return None
+            if (angle, epsilon) != key:
+                continue
+            payload = self._map[offset:offset + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                return None
+            if any(code >= len(_alphabet) for code in payload):
+                return None
+            return tuple(_alphabet[code] for code in payload)
+        return None
+
+    @staticmethod
+    def _read_header(f: Any) -> tuple[int, int, int]:
+        f.seek(0)
+        magic, slots, count, heap = _header.unpack(f.read(_header.size))
+        if magic != _magic:
+            raise ValueError(f'{f.name} is not a rotation cache.')
+        return slots, count, heap
+
+    @staticmethod
+    def _append(
+        f: Any,
+        slots: int,
+        count: int,
+        heap: int,
+        key: tuple[int, float],
+        payload: bytes,
+    ) -> None:
+        """Append `payload` to the heap, then publish its slot."""
+        offset = _header_size + slots * _slot.size + heap
+        f.seek(offset)
+        f.write(payload)
+        f.flush()
+
+        mask = slots - 1
+        start = _hash(key) & mask
+        for probe in range(slots):
+            position = _header_size + ((start + probe) & mask) * _slot.size
+            f.seek(position)
+            if _slot.unpack(f.read(_slot.size))[1] == 0:
+                break
+        slot = _slot.pack(*key, offset, zlib.crc32(payload), len(payload))
+        f.seek(position)
+        f.write(slot)
+        f.seek(0)
+        f.write(_header.pack(_magic, slots, count + 1, heap + len(payload)))
+        f.flush()
+
+    def _compact(self, f: Any, limit: int) -> None:
+        """Replace the file with one holding only the newest entries."""
+        slots, _, _ = self._read_header(f)
+        entries = []
+        for index in range(slots):
+            f.seek(_header_size + index * _slot.size)
+            angle, epsilon, offset, crc, length = _slot.unpack(
+                f.read(_slot.size),
+            )
+            if epsilon != 0:
+                entries.append((offset, (angle, epsilon), crc, length))
+
+        # The heap is append-only, so offsets order entries by age
+        kept: list[tuple[tuple[int, float], bytes]] = []
+        size = 0
+        for offset, key, crc, length in sorted(entries, reverse=True):
+            if len(kept) >= limit // 2:
+                break
+            if size + length > self.max_bytes // 2:
+                break
+            f.seek(offset)
+            payload = f.read(length)
+            if zlib.crc32(payload) == crc:
+                kept.append((key, payload))
+                size += length
+
+        _logger.debug(
+            f'Evicting {len(entries) - len(kept)} entries'
+            f' from rotation cache {self.path}.',
+        )
+        self._create(self.path, slots, kept[::-1])
+
+    @staticmethod
+    def _create(
+        path: str,
+        slots: int,
+        entries: list[tuple[tuple[int, float], bytes]],
+    ) -> None:
+        """Atomically write a new cache file holding `entries`."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp = tempfile.mkstemp(dir=directory, prefix='.rotcache')
+        try:
+            with os.fdopen(fd, 'w+b') as f:
+                f.write(_header.pack(_magic, slots, 0, 0))
+                f.write(b'\0' * (_header_size - _header.size))
+                f.write(b'\0' * (slots * _slot.size))
+                heap = 0
+                for count, (key, payload) in enumerate(entries):
+                    RotationCache._append(f, slots, count, heap, key, payload)
+                    heap += len(payload)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+
+_open_caches: dict[str, RotationCache] = {}
+
+
+def open_rotation_cache(path: str | os.PathLike[str]) -> RotationCache:
+    """Return this process's RotationCache for `path`, opening it once."""
+    path = os.path.abspath(os.fspath(path))
+    if path not in _open_caches:
+        _open_caches[path] = RotationCache(path)
+    return _open_caches[path]
+
+
+class _Writer:
+    """Open a cache file for writing under an exclusive advisory lock."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def __enter__(self) -> Any:
+        while True:
+            self.file = open(self.path, 'r+b')
+            if fcntl is None:
+                return self.file
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+            # Retry if another writer replaced the file while we waited
+            if os.fstat(self.file.fileno()).st_ino == os.stat(
+                self.path,
+            ).st_ino:
+                return self.file
+            self.file.close()
+
+    def __exit__(self, *args: Any) -> None:
+        self.file.close()
+
+
+def _table_size(max_entries: int) -> int:
+    """Return the power-of-two slot count for at most half load."""
+    return 1 << (2 * max_entries - 1).bit_length()
+
+
+def _hash(key: tuple[int, float]) -> int:
+    """Return a hash of `key` that is stable across processes."""
+    return zlib.crc32(struct.pack('<qd', *key))
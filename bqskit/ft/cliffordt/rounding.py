@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from functools import lru_cache
+
+import numpy as np
+import numpy.typing as npt
 from numpy import pi
 from numpy import round
 
@@ -17,6 +21,28 @@ from bqskit.ir.gates.parameterized.rz import RZGate
 from bqskit.ir.operation import Operation
 
 
+@lru_cache(maxsize=None)
+def discrete_z_gates() -> tuple[CircuitGate, ...]:
+    """Return the shared gates for RZ(k * pi/4), indexed by k mod 8."""
+    residues = [
+        [IdentityGate()],
+        [TGate()],
+        [SGate()],
+        [SGate(), TGate()],
+        [ZGate()],
+        [SdgGate(), TdgGate()],
+        [SdgGate()],
+        [TdgGate()],
+    ]
+    gates = []
+    for residue in residues:
+        circuit = Circuit(1)
+        for gate in residue:
+            circuit.append_gate(gate, (0,))
+        gates.append(CircuitGate(circuit))
+    return tuple(gates)
+
+
 class RoundToDiscreteZPass(BasePass):
 
     def __init__(self, synthesis_epsilon: float = 1e-8) -> None:
@@ -25,47 +51,57 @@ class RoundToDiscreteZPass(BasePass):
     def normalize_angle(self, angle: float) -> float:
         return angle % (2 * pi)
 
-    def check_angle(self, angle: float) -> Circuit | None:
-        angle = self.normalize_angle(angle)
+    def classify_angles(
+        self,
+        angles: npt.ArrayLike,
+    ) -> npt.NDArray[np.int64]:
+        """
+        Round many angles to multiples of pi/4 at once.
+
+        Returns:
+            (npt.NDArray[np.int64]): For each angle, the multiple of pi/4
+                mod 8 it rounds to, or -1 if it is further than
+                `synthesis_epsilon` from every multiple.
+        """
+        residues, residuals = self._round(angles)
+        residues[residuals > self.synthesis_epsilon] = -1
+        return residues
+
+    def _round(
+        self,
+        angles: npt.ArrayLike,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """Return the nearest multiples of pi/4 mod 8 and the residuals."""
+        angles = np.asarray(angles, dtype=np.float64) % (2 * pi)
         pi_over_4 = pi / 4
-        value = round(angle / pi_over_4)
-        rounded_angle = value * pi_over_4
-        residual = abs(angle - rounded_angle)
-
-        if residual > self.synthesis_epsilon:
-            return None
-
-        value %= 8
-
-        if value == 0:
-            gates = [IdentityGate()]
-        elif value == 1:
-            gates = [TGate()]
-        elif value == 2:
-            gates = [SGate()]
-        elif value == 3:
-            gates = [SGate(), TGate()]
-        elif value == 4:
-            gates = [ZGate()]
-        elif value == 5:
-            gates = [SdgGate(), TdgGate()]
-        elif value == 6:
-            gates = [SdgGate()]
-        else:
-            gates = [TdgGate()]
+        values = round(angles / pi_over_4)
+        residuals = np.abs(angles - values * pi_over_4)
+        return values.astype(np.int64) % 8, residuals
 
-        circuit = Circuit(1)
-        for gate in gates:
-            circuit.append_gate(gate, (0,))
-        return CircuitGate(circuit)
+    def check_angle(self, angle: float) -> CircuitGate | None:
+        residue = self.classify_angles([angle])[0]
+        return None if residue < 0 else discrete_z_gates()[residue]
 
     async def run(self, circuit: Circuit, data: PassData) -> None:
+        points, locations, angles = [], [], []
+        for cycle, op in circuit.operations_with_cycles():
+            if isinstance(op.gate, RZGate):
+                points.append((cycle, op.location[0]))
+                locations.append(op.location)
+                angles.append(op.params[0])
+
+        if len(angles) == 0:
+            return
+
+        gates = discrete_z_gates()
+        residues, residuals = self._round(angles)
+        matches = np.flatnonzero(residuals <= self.synthesis_epsilon)
+        circuit.batch_replace(
+            [points[i] for i in matches],
+            [Operation(gates[residues[i]], locations[i]) for i in matches],
+        )
 
-        for cycle, op in circuit.operations_with_cycles(reverse=True):
-            if not isinstance(op.gate, RZGate):
-                continue
-            subcircuit = self.check_angle(op.params[0])
-            point = (cycle, op.location[0])
-            if subcircuit is not None:
-                new_op = Operation(subcircuit, op.location)
-                circuit.replace(point, new_op)
+        # Rounding RZ(theta) by r moves it by |sin(r / 2)|
+        for residual in residuals[matches]:
+            if residual > 0:
+                data.update_error_mul(float(np.sin(residual / 2)))
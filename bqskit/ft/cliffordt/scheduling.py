@@ -0,0 +1,373 @@
+"""
+This module implements magic-state-factory-aware scheduling.
+
+The runtime of a fault-tolerant Clifford+T circuit is often set by how
+quickly magic states are produced rather than by its depth. Here every
+gate takes one Clifford layer, and every T or Tdg gate also consumes a
+magic state. The factories each produce one state per latency, and states
+are kept until they are consumed.
+
+Gates depend on the earlier gates on their qubits, except that diagonal
+gates, such as T, S and Z, commute with each other and with the control
+of a CNOT and both ends of a CZ. Commuting gates on a qubit still run one
+at a time, but in any order, so T gates can be consumed out of program
+order. The scheduler hands each state to the waiting T gate with the
+longest path to the end of the circuit. It runs in `O(n log n)` time in
+the number of operations.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+
+import numpy as np
+import numpy.typing as npt
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.cliffordtgates import rz_gates
+from bqskit.ft.cliffordt.cliffordtgates import t_gates
+from bqskit.ft.cliffordt.compact import alphabet
+from bqskit.ft.cliffordt.compact import CliffordTCircuit
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gates.constant.cx import CNOTGate
+from bqskit.ir.gates.constant.cz import CZGate
+from bqskit.ir.gates.constant.s import SGate
+from bqskit.ir.gates.constant.sdg import SdgGate
+from bqskit.ir.gates.constant.z import ZGate
+from bqskit.utils.typing import is_integer
+from bqskit.utils.typing import is_real_number
+
+
+_logger = logging.getLogger(__name__)
+
+_t_codes = np.isin(np.arange(len(alphabet)), [
+    alphabet.index(gate) for gate in t_gates
+])
+
+_rz_codes = np.isin(np.arange(len(alphabet)), [
+    alphabet.index(gate) for gate in rz_gates
+])
+
+_diagonal_codes = _t_codes | np.isin(np.arange(len(alphabet)), [
+    alphabet.index(gate)
+    for gate in [SGate(), SdgGate(), ZGate(), CZGate()]
+])
+
+_cnot_code = alphabet.index(CNOTGate())
+
+
+class CliffordTSchedule:
+    """
+    A timed schedule of a :class:`CliffordTCircuit`.
+
+    The schedule is stored as arrays indexed like the circuit's
+    operations: the layer each operation starts in, and, for T gates,
+    the factory that produced the magic state it consumed.
+    """
+
+    def __init__(
+        self,
+        start: npt.NDArray[np.float64],
+        factory: npt.NDArray[np.int32],
+        num_factories: int,
+        factory_latency: float,
+        clifford_time: float,
+    ) -> None:
+        """
+        Construct a CliffordTSchedule.
+
+        Args:
+            start (npt.NDArray[np.float64]): The start time of each
+                operation.
+
+            factory (npt.NDArray[np.int32]): The factory of each T gate's
+                magic state, or -1 for other operations.
+
+            num_factories (int): The number of magic state factories.
+
+            factory_latency (float): The time a factory takes to produce
+                a magic state.
+
+            clifford_time (float): The time every operation takes.
+        """
+        self.start = start
+        self.factory = factory
+        self.num_factories = num_factories
+        self.factory_latency = factory_latency
+        self.clifford_time = clifford_time
+
+    @property
+    def num_operations(self) -> int:
+        """The number of scheduled operations."""
+        return len(self.start)
+
+    @property
+    def t_count(self) -> int:
+        """The number of magic states consumed."""
+        return int(np.count_nonzero(self.factory >= 0))
+
+    @property
+    def runtime(self) -> float:
+        """The time the last operation finishes."""
+        if len(self.start) == 0:
+            return 0.0
+        return float(self.start.max()) + self.clifford_time
+
+    @property
+    def factory_utilization(self) -> float:
+        """The fraction of the states produced during the runtime used."""
+        produced = self.num_factories * self.runtime / self.factory_latency
+        return min(self.t_count / produced, 1.0) if produced > 0 else 0.0
+
+    @property
+    def order(self) -> npt.NDArray[np.intp]:
+        """The operation indices sorted by start time."""
+        return np.argsort(self.start, kind='stable')
+
+    def __repr__(self) -> str:
+        return (
+            f'CliffordTSchedule(runtime={self.runtime:g}, t_count='
+            f'{self.t_count}, factory_utilization='
+            f'{self.factory_utilization:.3f})'
+        )
+
+
+def _dependencies(
+    codes: list[int],
+    qubits: list[list[int]],
+    num_qudits: int,
+) -> tuple[list[int], list[int], list[int]]:
+    """
+    Return the dependency graph of a compact circuit in compressed form.
+
+    Returns:
+        (tuple[list[int], list[int], list[int]]): The successors of
+            operation `i` are `successors[offsets[i]:offsets[i + 1]]`,
+            and operation `i` has `indegree[i]` predecessors.
+    """
+    n = len(codes)
+    sources: list[int] = []
+    targets: list[int] = []
+
+    # The last gate on each qubit that diagonal gates do not commute
+    # with, and the diagonal gates on the qubit since then
+    blocker = [-1] * num_qudits
+    diagonal: list[list[int]] = [[] for _ in range(num_qudits)]
+
+    diagonal_codes = _diagonal_codes.tolist()
+    for i, (code, (a, b)) in enumerate(zip(codes, qubits)):
+        roles = [(a, diagonal_codes[code] or code == _cnot_code)]
+        if b != a:
+            roles.append((b, diagonal_codes[code]))
+        for qudit, is_diagonal in roles:
+            if blocker[qudit] >= 0:
+                sources.append(blocker[qudit])
+                targets.append(i)
+            if is_diagonal:
+                diagonal[qudit].append(i)
+            else:
+                sources.extend(diagonal[qudit])
+                targets.extend([i] * len(diagonal[qudit]))
+                diagonal[qudit] = []
+                blocker[qudit] = i
+
+    src = np.array(sources, dtype=np.int64)
+    order = np.argsort(src, kind='stable')
+    offsets = np.searchsorted(src[order], np.arange(n + 1)).tolist()
+    successors = np.array(targets, dtype=np.int64)[order].tolist()
+    indegree = np.bincount(targets, minlength=n).tolist()
+    return offsets, successors, indegree
+
+
+def schedule_magic_states(
+    circuit: Circuit | CliffordTCircuit,
+    num_factories: int,
+    factory_latency: float,
+    clifford_time: float = 1.0,
+) -> CliffordTSchedule:
+    """
+    Schedule `circuit` on a machine with a number of magic state factories.
+
+    Args:
+        circuit (Circuit | CliffordTCircuit): The Clifford+T circuit to
+            schedule. Its RZ gates must be synthesized first, since the
+            number of magic states each one needs is not known.
+
+        num_factories (int): The number of magic state factories.
+
+        factory_latency (float): The time a factory takes to produce one
+            magic state, in the same unit as `clifford_time`.
+
+        clifford_time (float): The time each operation takes, including
+            the consumption of a magic state by a T gate. (Default: 1.0)
+
+    Returns:
+        (CliffordTSchedule): The schedule.
+
+    Raises:
+        ValueError: If `circuit` has gates outside the Clifford+T gate
+            set, including RZ gates, or the machine parameters are not
+            positive.
+    """
+    if not is_integer(num_factories) or num_factories <= 0:
+        raise ValueError(
+            'Expected positive integer for num_factories'
+            f', got {num_factories}.',
+        )
+
+    if not is_real_number(factory_latency) or factory_latency <= 0:
+        raise ValueError(
+            'Expected positive number for factory_latency'
+            f', got {factory_latency}.',
+        )
+
+    if not is_real_number(clifford_time) or clifford_time <= 0:
+        raise ValueError(
+            'Expected positive number for clifford_time'
+            f', got {clifford_time}.',
+        )
+
+    if isinstance(circuit, Circuit):
+        circuit = CliffordTCircuit.from_circuit(circuit)
+
+    num_rz = int(np.count_nonzero(_rz_codes[circuit.opcodes]))
+    if num_rz > 0:
+        raise ValueError(
+            'Expected a Clifford+T circuit without RZ gates'
+            f', got {num_rz} RZ gates; synthesize them first.',
+        )
+
+    n = circuit.num_operations
+    codes = circuit.opcodes.tolist()
+    qubits = circuit.qubits.tolist()
+    offsets, successors, indegree = _dependencies(
+        codes, qubits, circuit.num_qudits,
+    )
+    is_t = _t_codes[circuit.opcodes].tolist()
+
+    # Longest path to the end, visiting successors before predecessors
+    tail = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        longest = 0.0
+        for j in successors[offsets[i]:offsets[i + 1]]:
+            if tail[j] > longest:
+                longest = tail[j]
+        tail[i] = longest + clifford_time
+
+    busy = [0.0] * circuit.num_qudits
+    start = [0.0] * n
+    factory = [-1] * n
+    ready = [0.0] * n
+    events = [(0.0, i) for i in range(n) if indegree[i] == 0]
+    waiting: list[tuple[float, int]] = []
+    states = 0
+    now = 0.0
+    while events or waiting:
+        produced = (states // num_factories + 1) * factory_latency
+        if events and (not waiting or events[0][0] <= max(produced, now)):
+            now, i = heapq.heappop(events)
+            if is_t[i]:
+                heapq.heappush(waiting, (-tail[i], i))
+                continue
+            a, b = qubits[i]
+            free = max(busy[a], busy[b])
+            if free > now:
+                # A commuting gate holds the qubit; try again when done
+                heapq.heappush(events, (free, i))
+                continue
+            start[i] = now
+        else:
+            _, i = heapq.heappop(waiting)
+            a, b = qubits[i]
+            start[i] = max(produced, ready[i], busy[a])
+            factory[i] = states % num_factories
+            states += 1
+
+        finish = start[i] + clifford_time
+        busy[a] = busy[b] = finish
+        for j in successors[offsets[i]:offsets[i + 1]]:
+            if finish > ready[j]:
+                ready[j] = finish
+            indegree[j] -= 1
+            if indegree[j] == 0:
+                heapq.heappush(events, (ready[j], j))
+
+    return CliffordTSchedule(
+        np.array(start, dtype=np.float64),
+        np.array(factory, dtype=np.int32),
+        num_factories,
+        factory_latency,
+        clifford_time,
+    )
+
+
+class MagicStateSchedulingPass(BasePass):
+    """
+    The MagicStateSchedulingPass class.
+
+    Stores the :class:`CliffordTSchedule` of a compiled Clifford+T
+    circuit in the pass data and logs its runtime and factory
+    utilization. The circuit itself is not changed.
+    """
+
+    def __init__(
+        self,
+        num_factories: int,
+        factory_latency: float,
+        clifford_time: float = 1.0,
+        key: str = 'magic_state_schedule',
+    ) -> None:
+        """
+        Construct a MagicStateSchedulingPass.
+
+        Args:
+            num_factories (int): See :func:`schedule_magic_states`.
+
+            factory_latency (float): See :func:`schedule_magic_states`.
+
+            clifford_time (float): See :func:`schedule_magic_states`.
+                (Default: 1.0)
+
+            key (str): The pass data key the schedule is stored under.
+                (Default: 'magic_state_schedule')
+        """
+        if not is_integer(num_factories) or num_factories <= 0:
+            raise ValueError(
+                'Expected positive integer for num_factories'
+                f', got {num_factories}.',
+            )
+
+        if not is_real_number(factory_latency) or factory_latency <= 0:
+            raise ValueError(
+                'Expected positive number for factory_latency'
+                f', got {factory_latency}.',
+            )
+
+        if not is_real_number(clifford_time) or clifford_time <= 0:
+            raise ValueError(
+                'Expected positive number for clifford_time'
+                f', got {clifford_time}.',
+            )
+
+        if not isinstance(key, str):
+            raise TypeError(f'Expected str for key, got {type(key)}.')
+
+        self.num_factories = num_factories
+        self.factory_latency = factory_latency
+        self.clifford_time = clifford_time
+        self.key = key
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        schedule = schedule_magic_states(
+            circuit,
+            self.num_factories,
+            self.factory_latency,
+            self.clifford_time,
+        )
+        data[self.key] = schedule
+        _logger.info(
+            f'Estimated runtime: {schedule.runtime:g}, factory'
+            f' utilization: {schedule.factory_utilization:.1%}.',
+        )
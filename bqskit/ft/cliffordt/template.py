@@ -0,0 +1,299 @@
+"""
+This module implements compile-once, bind-many Clifford+T templates.
+
+Variational circuits are recompiled many times with only their rotation
+angles changed. A template compiles the circuit once with every `RZGate`
+replaced by a :class:`RotationSlot`, a barrier that partitioning and
+grouping passes do not cross, so the compiled skeleton keeps one slot per
+rotation of the input. Binding angles then only synthesizes each rotation
+with :func:`synthesize_rz` and splices the sequences into the skeleton.
+Templates compiled for a model with a `rotation_cache` share its
+persistent :class:`RotationCache` when binding.
+
+Rotations stay where they were in the input, so optimizations that would
+merge a rotation with its neighbors are not applied across slots.
+
+The skeleton is checked against the input, with the input's own angles
+in its slots, by :func:`verify_equivalence`. The optimizations around a
+slot can leave single-qudit gates a small distance from the Clifford
+they replace, which the synthesis epsilon does not cover, so a skeleton
+that fails the check is compiled again with the next seed.
+"""
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+
+from bqskit.compiler.compiler import Compiler
+from bqskit.compiler.registry import _compile_circuit_registry
+from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
+from bqskit.ft.cliffordt.gridsynth import synthesize_rz
+from bqskit.ft.cliffordt.rotationcache import open_rotation_cache
+from bqskit.ft.cliffordt.verification import verify_equivalence
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.barrier import BarrierPlaceholder
+from bqskit.ir.gates.parameterized.rz import RZGate
+from bqskit.ir.operation import Operation
+from bqskit.qis.unitary.unitary import RealVector
+
+
+_logger = logging.getLogger(__name__)
+
+
+class RotationSlot(BarrierPlaceholder):
+    """A placeholder for the `index`-th rotation of a template."""
+
+    def __init__(self, index: int) -> None:
+        """Construct the RotationSlot for the rotation `index`."""
+        super().__init__(1)
+        self._name = f'slot{index}'
+        self.index = index
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, RotationSlot) and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash(('RotationSlot', self.index))
+
+
+class CliffordTTemplate:
+    """
+    A Clifford+T circuit with slots for the angles of its rotations.
+
+    Built by :func:`compile_template`. The skeleton is stored as a tuple
+    of operations, and :meth:`bind` builds a new circuit from it.
+    """
+
+    def __init__(
+        self,
+        skeleton: Circuit,
+        num_slots: int,
+        synthesis_epsilon: float = 1e-8,
+        cache_path: str | None = None,
+    ) -> None:
+        """
+        Construct a CliffordTTemplate.
+
+        Args:
+            skeleton (Circuit): The compiled circuit, holding a
+                :class:`RotationSlot` for every rotation.
+
+            num_slots (int): The number of rotations.
+
+            synthesis_epsilon (float): The largest allowed distance
+                between each bound rotation and its Clifford+T sequence.
+                (Default: 1e-8)
+
+            cache_path (str | None): The file of a persistent rotation
+                cache to consult and fill when binding, or None to not
+                persist sequences. (Default: None)
+
+        Raises:
+            ValueError: If `skeleton` does not hold exactly the slots
+                numbered 0 to `num_slots - 1`.
+        """
+        self.num_qudits = skeleton.num_qudits
+        self.radixes = skeleton.radixes
+        self.operations = tuple(skeleton)
+        self.num_slots = num_slots
+        self.synthesis_epsilon = synthesis_epsilon
+        self.cache_path = cache_path
+        self._slot_operations: dict[tuple[Gate, int], Operation] = {}
+
+        slots = sorted(
+            op.gate.index
+            for op in self.operations
+            if isinstance(op.gate, RotationSlot)
+        )
+        if slots != list(range(num_slots)):
+            raise ValueError(
+                f'Expected the skeleton to hold slots 0 to {num_slots - 1}'
+                f', got {slots}.',
+            )
+
+    def with_rotations(self, angles: RealVector) -> Circuit:
+        """Return the skeleton with an `RZGate` at `angles` in each slot."""
+        circuit = Circuit(self.num_qudits, self.radixes)
+        for op in self.operations:
+            if isinstance(op.gate, RotationSlot):
+                angle = angles[op.gate.index]
+                circuit.append_gate(RZGate(), op.location, [angle])
+            else:
+                circuit.append(op)
+        return circuit
+
+    def bind(self, angles: RealVector) -> Circuit:
+        """
+        Build the Clifford+T circuit for `angles`.
+
+        Args:
+            angles (RealVector): The angle of each rotation, in the order
+                the `RZGate` operations appear when iterating over the
+                input circuit.
+
+        Returns:
+            (Circuit): The compiled circuit with every rotation replaced
+                by its Clifford+T sequence, up to global phase.
+
+        Raises:
+            ValueError: If the number of angles does not match the
+                number of rotations.
+        """
+        angles = np.asarray(angles, dtype=np.float64).reshape(-1)
+        if len(angles) != self.num_slots:
+            raise ValueError(
+                f'Expected {self.num_slots} angles, got {len(angles)}.',
+            )
+
+        store = None
+        if self.cache_path is not None:
+            store = open_rotation_cache(self.cache_path)
+        sequences = [
+            synthesize_rz(angle, self.synthesis_epsilon, store=store)
+            for angle in angles
+        ]
+        # Bound gates have no parameters, so their operations are shared
+        shared = self._slot_operations
+        circuit = Circuit(self.num_qudits, self.radixes)
+        for op in self.operations:
+            if not isinstance(op.gate, RotationSlot):
+                circuit.append(op)
+                continue
+
+            qudit = op.location[0]
+            for gate in sequences[op.gate.index]:
+                key = (gate, qudit)
+                if key not in shared:
+                    shared[key] = Operation(gate, qudit)
+                circuit.append(shared[key])
+        return circuit
+
+
+def with_rotation_slots(circuit: Circuit) -> tuple[Circuit, list[float]]:
+    """
+    Replace every `RZGate` in `circuit` with a :class:`RotationSlot`.
+
+    Returns:
+        (tuple[Circuit, list[float]]): The new circuit, and the angles of
+            the replaced rotations in slot order.
+    """
+    slotted = Circuit(circuit.num_qudits, circuit.radixes)
+    angles: list[float] = []
+    for op in circuit:
+        if isinstance(op.gate, RZGate):
+            slotted.append(Operation(RotationSlot(len(angles)), op.location))
+            angles.append(op.params[0])
+        else:
+            slotted.append(op)
+    return slotted, angles
+
+
+def compile_template(
+    circuit: Circuit,
+    model: CliffordTModel | None = None,
+    optimization_level: int = 1,
+    compiler: Compiler | None = None,
+    seed: int | None = None,
+    max_attempts: int = 3,
+) -> CliffordTTemplate:
+    """
+    Compile `circuit` once into a template for rebinding its rotations.
+
+    Args:
+        circuit (Circuit): The circuit to compile. Every `RZGate` in it
+            becomes a slot of the template; everything else is compiled
+            as usual.
+
+        model (CliffordTModel | None): The model to compile to. If None,
+            a :class:`CliffordTModel` on all of the circuit's qudits.
+            (Default: None)
+
+        optimization_level (int): The optimization level, see
+            :func:`compile`. (Default: 1)
+
+        compiler (Compiler | None): The compiler to use, or None to
+            start one for this call. (Default: None)
+
+        seed (int | None): The seed of the compilation's pass data.
+            Each further attempt uses the next seed. (Default: None)
+
+        max_attempts (int): The number of times the skeleton is compiled
+            before giving up on one that passes the check against
+            `circuit`. (Default: 3)
+
+    Returns:
+        (CliffordTTemplate): The template. Binding the circuit's own
+            angles gives a compilation of `circuit`.
+
+    Raises:
+        RuntimeError: If no attempt gave a skeleton equivalent to
+            `circuit` to within ten times its compilation error.
+    """
+    if model is None:
+        model = CliffordTModel(circuit.num_qudits, radixes=circuit.radixes)
+
+    if not isinstance(model, CliffordTModel):
+        raise TypeError(f'Expected CliffordTModel, got {type(model)}.')
+
+    if optimization_level not in _compile_circuit_registry[model]:
+        raise ValueError(
+            'Expected optimization_level in'
+            f' {sorted(_compile_circuit_registry[model])}'
+            f', got {optimization_level}.',
+        )
+
+    # compile leaves the model and seed out of the pass data of registered
+    # workflows, and the workflows take their gate set from the model
+    slotted, angles = with_rotation_slots(circuit)
+    workflow = _compile_circuit_registry[model][optimization_level]
+    managed = compiler is None
+    if compiler is None:
+        compiler = Compiler()
+
+    try:
+        for attempt in range(max_attempts):
+            data = {
+                'model': model,
+                'seed': None if seed is None else seed + attempt,
+            }
+            skeleton, skeleton_data = compiler.compile(
+                slotted,
+                workflow,
+                True,
+                data=data,
+            )
+            template = CliffordTTemplate(
+                skeleton,
+                len(angles),
+                model.synthesis_epsilon,
+                model.options.rotation_cache,
+            )
+            # The check bounds the distance by adding up that of each run
+            # of gates, a few times the error in the pass data, while the
+            # gates left off a Clifford are orders of magnitude further
+            error = skeleton_data.error + model.synthesis_epsilon
+            threshold = 10 * error
+            if _matches(template.with_rotations(angles), circuit, threshold):
+                return template
+            _logger.warning(
+                f'Template skeleton {attempt} is not equivalent to its'
+                ' input; compiling it again.',
+            )
+    finally:
+        if managed:
+            compiler.close()
+
+    raise RuntimeError(
+        f'No skeleton equivalent to the input in {max_attempts} attempts.',
+    )
+
+
+def _matches(circuit: Circuit, reference: Circuit, threshold: float) -> bool:
+    """Return False if `circuit` is found further than `threshold`."""
+    try:
+        return verify_equivalence(circuit, reference, threshold).passed
+    except ValueError:
+        # Too large to check, taken as the synthesis epsilon promises
+        return True
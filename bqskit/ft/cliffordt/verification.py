@@ -0,0 +1,913 @@
+"""
+This module implements equivalence checking of Clifford+T circuits that
+scales past unitary simulation.
+
+A compiled circuit `V` is equivalent to its input `U`, up to global
+phase, when `W = U^dagger V` is a multiple of the identity. Instead of
+simulating `W`, which needs memory exponential in the number of qubits,
+`W` is rewritten as Pauli-product rotations followed by a Clifford with
+:class:`PauliRotationCircuit`, where the rotations of `V` that match
+rotations of `U^dagger` merge away. Rotations that merge into a Clifford
+rotation are moved into the Clifford, which lets the rotations they
+blocked merge in turn, until only rotations that are not Clifford are
+left. A rotation synthesized as Clifford+T gates does not merge with the
+one it approximates, but together they act as a single qubit within the
+synthesis error of a Clifford, so such runs of rotations are replaced by
+that Clifford if within `threshold`, and the difference is added to the
+bound.
+
+Pauli strings `P` are then propagated through what remains: through the
+Clifford as a single signed string, using its tableau, and through each
+rotation by splitting the strings that anticommute with it in two. `P`
+goes forward through the first half of the rotations, and its image
+under the Clifford backward through the second half, and their overlap
+is `Tr(P W P W^dagger) / 2^n`.
+
+If no rotation is left, `W` is a Clifford and the overlaps with the
+`2 n` generators `X_q` and `Z_q` certify exactly whether the circuits
+are equivalent. Otherwise the strings grow with each rotation, and terms
+below `truncation`, or beyond the `max_terms` largest, are dropped. The
+norm of what was dropped bounds the error of each overlap. The result
+is then either:
+
+- A bound on the distance from the overlaps with the generators. `W` is
+  as far from commuting with any Pauli string as the sum of how far it
+  is from commuting with each generator, and a `W` that nearly commutes
+  with every Pauli string is nearly a multiple of the identity.
+
+- With `num_samples`, an estimate of the process fidelity
+  `|Tr W|^2 / 4^n`, which is the mean overlap over uniformly random
+  Pauli strings, and a lower bound on it that holds with probability
+  `confidence` by Hoeffding's inequality. Certifying a distance `d` this
+  way takes about `2 ln(1 / (1 - confidence)) / d^4` samples.
+
+Both are cheap while few rotations that are not Clifford remain after
+merging. Each Pauli string is propagated on its own, so
+:class:`EquivalenceVerificationPass` spreads them over the workers of a
+:class:`Compiler`. Circuits with gates that are neither Clifford nor
+rotations are simulated instead, up to `max_dense_qudits` qubits.
+
+Distances are as in :meth:`UnitaryMatrix.get_distance_from`, `sqrt(1 -
+F)` for the process fidelity `F`.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from random import Random
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.paulirotation import _apply_recipe
+from bqskit.ft.cliffordt.paulirotation import _multiply
+from bqskit.ft.cliffordt.paulirotation import _operation_recipe
+from bqskit.ft.cliffordt.paulirotation import _pack
+from bqskit.ft.cliffordt.paulirotation import _Pauli
+from bqskit.ft.cliffordt.paulirotation import _popcount
+from bqskit.ft.cliffordt.paulirotation import _rotation_codes
+from bqskit.ft.cliffordt.paulirotation import _unpack
+from bqskit.ft.cliffordt.paulirotation import PauliRotationCircuit
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.gate import Gate
+from bqskit.ir.gates.circuitgate import CircuitGate
+from bqskit.ir.gates.constant.t import TGate
+from bqskit.ir.gates.constant.tdg import TdgGate
+from bqskit.ir.operation import Operation
+from bqskit.qis.state.state import StateVector
+from bqskit.qis.state.system import StateSystem
+from bqskit.runtime import get_runtime
+
+
+_logger = logging.getLogger(__name__)
+
+_Terms = Dict[Tuple[int, int], float]
+"""The coefficients of an operator on the Hermitian Pauli strings."""
+
+_Rotation = Tuple[int, int, float, float]
+"""The X mask, Z mask, and cosine and sine of the angle of a rotation."""
+
+_inverse_gates = {TGate(): TdgGate(), TdgGate(): TGate()}
+"""The inverse of constant rotations, as rotations."""
+
+_quarter_turns = [(1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0)]
+"""The exact cosine and sine of multiples of `pi / 2`."""
+
+
+@dataclass
+class VerificationResult:
+    """The outcome of checking a compiled circuit against its input."""
+
+    passed: bool
+    """Whether the distance bound is within the threshold."""
+
+    method: str
+    """
+    How the circuits were compared: 'clifford' if only Clifford gates
+    were left to compare, which is exact, 'generators' or 'sampling' if
+    the distance is bounded by propagating the generators or random
+    Pauli strings, or 'unitary' if the circuits were simulated.
+    """
+
+    distance_bound: float = 0.0
+    """An upper bound on the distance between the circuits."""
+
+    fidelity_bound: float = 1.0
+    """A lower bound on the process fidelity of the circuits."""
+
+    fidelity_estimate: float = 1.0
+    """The mean overlap for 'sampling', otherwise the fidelity bound."""
+
+    confidence: float = 1.0
+    """The probability the bounds hold, below one only for 'sampling'."""
+
+    num_paulis: int = 0
+    """The number of Pauli strings propagated."""
+
+    num_rotations: int = 0
+    """The rotations that are not Clifford left after merging."""
+
+    truncation_error: float = 0.0
+    """The largest error of an overlap due to dropped terms."""
+
+
+class _Reduction:
+    """`U^dagger V` as rotations around a split point and a Clifford."""
+
+    def __init__(
+        self,
+        rows: Sequence[_Pauli],
+        forward: Sequence[_Rotation],
+        backward: Sequence[_Rotation],
+        num_rotations: int,
+        rounding_error: float,
+    ) -> None:
+        self.rows = rows
+        """The tableau of the inverse of the Clifford."""
+
+        self.forward = forward
+        """The rotations before the split point, in order."""
+
+        self.backward = backward
+        """The inverses of the rotations after it, in reverse order."""
+
+        self.num_rotations = num_rotations
+        """The number of rotations, none of them Clifford."""
+
+        self.rounding_error = rounding_error
+        """A bound on the distance added by rounding and replacing."""
+
+
+@lru_cache(maxsize=None)
+def _inverse_gate(gate: Gate) -> Gate:
+    """Return the inverse of a constant gate, cached."""
+    if gate in _inverse_gates:
+        return _inverse_gates[gate]
+    return gate.get_inverse()
+
+
+def _inverse(op: Operation) -> Operation:
+    """Return the inverse of `op`, keeping rotations as rotations."""
+    if op.num_params == 0:
+        return Operation(_inverse_gate(op.gate), op.location)
+    if op.gate in _rotation_codes:
+        return Operation(op.gate, op.location, [-p for p in op.params])
+    return op.get_inverse()
+
+
+def _signed(x: int, z: int, sign: int) -> _Pauli:
+    """Return `sign` times a Hermitian string as a power of `i`."""
+    return x, z, (_popcount(x & z) + (1 - sign)) % 4
+
+
+def _image(rows: Sequence[_Pauli], x: int, z: int) -> tuple[int, int, int]:
+    """Return the image under `rows` of a Hermitian string, with its sign."""
+    num_qudits = len(rows) // 2
+    result = (0, 0, _popcount(x & z))
+    for mask, offset in ((x, 0), (z, num_qudits)):
+        while mask:
+            low = mask & -mask
+            result = _multiply(result, rows[offset + low.bit_length() - 1])
+            mask ^= low
+    x, z, phase = result
+    return x, z, 1 if (phase - _popcount(x & z)) % 4 == 0 else -1
+
+
+def _compose(rows: Sequence[_Pauli], frame: Sequence[_Pauli]) -> list[_Pauli]:
+    """Return the tableau of the inverse of `C D` for `rows` of `C`."""
+    composed = []
+    for x, z, phase in rows:
+        sign = 1 if (phase - _popcount(x & z)) % 4 == 0 else -1
+        x, z, image_sign = _image(frame, x, z)
+        composed.append(_signed(x, z, sign * image_sign))
+    return composed
+
+
+def _absorb_cliffords(
+    rotations: PauliRotationCircuit,
+) -> tuple[list[tuple[int, int, float]], list[_Pauli], float]:
+    """
+    Move the rotations that are Clifford after the others.
+
+    Returns the other rotations, conjugated by the Clifford rotations `D`
+    before them, the tableau of the inverse of `D`, and the distance
+    added by taking angles within float error of a quarter turn as one.
+    """
+    num_qudits = rotations.num_qudits
+    frame: list[_Pauli] = [(1 << q, 0, 0) for q in range(num_qudits)]
+    frame += [(0, 1 << q, 0) for q in range(num_qudits)]
+    kept = []
+    error = 0.0
+    for x, z, angle in zip(
+        _unpack(rotations.x_masks),
+        _unpack(rotations.z_masks),
+        rotations.angles.tolist(),
+    ):
+        # R D = D (D^dagger R D)
+        x, z, sign = _image(frame, x, z)
+        angle *= sign
+        turns = round(angle / (np.pi / 2))
+        if abs(angle - turns * np.pi / 2) > 1e-12:
+            kept.append((x, z, angle))
+            continue
+
+        # D becomes D Q for the quarter turn Q, so its tableau rows are
+        # conjugated by Q
+        error += abs(angle - turns * np.pi / 2) / 2
+        cos, sin = _quarter_turns[turns % 4]
+        for index, (rx, rz, phase) in enumerate(frame):
+            if not _popcount((x & rz) ^ (z & rx)) & 1:
+                continue
+            row_sign = 1 if (phase - _popcount(rx & rz)) % 4 == 0 else -1
+            rotated = _rotate({(rx, rz): 1.0}, (x, z, cos, -sin))
+            ((rx, rz), c), = rotated.items()
+            frame[index] = _signed(rx, rz, row_sign * int(c))
+    return kept, frame, error
+
+
+def _local_cliffords() -> tuple[np.ndarray, list[tuple[int, int, int]]]:
+    """Return the one-qubit Cliffords and their quarter turns about X, Z, X."""
+    def rotation(sigma: np.ndarray, turns: int) -> np.ndarray:
+        half = turns * np.pi / 4
+        return np.cos(half) * np.identity(2) - 1j * np.sin(half) * sigma
+
+    x = np.array([[0, 1], [1, 0]])
+    z = np.array([[1, 0], [0, -1]])
+    turns = sorted(
+        [(a, b, c) for a in range(4) for b in range(4) for c in range(4)],
+        key=lambda t: sum(1 for n in t if n),
+    )
+    matrices = [
+        rotation(x, c) @ rotation(z, b) @ rotation(x, a)
+        for a, b, c in turns
+    ]
+    return np.array(matrices), turns
+
+
+_cliffords, _clifford_turns = _local_cliffords()
+"""Each one-qubit Clifford, several times, with the fewest turns first."""
+
+
+def _blocker(
+    items: Sequence[Sequence[Any]],
+    unions: Sequence[Sequence[int]],
+    x: int,
+    z: int,
+) -> int | None:
+    """Return the last item that does not commute with a string, if any."""
+    for block in range(len(unions) - 1, -1, -1):
+        x_union, z_union = unions[block]
+        if not (x & z_union) and not (z & x_union):
+            continue
+        start = block * 64
+        for index in range(min(start + 64, len(items)) - 1, start - 1, -1):
+            ax, az, bx, bz, _ = items[index]
+            if _popcount((x & az) ^ (z & ax)) & 1:
+                return index
+            if _popcount((x & bz) ^ (z & bx)) & 1:
+                return index
+    return None
+
+
+def _fuse(
+    rotations: Sequence[tuple[int, int, float]],
+    threshold: float,
+) -> tuple[list[tuple[int, int, float]], float, int]:
+    """
+    Replace runs of rotations that act as a nearly Clifford qubit.
+
+    Two anticommuting strings `A` and `B` generate the same algebra as
+    `X` and `Z` on one qubit, so rotations about `A`, `B`, and `iAB` that
+    commute with everything between them compose to a one-qubit unitary.
+    Those within `threshold` of a Clifford are replaced by quarter turns,
+    as when a rotation was synthesized to within that accuracy.
+
+    Returns the rotations, the distance added, and how many runs were
+    replaced.
+    """
+    # Each item is the axes A and B of its algebra, B zero until a
+    # rotation that anticommutes with A joins, and its rotations
+    items: list[list[Any]] = []
+    unions: list[list[int]] = []
+    for x, z, angle in rotations:
+        target = _blocker(items, unions, x, z)
+        if target is not None:
+            ax, az, bx, bz, _ = items[target]
+            algebra = ((ax, az), (bx, bz), (ax ^ bx, az ^ bz))
+            if (bx or bz) and (x, z) not in algebra:
+                target = None
+
+        if target is None:
+            if len(items) % 64 == 0:
+                unions.append([0, 0])
+            items.append([x, z, 0, 0, [(x, z, angle)]])
+            unions[-1][0] |= x
+            unions[-1][1] |= z
+            continue
+
+        item = items[target]
+        if not (item[2] or item[3]):
+            item[2], item[3] = x, z
+        item[4].append((x, z, angle))
+        unions[target // 64][0] |= x
+        unions[target // 64][1] |= z
+
+    fused = []
+    error = 0.0
+    replaced = 0
+    for ax, az, bx, bz, members in items:
+        if len(members) == 1:
+            fused.extend(members)
+            continue
+
+        # A, B, and iAB act as X, Z, and iXZ = Y
+        cx, cz, phase = _multiply(
+            (ax, az, _popcount(ax & az)),
+            (bx, bz, _popcount(bx & bz)),
+        )
+        sign = 1 if (phase + 1 - _popcount(cx & cz)) % 4 == 0 else -1
+        sigmas = {
+            (ax, az): np.array([[0, 1], [1, 0]]),
+            (bx, bz): np.array([[1, 0], [0, -1]]),
+            (cx, cz): sign * np.array([[0, -1j], [1j, 0]]),
+        }
+        unitary = np.identity(2, dtype=np.complex128)
+        for x, z, angle in members:
+            step = math.cos(angle / 2) * np.identity(2, dtype=np.complex128)
+            step -= 1j * math.sin(angle / 2) * sigmas[(x, z)]
+            unitary = step @ unitary
+
+        traces = np.abs(np.einsum('kij,ij->k', _cliffords.conj(), unitary))
+        best = int(np.argmax(traces >= np.max(traces) - 1e-12))
+        # 1 - |Tr M / 2|^2 is half the norm of the traceless part of M,
+        # which keeps distances below the square root of float precision
+        product = _cliffords[best].conj().T @ unitary
+        product -= np.trace(product) / 2 * np.identity(2)
+        distance = float(np.linalg.norm(product)) / math.sqrt(2)
+        if distance > threshold:
+            fused.extend(members)
+            continue
+
+        error += distance
+        replaced += 1
+        for (x, z), turns in zip(
+            ((ax, az), (bx, bz), (ax, az)),
+            _clifford_turns[best],
+        ):
+            if turns:
+                fused.append((x, z, turns * np.pi / 2))
+    return fused, error, replaced
+
+
+def _reduce(
+    circuit: Circuit,
+    reference: Circuit,
+    threshold: float,
+    tolerance: float,
+) -> _Reduction | None:
+    """Return `reference^dagger circuit` reduced, or None if unsupported."""
+    if circuit.num_qudits != reference.num_qudits:
+        raise ValueError(
+            f'Expected circuits of {reference.num_qudits} qudits'
+            f', got {circuit.num_qudits}.',
+        )
+
+    operations: list[list[Operation]] = []
+    for c in (circuit, reference):
+        if any(isinstance(g, CircuitGate) for g in c.gate_set):
+            c = c.copy()
+            c.unfold_all()
+        operations.append(list(c))
+
+    num_qudits = circuit.num_qudits
+    combined = Circuit(num_qudits)
+    for op in operations[0]:
+        combined.append(op)
+    for op in reversed(operations[1]):
+        combined.append(_inverse(op))
+
+    rotations = PauliRotationCircuit.from_circuit(combined, tolerance)
+    if rotations is None:
+        return None
+
+    rows: list[_Pauli] = [(1 << q, 0, 0) for q in range(num_qudits)]
+    rows += [(0, 1 << q, 0) for q in range(num_qudits)]
+    for op in rotations.clifford:
+        recipe = _operation_recipe(op, tolerance)
+        assert recipe is not None
+        _apply_recipe(rows, op.location, recipe)
+
+    # Merged rotations that become Clifford block others from merging,
+    # so they are moved into the Clifford until none are left
+    rounding_error = 0.0
+    while True:
+        # Rounding R(a) to R(b) moves it by at most |a - b| / 2
+        rotations = rotations.merge()
+        angles = np.mod(rotations.angles, 2 * np.pi)
+        offsets = np.abs(angles - np.rint(angles / (np.pi / 4)) * np.pi / 4)
+        rounding_error += float(np.sum(offsets[offsets <= tolerance])) / 2
+        rotations = rotations.round(tolerance)
+
+        kept, frame, error = _absorb_cliffords(rotations)
+        rounding_error += error
+        absorbed = len(kept) < rotations.num_rotations
+        if absorbed:
+            rows = _compose(rows, frame)
+
+        # Each replacement leaves fewer rotations that are not Clifford
+        kept, error, replaced = _fuse(kept, threshold)
+        rounding_error += error
+        if not absorbed and not replaced:
+            break
+        num_words = rotations.x_masks.shape[1]
+        rotations = PauliRotationCircuit(
+            num_qudits,
+            _pack([x for x, _, _ in kept], num_words),
+            _pack([z for _, z, _ in kept], num_words),
+            [angle for _, _, angle in kept],
+            rotations.clifford,
+        )
+
+    steps = [
+        (x, z, math.cos(angle), math.sin(angle))
+        for x, z, angle in kept
+    ]
+    middle = len(steps) // 2
+    # Conjugating by R^dagger is rotating by the negated angle
+    backward = [(x, z, c, -s) for x, z, c, s in reversed(steps[middle:])]
+    return _Reduction(
+        rows,
+        steps[:middle],
+        backward,
+        len(steps),
+        rounding_error,
+    )
+
+
+def _rotate(terms: _Terms, rotation: _Rotation) -> _Terms:
+    """Return `R Q R^dagger` for the operator `Q` and rotation `R`."""
+    x, z, cos, sin = rotation
+    phase = _popcount(x & z)
+    result: _Terms = {}
+    for key, coefficient in terms.items():
+        qx, qz = key
+        if not _popcount((x & qz) ^ (z & qx)) & 1:
+            result[key] = result.get(key, 0.0) + coefficient
+            continue
+
+        # R Q R^dagger = cos(a) Q + sin(a) (-i P Q) if P, Q anticommute
+        if cos:
+            result[key] = result.get(key, 0.0) + cos * coefficient
+        if not sin:
+            continue
+        px, pz, r = _multiply((x, z, phase), (qx, qz, _popcount(qx & qz)))
+        if (r + 3 - _popcount(px & pz)) % 4 != 0:
+            coefficient = -coefficient
+        product = (px, pz)
+        result[product] = result.get(product, 0.0) + sin * coefficient
+    return result
+
+
+def _truncate(
+    terms: _Terms,
+    truncation: float,
+    max_terms: int,
+) -> tuple[_Terms, float]:
+    """Drop small terms and all but the largest, return the norm dropped."""
+    dropped = 0.0
+    kept: _Terms = {}
+    for key, coefficient in terms.items():
+        if abs(coefficient) <= truncation:
+            dropped += coefficient * coefficient
+        else:
+            kept[key] = coefficient
+
+    if len(kept) > max_terms:
+        ordered = sorted(kept.items(), key=lambda t: -abs(t[1]))
+        dropped += sum(c * c for _, c in ordered[max_terms:])
+        kept = dict(ordered[:max_terms])
+    return kept, math.sqrt(dropped)
+
+
+def _propagate(
+    terms: _Terms,
+    rotations: Iterable[_Rotation],
+    truncation: float,
+    max_terms: int,
+) -> tuple[_Terms, float]:
+    """Conjugate `terms` by `rotations` in order, return with the error."""
+    error = 0.0
+    x_union = z_union = 0
+    for qx, qz in terms:
+        x_union |= qx
+        z_union |= qz
+
+    for rotation in rotations:
+        x, z, cos, sin = rotation
+        # The rotation commutes with every term unless they overlap
+        if not (x & z_union) and not (z & x_union):
+            continue
+        terms = _rotate(terms, rotation)
+        x_union |= x
+        z_union |= z
+        if cos and sin:
+            terms, dropped = _truncate(terms, truncation, max_terms)
+            error += dropped
+            # Overlaps are within [-1, 1], so the rest would not tell more
+            if error >= 2:
+                break
+    return terms, error
+
+
+def _overlaps(
+    reduction: _Reduction,
+    paulis: Sequence[tuple[int, int]],
+    truncation: float,
+    max_terms: int,
+) -> list[tuple[float, float]]:
+    """Return the overlap of each Pauli string and its error bound."""
+    results = []
+    for x, z in paulis:
+        image_x, image_z, sign = _image(reduction.rows, x, z)
+        forward, forward_error = _propagate(
+            {(x, z): 1.0},
+            reduction.forward,
+            truncation,
+            max_terms,
+        )
+        backward, backward_error = _propagate(
+            {(image_x, image_z): float(sign)},
+            reduction.backward,
+            truncation,
+            max_terms,
+        )
+        if len(backward) < len(forward):
+            forward, backward = backward, forward
+        overlap = sum(c * backward.get(k, 0.0) for k, c in forward.items())
+        results.append((overlap, forward_error + backward_error))
+    return results
+
+
+def _paulis(
+    num_qudits: int,
+    num_samples: int | None,
+    sampled: bool,
+    seed: int | None,
+) -> list[tuple[int, int]]:
+    """Return `num_samples` random strings if `sampled`, else generators."""
+    if not sampled or num_samples is None:
+        paulis = [(1 << q, 0) for q in range(num_qudits)]
+        return paulis + [(0, 1 << q) for q in range(num_qudits)]
+    rng = Random(seed)
+    return [
+        (rng.getrandbits(num_qudits), rng.getrandbits(num_qudits))
+        for _ in range(num_samples)
+    ]
+
+
+def _conclude(
+    reduction: _Reduction,
+    overlaps: Sequence[tuple[float, float]],
+    sampled: bool,
+    threshold: float,
+    confidence: float,
+) -> VerificationResult:
+    """Return the verification result of the overlaps."""
+    result = VerificationResult(
+        True,
+        'clifford',
+        num_paulis=len(overlaps),
+        num_rotations=reduction.num_rotations,
+        truncation_error=max((e for _, e in overlaps), default=0.0),
+    )
+
+    if reduction.num_rotations == 0:
+        # Exact, every overlap is 1, -1, or 0 for a Clifford
+        if all(value > 0.5 for value, _ in overlaps):
+            distance = 0.0
+        else:
+            distance = 1.0
+    elif sampled:
+        result.method = 'sampling'
+        result.confidence = confidence
+        count = len(overlaps)
+        mean = sum(value for value, _ in overlaps) / count
+        error = sum(e for _, e in overlaps) / count
+        slack = math.sqrt(2 * math.log(1 / (1 - confidence)) / count)
+        result.fidelity_estimate = min(max(mean, 0.0), 1.0)
+        distance = math.sqrt(1 - min(max(mean - error - slack, 0.0), 1.0))
+    else:
+        # ||W - P W P|| is at most the sum over the generators of P, each
+        # in half of all P, and the mean of P W P is Tr(W) / 2^n
+        result.method = 'generators'
+        distance = sum(
+            math.sqrt(2 * max(1 - value + error, 0.0))
+            for value, error in overlaps
+        ) / 2
+
+    # The distance is the sine of an angle that obeys the triangle
+    # inequality, so it is subadditive
+    result.distance_bound = min(distance + reduction.rounding_error, 1.0)
+    result.fidelity_bound = 1 - result.distance_bound ** 2
+    if result.method != 'sampling':
+        result.fidelity_estimate = result.fidelity_bound
+    result.passed = result.distance_bound <= threshold
+    return result
+
+
+def _simulate(
+    circuit: Circuit,
+    reference: Circuit,
+    threshold: float,
+    max_dense_qudits: int,
+) -> VerificationResult:
+    """Return the verification result of simulating both circuits."""
+    if circuit.num_qudits > max_dense_qudits:
+        raise ValueError(
+            'Expected only Clifford gates and rotations to verify circuits'
+            f' of more than {max_dense_qudits} qudits.',
+        )
+    utry = circuit.get_unitary()
+    distance = utry.get_distance_from(reference.get_unitary())
+    return VerificationResult(
+        distance <= threshold,
+        'unitary',
+        distance,
+        1 - distance * distance,
+        1 - distance * distance,
+    )
+
+
+def verify_equivalence(
+    circuit: Circuit,
+    reference: Circuit,
+    threshold: float = 1e-4,
+    num_samples: int | None = None,
+    confidence: float = 0.99,
+    truncation: float = 1e-14,
+    max_terms: int = 4096,
+    max_dense_qudits: int = 8,
+    seed: int | None = None,
+    tolerance: float = 1e-10,
+) -> VerificationResult:
+    """
+    Check that `circuit` implements `reference`, up to global phase.
+
+    Args:
+        circuit (Circuit): The circuit to check, such as a compiled one.
+
+        reference (Circuit): The circuit it should implement.
+
+        threshold (float): The largest distance between the circuits
+            that passes. Runs of rotations within it of a Clifford are
+            also taken as that Clifford. (Default: 1e-4)
+
+        num_samples (int | None): The number of random Pauli strings
+            to estimate the fidelity from. If None, the generators are
+            propagated and the distance bound holds with certainty.
+            (Default: None)
+
+        confidence (float): The probability that the bounds estimated
+            from `num_samples` strings hold. (Default: 0.99)
+
+        truncation (float): Propagated terms with coefficients up to
+            this are dropped. (Default: 1e-14)
+
+        max_terms (int): The largest number of terms kept while
+            propagating a Pauli string. (Default: 4096)
+
+        max_dense_qudits (int): The largest circuits simulated if they
+            have gates that are neither Clifford nor rotations.
+            (Default: 8)
+
+        seed (int | None): The seed of the random Pauli strings.
+            (Default: None)
+
+        tolerance (float): Merged rotations within this angle of a
+            multiple of `pi / 4` are rounded to it, which is added to the
+            distance bound, and parameterized gates this close to a
+            Clifford are taken as Clifford. (Default: 1e-10)
+
+    Returns:
+        (VerificationResult): Whether the circuits passed, and how.
+
+    Raises:
+        ValueError: If the circuits have different sizes, or are too
+            large to simulate and have gates that are neither Clifford
+            nor rotations.
+    """
+    if num_samples is not None and num_samples <= 0:
+        raise ValueError(
+            f'Expected positive integer for num_samples, got {num_samples}.',
+        )
+
+    if not 0 < confidence < 1:
+        raise ValueError(f'Expected confidence in (0, 1), got {confidence}.')
+
+    reduction = _reduce(circuit, reference, threshold, tolerance)
+    if reduction is None:
+        return _simulate(circuit, reference, threshold, max_dense_qudits)
+
+    # Cliffords are always checked exactly, on the generators
+    sampled = num_samples is not None and reduction.num_rotations > 0
+    paulis = _paulis(circuit.num_qudits, num_samples, sampled, seed)
+    overlaps = _overlaps(reduction, paulis, truncation, max_terms)
+    return _conclude(reduction, overlaps, sampled, threshold, confidence)
+
+
+class EquivalenceVerificationPass(BasePass):
+    """
+    The EquivalenceVerificationPass class.
+
+    Runs a list of passes, then checks the circuit they produce against
+    the one they were given, see :func:`verify_equivalence`. The Pauli
+    strings are propagated in chunks across the compiler's workers. The
+    :class:`VerificationResult` is stored in the pass data, and a warning
+    is logged if it did not pass. State preparation and state mapping
+    compilations are not checked, as their circuits need not be
+    equivalent.
+    """
+
+    def __init__(
+        self,
+        passes: Iterable[BasePass],
+        threshold: float = 1e-4,
+        num_samples: int | None = None,
+        confidence: float = 0.99,
+        truncation: float = 1e-14,
+        max_terms: int = 4096,
+        max_dense_qudits: int = 8,
+        tolerance: float = 1e-10,
+        chunk_size: int = 16,
+        key: str = 'cliffordt_verification',
+    ) -> None:
+        """
+        Construct an EquivalenceVerificationPass.
+
+        Args:
+            passes (Iterable[BasePass]): The passes to run and verify.
+
+            threshold (float): See :func:`verify_equivalence`.
+                (Default: 1e-4)
+
+            num_samples (int | None): See :func:`verify_equivalence`.
+                (Default: None)
+
+            confidence (float): See :func:`verify_equivalence`.
+                (Default: 0.99)
+
+            truncation (float): See :func:`verify_equivalence`.
+                (Default: 1e-14)
+
+            max_terms (int): See :func:`verify_equivalence`.
+                (Default: 4096)
+
+            max_dense_qudits (int): See :func:`verify_equivalence`. The
+                check is skipped with a warning for larger circuits with
+                other gates. (Default: 8)
+
+            tolerance (float): See :func:`verify_equivalence`.
+                (Default: 1e-10)
+
+            chunk_size (int): The number of Pauli strings propagated by
+                each runtime task. (Default: 16)
+
+            key (str): The pass data key the result is stored under.
+                (Default: 'cliffordt_verification')
+        """
+        self.passes = list(passes)
+        if not all(isinstance(p, BasePass) for p in self.passes):
+            raise TypeError('Expected a sequence of BasePass objects.')
+
+        if num_samples is not None and num_samples <= 0:
+            raise ValueError(
+                'Expected positive integer for num_samples'
+                f', got {num_samples}.',
+            )
+
+        if not 0 < confidence < 1:
+            raise ValueError(
+                f'Expected confidence in (0, 1), got {confidence}.',
+            )
+
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError(
+                f'Expected positive integer for chunk_size, got {chunk_size}.',
+            )
+
+        if not isinstance(key, str):
+            raise TypeError(f'Expected str for key, got {type(key)}.')
+
+        self.threshold = threshold
+        self.num_samples = num_samples
+        self.confidence = confidence
+        self.truncation = truncation
+        self.max_terms = max_terms
+        self.max_dense_qudits = max_dense_qudits
+        self.tolerance = tolerance
+        self.chunk_size = chunk_size
+        self.key = key
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        reference = circuit.copy()
+        for p in self.passes:
+            await p.run(circuit, data)
+
+        if isinstance(data._target, (StateVector, StateSystem)):
+            _logger.debug('Skipping verification of a state compilation.')
+            return
+
+        reduction = _reduce(
+            circuit,
+            reference,
+            self.threshold,
+            self.tolerance,
+        )
+        if reduction is None:
+            try:
+                result = _simulate(
+                    circuit,
+                    reference,
+                    self.threshold,
+                    self.max_dense_qudits,
+                )
+            except ValueError as e:
+                _logger.warning(f'Skipping verification: {e}')
+                return
+        else:
+            sampled = self.num_samples is not None
+            sampled = sampled and reduction.num_rotations > 0
+            paulis = _paulis(
+                circuit.num_qudits,
+                self.num_samples,
+                sampled,
+                data.seed,
+            )
+            chunks = [
+                paulis[i:i + self.chunk_size]
+                for i in range(0, len(paulis), self.chunk_size)
+            ]
+            if len(chunks) <= 1:
+                overlaps = _overlaps(
+                    reduction,
+                    paulis,
+                    self.truncation,
+                    self.max_terms,
+                )
+            else:
+                chunk_overlaps = await get_runtime().map(
+                    _overlaps,
+                    [reduction] * len(chunks),
+                    chunks,
+                    [self.truncation] * len(chunks),
+                    [self.max_terms] * len(chunks),
+                )
+                overlaps = [o for chunk in chunk_overlaps for o in chunk]
+            result = _conclude(
+                reduction,
+                overlaps,
+                sampled,
+                self.threshold,
+                self.confidence,
+            )
+
+        data[self.key] = result
+        message = (
+            f'Verification by {result.method}: distance at most'
+            f' {result.distance_bound:.3g} with confidence'
+            f' {result.confidence:.3g}, {result.num_rotations} rotations'
+            ' left after merging.'
+        )
+        if result.passed:
+            _logger.info(message)
+        else:
+            _logger.warning(f'Failed {message[0].lower()}{message[1:]}')
@@ -0,0 +1,377 @@
+"""
+This module implements windowed compilation of very large circuits.
+
+The circuit is cut at cycle boundaries into windows of about the same
+number of operations, and each window is compiled on its own, so the
+workflow only ever holds one window's intermediate circuits, partitions,
+and block unitaries per task. Windows are compiled a round at a time to
+bound how many are alive at once.
+
+Cutting at cycle boundaries keeps every window a contiguous slice of the
+circuit, so the windows' results compose to a circuit equivalent to the
+input, with the windows' errors combined. Optimizations that would cross
+a cut are recovered by compiling seams: the last cycles of each compiled
+window together with the first cycles of the next, kept only if they
+lower the T count or the gate count.
+
+An error budget is split between the windows in proportion to their
+rotations, so the compiled circuit stays within it as a whole. Error
+accumulated before the circuit is cut is split the same way and counted
+against each window's share. The
+records the workflow leaves in each window's pass data, such as the
+`error_budget` allocation, the running counts of the caches, and the
+`pass_profile` of profiled passes, are merged into the pass data of the
+whole circuit.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any
+from typing import Iterator
+from typing import Sequence
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.machine import MachineModel
+from bqskit.compiler.passdata import PassData
+from bqskit.compiler.workflow import Workflow
+from bqskit.compiler.workflow import WorkflowLike
+from bqskit.ft.cliffordt.budget import _record_consumed
+from bqskit.ft.cliffordt.budget import BudgetedRotationSynthesisPass
+from bqskit.ft.cliffordt.profiling import counter_keys
+from bqskit.ft.cliffordt.resources import estimate_resources
+from bqskit.ft.ftmodel import FaultTolerantModel
+from bqskit.ir.circuit import Circuit
+from bqskit.ir.operation import Operation
+from bqskit.runtime import get_runtime
+
+
+_logger = logging.getLogger(__name__)
+
+_merged_keys = counter_keys + ('error_budget', 'pass_profile')
+"""The pass data keys merged from each window into the whole circuit's."""
+
+
+def split_windows(circuit: Circuit, window_size: int) -> Iterator[Circuit]:
+    """
+    Cut `circuit` into windows at cycle boundaries.
+
+    Args:
+        circuit (Circuit): The circuit to cut.
+
+        window_size (int): Each window ends at the first cycle boundary
+            after it reaches this many operations.
+
+    Yields:
+        (Circuit): The windows in order. Appending them to an empty
+            circuit gives back `circuit`.
+    """
+    window = Circuit(circuit.num_qudits, circuit.radixes)
+    last_cycle = -1
+    for cycle, op in circuit.operations_with_cycles():
+        if cycle != last_cycle and window.num_operations >= window_size:
+            yield window
+            window = Circuit(circuit.num_qudits, circuit.radixes)
+        last_cycle = cycle
+        window.append(Operation(op.gate, op.location, list(op.params)))
+
+    if window.num_operations > 0:
+        yield window
+
+
+def _window_rotations(circuit: Circuit, window_size: int) -> list[int]:
+    """Count the parameterized operations of each of `circuit`'s windows."""
+    counts = [0]
+    num_operations = 0
+    last_cycle = -1
+    for cycle, op in circuit.operations_with_cycles():
+        if cycle != last_cycle and num_operations >= window_size:
+            counts.append(0)
+            num_operations = 0
+        last_cycle = cycle
+        num_operations += 1
+        counts[-1] += op.num_params > 0
+    return counts if num_operations > 0 else []
+
+
+def _split_cycles(
+    circuit: Circuit,
+    cuts: Sequence[int],
+) -> list[Circuit]:
+    """Split `circuit` before each cycle index in `cuts`."""
+    parts = [
+        Circuit(circuit.num_qudits, circuit.radixes)
+        for _ in range(len(cuts) + 1)
+    ]
+    part = 0
+    for cycle, op in circuit.operations_with_cycles():
+        while part < len(cuts) and cycle >= cuts[part]:
+            part += 1
+        parts[part].append(op)
+    return parts
+
+
+def _cost(circuit: Circuit, model: MachineModel) -> tuple[float, int]:
+    """Return the cost of `circuit` on `model` and its gate count."""
+    if isinstance(model, FaultTolerantModel):
+        return model.circuit_cost(circuit), circuit.num_operations
+    return estimate_resources(circuit).t_count, circuit.num_operations
+
+
+async def _run_window(
+    workflow: Workflow,
+    circuit: Circuit,
+    model: MachineModel,
+    seed: int | None,
+    budget_share: float,
+    budget_spent: float,
+) -> tuple[Circuit, float, dict[str, Any]]:
+    """Compile one window, returning it, its error, and its records."""
+    data = PassData(circuit)
+    data.model = model
+    data.seed = seed
+    data[BudgetedRotationSynthesisPass.share_key] = budget_share
+    data[BudgetedRotationSynthesisPass.spent_key] = budget_spent
+    await workflow.run(circuit, data)
+    records = {key: data[key] for key in _merged_keys if key in data}
+    return circuit, data.error, records
+
+
+def _merge_records(
+    data: PassData,
+    part: dict[str, Any],
+    label: dict[str, int],
+) -> None:
+    """Add the counts and profile records of a part to `data`."""
+    for key in counter_keys:
+        if key in part:
+            counts = data.setdefault(key, {})
+            for name, count in part[key].items():
+                counts[name] = counts.get(name, 0) + count
+
+    for record in part.get('pass_profile', []):
+        data.setdefault('pass_profile', []).append({**record, **label})
+
+
+def _merge_error(data: PassData, error: float, part: dict[str, Any]) -> None:
+    """Add the error of a part, and its use of the budget, to `data`."""
+    data.update_error_mul(error)
+    if 'error_budget' not in part:
+        return
+
+    record = data.setdefault('error_budget', {})
+    for key in ['total', 'before_rotations', 'allocated']:
+        record[key] = record.get(key, 0.0) + part['error_budget'][key]
+    for key in ['rounded', 'synthesized']:
+        record[key] = record.get(key, 0) + part['error_budget'][key]
+    epsilon = part['error_budget']['epsilon']
+    record['epsilon'] = min(record.get('epsilon', epsilon), epsilon)
+    _record_consumed(record, float(data.error))
+
+
+class WindowedCompilationPass(BasePass):
+    """
+    The WindowedCompilationPass class.
+
+    Run a workflow on consecutive windows of the circuit instead of the
+    whole circuit, then stitch the results back together. Memory used by
+    the workflow is bounded by the window size and the number of windows
+    compiled at once, rather than by the size of the circuit.
+
+    The workflow must take a circuit to an equivalent circuit; it is
+    given windows as circuits on all of the input's qudits. Each window,
+    and each seam, is given a share of any error budget, stored in its
+    pass data under :attr:`BudgetedRotationSynthesisPass.share_key`: a
+    window's share is in proportion to its parameterized operations, and
+    windows without any, and seams, count as one. The same share of the
+    error in the pass data when the pass starts is stored under
+    :attr:`BudgetedRotationSynthesisPass.spent_key`, to be taken out of
+    the window's budget.
+
+    The windows' errors, `error_budget` records, cache counts, and
+    `pass_profile` records are merged into the pass data of the circuit.
+    Profile records are tagged with the index of their `window` or
+    `seam`, so they can be told apart from those of top-level passes.
+    """
+
+    def __init__(
+        self,
+        loop_body: WorkflowLike,
+        window_size: int = 10000,
+        overlap: int = 4,
+        max_in_flight: int = 8,
+    ) -> None:
+        """
+        Construct a WindowedCompilationPass.
+
+        Args:
+            loop_body (WorkflowLike): The workflow to run on every window.
+
+            window_size (int): The number of operations in each window.
+                Windows are cut at the first cycle boundary after this
+                many operations. (Default: 10000)
+
+            overlap (int): The number of cycles on each side of a cut
+                recompiled as a seam once both windows are compiled. Set
+                to 0 to only compile the windows. (Default: 4)
+
+            max_in_flight (int): The number of windows compiled in
+                parallel in each round. (Default: 8)
+        """
+        if not isinstance(window_size, int) or window_size <= 0:
+            raise ValueError(
+                'Expected positive integer for window_size'
+                f', got {window_size}.',
+            )
+
+        if not isinstance(overlap, int) or overlap < 0:
+            raise ValueError(
+                f'Expected non-negative integer for overlap, got {overlap}.',
+            )
+
+        if not isinstance(max_in_flight, int) or max_in_flight <= 0:
+            raise ValueError(
+                'Expected positive integer for max_in_flight'
+                f', got {max_in_flight}.',
+            )
+
+        self.workflow = Workflow(loop_body)
+        self.window_size = window_size
+        self.overlap = overlap
+        self.max_in_flight = max_in_flight
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        rotations = _window_rotations(circuit, self.window_size)
+        num_seams = max(len(rotations) - 1, 0) if self.overlap > 0 else 0
+        total = sum(max(r, 1) for r in rotations) + num_seams
+        shares = [max(r, 1) / total for r in rotations]
+        spent_key = BudgetedRotationSynthesisPass.spent_key
+        spent = data.error + data.get(spent_key, 0.0)
+
+        result = Circuit(circuit.num_qudits, circuit.radixes)
+        pending: Circuit | None = None
+        num_windows = 0
+        windows = split_windows(circuit, self.window_size)
+        while True:
+            batch = [
+                window for _, window in zip(range(self.max_in_flight), windows)
+            ]
+            if len(batch) == 0:
+                break
+            start = num_windows
+            num_windows += len(batch)
+
+            outputs = await self._compile(
+                batch,
+                shares[start:num_windows],
+                spent,
+                start,
+                data,
+            )
+            if pending is not None:
+                outputs.insert(0, pending)
+            if self.overlap > 0:
+                first_seam = start - 1 if pending is not None else start
+                outputs = await self._compile_seams(
+                    outputs,
+                    first_seam,
+                    1 / total,
+                    spent,
+                    data,
+                )
+
+            for output in outputs[:-1]:
+                result.append_circuit(output, list(range(result.num_qudits)))
+            pending = outputs[-1]
+
+        if pending is not None:
+            result.append_circuit(pending, list(range(result.num_qudits)))
+
+        circuit.become(result, False)
+        _logger.debug(
+            f'Compiled {num_windows} windows of up to'
+            f' {self.window_size} operations.',
+        )
+
+    async def _compile(
+        self,
+        circuits: list[Circuit],
+        shares: list[float],
+        spent: float,
+        start: int,
+        data: PassData,
+    ) -> list[Circuit]:
+        """
+        Run the workflow on `circuits` in parallel, merging their data.
+
+        Each circuit is given its share of the error budget and of the
+        error `spent` before the circuit was cut.
+        """
+        k = len(circuits)
+        results = await get_runtime().map(
+            _run_window,
+            [self.workflow] * k,
+            circuits,
+            [data.model] * k,
+            [data.seed] * k,
+            shares,
+            [spent * share for share in shares],
+        )
+        for i, (_, error, records) in enumerate(results, start):
+            _merge_records(data, records, {'window': i})
+            _merge_error(data, error, records)
+        return [output for output, _, _ in results]
+
+    async def _compile_seams(
+        self,
+        outputs: list[Circuit],
+        first_seam: int,
+        share: float,
+        spent: float,
+        data: PassData,
+    ) -> list[Circuit]:
+        """
+        Recompile the cycles around each cut between `outputs`.
+
+        Returns the outputs' parts between seams, interleaved with the
+        seams. Each seam is its compiled version if that is cheaper. The
+        seams are numbered from `first_seam` in their profile records,
+        and each is given `share` of the error budget and of the error
+        `spent` before the circuit was cut.
+        """
+        # Each output gives at most half its cycles to each neighbor
+        parts = []
+        for i, output in enumerate(outputs):
+            width = min(self.overlap, output.num_cycles // 2)
+            front = width if i > 0 else 0
+            back = output.num_cycles - width
+            back = back if i < len(outputs) - 1 else output.num_cycles
+            parts.append(_split_cycles(output, [front, back]))
+
+        seams = []
+        for left, right in zip(parts[:-1], parts[1:]):
+            seam = left[2].copy()
+            seam.append_circuit(right[0], list(range(seam.num_qudits)))
+            seams.append(seam)
+
+        todo = [i for i, seam in enumerate(seams) if seam.num_operations > 0]
+        if len(todo) > 0:
+            compiled = await get_runtime().map(
+                _run_window,
+                [self.workflow] * len(todo),
+                [seams[i].copy() for i in todo],
+                [data.model] * len(todo),
+                [data.seed] * len(todo),
+                [share] * len(todo),
+                [spent * share] * len(todo),
+            )
+            for i, (output, error, records) in zip(todo, compiled):
+                _merge_records(data, records, {'seam': first_seam + i})
+                if _cost(output, data.model) < _cost(seams[i], data.model):
+                    _merge_error(data, error, records)
+                    seams[i] = output
+
+        stitched = [parts[0][1]]
+        for seam, part in zip(seams, parts[1:]):
+            stitched.extend([seam, part[1]])
+        return stitched
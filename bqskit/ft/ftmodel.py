@@ -1,10 +1,20 @@
 """This module implements a generic FaultTolerantModel class."""
 from __future__ import annotations
 
+from typing import Mapping
 from typing import Sequence
 
 from bqskit.compiler.machine import MachineModel
+from bqskit.ir.circuit import Circuit
 from bqskit.ir.gate import Gate
+from bqskit.ir.gates.circuitgate import CircuitGate
+
+
+clifford_cost = 1.0
+"""The default cost of a Clifford gate, per qudit it acts on."""
+
+non_clifford_cost = 50.0
+"""The default cost of a non-Clifford gate, such as T, in a surface code."""
 
 
 class FaultTolerantModel(MachineModel):
@@ -15,6 +25,7 @@ class FaultTolerantModel(MachineModel):
         clifford_gates: Sequence[Gate],
         non_clifford_gates: Sequence[Gate],
         radixes: Sequence[int] = [],
+        gate_costs: Mapping[Gate, float] = {},
     ) -> None:
         """
         Construct a FaultTolerantModel of an error corrected machine.
@@ -30,6 +41,41 @@ class FaultTolerantModel(MachineModel):
 
             radixes (Sequence[int]): The radixes of the qudits. If empty,
                 qudits are assumed to be qubits. (Default: [])
+
+            gate_costs (Mapping[Gate, float]): The cost of executing each
+                gate, overriding the defaults: `clifford_cost` per qudit
+                for Clifford gates and `non_clifford_cost` for the others.
+                (Default: {})
         """
         gate_set = list(clifford_gates) + list(non_clifford_gates)
         super().__init__(num_qudits, gate_set=gate_set, radixes=radixes)
+
+        self.gate_costs: dict[Gate, float] = {}
+        for gate in clifford_gates:
+            self.gate_costs[gate] = clifford_cost * gate.num_qudits
+        for gate in non_clifford_gates:
+            self.gate_costs[gate] = non_clifford_cost
+        self.gate_costs.update(gate_costs)
+
+        self.rotation_cost = non_clifford_cost
+        """The cost of a gate outside the model, per parameter."""
+
+    def gate_cost(self, gate: Gate) -> float:
+        """
+        Return the cost of `gate` on this machine.
+
+        Gates outside the model are costed as the rotations they will be
+        approximated by, one per parameter and at least one.
+        """
+        if gate in self.gate_costs:
+            return self.gate_costs[gate]
+        if isinstance(gate, CircuitGate):
+            return self.circuit_cost(gate._circuit)
+        return self.rotation_cost * max(gate.num_params, 1)
+
+    def circuit_cost(self, circuit: Circuit) -> float:
+        """Return the total cost of the gates in `circuit`."""
+        return sum(
+            self.gate_cost(gate) * circuit.count(gate)
+            for gate in circuit.gate_set
+        )
@@ -1,7 +1,18 @@
 from __future__ import annotations
 
+import hashlib
+import itertools
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
 from functools import partial
+from typing import Any
 from typing import Callable
+from typing import Iterable
+from typing import Sequence
+
+import numpy as np
 
 from bqskit.compiler.basepass import BasePass
 from bqskit.compiler.passdata import PassData
@@ -10,6 +21,17 @@ from bqskit.ir.circuit import CircuitGate
 from bqskit.ir.circuit import Gate
 from bqskit.ir.operation import Operation
 from bqskit.qis.unitary import UnitaryMatrix
+from bqskit.qis.unitary.unitarymatrix import UnitaryLike
+
+
+_rule_sets: OrderedDict[bytes, ReplacementRuleSet] = OrderedDict()
+"""The most recently pickled or unpickled rule sets, by digest."""
+
+_max_rule_sets = 16
+"""The number of rule sets kept in `_rule_sets`."""
+
+_rule_set_directory = os.path.join(tempfile.gettempdir(), 'bqskit-rule-sets')
+"""The directory the rules of pickled rule sets are shared through."""
 
 
 def construct_unitary_match_rule(
@@ -48,21 +70,375 @@ class ReplacementRule(BasePass):
             replacement (Circuit | CircuitGate | Gate): The Circuit or Gate
                 to replace the partition with. The width of the replacement
                 must match the partition's width.
+
+        Note:
+            The replacement is stored as a tuple of operations. Matching
+            partitions are rebuilt from it, sharing the operations
+            without parameters instead of copying them.
         """
         self.indicator = indicator
-        if isinstance(replacement, Gate):
-            num_qudits = replacement.num_qudits
-            self.replacement = Circuit(num_qudits, replacement.radixes)
-            self.replacement.append_gate(
-                replacement, [_ for _ in range(num_qudits)],
-            )
-            self.replacement.unfold_all()
-        else:
-            self.replacement = replacement
+        self.replacement = replacement
+
+    @property
+    def replacement(self) -> Circuit:
+        """A new circuit holding the replacement."""
+        return _build(self.operations, self.radixes)
+
+    @replacement.setter
+    def replacement(self, replacement: Circuit | CircuitGate | Gate) -> None:
+        circuit = _as_circuit(replacement)
+        self.radixes = circuit.radixes
+        self.operations = tuple(circuit)
 
     async def run(self, circuit: Circuit, data: PassData) -> None:
-        if circuit.num_qudits != self.replacement.num_qudits:
+        if circuit.radixes != self.radixes:
             return
         replace = self.indicator(circuit)
         if replace:
-            circuit.become(self.replacement, deepcopy=True)
+            _become(circuit, self.operations)
+
+
+class ReplacementRuleSet(BasePass):
+
+    def __init__(
+        self,
+        rules: Iterable[
+            tuple[UnitaryLike | Gate, Circuit | CircuitGate | Gate]
+        ],
+        threshold: float = 1e-8,
+        resolution: float = 1e-6,
+        max_probes: int = 64,
+    ) -> None:
+        """
+        Replace a partition with the first rule whose unitary it matches.
+
+        Unlike a sequence of `ReplacementRule` passes, the partition's
+        unitary is computed once and looked up in a hashed index, so the
+        cost per partition does not grow with the number of rules.
+
+        Args:
+            rules (Iterable[tuple[UnitaryLike | Gate, Circuit | CircuitGate |
+                Gate]]): Pairs of (unitary, replacement). A constant Gate
+                may be given in place of its unitary. Rules are matched
+                up to global phase and may act on any number of qudits.
+                If several rules share a unitary, the first one wins.
+
+            threshold (float): The maximum distance between a partition's
+                unitary and a rule's unitary to apply the rule.
+                (Default: 1e-8)
+
+            resolution (float): The grid spacing used to quantize
+                unitaries when building index keys. Must be larger than
+                `threshold`. (Default: 1e-6)
+
+            max_probes (int): The most magnitude cells a lookup probes
+                for a unitary close to cell boundaries. Past it, the
+                lookup compares against every rule. (Default: 64)
+
+        Raises:
+            ValueError: If `resolution` is not larger than `threshold`.
+
+            ValueError: If `max_probes` is not positive.
+
+        Note:
+            A unitary within `threshold` of a rule may quantize to a
+            neighboring cell, or pick a different pivot, than the rule
+            did. When its own cell has no match, the lookup falls back
+            to a second index keyed on the magnitudes of the entries,
+            which depend on neither, and probes every cell a rule within
+            `threshold` could be in.
+
+            Replacements are applied without copying, as in
+            :class:`ReplacementRule`. The rules are serialized once, when
+            the set is built, and written to a file named by a digest of
+            them the first time the set is pickled. A rule set is pickled
+            as that digest alone, so tasks carry it whatever the number
+            of rules. Unpickling returns the rule set the process last
+            used with that digest, or loads it from the file, so each
+            worker reads and indexes the rules once. Workers on other
+            hosts need the directory of these files on a shared file
+            system.
+        """
+        if resolution <= threshold:
+            raise ValueError(
+                'Expected resolution to be larger than threshold'
+                f', got {resolution} <= {threshold}.',
+            )
+
+        if max_probes <= 0:
+            raise ValueError(
+                f'Expected max_probes to be positive, got {max_probes}.',
+            )
+
+        self.threshold = threshold
+        self.resolution = resolution
+        self.max_probes = max_probes
+        self.rules: list[tuple[UnitaryMatrix, tuple[Operation, ...]]] = []
+        self.index: dict[bytes, list[int]] = {}
+        self.magnitude_index: dict[bytes, list[int]] = {}
+        for target, replacement in rules:
+            if isinstance(target, Gate):
+                target = target.get_unitary()
+            target = UnitaryMatrix(target)
+            replacement = _as_circuit(replacement)
+            if replacement.radixes != target.radixes:
+                raise ValueError(
+                    'Expected replacement radixes to match the rule'
+                    f' unitary, got {replacement.radixes} and'
+                    f' {target.radixes}.',
+                )
+            key = unitary_fingerprint(target, resolution)
+            self.index.setdefault(key, []).append(len(self.rules))
+            key = _magnitude_key(target, resolution)
+            self.magnitude_index.setdefault(key, []).append(len(self.rules))
+            self.rules.append((target, tuple(replacement)))
+
+        self.payload = pickle.dumps(
+            [(target.numpy, ops) for target, ops in self.rules],
+        )
+        self.digest = _digest(self.payload, threshold, resolution, max_probes)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Pickle the digest of the rules, see :func:`_load_rule_set`."""
+        _remember(self.digest, self)
+        _share(self.digest, self.payload)
+        args = (self.digest, self.threshold, self.resolution, self.max_probes)
+        return (_load_rule_set, args)
+
+    def lookup_operations(
+        self,
+        utry: UnitaryMatrix,
+    ) -> tuple[Operation, ...] | None:
+        """Return the replacement for `utry`, or None if no rule matches."""
+        key = unitary_fingerprint(utry, self.resolution)
+        for i in self.index.get(key, []):
+            target, replacement = self.rules[i]
+            if _distance(utry, target) < self.threshold:
+                return replacement
+
+        # The entries of a rule within the threshold are, after aligning
+        # the phases, within this distance of the entries of `utry`
+        margin = np.sqrt(2 * utry.shape[0]) * self.threshold
+        keys = _magnitude_probes(
+            utry,
+            self.resolution,
+            margin,
+            self.max_probes,
+        )
+        if keys is None:
+            candidates: Iterable[int] = range(len(self.rules))
+        else:
+            index = self.magnitude_index
+            candidates = sorted({i for k in keys for i in index.get(k, [])})
+        for i in candidates:
+            target, replacement = self.rules[i]
+            if target.shape != utry.shape:
+                continue
+            if _distance(utry, target) < self.threshold:
+                return replacement
+        return None
+
+    def lookup(self, utry: UnitaryMatrix) -> Circuit | None:
+        """Return a new circuit holding the replacement for `utry`."""
+        replacement = self.lookup_operations(utry)
+        if replacement is None:
+            return None
+        return _build(replacement, utry.radixes)
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        """Perform the pass's operation, see :class:`BasePass` for more."""
+        replacement = self.lookup_operations(circuit.get_unitary())
+        if replacement is not None:
+            _become(circuit, replacement)
+
+
+def _load_rule_set(
+    digest: bytes,
+    threshold: float,
+    resolution: float,
+    max_probes: int,
+) -> ReplacementRuleSet:
+    """Return the remembered rule set with `digest`, or load it."""
+    rule_set = _rule_sets.get(digest)
+    if rule_set is None:
+        path = _rule_set_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError as e:
+            raise RuntimeError(
+                f'No rules at {path}; workers on another host need'
+                ' the directory on a shared file system.',
+            ) from e
+        # The file is trusted only if it is what the digest was made from
+        if _digest(payload, threshold, resolution, max_probes) != digest:
+            raise RuntimeError(f'The rules at {path} do not match.')
+        rules = pickle.loads(payload)
+        rule_set = ReplacementRuleSet(
+            [(target, _build(ops, UnitaryMatrix(target).radixes))
+             for target, ops in rules],
+            threshold,
+            resolution,
+            max_probes,
+        )
+    _remember(digest, rule_set)
+    return rule_set
+
+
+def _digest(
+    payload: bytes,
+    threshold: float,
+    resolution: float,
+    max_probes: int,
+) -> bytes:
+    """Return the digest of a rule set with serialized rules `payload`."""
+    return hashlib.blake2b(
+        pickle.dumps((threshold, resolution, max_probes, payload)),
+        digest_size=16,
+    ).digest()
+
+
+def _rule_set_path(digest: bytes) -> str:
+    """Return the file the rules with `digest` are shared through."""
+    return os.path.join(_rule_set_directory, f'{digest.hex()}.rules')
+
+
+def _share(digest: bytes, payload: bytes) -> None:
+    """Write `payload` to the file for `digest`, unless it exists."""
+    path = _rule_set_path(digest)
+    if os.path.exists(path):
+        return
+    os.makedirs(_rule_set_directory, 0o700, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=_rule_set_directory, prefix='.rules')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def _remember(digest: bytes, rule_set: ReplacementRuleSet) -> None:
+    """Record `rule_set` as the most recently used one with `digest`."""
+    _rule_sets[digest] = rule_set
+    _rule_sets.move_to_end(digest)
+    while len(_rule_sets) > _max_rule_sets:
+        _rule_sets.popitem(last=False)
+
+
+def unitary_fingerprint(utry: UnitaryLike, resolution: float = 1e-6) -> bytes:
+    """
+    Return a global-phase-invariant hash key for `utry`.
+
+    The pivot is the first entry whose magnitude is within
+    `100 * resolution` of the largest one. The matrix is rotated so the
+    pivot is real and positive, then quantized onto a grid of spacing
+    `resolution`. Unitaries within a small distance of each other map
+    to the same key unless an entry falls on a grid boundary.
+    """
+    utry = np.asarray(utry, dtype=np.complex128)
+    flat = utry.ravel()
+    mags = np.abs(flat)
+    pivot = np.flatnonzero(mags >= mags.max() - 100 * resolution)[0]
+    canonical = flat * (np.conj(flat[pivot]) / mags[pivot])
+    grid = np.round(canonical.view(np.float64) / resolution) + 0.0
+    shape = np.array(utry.shape, dtype=np.int64)
+    return shape.tobytes() + grid.astype(np.int64).tobytes()
+
+
+def _magnitude_key(utry: UnitaryLike, resolution: float) -> bytes:
+    """
+    Return a phase- and pivot-independent hash key for `utry`.
+
+    The key is the shape of `utry` and the magnitudes of its entries,
+    quantized onto a grid of spacing `resolution`.
+    """
+    utry = np.asarray(utry, dtype=np.complex128)
+    grid = np.round(np.abs(utry.ravel()) / resolution)
+    shape = np.array(utry.shape, dtype=np.int64)
+    return shape.tobytes() + grid.astype(np.int64).tobytes()
+
+
+def _magnitude_probes(
+    utry: UnitaryLike,
+    resolution: float,
+    margin: float,
+    max_probes: int,
+) -> list[bytes] | None:
+    """
+    Return the magnitude key of every unitary close to `utry`.
+
+    These are the keys, see :func:`_magnitude_key`, of every unitary
+    whose entry magnitudes are within `margin` of those of `utry`, or
+    None if there are more than `max_probes` of them.
+    """
+    utry = np.asarray(utry, dtype=np.complex128)
+    scaled = np.abs(utry.ravel()) / resolution
+    grid = np.round(scaled)
+    offset = scaled - grid
+    near = np.flatnonzero(np.abs(offset) > 0.5 - margin / resolution)
+    if 1 << len(near) > max_probes:
+        return None
+    shape = np.array(utry.shape, dtype=np.int64).tobytes()
+    steps = np.sign(offset[near])
+    keys = []
+    for moves in itertools.product([0, 1], repeat=len(near)):
+        probe = grid.copy()
+        probe[near] += steps * moves
+        keys.append(shape + probe.astype(np.int64).tobytes())
+    return keys
+
+
+def _distance(a: UnitaryLike, b: UnitaryLike) -> float:
+    """
+    Return the same distance as `UnitaryMatrix.get_distance_from`.
+
+    Computing `1 - |Tr(A^dagger B)| / N` from the Frobenius norm of the
+    phase-aligned difference avoids the cancellation that puts a floor of
+    about 1e-8 on the direct formula.
+    """
+    a = np.asarray(a)
+    b = np.asarray(b)
+    overlap = np.vdot(b, a)
+    phase = overlap / abs(overlap) if abs(overlap) > 0 else 1.0
+    gap = np.sum(np.abs(a - phase * b) ** 2) / (2 * a.shape[0])
+    return float(np.sqrt(max(gap * (2 - gap), 0.0)))
+
+
+def _as_circuit(replacement: Circuit | CircuitGate | Gate) -> Circuit:
+    """Wrap a Gate into an unfolded circuit."""
+    if isinstance(replacement, Gate):
+        num_qudits = replacement.num_qudits
+        circuit = Circuit(num_qudits, replacement.radixes)
+        circuit.append_gate(replacement, [_ for _ in range(num_qudits)])
+        circuit.unfold_all()
+        return circuit
+    return replacement
+
+
+def _build(operations: Sequence[Operation], radixes: Sequence[int]) -> Circuit:
+    """Build a new circuit from `operations`."""
+    circuit = Circuit(len(radixes), radixes)
+    _extend(circuit, operations)
+    return circuit
+
+
+def _become(circuit: Circuit, operations: Sequence[Operation]) -> None:
+    """Make `circuit` hold exactly `operations`."""
+    circuit.clear()
+    _extend(circuit, operations)
+
+
+def _extend(circuit: Circuit, operations: Sequence[Operation]) -> None:
+    """
+    Append `operations` to `circuit`, sharing the parameter-free ones.
+
+    Circuits update parameters in place, so only operations without any
+    are safe to share between circuits; the rest are copied. This avoids
+    the deep copy of `Circuit.become` for constant replacements.
+    """
+    for op in operations:
+        if op.num_params != 0:
+            op = Operation(op.gate, op.location, list(op.params))
+        circuit.append(op)
@@ -11,6 +11,7 @@ setup(
     author_email='mtweiden@berkeley.edu',
     version='0.1.0',
     packages=find_namespace_packages(exclude=['tests']),
+    package_data={'bqskit.ft.cliffordt': ['*.npz']},
     install_requires=['bqskit', 'numpy', 'scipy'],
     python_requires='>=3.8, <4.0',
 )
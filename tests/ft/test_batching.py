@@ -0,0 +1,91 @@
+"""This file tests the BatchedSingleQubitPass."""
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.batching import BatchedSingleQubitPass
+from bqskit.ft.rules.replacement import ReplacementRuleSet
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import U3Gate
+from bqskit.passes import GroupSingleQuditGatePass
+from bqskit.passes import UnfoldPass
+from bqskit.passes import ZXZXZDecomposition
+
+
+def run(batched: BatchedSingleQubitPass, circuit: Circuit) -> PassData:
+    data = PassData(circuit)
+    asyncio.run(batched.run(circuit, data))
+    return data
+
+
+class TestBatchedSingleQubitPass:
+
+    def test_replaces_matching_blocks(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(RZGate(), 0, [np.pi / 2])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(RZGate(), 1, [np.pi / 2])
+        circuit.append_gate(RZGate(), 0, [0.3])
+        target = circuit.get_unitary()
+
+        rules = ReplacementRuleSet([(SGate(), SGate())])
+        run(BatchedSingleQubitPass(rules), circuit)
+        circuit.unfold_all()
+        assert circuit.count(SGate()) == 2
+        assert circuit.count(RZGate()) == 1
+        assert circuit.get_unitary().get_distance_from(target) < 1e-7
+
+    def test_error(self) -> None:
+        circuit = Circuit(2)
+        for q in [0, 1, 0]:
+            circuit.append_gate(RZGate(), q, [np.pi / 2 + 1e-5])
+            circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(RZGate(), 1, [np.pi / 2])
+        # An RZ off by an angle d is sin(d / 2) from the gate
+        distance = np.sin(0.5e-5)
+
+        rules = ReplacementRuleSet(
+            [(SGate(), SGate())],
+            threshold=1e-4,
+            resolution=1e-3,
+        )
+        data = run(BatchedSingleQubitPass(rules), circuit)
+        assert data.error == pytest.approx(1 - (1 - distance) ** 3)
+
+    def test_filter_and_unchanged_blocks(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(U3Gate(), 0, [0.1, 0.2, 0.3])
+        batched = BatchedSingleQubitPass(
+            ReplacementRuleSet([(SGate(), SGate())]),
+            collection_filter=lambda op: op.num_params > 0,
+        )
+        run(batched, circuit)
+        assert [op.gate for op in circuit] == [HGate(), U3Gate()]
+
+    def test_chunks_match_unbatched(self) -> None:
+        circuit = Circuit(3)
+        for i in range(20):
+            for q in range(3):
+                circuit.append_gate(U3Gate(), q, [0.1 * (i % 4), q, 0.5])
+            circuit.append_gate(CNOTGate(), (i % 3, (i + 1) % 3))
+        workflow = [
+            GroupSingleQuditGatePass(),
+            BatchedSingleQubitPass(ZXZXZDecomposition(), chunk_size=3),
+            UnfoldPass(),
+        ]
+        with Compiler(num_workers=2) as compiler:
+            result = compiler.compile(circuit, workflow)
+        assert result.count(U3Gate()) == 0
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
@@ -0,0 +1,111 @@
+"""This file tests the CachedSynthesisPass."""
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.blockcache import block_cache
+from bqskit.ft.cliffordt.blockcache import block_fingerprint
+from bqskit.ft.cliffordt.blockcache import CachedSynthesisPass
+from bqskit.ft.cliffordt.blockcache import ForEachUniqueBlockPass
+from bqskit.ft.cliffordt.clifford import CliffordSynthesisPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import SGate
+from bqskit.passes import QuickPartitioner
+from bqskit.passes import UnfoldPass
+from bqskit.qis import UnitaryMatrix
+
+
+def permuted(utry: np.ndarray, order: list[int]) -> np.ndarray:
+    num_qudits = len(order)
+    tensor = utry.reshape([2] * 2 * num_qudits)
+    axes = order + [num_qudits + q for q in order]
+    return tensor.transpose(axes).reshape(utry.shape)
+
+
+def run(synthesis: CachedSynthesisPass, circuit: Circuit) -> PassData:
+    data = PassData(circuit)
+    asyncio.run(synthesis.run(circuit, data))
+    return data
+
+
+class TestBlockFingerprint:
+
+    def test_phase_and_order_invariant(self) -> None:
+        utry = UnitaryMatrix.random(3).numpy
+        key, order = block_fingerprint(utry, [2, 2, 2])
+        other = permuted(utry, [2, 0, 1]) * np.exp(1.3j)
+        other_key, other_order = block_fingerprint(other, [2, 2, 2])
+        assert key == other_key
+        assert np.allclose(
+            permuted(utry, list(order)) / permuted(other, list(other_order)),
+            np.exp(-1.3j),
+        )
+
+    def test_distinct_unitaries(self) -> None:
+        first = block_fingerprint(UnitaryMatrix.random(2), [2, 2])[0]
+        second = block_fingerprint(UnitaryMatrix.random(2), [2, 2])[0]
+        assert first != second
+
+
+class TestCachedSynthesisPass:
+
+    def test_permuted_block_hits(self) -> None:
+        block_cache.clear()
+        synthesis = CachedSynthesisPass(CliffordSynthesisPass())
+        circuit = Circuit(3)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 2))
+        circuit.append_gate(SGate(), 1)
+        circuit.append_gate(CNOTGate(), (1, 2))
+        permuted_circuit = Circuit(3)
+        for op in circuit:
+            location = [(q + 1) % 3 for q in op.location]
+            permuted_circuit.append_gate(op.gate, location)
+
+        for block, hits in [(circuit, 0), (permuted_circuit, 1)]:
+            target = block.get_unitary()
+            data = run(synthesis, block)
+            assert data['block_synthesis_cache']['hits'] == hits
+            assert block.get_unitary().get_distance_from(target) < 1e-7
+
+        assert block_cache.hits == 1
+        assert block_cache.misses == 1
+
+    def test_different_blocks_miss(self) -> None:
+        block_cache.clear()
+        synthesis = CachedSynthesisPass(CliffordSynthesisPass())
+        for gate in [HGate(), SGate()]:
+            circuit = Circuit(1)
+            circuit.append_gate(gate, 0)
+            data = run(synthesis, circuit)
+            assert data['block_synthesis_cache']['misses'] == 1
+        assert len(block_cache) == 2
+
+
+class TestForEachUniqueBlockPass:
+
+    def test_repeated_blocks_run_once(self) -> None:
+        circuit = Circuit(4)
+        for _ in range(3):
+            for a, b in [(0, 1), (3, 2)]:
+                circuit.append_gate(HGate(), a)
+                circuit.append_gate(CNOTGate(), (a, b))
+                circuit.append_gate(SGate(), b)
+                circuit.append_gate(CNOTGate(), (b, a))
+        workflow = [
+            QuickPartitioner(2),
+            ForEachUniqueBlockPass(CliffordSynthesisPass()),
+            UnfoldPass(),
+        ]
+        with Compiler() as compiler:
+            result, data = compiler.compile(circuit, workflow, True)
+        assert data['block_synthesis_cache'] == {'hits': 1, 'misses': 0}
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
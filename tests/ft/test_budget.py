@@ -0,0 +1,154 @@
+"""This file tests the allocation of error budgets to rotations."""
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.compiler.registry import _compile_circuit_registry
+from bqskit.ft.cliffordt.budget import allocate_rotation_budget
+from bqskit.ft.cliffordt.budget import BudgetedRotationSynthesisPass
+from bqskit.ft.cliffordt.budget import MeasureErrorPass
+from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
+from bqskit.ft.cliffordt.gridsynth import RZtoCliffordTSynthesisPass
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.passes import SetModelPass
+from bqskit.passes import UnfoldPass
+
+
+def rotations(angles: np.ndarray) -> Circuit:
+    circuit = Circuit(1)
+    for angle in angles:
+        circuit.append_gate(RZGate(), 0, [angle])
+        circuit.append_gate(HGate(), 0)
+    return circuit
+
+
+def t_count(circuit: Circuit) -> int:
+    circuit.unfold_all()
+    return circuit.count(TGate()) + circuit.count(TdgGate())
+
+
+class TestAllocateRotationBudget:
+
+    def test_rounds_nearly_discrete_rotations(self) -> None:
+        angles = [np.pi / 4 + 1e-7, 0.3, np.pi / 2, 1.1]
+        rounded, epsilon = allocate_rotation_budget(angles, 1e-4)
+        assert rounded.tolist() == [True, False, True, False]
+        assert np.isclose(epsilon, (1e-4 - np.sin(5e-8)) / 2)
+
+    def test_rounds_everything_within_budget(self) -> None:
+        rounded, epsilon = allocate_rotation_budget([0.01, np.pi], 0.1)
+        assert rounded.all()
+
+
+class TestBudgetedRotationSynthesisPass:
+
+    def test_fewer_t_gates_within_budget(self) -> None:
+        rng = np.random.default_rng(0)
+        angles = np.concatenate([
+            rng.uniform(0, 2 * np.pi, 10),
+            np.pi / 4 * rng.integers(0, 8, 10) + rng.normal(0, 1e-5, 10),
+        ])
+        budget = 1e-3
+        model = CliffordTModel(1)
+
+        circuit = rotations(angles)
+        data = PassData(circuit)
+        data.model = model
+        asyncio.run(BudgetedRotationSynthesisPass(budget).run(circuit, data))
+        assert RZGate() not in circuit.gate_set
+        assert data.error <= budget
+        record = data['error_budget']
+        assert record['rounded'] >= 10
+        assert record['consumed'] == data.error
+        assert not record['exceeded']
+        assert record['overrun'] == 0
+        assert circuit.get_unitary().get_distance_from(
+            rotations(angles).get_unitary(),
+        ) <= budget
+
+        uniform = rotations(angles)
+        uniform_data = PassData(uniform)
+        uniform_data.model = model
+        synthesis = RZtoCliffordTSynthesisPass(budget / len(angles))
+        asyncio.run(synthesis.run(uniform, uniform_data))
+        assert t_count(circuit) < t_count(uniform)
+
+    def test_records_overrun(self) -> None:
+        circuit = rotations(np.array([0.3, 1.1]))
+        data = PassData(circuit)
+        data.model = CliffordTModel(1)
+        data.error = 2e-4
+        asyncio.run(BudgetedRotationSynthesisPass(1e-4).run(circuit, data))
+        assert RZGate() not in circuit.gate_set
+        record = data['error_budget']
+        assert record['allocated'] == 1e-6
+        assert record['exceeded']
+        assert record['overrun'] == record['consumed'] - 1e-4
+        assert record['overrun'] >= 1e-4
+
+    def test_takes_out_earlier_error(self) -> None:
+        circuit = rotations(np.array([0.3, 1.1]))
+        data = PassData(circuit)
+        data.model = CliffordTModel(1)
+        data.error = 1e-5
+        data[BudgetedRotationSynthesisPass.spent_key] = 2e-5
+        asyncio.run(BudgetedRotationSynthesisPass(1e-4).run(circuit, data))
+        record = data['error_budget']
+        assert record['allocated'] == pytest.approx(7e-5)
+        assert record['consumed'] == pytest.approx(data.error + 2e-5)
+        assert not record['exceeded']
+
+    def test_budgeted_workflow(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(RZGate(), 1, [0.4])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        model = CliffordTModel(
+            2,
+            options=CliffordTOptions(error_budget=1e-4),
+        )
+        registered = _compile_circuit_registry[model][1]
+        workflow = [SetModelPass(model), *registered]
+        with Compiler(num_workers=1) as compiler:
+            result, data = compiler.compile(circuit, workflow, True)
+        assert data['error_budget']['total'] == 1e-4
+        assert data.error <= 1e-4
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) <= 1e-4
+
+
+class ShiftPass(BasePass):
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        circuit.set_params([p + 2e-9 for p in circuit.params])
+
+
+class TestMeasureErrorPass:
+
+    def test_measures_error(self) -> None:
+        circuit = rotations(np.array([0.3]))
+        data = PassData(circuit)
+        data.error = 1e-3
+        asyncio.run(MeasureErrorPass(ShiftPass()).run(circuit, data))
+        expected = 1 - (1 - 1e-3) * (1 - np.sin(1e-9))
+        assert data.error == pytest.approx(expected, rel=1e-12)
+
+    def test_unchanged_circuit_has_no_error(self) -> None:
+        circuit = rotations(np.array([np.pi / 4]))
+        data = PassData(circuit)
+        asyncio.run(MeasureErrorPass(UnfoldPass()).run(circuit, data))
+        assert data.error == 0
@@ -0,0 +1,246 @@
+"""This file tests the checkpointing of Clifford+T workflows."""
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt import checkpoint
+from bqskit.ft.cliffordt.blockcache import CachedSynthesisPass
+from bqskit.ft.cliffordt.checkpoint import CheckpointPass
+from bqskit.ft.cliffordt.checkpoint import resume_compilation
+from bqskit.ft.cliffordt.clifford import CliffordSynthesisPass
+from bqskit.ft.cliffordt.defaultworkflow import build_circuit_workflow
+from bqskit.ft.cliffordt.defaultworkflow import normal_form_replace
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.rounding import RoundToDiscreteZPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.passes import UnfoldPass
+
+
+class RecordPass(BasePass):
+    """Append the stage to the file `log`, crashing at stage 2 if asked."""
+
+    def __init__(self, stage: int, log: str) -> None:
+        self.stage = stage
+        self.log = log
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        if self.stage == 2 and os.path.exists(self.log + '.crash'):
+            raise RuntimeError('Crashed.')
+        with open(self.log, 'a') as f:
+            f.write(f'{self.stage}\n')
+        data.setdefault('stages_run', []).append(self.stage)
+
+
+class DirectCompiler:
+    """Run workflows in this process, as a Compiler runs them."""
+
+    def compile(
+        self,
+        circuit: Circuit,
+        workflow: BasePass,
+        request_data: bool = False,
+        data: PassData | None = None,
+    ) -> Circuit | tuple[Circuit, PassData]:
+        pass_data = PassData(circuit)
+        if data is not None:
+            pass_data.update(data)
+        asyncio.run(workflow.run(circuit, pass_data))
+        return (circuit, pass_data) if request_data else circuit
+
+
+def rotations() -> Circuit:
+    circuit = Circuit(2)
+    circuit.append_gate(RZGate(), 0, [np.pi / 4])
+    circuit.append_gate(CNOTGate(), (0, 1))
+    circuit.append_gate(RZGate(), 1, [np.pi / 2])
+    circuit.append_gate(RZGate(), 0, [0.3])
+    return circuit
+
+
+def stages(log: str, epsilon: float = 1e-8) -> list[BasePass]:
+    return [
+        normal_form_replace(epsilon),
+        RecordPass(0, log),
+        UnfoldPass(),
+        RecordPass(1, log),
+        RoundToDiscreteZPass(epsilon),
+        RecordPass(2, log),
+    ]
+
+
+def run(workflow: BasePass, circuit: Circuit) -> PassData:
+    data = PassData(circuit)
+    asyncio.run(workflow.run(circuit, data))
+    return data
+
+
+def crash(workflow: BasePass, circuit: Circuit, log: str) -> None:
+    """Run `workflow` on `circuit`, crashing at stage 2."""
+    Path(log + '.crash').touch()
+    try:
+        with pytest.raises(RuntimeError):
+            run(workflow, circuit)
+    finally:
+        os.remove(log + '.crash')
+
+
+def ran(log: str) -> list[int]:
+    """Return the stages run since the last call, and forget them."""
+    if not os.path.exists(log):
+        return []
+    with open(log) as f:
+        stages_run = [int(line) for line in f]
+    os.remove(log)
+    return stages_run
+
+
+class TestCheckpointPass:
+
+    def test_resume_after_crash(self, tmp_path: Path) -> None:
+        log = str(tmp_path / 'runs')
+        directory = str(tmp_path / 'checkpoint')
+        expected = rotations()
+        run(CheckpointPass(stages(log), str(tmp_path / 'whole')), expected)
+
+        crash(CheckpointPass(stages(log), directory), rotations(), log)
+        saved = checkpoint._read(next(Path(directory).glob('*.stage.ckpt')))
+        assert saved['stage'] == 4
+
+        ran(log)
+        circuit = rotations()
+        data = run(CheckpointPass(stages(log), directory), circuit)
+        assert ran(log) == [2]
+        assert data['stages_run'] == [0, 1, 2]
+        assert circuit == expected
+
+        # Finished compilations are not run again
+        circuit = rotations()
+        data = run(CheckpointPass(stages(log), directory), circuit)
+        assert ran(log) == []
+        assert data['stages_run'] == [0, 1, 2]
+        assert circuit == expected
+
+    def test_chosen_stages(self, tmp_path: Path) -> None:
+        log = str(tmp_path / 'runs')
+        directory = str(tmp_path / 'checkpoint')
+        crash(CheckpointPass(stages(log), directory, [1]), rotations(), log)
+        saved = checkpoint._read(next(Path(directory).glob('*.stage.ckpt')))
+        assert saved['stage'] == 1
+
+        ran(log)
+        data = run(CheckpointPass(stages(log), directory, [1]), rotations())
+        assert ran(log) == [1, 2]
+        assert data['stages_run'] == [0, 1, 2]
+
+    def test_different_inputs(self, tmp_path: Path) -> None:
+        log = str(tmp_path / 'runs')
+        directory = str(tmp_path / 'checkpoint')
+        run(CheckpointPass(stages(log), directory), rotations())
+        circuit = rotations()
+        circuit.append_gate(HGate(), 1)
+        data = run(CheckpointPass(stages(log), directory), circuit)
+        assert data['stages_run'] == [0, 1, 2]
+        assert len(list(Path(directory).glob('*.stage.ckpt'))) == 2
+
+    def test_different_parameters(self, tmp_path: Path) -> None:
+        log = str(tmp_path / 'runs')
+        directory = str(tmp_path / 'checkpoint')
+        run(CheckpointPass(stages(log), directory), rotations())
+        ran(log)
+        workflow = CheckpointPass(stages(log, 1e-3), directory)
+        data = run(workflow, rotations())
+        assert ran(log) == [0, 1, 2]
+        assert data['stages_run'] == [0, 1, 2]
+        assert len(list(Path(directory).glob('*.stage.ckpt'))) == 2
+
+    def test_invalid_stages(self) -> None:
+        with pytest.raises(ValueError):
+            CheckpointPass(stages('runs'), 'checkpoint', [6])
+
+
+class TestBlockCheckpoints:
+
+    def test_blocks_are_saved(self, tmp_path: Path) -> None:
+        directory = str(tmp_path)
+        synthesis = CachedSynthesisPass(
+            CliffordSynthesisPass(),
+            cache_size=0,
+            checkpoint=directory,
+            checkpoint_interval=1,
+        )
+        circuit = Circuit(2)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        target = circuit.get_unitary()
+        assert run(synthesis, circuit)['block_synthesis_cache']['misses'] == 1
+        assert len(list(tmp_path.glob('blocks-*.ckpt'))) == 1
+
+        # As if resumed in a new process
+        checkpoint._loaded_shards.clear()
+        block = Circuit.from_unitary(target)
+        data = run(synthesis, block)
+        assert data['block_synthesis_cache']['hits'] == 1
+        assert block == circuit
+
+    def test_only_used_shards_are_loaded(self, tmp_path: Path) -> None:
+        directory = str(tmp_path)
+        gates = frozenset([HGate(), CNOTGate()])
+        keys = [('block', i, gates) for i in range(40)]
+        for key in keys:
+            checkpoint.save_block(directory, key, key[1], 8)
+        checkpoint.flush_blocks(directory)
+        shards = {checkpoint._shard(key) for key in keys}
+        assert len(shards) > 1
+        assert {p.name[7:9] for p in tmp_path.glob('blocks-*.ckpt')} == shards
+
+        checkpoint._loaded_shards.clear()
+        assert checkpoint.finished_block(directory, keys[3]) == 3
+        assert list(checkpoint._loaded_shards) == [
+            (directory, checkpoint._shard(keys[3])),
+        ]
+        assert checkpoint.finished_block(directory, ('block', 40)) is None
+        for key in keys:
+            assert checkpoint.finished_block(directory, key) == key[1]
+        assert len(checkpoint._loaded_shards) <= checkpoint._max_loaded_shards
+
+
+class TestResumeCompilation:
+
+    def test_resume(self, tmp_path: Path) -> None:
+        log = str(tmp_path / 'runs')
+        directory = str(tmp_path / 'checkpoint')
+        expected = rotations()
+        run(CheckpointPass(stages(log), str(tmp_path / 'whole')), expected)
+        crash(CheckpointPass(stages(log), directory), rotations(), log)
+
+        ran(log)
+        resumed, data = resume_compilation(
+            directory,
+            compiler=DirectCompiler(),  # type: ignore
+            request_data=True,
+        )
+        assert ran(log) == [2]
+        assert resumed == expected
+        assert data['stages_run'] == [0, 1, 2]
+
+    def test_workflow_option(self, tmp_path: Path) -> None:
+        directory = str(tmp_path)
+        options = CliffordTOptions(checkpoint=directory)
+        workflow = build_circuit_workflow(1, options=options)
+        assert len(workflow) == 1
+        assert isinstance(workflow[0], CheckpointPass)
+        assert workflow[0].directory == directory
+
+    def test_needs_one_compilation(self, tmp_path: Path) -> None:
+        with pytest.raises(ValueError):
+            resume_compilation(str(tmp_path))
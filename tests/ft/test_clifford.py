@@ -0,0 +1,152 @@
+"""This file tests Clifford tableaux and the CliffordSynthesisPass."""
+from __future__ import annotations
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.clifford import _CliffordTable
+from bqskit.ft.cliffordt.clifford import clifford_table
+from bqskit.ft.cliffordt.clifford import CliffordPredicate
+from bqskit.ft.cliffordt.clifford import CliffordSynthesisPass
+from bqskit.ft.cliffordt.clifford import CliffordTableau
+from bqskit.ft.cliffordt.clifford import synthesize_clifford
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import SqrtXGate
+from bqskit.ir.gates import SwapGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+from bqskit.qis.state import StateVector
+
+
+def random_clifford(num_qudits: int, length: int, seed: int) -> Circuit:
+    rng = np.random.default_rng(seed)
+    gates = [HGate(), SGate(), SqrtXGate(), CNOTGate()]
+    gates = [gate for gate in gates if gate.num_qudits <= num_qudits]
+    circuit = Circuit(num_qudits)
+    for index in rng.integers(len(gates), size=length):
+        gate = gates[index]
+        location = rng.choice(num_qudits, gate.num_qudits, replace=False)
+        circuit.append_gate(gate, [int(q) for q in location])
+    return circuit
+
+
+class TestCliffordTableau:
+
+    def test_cnot(self) -> None:
+        tableau = CliffordTableau.from_unitary(CNOTGate().get_unitary())
+        assert repr(tableau) == 'CliffordTableau(+XX, +IX, +ZI, +ZZ)'
+
+    def test_gate_list_matches_unitary(self) -> None:
+        for num_qudits in [1, 2, 3]:
+            circuit = random_clifford(num_qudits, 40, num_qudits)
+            tableau = CliffordTableau.from_circuit(circuit)
+            assert tableau is not None
+            assert tableau == CliffordTableau.from_unitary(
+                circuit.get_unitary(),
+            )
+
+    def test_non_clifford(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(TGate(), 0)
+        assert CliffordTableau.from_circuit(circuit) is None
+        circuit.append_gate(TGate(), 0)
+        assert CliffordTableau.from_circuit(circuit) is not None
+        circuit.append_gate(U3Gate(), 1, [0.1, 0.2, 0.3])
+        assert CliffordTableau.from_circuit(circuit) is None
+
+    def test_clifford_valued_parameters(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(RZGate(), 0, [np.pi / 2])
+        circuit.append_gate(U3Gate(), 0, [np.pi / 2, 0, np.pi])
+        assert CliffordTableau.from_circuit(circuit) is not None
+
+    def test_near_clifford(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(RZGate(), 1, [1e-5])
+        assert CliffordTableau.from_circuit(circuit) is None
+        assert CliffordTableau.from_unitary(circuit.get_unitary()) is None
+        data = PassData(circuit)
+        assert not CliffordPredicate().get_truth_value(circuit, data)
+
+        circuit.set_params([1e-10])
+        assert CliffordTableau.from_circuit(circuit) is not None
+        assert CliffordTableau.from_unitary(circuit.get_unitary()) is not None
+
+
+class TestSynthesizeClifford:
+
+    def test_table_sizes(self) -> None:
+        assert len(clifford_table(1)) == 24
+        assert len(clifford_table(2)) == 11520
+
+    def test_shipped_table_matches_build(self) -> None:
+        shipped = clifford_table(2)
+        built = _CliffordTable.build(2)
+        assert np.array_equal(shipped.keys, built.keys)
+        assert np.array_equal(shipped.offsets, built.offsets)
+        assert np.array_equal(shipped.codes, built.codes)
+
+    def test_two_qubit_cnot_count_is_optimal(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(SwapGate(), (0, 1))
+        circuit.append_gate(HGate(), 0)
+        tableau = CliffordTableau.from_circuit(circuit)
+        assert tableau is not None
+        result = synthesize_clifford(tableau)
+        assert result.count(CNOTGate()) == 3
+        for seed in range(10):
+            circuit = random_clifford(2, 30, seed)
+            tableau = CliffordTableau.from_circuit(circuit)
+            assert tableau is not None
+            result = synthesize_clifford(tableau)
+            assert result.count(CNOTGate()) <= 3
+            assert result.get_unitary().get_distance_from(
+                circuit.get_unitary(),
+            ) < 1e-7
+
+    def test_wide_cliffords(self) -> None:
+        for num_qudits in [3, 4]:
+            circuit = random_clifford(num_qudits, 50, num_qudits)
+            tableau = CliffordTableau.from_circuit(circuit)
+            assert tableau is not None
+            result = synthesize_clifford(tableau)
+            assert result.get_unitary().get_distance_from(
+                circuit.get_unitary(),
+            ) < 1e-7
+
+
+class TestCliffordSynthesisPass:
+
+    def test_predicate(self) -> None:
+        data = PassData(Circuit(2))
+        circuit = random_clifford(2, 10, 0)
+        assert CliffordPredicate().get_truth_value(circuit, data)
+        circuit.append_gate(TGate(), 1)
+        assert not CliffordPredicate().get_truth_value(circuit, data)
+
+    def test_predicate_rejects_state_targets(self) -> None:
+        data = PassData(Circuit(2))
+        data.target = StateVector([0.6, 0, 0, 0.8])
+        assert not CliffordPredicate().get_truth_value(Circuit(2), data)
+
+    def test_pass(self) -> None:
+        circuit = random_clifford(3, 60, 7)
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, [CliffordSynthesisPass()])
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
+
+    def test_non_clifford_is_unchanged(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(U3Gate(), 0, [0.1, 0.2, 0.3])
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, [CliffordSynthesisPass()])
+        assert result.gate_set == {U3Gate()}
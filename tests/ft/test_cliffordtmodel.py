@@ -0,0 +1,110 @@
+"""This file tests the CliffordTModel and its workflow registration."""
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import numpy as np
+
+from bqskit.compiler.registry import _compile_circuit_registry
+from bqskit.compiler.workflow import Workflow
+from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
+from bqskit.ft.cliffordt.cliffordtmodel import default_workflow
+from bqskit.ft.cliffordt.cliffordtmodel import DefaultWorkflowPass
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.ftmodel import FaultTolerantModel
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CircuitGate
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+
+
+def imported_modules(statement: str) -> set[str]:
+    script = f'import sys\n{statement}\nprint(*sys.modules)'
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return set(output.split())
+
+
+class TestLazyImports:
+
+    def test_package_import_is_lazy(self) -> None:
+        modules = imported_modules('import bqskit.ft')
+        assert 'bqskit.ir' not in modules
+        assert 'bqskit.ft.cliffordt.defaultworkflow' not in modules
+
+    def test_model_construction_does_not_build_workflows(self) -> None:
+        modules = imported_modules(
+            'from bqskit.ft import CliffordTModel\nCliffordTModel(2)',
+        )
+        assert 'bqskit.ft.cliffordt.defaultworkflow' not in modules
+
+    def test_attributes(self) -> None:
+        import bqskit.ft
+        assert bqskit.ft.CliffordTModel is CliffordTModel
+        for name in bqskit.ft.__all__:
+            assert getattr(bqskit.ft, name) is not None
+
+
+class TestDefaultWorkflow:
+
+    def test_registered_workflows_are_lazy(self) -> None:
+        model = CliffordTModel(2)
+        workflow = _compile_circuit_registry[model][3]
+        assert len(workflow) == 1
+        assert isinstance(workflow[0], DefaultWorkflowPass)
+
+    def test_workflows_are_shared(self) -> None:
+        first = DefaultWorkflowPass('unitary', 2, 1e-6)
+        second = DefaultWorkflowPass('unitary', 2, 1e-6)
+        assert isinstance(first.workflow, Workflow)
+        assert first.workflow is second.workflow
+        assert first.workflow is not default_workflow('unitary', 2)
+
+    def test_workflows_are_shared_for_equal_options(self) -> None:
+        options = CliffordTOptions(error_budget=1e-4, pauli_rotations=True)
+        first = DefaultWorkflowPass('circuit', 1, 1e-6, options)
+        second = DefaultWorkflowPass(
+            'circuit',
+            1,
+            1e-6,
+            CliffordTOptions(error_budget=1e-4, pauli_rotations=True),
+        )
+        assert first.workflow is second.workflow
+        other = DefaultWorkflowPass('circuit', 1, 1e-6, CliffordTOptions())
+        assert other.workflow is not first.workflow
+        default = DefaultWorkflowPass('circuit', 1, 1e-6)
+        assert other.workflow is default.workflow
+
+
+class TestGateCosts:
+
+    def test_surface_code_defaults(self) -> None:
+        model = CliffordTModel(2, synthesis_epsilon=1e-8)
+        assert model.gate_cost(SGate()) == 1
+        assert model.gate_cost(CNOTGate()) == 2
+        assert model.gate_cost(TGate()) == 50
+        assert model.gate_cost(RZGate()) == model.rotation_cost
+        assert model.rotation_cost == 50 * 3 * np.log2(1e8)
+        assert model.gate_cost(U3Gate()) == 3 * model.rotation_cost
+
+    def test_native_rotations(self) -> None:
+        model = FaultTolerantModel(1, [HGate()], [RZGate()])
+        assert model.gate_cost(RZGate()) == 50
+
+    def test_overrides_and_circuit_cost(self) -> None:
+        model = CliffordTModel(2, gate_costs={TGate(): 10})
+        circuit = Circuit(2)
+        circuit.append_gate(SGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(TGate(), 1)
+        assert model.circuit_cost(circuit) == 13
+        assert model.gate_cost(CircuitGate(circuit)) == 13
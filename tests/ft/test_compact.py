@@ -0,0 +1,77 @@
+"""This file tests the CliffordTCircuit."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from bqskit.ft.cliffordt.compact import alphabet
+from bqskit.ft.cliffordt.compact import CliffordTCircuit
+from bqskit.ft.cliffordt.resources import estimate_resources
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+
+
+def random_circuit(num_qudits: int, length: int, seed: int) -> Circuit:
+    rng = np.random.default_rng(seed)
+    gates = [gate for gate in alphabet if gate.num_qudits <= num_qudits]
+    circuit = Circuit(num_qudits)
+    for index in rng.integers(len(gates), size=length):
+        gate = gates[index]
+        location = rng.choice(num_qudits, gate.num_qudits, replace=False)
+        params = rng.uniform(-np.pi, np.pi, gate.num_params)
+        circuit.append_gate(gate, [int(q) for q in location], list(params))
+    return circuit
+
+
+class TestCliffordTCircuit:
+
+    @pytest.mark.parametrize('num_qudits', [1, 2, 5])
+    def test_round_trip(self, num_qudits: int) -> None:
+        for seed in range(5):
+            circuit = random_circuit(num_qudits, 60, seed)
+            compact = CliffordTCircuit.from_circuit(circuit)
+            assert compact.num_operations == circuit.num_operations
+            assert compact.to_circuit() == circuit
+            assert compact.depth == circuit.depth
+            assert compact.gate_counts == dict(circuit.gate_counts)
+            assert compact.to_qasm() == circuit.to('qasm')
+
+    def test_append_gate(self) -> None:
+        compact = CliffordTCircuit(2)
+        compact.append_gate(TGate(), [1])
+        compact.append_gate(RZGate(), [0], [0.5])
+        compact.append_gate(CNOTGate(), [1, 0])
+        assert compact.count(TGate()) == 1
+        assert compact.angles.tolist() == [0.5]
+        assert compact.depth == 2
+        with pytest.raises(ValueError):
+            compact.append_gate(U3Gate(), [0], [0.1, 0.2, 0.3])
+        with pytest.raises(ValueError):
+            compact.append_gate(CNOTGate(), [1, 1])
+
+    def test_from_arrays_validates(self) -> None:
+        t, cx = alphabet.index(TGate()), alphabet.index(CNOTGate())
+        rz = alphabet.index(RZGate())
+        with pytest.raises(ValueError):
+            CliffordTCircuit.from_arrays(2, [t], [[0, 1]])
+        with pytest.raises(ValueError):
+            CliffordTCircuit.from_arrays(2, [cx], [[0, 2]])
+        with pytest.raises(ValueError):
+            CliffordTCircuit.from_arrays(2, [rz], [[0, 0]])
+        compact = CliffordTCircuit.from_arrays(2, [rz, cx], [0, 0, 0, 1], [1])
+        assert compact.to_circuit().gate_set == {RZGate(), CNOTGate()}
+
+    def test_save_and_load(self, tmp_path: Path) -> None:
+        compact = CliffordTCircuit.from_circuit(random_circuit(3, 50, 7))
+        compact.save(tmp_path / 'circuit.npz')
+        assert CliffordTCircuit.load(tmp_path / 'circuit.npz') == compact
+
+    def test_resources_match(self) -> None:
+        circuit = random_circuit(4, 200, 3)
+        compact = CliffordTCircuit.from_circuit(circuit)
+        assert estimate_resources(compact) == estimate_resources(circuit)
@@ -1,15 +1,20 @@
-"""This file tests that bqskit.compile outputs are in FaultTolerantGateSet."""
+"""This file tests that bqskit.compile outputs are in the CliffordTModel."""
 from __future__ import annotations
 
 from itertools import combinations
 from random import choice
 
-from bqskit.compiler import compile
-from bqskit.compiler.machine import MachineModel
-from bqskit.ft.cliffordt.ftgateset import FaultTolerantGateSet
+import numpy as np
+
+from bqskit import compile
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
+from bqskit.ft.cliffordt.cliffordtmodel import default_workflow
 from bqskit.ir import Circuit
 from bqskit.ir import Gate
+from bqskit.ir.gates import CNOTGate
 from bqskit.ir.gates import U3Gate
+from bqskit.qis.state import StateVector
 
 
 def simple_circuit(num_qudits: int, gate_set: list[Gate]) -> Circuit:
@@ -31,7 +36,40 @@ class TestCompileDefaults:
         input_gateset = [U3Gate()]
         num_qudits = 2
         target = simple_circuit(num_qudits, input_gateset)
-        ftgateset = FaultTolerantGateSet()
-        machine = MachineModel(num_qudits, gate_set=ftgateset)
-        result = compile(target, machine)
-        assert all([gate in ftgateset for gate in result.gate_set])
+        model = CliffordTModel(num_qudits)
+        result = compile(target, model)
+        assert all([gate in model.gate_set for gate in result.gate_set])
+
+    def test_outputs_are_in_the_model(self) -> None:
+        # Generic single-qubit gates the circuit path used to leave as U3s
+        circuit = Circuit(2)
+        circuit.append_gate(U3Gate(), 0, [0.3, 0.5, 0.7])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(U3Gate(), 1, [1.1, 0.2, -0.4])
+        circuit.append_gate(CNOTGate(), (1, 0))
+        circuit.append_gate(U3Gate(), 0, [0.9, 0.1, 0.3])
+        model = CliffordTModel(2)
+        with Compiler(num_workers=2) as compiler:
+            for level in [1, 2]:
+                result = compile(
+                    circuit,
+                    model,
+                    optimization_level=level,
+                    compiler=compiler,
+                    seed=1,
+                )
+                assert all(g in model.gate_set for g in result.gate_set)
+                assert result.get_unitary().get_distance_from(
+                    circuit.get_unitary(),
+                ) < 1e-6
+
+    def test_state_targets_are_not_taken_as_clifford(self) -> None:
+        # An empty circuit is Clifford, but does not prepare the state
+        state = StateVector([0.6, 0, 0, 0.8])
+        workflow = default_workflow('stateprep', 1, 1e-3)
+        with Compiler(num_workers=1) as compiler:
+            result = compiler.compile(
+                Circuit(2), workflow, data={'target': state},
+            )
+        prepared = result.get_statevector(StateVector([1, 0, 0, 0]))
+        assert abs(np.vdot(prepared, state)) > 0.99
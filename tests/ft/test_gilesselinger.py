@@ -0,0 +1,122 @@
+"""This file tests the GilesSelingerSynthesisPass."""
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.gilesselinger import GilesSelingerPredicate
+from bqskit.ft.cliffordt.gilesselinger import GilesSelingerSynthesisPass
+from bqskit.ft.cliffordt.gilesselinger import recognize_unitary
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CCXGate
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import IdentityGate
+from bqskit.ir.gates import SdgGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+from bqskit.ir.gates import XGate
+from bqskit.ir.gates import ZGate
+from bqskit.qis import UnitaryMatrix
+from bqskit.qis.state import StateVector
+
+
+clifford_t_gates = {
+    HGate(), SGate(), SdgGate(), TGate(), TdgGate(), XGate(), ZGate(),
+    CNOTGate(), IdentityGate(1), IdentityGate(2), IdentityGate(3),
+}
+
+
+def random_clifford_t(num_qudits: int, length: int, seed: int) -> Circuit:
+    rng = np.random.default_rng(seed)
+    gates = [HGate(), SGate(), TGate(), TdgGate(), CNOTGate(), CCXGate()]
+    gates = [gate for gate in gates if gate.num_qudits <= num_qudits]
+    circuit = Circuit(num_qudits)
+    for index in rng.integers(len(gates), size=length):
+        gate = gates[index]
+        location = rng.choice(num_qudits, gate.num_qudits, replace=False)
+        circuit.append_gate(gate, [int(q) for q in location])
+    return circuit
+
+
+class TestRecognizeUnitary:
+
+    def test_global_phase(self) -> None:
+        utry = CCXGate().get_unitary() * np.exp(0.7j)
+        assert recognize_unitary(utry) is not None
+
+    def test_inexact(self) -> None:
+        assert recognize_unitary(UnitaryMatrix.random(2)) is None
+
+
+class TestGilesSelingerSynthesisPass:
+
+    @pytest.mark.parametrize('num_qudits', [1, 2, 3])
+    def test_random_circuits(self, num_qudits: int) -> None:
+        synthesis = GilesSelingerSynthesisPass()
+        for seed in range(5):
+            circuit = random_clifford_t(num_qudits, 25, seed)
+            result = synthesis.synthesize(circuit.get_unitary())
+            assert result is not None
+            assert result.gate_set <= clifford_t_gates
+            assert result.get_unitary().get_distance_from(
+                circuit.get_unitary(),
+            ) < 1e-8
+
+    def test_toffoli(self) -> None:
+        result = GilesSelingerSynthesisPass().synthesize(
+            CCXGate().get_unitary(),
+        )
+        assert result is not None
+        assert result.count(TGate()) + result.count(TdgGate()) == 7
+
+    def test_needs_ancilla(self) -> None:
+        controlled_t = np.diag([1, 1, 1, np.exp(1j * np.pi / 4)])
+        synthesis = GilesSelingerSynthesisPass()
+        assert synthesis.synthesize(controlled_t) is None
+
+    def test_inexact_circuit_is_unchanged(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(U3Gate(), 0, [0.1, 0.2, 0.3])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, [GilesSelingerSynthesisPass()])
+        assert result.gate_set == {U3Gate(), CNOTGate()}
+
+    def test_predicate(self) -> None:
+        circuit = random_clifford_t(3, 20, 1)
+        data = PassData(circuit)
+        assert GilesSelingerPredicate().get_truth_value(circuit, data)
+        circuit.append_gate(U3Gate(), 0, [0.1, 0.2, 0.3])
+        assert not GilesSelingerPredicate().get_truth_value(circuit, data)
+
+    def test_predicate_rejects_state_targets(self) -> None:
+        circuit = Circuit(2)
+        data = PassData(circuit)
+        data.target = StateVector([0.6, 0, 0, 0.8])
+        assert not GilesSelingerPredicate().get_truth_value(circuit, data)
+        assert GilesSelingerSynthesisPass.key not in data
+
+    def test_predicate_result_is_reused(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        circuit = random_clifford_t(2, 20, 2)
+        expected = circuit.get_unitary()
+        data = PassData(circuit)
+        assert GilesSelingerPredicate().get_truth_value(circuit, data)
+
+        def fail(*args: object) -> None:
+            raise AssertionError('Synthesized twice.')
+
+        monkeypatch.setattr(GilesSelingerSynthesisPass, 'synthesize', fail)
+        asyncio.run(GilesSelingerSynthesisPass().run(circuit, data))
+        assert GilesSelingerSynthesisPass.key not in data
+        assert circuit.gate_set <= clifford_t_gates
+        assert circuit.get_unitary().get_distance_from(expected) < 1e-8
@@ -0,0 +1,154 @@
+"""This file tests approximate Clifford+T synthesis of Z rotations."""
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.gridsynth import gridsynth
+from bqskit.ft.cliffordt.gridsynth import rz_cache
+from bqskit.ft.cliffordt.gridsynth import RZtoCliffordTSynthesisPass
+from bqskit.ft.cliffordt.gridsynth import solve_norm_equation
+from bqskit.ft.cliffordt.gridsynth import synthesize_rz
+from bqskit.ft.cliffordt.gridsynth import SynthesisCache
+from bqskit.ft.cliffordt.ring import ZRootTwo
+from bqskit.ft.rules.replacement import _distance
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+
+
+def rz_distance(gates: list, angle: float) -> float:
+    circuit = Circuit(1)
+    for gate in gates:
+        circuit.append_gate(gate, 0)
+    return circuit.get_unitary().get_distance_from(
+        RZGate().get_unitary([angle]),
+    )
+
+
+class TestGridsynth:
+
+    @pytest.mark.parametrize('epsilon', [1e-2, 1e-4, 1e-7])
+    def test_random_angles(self, epsilon: float) -> None:
+        rng = np.random.default_rng(7)
+        for angle in rng.uniform(-np.pi, np.pi, 5):
+            gates = synthesize_rz(angle, epsilon, None)
+            assert rz_distance(list(gates), angle) <= epsilon * (1 + 1e-6)
+
+    def test_t_count_scales_with_precision(self) -> None:
+        gates = gridsynth(0.3, 1e-6)
+        t_count = sum(isinstance(g, (TGate, TdgGate)) for g in gates)
+        assert t_count <= 3 * np.log2(1e6) + 10
+
+    def test_multiples_of_pi_over_4_are_exact(self) -> None:
+        for turns in range(-8, 9):
+            gates = synthesize_rz(turns * np.pi / 4, 1e-10, None)
+            assert len(gates) <= 2
+            assert rz_distance(list(gates), turns * np.pi / 4) < 1e-7
+
+    def test_near_degenerate_angles(self) -> None:
+        epsilon = 1e-5
+        for angle in [2.5 * epsilon, -3 * epsilon, np.pi / 4 + 2.2 * epsilon]:
+            gates = synthesize_rz(angle, epsilon, None)
+            assert rz_distance(list(gates), angle) <= epsilon * (1 + 1e-6)
+
+    def test_near_axis_angles_are_not_split(self) -> None:
+        epsilon = 1e-8
+        for angle in [np.pi / 2 - 2e-8, np.pi / 4 + 2.2 * epsilon]:
+            gates = synthesize_rz(angle, epsilon, None)
+            t_count = sum(isinstance(g, (TGate, TdgGate)) for g in gates)
+            assert t_count <= 4 * np.log2(1 / epsilon) + 10
+            utry = RZGate().get_unitary([angle])
+            circuit = Circuit(1)
+            for gate in gates:
+                circuit.append_gate(gate, 0)
+            assert _distance(circuit.get_unitary(), utry) <= 1.001 * epsilon
+
+    def test_invalid_epsilon(self) -> None:
+        with pytest.raises(ValueError):
+            gridsynth(0.1, 0)
+        with pytest.raises(ValueError):
+            RZtoCliffordTSynthesisPass(1.5)
+
+    def test_solve_norm_equation(self) -> None:
+        for xi in [ZRootTwo(5), ZRootTwo(7, 2), ZRootTwo(13, -4)]:
+            t = solve_norm_equation(xi)
+            if t is not None:
+                assert t.norm_sq() == xi
+        assert solve_norm_equation(ZRootTwo(7)) is None
+        assert solve_norm_equation(ZRootTwo(-1)) is None
+
+
+class TestSynthesisCache:
+
+    def test_hits_and_eviction(self) -> None:
+        cache = SynthesisCache(maxsize=2)
+        synthesize_rz(0.1, 1e-3, cache)
+        synthesize_rz(0.1 + np.pi / 2, 1e-3, cache)
+        assert cache.hits == 1 and cache.misses == 1
+        synthesize_rz(0.2, 1e-3, cache)
+        synthesize_rz(0.3, 1e-3, cache)
+        assert len(cache) == 2
+        synthesize_rz(0.1, 1e-3, cache)
+        assert cache.misses == 4
+        assert cache.hit_rate == pytest.approx(1 / 5)
+
+    def test_invalid_size(self) -> None:
+        with pytest.raises(ValueError):
+            SynthesisCache(-1)
+
+    def test_reserve_never_shrinks(self) -> None:
+        cache = SynthesisCache(maxsize=4)
+        cache.reserve(2)
+        assert cache.maxsize == 4
+        cache.reserve(8)
+        assert cache.maxsize == 8
+
+
+class TestRZtoCliffordTSynthesisPass:
+
+    def test_circuit(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(RZGate(), 0, [0.7])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(RZGate(), 1, [0.7])
+        circuit.append_gate(RZGate(), 0, [-1.3])
+        with Compiler() as compiler:
+            result, data = compiler.compile(
+                circuit,
+                [RZtoCliffordTSynthesisPass(1e-4)],
+                request_data=True,
+            )
+        result.unfold_all()
+        assert RZGate() not in result.gate_set
+        assert data.error <= 3e-4
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) <= 3e-4
+        counts = data['rz_synthesis_cache']
+        assert counts['hits'] + counts['misses'] == 3
+        assert counts['hits'] >= 1
+
+    def test_records_errors_below_float_floor(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(RZGate(), 0, [0.7])
+        data = PassData(circuit)
+        asyncio.run(RZtoCliffordTSynthesisPass(1e-10).run(circuit, data))
+        assert 0 < data.error <= 1e-10 * (1 + 1e-6)
+
+    def test_no_cache_keeps_shared_cache(self) -> None:
+        rz_cache.reserve(16)
+        synthesize_rz(0.9, 1e-3, rz_cache)
+        size, maxsize = len(rz_cache), rz_cache.maxsize
+        circuit = Circuit(1)
+        circuit.append_gate(RZGate(), 0, [0.7])
+        synthesis = RZtoCliffordTSynthesisPass(1e-3, cache_size=0)
+        asyncio.run(synthesis.run(circuit, PassData(circuit)))
+        assert len(rz_cache) == size
+        assert rz_cache.maxsize == maxsize
@@ -0,0 +1,85 @@
+"""This file tests the MatsumotoAmanoSynthesisPass."""
+from __future__ import annotations
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.defaultworkflow import normal_form_replace
+from bqskit.ft.cliffordt.matsumotoamano import bloch_matrix
+from bqskit.ft.cliffordt.matsumotoamano import MatsumotoAmanoSynthesisPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+from bqskit.ir.gates import XGate
+from bqskit.passes import UnfoldPass
+
+
+def t_count(circuit: Circuit) -> int:
+    return circuit.count(TGate()) + circuit.count(TdgGate())
+
+
+class TestMatsumotoAmano:
+
+    def test_bloch_matrix_is_phase_invariant(self) -> None:
+        utry = U3Gate().get_unitary([0.4, 1.1, -0.2])
+        assert np.allclose(bloch_matrix(utry), bloch_matrix(1j * utry))
+
+    def test_random_words(self) -> None:
+        rng = np.random.default_rng(12)
+        gates = [HGate(), SGate(), TGate(), TdgGate(), XGate()]
+        synthesis = MatsumotoAmanoSynthesisPass()
+        for length in [1, 5, 20, 60]:
+            circuit = Circuit(1)
+            for index in rng.integers(len(gates), size=length):
+                circuit.append_gate(gates[index], 0)
+            result = synthesis.synthesize(circuit.get_unitary())
+            assert result is not None
+            assert result.get_unitary().get_distance_from(
+                circuit.get_unitary(),
+            ) < 1e-7
+            assert t_count(result) <= t_count(circuit)
+
+    def test_t_count_is_optimal(self) -> None:
+        synthesis = MatsumotoAmanoSynthesisPass()
+        circuit = Circuit(1)
+        for gate in [TGate(), TGate(), HGate(), TGate(), HGate(), TdgGate()]:
+            circuit.append_gate(gate, 0)
+        result = synthesis.synthesize(circuit.get_unitary())
+        assert result is not None
+        assert t_count(result) == 2
+
+    def test_inexact_circuit_is_unchanged(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(U3Gate(), 0, [0.1, 0.2, 0.3])
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, [MatsumotoAmanoSynthesisPass()])
+        assert result.gate_set == {U3Gate()}
+
+    def test_exact_u3_is_synthesized(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(U3Gate(), 0, [np.pi / 4, np.pi / 2, np.pi / 4])
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, [MatsumotoAmanoSynthesisPass()])
+        assert U3Gate() not in result.gate_set
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
+
+    def test_tolerance(self) -> None:
+        utry = U3Gate().get_unitary([np.pi / 2 + 1e-9, 0, np.pi])
+        assert MatsumotoAmanoSynthesisPass().synthesize(utry) is None
+        synthesis = MatsumotoAmanoSynthesisPass(tolerance=5e-9)
+        result = synthesis.synthesize(utry)
+        assert result is not None
+        assert result.gate_set == {HGate()}
+
+        circuit = Circuit(1)
+        circuit.append_gate(U3Gate(), 0, [np.pi / 2 + 1e-9, 0, np.pi])
+        workflow = [normal_form_replace(1e-8), UnfoldPass()]
+        with Compiler() as compiler:
+            assert compiler.compile(circuit, workflow).gate_set == {HGate()}
+            workflow = [normal_form_replace(1e-12), UnfoldPass()]
+            assert compiler.compile(circuit, workflow).gate_set == {U3Gate()}
@@ -0,0 +1,163 @@
+"""This file tests the PauliRotationCircuit and PauliRotationPass."""
+from __future__ import annotations
+
+import asyncio
+from random import choice
+from random import sample
+from random import seed
+
+import numpy as np
+
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.defaultworkflow import build_cliffordt_workflow
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.paulirotation import PauliRotationCircuit
+from bqskit.ft.cliffordt.paulirotation import PauliRotationPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import CRZGate
+from bqskit.ir.gates import CZGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RXGate
+from bqskit.ir.gates import RYGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import SqrtXGate
+from bqskit.ir.gates import SwapGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+from bqskit.ir.gates import YGate
+
+
+def random_circuit(num_qudits: int, num_gates: int) -> Circuit:
+    gates = [
+        HGate(), SGate(), YGate(), SqrtXGate(), CNOTGate(), CZGate(),
+        SwapGate(), TGate(), TdgGate(), RZGate(), RXGate(), RYGate(),
+        U3Gate(),
+    ]
+    angles = [np.pi / 4, np.pi / 2, np.pi, 0.3, -0.7]
+    circuit = Circuit(num_qudits)
+    while circuit.num_operations < num_gates:
+        gate = choice(gates)
+        if gate.num_qudits > num_qudits:
+            continue
+        location = sample(range(num_qudits), gate.num_qudits)
+        params = [choice(angles) for _ in range(gate.num_params)]
+        circuit.append_gate(gate, location, params)
+    return circuit
+
+
+class TestPauliRotationCircuit:
+
+    def test_equivalent(self) -> None:
+        seed(7)
+        for num_qudits in [1, 2, 3, 4]:
+            circuit = random_circuit(num_qudits, 40)
+            target = circuit.get_unitary()
+            rotations = PauliRotationCircuit.from_circuit(circuit)
+            assert rotations is not None
+            for result in [rotations, rotations.merge().round()]:
+                utry = result.to_circuit().get_unitary()
+                assert utry.get_distance_from(target) < 1e-7
+
+    def test_merge_commuting(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(HGate(), 1)
+        circuit.append_gate(CZGate(), (0, 1))
+        circuit.append_gate(TGate(), 0)
+        rotations = PauliRotationCircuit.from_circuit(circuit)
+        assert rotations is not None
+        assert rotations.count_non_clifford() == 2
+
+        merged = rotations.merge().round()
+        assert list(merged.paulis()) == [('ZI', np.pi / 2)]
+        assert merged.count_non_clifford() == 0
+        assert SGate() in merged.to_circuit().gate_set
+
+    def test_anticommuting_not_merged(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(RXGate(), 0, [0.3])
+        circuit.append_gate(TGate(), 0)
+        rotations = PauliRotationCircuit.from_circuit(circuit)
+        assert rotations is not None
+        assert [p for p, _ in rotations.merge().paulis()] == ['Z', 'X', 'Z']
+
+        circuit.append_gate(RZGate(), 0, [-np.pi / 4])
+        rotations = PauliRotationCircuit.from_circuit(circuit)
+        assert rotations is not None
+        merged = rotations.merge().round()
+        assert [p for p, _ in merged.paulis()] == ['Z', 'X']
+
+    def test_cancelled_rotations_are_removed(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(RXGate(), 0, [0.2])
+        # Summed in order, these angles leave a rounding error of 3e-17
+        for angle in [0.1, 0.2, -0.1, -0.2]:
+            circuit.append_gate(RZGate(), 0, [angle])
+        circuit.append_gate(RXGate(), 0, [0.5])
+        rotations = PauliRotationCircuit.from_circuit(circuit)
+        assert rotations is not None
+        assert list(rotations.merge().paulis()) == [('X', 0.2 + 0.5)]
+
+    def test_packed_masks(self) -> None:
+        circuit = Circuit(70)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(CNOTGate(), (69, 0))
+        circuit.append_gate(TGate(), 0)
+        rotations = PauliRotationCircuit.from_circuit(circuit)
+        assert rotations is not None
+        assert rotations.x_masks.shape == (1, 2)
+        assert rotations.x_masks.tolist() == [[1, 0]]
+        assert rotations.z_masks.tolist() == [[0, 1 << 5]]
+        pauli, angle = next(rotations.paulis())
+        assert pauli == 'X' + 'I' * 68 + 'Z'
+        assert angle == np.pi / 4
+
+    def test_other_gates(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(CRZGate(), (0, 1), [0.3])
+        assert PauliRotationCircuit.from_circuit(circuit) is None
+
+
+class TestPauliRotationPass:
+
+    def test_rewrites_if_fewer_rotations(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(HGate(), 1)
+        circuit.append_gate(CNOTGate(), (1, 0))
+        circuit.append_gate(CNOTGate(), (1, 0))
+        circuit.append_gate(RZGate(), 0, [0.3])
+        target = circuit.get_unitary()
+        data = PassData(circuit)
+        asyncio.run(PauliRotationPass().run(circuit, data))
+        assert circuit.get_unitary().get_distance_from(target) < 1e-7
+        assert circuit.count(RZGate()) == 1
+        assert circuit.count(TGate()) == 0
+        assert data['pauli_rotations'] == {
+            'rotations': 2, 'merged': 1, 'applied': 1,
+        }
+        assert data['pauli_rotation_circuit'].num_rotations == 1
+
+    def test_keeps_circuit_otherwise(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(TGate(), 0)
+        expected = circuit.copy()
+        data = PassData(circuit)
+        asyncio.run(PauliRotationPass().run(circuit, data))
+        assert circuit == expected
+        assert data['pauli_rotations']['applied'] == 0
+
+    def test_workflow_option(self) -> None:
+        passes = build_cliffordt_workflow(1)
+        assert not any(isinstance(p, PauliRotationPass) for p in passes)
+        passes = build_cliffordt_workflow(
+            1,
+            options=CliffordTOptions(pauli_rotations=True),
+        )
+        assert sum(isinstance(p, PauliRotationPass) for p in passes) == 1
@@ -0,0 +1,110 @@
+"""This file tests the PeepholeOptimizationPass."""
+from __future__ import annotations
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.cliffordtgates import clifford_gates
+from bqskit.ft.cliffordt.cliffordtgates import t_gates
+from bqskit.ft.cliffordt.peephole import PeepholeOptimizationPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CircuitGate
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import CZGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import SqrtXGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+from bqskit.ir.gates import XGate
+from bqskit.ir.gates import ZGate
+
+
+def optimize(circuit: Circuit) -> Circuit:
+    with Compiler(num_workers=1) as compiler:
+        return compiler.compile(circuit, [PeepholeOptimizationPass()])
+
+
+def gates_on(circuit: Circuit, *gates: tuple[object, int]) -> Circuit:
+    for gate, qudit in gates:
+        circuit.append_gate(gate, qudit)
+    return circuit
+
+
+class TestPeepholeOptimizationPass:
+
+    def test_phase_rules(self) -> None:
+        circuit = gates_on(Circuit(1), (TGate(), 0), (TGate(), 0))
+        assert [op.gate for op in optimize(circuit)] == [SGate()]
+
+        circuit = gates_on(Circuit(1), (TGate(), 0), (TdgGate(), 0))
+        assert optimize(circuit).num_operations == 0
+
+        circuit = gates_on(Circuit(1), (SGate(), 0), (SGate(), 0))
+        assert [op.gate for op in optimize(circuit)] == [ZGate()]
+
+    def test_cancellations_uncover_more(self) -> None:
+        circuit = gates_on(
+            Circuit(1),
+            (HGate(), 0), (XGate(), 0), (XGate(), 0), (HGate(), 0),
+            (SqrtXGate(), 0), (SqrtXGate(), 0), (XGate(), 0),
+        )
+        assert optimize(circuit).num_operations == 0
+
+    def test_phases_commute_through_controls(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(CZGate(), (0, 1))
+        circuit.append_gate(TdgGate(), 1)
+        circuit.append_gate(CZGate(), (0, 1))
+        circuit.append_gate(TGate(), 1)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        result = optimize(circuit)
+        assert [op.gate for op in result] == [SGate()]
+
+    def test_phases_stop_at_targets(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(TGate(), 1)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(TdgGate(), 1)
+        assert optimize(circuit) == circuit
+
+    def test_rotations_merge_with_phases(self) -> None:
+        circuit = gates_on(Circuit(1), (TGate(), 0), (SGate(), 0))
+        circuit.append_gate(RZGate(), 0, [np.pi / 4])
+        assert [op.gate for op in optimize(circuit)] == [ZGate()]
+
+        circuit.append_gate(RZGate(), 0, [0.1])
+        result = optimize(circuit)
+        assert [op.gate for op in result] == [RZGate()]
+        assert np.isclose(result.params[0], np.pi + 0.1)
+
+    def test_random_circuits(self) -> None:
+        rng = np.random.default_rng(0)
+        gates = clifford_gates + t_gates
+        circuits = []
+        for _ in range(20):
+            circuit = Circuit(3)
+            for _ in range(40):
+                gate = gates[rng.integers(len(gates))]
+                location = rng.permutation(3)[:gate.num_qudits].tolist()
+                circuit.append_gate(gate, location)
+            circuit.append_gate(U3Gate(), 0, [0.1, 0.2, 0.3])
+            circuit.append_gate(RZGate(), 1, [0.4])
+            subcircuit = CircuitGate(circuit.copy())
+            circuit.append_gate(subcircuit, [2, 0, 1], circuit.params)
+            circuits.append(circuit)
+
+        workflow = [PeepholeOptimizationPass()]
+        with Compiler(num_workers=1) as compiler:
+            ids = [compiler.submit(c, workflow) for c in circuits]
+            results = [compiler.result(task_id) for task_id in ids]
+        for circuit, result in zip(circuits, results):
+            assert result.num_operations < 2 * circuit.num_operations
+            assert result.get_unitary().get_distance_from(
+                circuit.get_unitary(),
+            ) < 1e-7
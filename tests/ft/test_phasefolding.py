@@ -0,0 +1,88 @@
+"""This file tests the PhaseFoldingPass."""
+from __future__ import annotations
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.phasefolding import PhaseFoldingPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import SqrtXGate
+from bqskit.ir.gates import SwapGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import XGate
+
+
+def fold(circuit: Circuit) -> Circuit:
+    with Compiler() as compiler:
+        return compiler.compile(circuit, [PhaseFoldingPass()])
+
+
+class TestPhaseFoldingPass:
+
+    def test_merge_across_cnots(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(TGate(), 1)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(CNOTGate(), (1, 0))
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(SwapGate(), (0, 1))
+        circuit.append_gate(TGate(), 1)
+        result = fold(circuit)
+        assert result.count(TGate()) == 0
+        assert result.count(RZGate()) == 1
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
+
+    def test_cancellation(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(CNOTGate(), (1, 0))
+        circuit.append_gate(CNOTGate(), (1, 0))
+        circuit.append_gate(TdgGate(), 0)
+        result = fold(circuit)
+        assert result.gate_set == {CNOTGate()}
+
+    def test_x_flips_sign(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(XGate(), 0)
+        circuit.append_gate(TGate(), 0)
+        result = fold(circuit)
+        assert result.gate_set == {XGate()}
+
+    def test_opaque_gates_block_merges(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(SGate(), 1)
+        result = fold(circuit)
+        assert result == circuit
+
+    def test_random_circuits(self) -> None:
+        rng = np.random.default_rng(0)
+        gates = [
+            CNOTGate(), XGate(), TGate(), TdgGate(), SGate(), RZGate(),
+            HGate(), SwapGate(), SqrtXGate(),
+        ]
+        for seed in range(10):
+            circuit = Circuit(3)
+            for index in rng.integers(len(gates), size=60):
+                gate = gates[index]
+                location = rng.choice(3, gate.num_qudits, replace=False)
+                params = rng.uniform(-np.pi, np.pi, gate.num_params)
+                circuit.append_gate(
+                    gate, [int(q) for q in location], list(params),
+                )
+            result = fold(circuit)
+            assert result.num_operations <= circuit.num_operations
+            assert result.get_unitary().get_distance_from(
+                circuit.get_unitary(),
+            ) < 1e-7
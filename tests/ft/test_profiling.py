@@ -0,0 +1,106 @@
+"""This file tests the profiling of Clifford+T workflows."""
+from __future__ import annotations
+
+import asyncio
+import json
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.cliffordtmodel import DefaultWorkflowPass
+from bqskit.ft.cliffordt.defaultworkflow import build_cliffordt_workflow
+from bqskit.ft.cliffordt.defaultworkflow import normal_form_replace
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.profiling import profile_workflow
+from bqskit.ft.cliffordt.profiling import ProfiledPass
+from bqskit.ft.cliffordt.rounding import RoundToDiscreteZPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import RZGate
+from bqskit.passes import UnfoldPass
+
+
+def rotations() -> Circuit:
+    circuit = Circuit(2)
+    circuit.append_gate(RZGate(), 0, [np.pi / 4])
+    circuit.append_gate(CNOTGate(), (0, 1))
+    circuit.append_gate(RZGate(), 1, [np.pi / 2])
+    circuit.append_gate(RZGate(), 0, [0.3])
+    return circuit
+
+
+class TestProfiledPass:
+
+    def test_records(self, tmp_path: Path) -> None:
+        trace = str(tmp_path / 'trace.jsonl')
+        passes = profile_workflow(
+            [normal_form_replace(), UnfoldPass(), RoundToDiscreteZPass()],
+            trace,
+        )
+        circuit = rotations()
+        data = PassData(circuit)
+        for profiled in passes:
+            asyncio.run(profiled.run(circuit, data))
+
+        records = data['pass_profile']
+        assert [r['pass'] for r in records] == [
+            'BatchedSingleQubitPass', 'UnfoldPass', 'RoundToDiscreteZPass',
+        ]
+        assert [r['index'] for r in records] == [0, 1, 2]
+        counts = {'blocks': 3, 'distinct': 3, 'replaced': 2}
+        assert records[0]['counters'] == {'batched_single_qubit': counts}
+        assert records[1]['gate_counts_before'] == {
+            'CNOTGate': 1, 'CircuitGate': 2, 'RZGate': 1,
+        }
+        assert records[0]['t_count_before'] == 0
+        assert records[0]['t_count_after'] == 1
+        assert all(r['wall_time'] >= 0 for r in records)
+        assert all(r['max_rss_mb'] > 0 for r in records)
+        assert all(r['max_rss_growth_mb'] >= 0 for r in records)
+        assert 'counters' not in records[1]
+
+        with open(trace) as f:
+            assert [json.loads(line) for line in f] == records
+
+    def test_traced_peak(self) -> None:
+        class AllocatePass(BasePass):
+            async def run(self, circuit: Circuit, data: PassData) -> None:
+                np.ones(2 ** 22).sum()
+
+        circuit = rotations()
+        data = PassData(circuit)
+        tracemalloc.start()
+        try:
+            for profiled in profile_workflow([AllocatePass(), UnfoldPass()]):
+                asyncio.run(profiled.run(circuit, data))
+        finally:
+            tracemalloc.stop()
+        records = data['pass_profile']
+        assert records[0]['traced_peak_mb'] >= 32
+        assert records[1]['traced_peak_mb'] < 32
+
+    def test_default_workflows_are_not_wrapped(self) -> None:
+        passes = build_cliffordt_workflow(1)
+        assert not any(isinstance(p, ProfiledPass) for p in passes)
+        profiled = build_cliffordt_workflow(
+            1,
+            options=CliffordTOptions(profile=True),
+        )
+        assert all(isinstance(p, ProfiledPass) for p in profiled)
+        assert len(profiled) == len(passes)
+
+    def test_registered_workflow(self) -> None:
+        workflow = DefaultWorkflowPass(
+            'circuit',
+            1,
+            options=CliffordTOptions(profile=True),
+        )
+        with Compiler(num_workers=1) as compiler:
+            _, data = compiler.compile(rotations(), workflow, True)
+        records = data['pass_profile']
+        assert len(records) == len(workflow.workflow)
+        assert records[-1]['t_count_after'] > 0
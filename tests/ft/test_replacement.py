@@ -1,14 +1,30 @@
 """This file tests that bqskit.compile outputs are in FaultTolerantGateSet."""
 from __future__ import annotations
 
+import asyncio
+import os
+import pickle
+
 import numpy as np
+import pytest
 
 from bqskit.compiler import Compiler
-from bqskit.ft.replacement import construct_unitary_match_rule
-from bqskit.ft.replacement import ReplacementRule
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.defaultworkflow import clifford_replace
+from bqskit.ft.rules.replacement import _max_rule_sets
+from bqskit.ft.rules.replacement import _rule_set_path
+from bqskit.ft.rules.replacement import _rule_sets
+from bqskit.ft.rules.replacement import construct_unitary_match_rule
+from bqskit.ft.rules.replacement import ReplacementRule
+from bqskit.ft.rules.replacement import ReplacementRuleSet
+from bqskit.ft.rules.replacement import unitary_fingerprint
 from bqskit.ir import Circuit
 from bqskit.ir import Operation
 from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import CZGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TGate
 from bqskit.ir.gates import U3Gate
 from bqskit.ir.gates import XGate
 from bqskit.ir.gates import ZGate
@@ -60,3 +76,167 @@ class TestReplacementRules:
 
         assert XGate() not in result.gate_set
         assert ZGate() in result.gate_set
+
+    def test_set_replacement(self) -> None:
+        x_match = construct_unitary_match_rule(XGate().get_unitary())
+        rule = ReplacementRule(x_match, XGate())
+        rule.replacement = ZGate()
+        assert rule.replacement.gate_set == {ZGate()}
+        circuit = Circuit(1)
+        circuit.append_gate(U3Gate(), 0, [np.pi, 0, np.pi])
+        asyncio.run(rule.run(circuit, PassData(circuit)))
+        assert circuit.gate_set == {ZGate()}
+
+
+class TestReplacementRuleSet:
+
+    def test_lookup_up_to_global_phase(self) -> None:
+        rules = ReplacementRuleSet([(XGate(), XGate()), (ZGate(), ZGate())])
+        utry = UnitaryMatrix(np.exp(0.7j) * XGate().get_unitary())
+        replacement = rules.lookup(utry)
+        assert replacement is not None
+        assert replacement.gate_set == {XGate()}
+        assert rules.lookup(HGate().get_unitary()) is None
+
+    def test_lookup_multi_qudit(self) -> None:
+        rules = ReplacementRuleSet([(CNOTGate(), CNOTGate())])
+        circuit = Circuit(2)
+        circuit.append_gate(HGate(), 1)
+        circuit.append_gate(CZGate(), (0, 1))
+        circuit.append_gate(HGate(), 1)
+        replacement = rules.lookup(circuit.get_unitary())
+        assert replacement is not None
+        assert replacement.gate_set == {CNOTGate()}
+
+    def test_fingerprint_is_phase_invariant(self) -> None:
+        utry = U3Gate().get_unitary([0.1, 0.2, 0.3])
+        key = unitary_fingerprint(utry)
+        assert key == unitary_fingerprint(np.exp(-2.1j) * utry)
+        assert key != unitary_fingerprint(ZGate().get_unitary())
+
+    def test_lookup_across_cell_boundary(self) -> None:
+        # The imaginary part of the last entry sits on a cell boundary
+        def phase(offset: float) -> UnitaryMatrix:
+            angle = np.arcsin(0.3000005 + offset)
+            return UnitaryMatrix(np.diag([1, np.exp(1j * angle)]))
+
+        rule, utry = phase(-2e-9), phase(2e-9)
+        assert unitary_fingerprint(rule) != unitary_fingerprint(utry)
+        assert utry.get_distance_from(rule) < 1e-8
+        rules = ReplacementRuleSet([(rule, ZGate())])
+        assert rules.lookup(utry) is not None
+        assert rules.lookup(phase(1e-3)) is None
+
+    def test_lookup_without_probing(self) -> None:
+        # Every entry is near a boundary, so all the rules are compared
+        utry = UnitaryMatrix(np.exp(0.7j) * HGate().get_unitary())
+        rules = ReplacementRuleSet(
+            [(XGate(), XGate()), (HGate(), HGate())],
+            resolution=2e-8,
+            max_probes=1,
+        )
+        replacement = rules.lookup(utry)
+        assert replacement is not None
+        assert replacement.gate_set == {HGate()}
+        assert rules.lookup(ZGate().get_unitary()) is None
+
+    def test_lookup_across_pivot_cutoff(self) -> None:
+        # The first entry is the pivot of one and not of the other
+        def rotation(offset: float) -> UnitaryMatrix:
+            angle = np.pi / 4 - 1e-4 / np.sqrt(2) + offset
+            c, s = np.cos(angle), np.sin(angle)
+            return UnitaryMatrix([[s, -c], [c * 1j, s * 1j]])
+
+        rule, utry = rotation(2e-9), rotation(-2e-9)
+        assert unitary_fingerprint(rule) != unitary_fingerprint(utry)
+        assert utry.get_distance_from(rule) < 1e-8
+        rules = ReplacementRuleSet([(rule, XGate())])
+        assert rules.lookup(utry) is not None
+
+    def test_replace_single_qubit(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(U3Gate(), (0), [np.pi, 0, np.pi])
+        circuit.append_gate(U3Gate(), (1), [0, np.pi, 0])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        rules = ReplacementRuleSet([(XGate(), XGate()), (ZGate(), ZGate())])
+        workflow = [
+            GroupSingleQuditGatePass(),
+            ForEachBlockPass(rules),
+            UnfoldPass(),
+        ]
+
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, workflow)
+
+        assert result.gate_set == {XGate(), ZGate(), CNOTGate()}
+
+    def test_replacements_are_shared(self) -> None:
+        rules = ReplacementRuleSet([(XGate(), XGate())])
+        first, second = Circuit(1), Circuit(1)
+        for circuit in [first, second]:
+            circuit.append_gate(U3Gate(), 0, [np.pi, 0, np.pi])
+            asyncio.run(rules.run(circuit, PassData(circuit)))
+        assert first[0, 0] is second[0, 0]
+        assert first[0, 0].gate == XGate()
+
+    def test_parameterized_replacements_are_copied(self) -> None:
+        rz = Circuit(1)
+        rz.append_gate(RZGate(), 0, [0.5])
+        rules = ReplacementRuleSet([(rz.get_unitary(), rz)])
+        first = rules.lookup(rz.get_unitary())
+        second = rules.lookup(rz.get_unitary())
+        assert first is not None and second is not None
+        first.set_params([0.1])
+        assert second.params == [0.5]
+
+    def test_pickle_reuses_live_rule_set(self) -> None:
+        rules = ReplacementRuleSet([(XGate(), XGate()), (ZGate(), ZGate())])
+        assert pickle.loads(pickle.dumps(rules)) is rules
+
+    def test_pickle_sends_only_the_digest(self) -> None:
+        angles = np.linspace(0.1, 1, 200)
+        rules = ReplacementRuleSet(
+            [(RZGate().get_unitary([a]), ZGate()) for a in angles],
+        )
+        payload = pickle.dumps(rules)
+        assert len(payload) < 200
+
+        # As if unpickled by a worker that has not seen the rules
+        del _rule_sets[rules.digest]
+        loaded = pickle.loads(payload)
+        assert loaded is not rules
+        assert loaded.digest == rules.digest
+        assert loaded.lookup(RZGate().get_unitary([angles[7]])) is not None
+
+    def test_pickle_checks_the_shared_rules(self) -> None:
+        rules = ReplacementRuleSet([(XGate(), HGate())])
+        payload = pickle.dumps(rules)
+        other = ReplacementRuleSet([(XGate(), ZGate())])
+        with open(_rule_set_path(rules.digest), 'wb') as f:
+            f.write(other.payload)
+        del _rule_sets[rules.digest]
+        with pytest.raises(RuntimeError):
+            pickle.loads(payload)
+        os.remove(_rule_set_path(rules.digest))
+
+    def test_pickle_keeps_few_rule_sets(self) -> None:
+        payload = pickle.dumps(ReplacementRuleSet([(XGate(), XGate())]))
+        for angle in np.linspace(0.1, 1, 20):
+            rz = RZGate().get_unitary([angle])
+            pickle.dumps(ReplacementRuleSet([(rz, ZGate())]))
+        assert len(_rule_sets) <= _max_rule_sets
+        rules = pickle.loads(payload)
+        assert rules.lookup(XGate().get_unitary()) is not None
+
+    def test_clifford_replace(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(U3Gate(), 0, [np.pi / 2, 0, np.pi])
+        circuit.append_gate(U3Gate(), 1, [0, 0, np.pi / 4])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(U3Gate(), 1, [0.1, 0.2, 0.3])
+        workflow = [GroupSingleQuditGatePass(), clifford_replace()]
+
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, workflow + [UnfoldPass()])
+
+        assert result.gate_set == {HGate(), TGate(), CNOTGate(), U3Gate()}
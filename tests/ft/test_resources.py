@@ -0,0 +1,66 @@
+"""This file tests Clifford+T resource estimation."""
+from __future__ import annotations
+
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.resources import estimate_resources
+from bqskit.ft.cliffordt.resources import ResourceEstimationPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CircuitGate
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+
+
+class TestEstimateResources:
+
+    def test_counts(self) -> None:
+        circuit = Circuit(3)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(TGate(), 1)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(TdgGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 2))
+        circuit.append_gate(TGate(), 2)
+        circuit.append_gate(RZGate(), 1, [0.1])
+        circuit.append_gate(U3Gate(), 1, [0.1, 0.2, 0.3])
+        resources = estimate_resources(circuit)
+        assert resources.t_count == 4
+        assert resources.t_depth == 3
+        assert resources.clifford_count == 2
+        assert resources.rz_count == 1
+        assert resources.other_count == 1
+        assert resources.t_per_qudit == [2, 1, 1]
+        assert resources.magic_states_per_layer == [2, 1, 1]
+        assert resources.peak_magic_state_rate == 2
+
+    def test_circuit_gates_are_expanded(self) -> None:
+        inner = Circuit(2)
+        inner.append_gate(TGate(), 1)
+        inner.append_gate(CNOTGate(), (1, 0))
+        circuit = Circuit(3)
+        circuit.append_gate(CircuitGate(inner), (2, 0))
+        resources = estimate_resources(circuit)
+        assert resources.t_per_qudit == [1, 0, 0]
+        assert resources.clifford_count == 1
+
+    def test_empty(self) -> None:
+        resources = estimate_resources(Circuit(2))
+        assert resources.t_depth == 0
+        assert resources.peak_magic_state_rate == 0
+
+
+class TestResourceEstimationPass:
+
+    def test_stores_resources(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(TGate(), 0)
+        with Compiler() as compiler:
+            _, data = compiler.compile(
+                circuit,
+                [ResourceEstimationPass('counts')],
+                request_data=True,
+            )
+        assert data['counts'].t_count == 1
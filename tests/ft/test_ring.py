@@ -0,0 +1,86 @@
+"""This file tests exact arithmetic over Z[sqrt(2)], Z[1/sqrt(2)], and Z[w]."""
+from __future__ import annotations
+
+import numpy as np
+
+from bqskit.ft.cliffordt.ring import DyadicMatrix
+from bqskit.ft.cliffordt.ring import LAMBDA
+from bqskit.ft.cliffordt.ring import recognize_dyadic
+from bqskit.ft.cliffordt.ring import solve_grid_problem_1d
+from bqskit.ft.cliffordt.ring import ZOmega
+from bqskit.ft.cliffordt.ring import ZRootTwo
+
+
+class TestZRootTwo:
+
+    def test_arithmetic(self) -> None:
+        x = ZRootTwo(3, -2)
+        y = ZRootTwo(1, 5)
+        assert np.isclose(float(x * y), float(x) * float(y))
+        assert (x * y).norm() == x.norm() * y.norm()
+        assert LAMBDA * LAMBDA ** -1 == 1
+        assert ZRootTwo(4, 3).div_sqrt2().mul_sqrt2() == ZRootTwo(4, 3)
+
+    def test_grid_problem_1d(self) -> None:
+        solutions = set(solve_grid_problem_1d(-3, 3, -2, 2))
+        expected = {
+            ZRootTwo(a, b)
+            for a in range(-10, 11)
+            for b in range(-10, 11)
+            if abs(float(ZRootTwo(a, b))) <= 3
+            and abs(float(ZRootTwo(a, -b))) <= 2
+        }
+        assert solutions == expected
+
+    def test_recognize_dyadic(self) -> None:
+        assert recognize_dyadic(1 / np.sqrt(2), 8, 1e-11) == (ZRootTwo(1), 1)
+        value = (1 + np.sqrt(2)) / 2 ** 1.5
+        assert recognize_dyadic(value, 8, 1e-11) == (ZRootTwo(1, 1), 3)
+        assert recognize_dyadic(0.3, 8, 1e-11) is None
+
+    def test_gcd_and_sign(self) -> None:
+        x, y = ZRootTwo(7, 3), ZRootTwo(-2, 5)
+        assert (x * y).gcd(x).norm() in (x.norm(), -x.norm())
+        assert ZRootTwo(-3, 3).sign() == 1
+        assert ZRootTwo(3, -3).sign() == -1
+        assert ZRootTwo(0).sign() == 0
+
+
+class TestDyadicMatrix:
+
+    def test_from_float_round_trip(self) -> None:
+        c = 1 / np.sqrt(2)
+        rotation = np.array([[c, -c, 0], [c, c, 0], [0, 0, 1]])
+        matrix = DyadicMatrix.from_float(rotation)
+        assert matrix is not None
+        assert matrix.k == 1
+        assert matrix.is_orthogonal()
+        assert np.allclose(matrix.numpy(), rotation)
+        assert (matrix @ matrix.T).k == 0
+
+
+class TestZOmega:
+
+    def test_arithmetic(self) -> None:
+        x = ZOmega(1, -2, 3, 4)
+        y = ZOmega(-5, 0, 2, 1)
+        assert np.isclose(complex(x * y), complex(x) * complex(y))
+        assert np.isclose(complex(x.conj()), complex(x).conjugate())
+        assert np.isclose(float(x.norm_sq()), abs(complex(x)) ** 2)
+        assert ZOmega(0, 0, 1, 0) ** 8 == ZOmega(0, 0, 0, 1)
+
+    def test_div_sqrt2(self) -> None:
+        x = ZOmega(3, 1, -2, 5)
+        root2 = ZOmega(-1, 0, 1, 0)
+        assert (x * root2).is_divisible_by_sqrt2()
+        assert (x * root2).div_sqrt2() == x
+        assert not x.is_divisible_by_sqrt2()
+
+    def test_divmod_and_gcd(self) -> None:
+        x = ZOmega(2, -1, 0, 3)
+        y = ZOmega(1, 1, -1, 2)
+        quotient, remainder = (x * y).divmod(y)
+        assert quotient == x and remainder.is_zero()
+        _, remainder = x.divmod(y)
+        assert remainder.norm() < y.norm()
+        assert (x * y).gcd(y).norm() == y.norm()
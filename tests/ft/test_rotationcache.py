@@ -0,0 +1,148 @@
+"""This file tests the persistent RotationCache."""
+from __future__ import annotations
+
+import os
+import pickle
+import struct
+from pathlib import Path
+
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.registry import _compile_circuit_registry
+from bqskit.ft.cliffordt.budget import BudgetedRotationSynthesisPass
+from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
+from bqskit.ft.cliffordt.defaultworkflow import build_cliffordt_workflow
+from bqskit.ft.cliffordt.gridsynth import RZtoCliffordTSynthesisPass
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.gridsynth import synthesize_rz
+from bqskit.ft.cliffordt.rotationcache import RotationCache
+from bqskit.ir import Circuit
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+from bqskit.passes import SetModelPass
+
+
+class TestRotationCache:
+
+    def test_round_trip(self, tmp_path: Path) -> None:
+        cache = RotationCache(tmp_path / 'rz.cache')
+        gates = (HGate(), TGate(), SGate())
+        assert cache.get(0.3, 1e-6) is None
+        cache.put(0.3, 1e-6, gates)
+        assert cache.get(0.3, 1e-6) == gates
+        assert cache.get(0.3, 1e-5) is None
+        assert cache.hits == 1 and cache.misses == 2
+
+    def test_quantized_key(self, tmp_path: Path) -> None:
+        cache = RotationCache(tmp_path / 'rz.cache')
+        cache.put(0.3, 1e-6, (TGate(),))
+        assert cache.get(0.3 + 1e-13, 1e-6) == (TGate(),)
+        assert cache.get(0.3 + 1e-9, 1e-6) is None
+
+    def test_shared_between_instances(self, tmp_path: Path) -> None:
+        path = tmp_path / 'rz.cache'
+        reader = RotationCache(path)
+        writer = RotationCache(path)
+        writer.put(0.1, 1e-4, (HGate(), TGate()))
+        assert reader.get(0.1, 1e-4) == (HGate(), TGate())
+        copy = pickle.loads(pickle.dumps(reader))
+        assert copy.get(0.1, 1e-4) == (HGate(), TGate())
+
+    def test_eviction_is_bounded(self, tmp_path: Path) -> None:
+        path = tmp_path / 'rz.cache'
+        cache = RotationCache(path, max_entries=8, max_bytes=256)
+        for i in range(50):
+            cache.put(0.01 * i, 1e-4, (HGate(), TGate()) * (i % 5 + 1))
+        assert 0 < len(cache) <= 8
+        assert cache.get(0.49, 1e-4) is not None
+        assert cache.get(0.0, 1e-4) is None
+        assert os.path.getsize(path) <= 64 + 16 * 32 + 256
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path: Path) -> None:
+        path = tmp_path / 'rz.cache'
+        cache = RotationCache(path)
+        cache.put(0.2, 1e-3, (TGate(),) * 10)
+        with open(path, 'r+b') as f:
+            f.seek(-5, os.SEEK_END)
+            f.write(b'\x07')
+        assert RotationCache(path).get(0.2, 1e-3) is None
+
+    def test_unsupported_gates_are_not_stored(self, tmp_path: Path) -> None:
+        cache = RotationCache(tmp_path / 'rz.cache')
+        cache.put(0.2, 1e-3, (U3Gate(),))
+        assert len(cache) == 0
+
+    def test_not_a_cache(self, tmp_path: Path) -> None:
+        path = tmp_path / 'rz.cache'
+        path.write_bytes(struct.pack('<8s', b'notcache') + b'\0' * 100)
+        with pytest.raises(ValueError):
+            RotationCache(path)
+
+    def test_synthesize_rz_fills_store(self, tmp_path: Path) -> None:
+        store = RotationCache(tmp_path / 'rz.cache')
+        gates = synthesize_rz(0.37, 1e-4, None, store)
+        assert synthesize_rz(0.37, 1e-4, None, store) == gates
+        assert store.hits == 1 and store.misses == 1
+
+
+class TestRZtoCliffordTSynthesisPassStore:
+
+    def test_counts_in_pass_data(self, tmp_path: Path) -> None:
+        path = str(tmp_path / 'rz.cache')
+        circuit = Circuit(1)
+        circuit.append_gate(RZGate(), 0, [0.61])
+        workflow = [RZtoCliffordTSynthesisPass(1e-4, 0, path)]
+        with Compiler() as compiler:
+            _, data = compiler.compile(circuit, workflow, request_data=True)
+            assert data['rotation_cache'] == {'hits': 0, 'misses': 1}
+            _, data = compiler.compile(circuit, workflow, request_data=True)
+            assert data['rotation_cache']['hits'] == 1
+
+    def test_budgeted_pass_fills_store(self, tmp_path: Path) -> None:
+        path = str(tmp_path / 'rz.cache')
+        circuit = Circuit(1)
+        circuit.append_gate(RZGate(), 0, [0.61])
+        workflow = [BudgetedRotationSynthesisPass(1e-4, cache_path=path)]
+        with Compiler() as compiler:
+            compiler.compile(circuit, workflow)
+        assert len(RotationCache(path)) == 1
+
+
+class TestRotationCacheOption:
+
+    def test_workflow_option(self, tmp_path: Path) -> None:
+        path = str(tmp_path / 'rz.cache')
+        for error_budget in [None, 1e-4]:
+            options = CliffordTOptions(
+                error_budget=error_budget,
+                rotation_cache=path,
+            )
+            passes = build_cliffordt_workflow(1, options=options)
+            rotation_types = (
+                RZtoCliffordTSynthesisPass,
+                BudgetedRotationSynthesisPass,
+            )
+            rotation_passes = [
+                p for p in passes if isinstance(p, rotation_types)
+            ]
+            assert len(rotation_passes) == 1
+            assert rotation_passes[0].cache_path == path
+
+    def test_model_option(self, tmp_path: Path) -> None:
+        path = str(tmp_path / 'rz.cache')
+        circuit = Circuit(1)
+        circuit.append_gate(RZGate(), 0, [0.61])
+        model = CliffordTModel(
+            1,
+            options=CliffordTOptions(rotation_cache=path),
+        )
+        registered = _compile_circuit_registry[model][1]
+        workflow = [SetModelPass(model), *registered]
+        with Compiler(num_workers=1) as compiler:
+            _, data = compiler.compile(circuit, workflow, True)
+        assert data['rotation_cache'] == {'hits': 0, 'misses': 1}
+        assert len(RotationCache(path)) == 1
@@ -0,0 +1,55 @@
+"""This file tests the RoundToDiscreteZPass."""
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.rounding import discrete_z_gates
+from bqskit.ft.cliffordt.rounding import RoundToDiscreteZPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CircuitGate
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import RZGate
+
+
+class TestRoundToDiscreteZPass:
+
+    def test_classify_angles(self) -> None:
+        rounding = RoundToDiscreteZPass(1e-8)
+        angles = [0, np.pi / 4, -np.pi / 4 + 1e-9, 3 * np.pi, 0.1, 1e-7]
+        residues = rounding.classify_angles(angles)
+        assert residues.tolist() == [0, 1, 7, 4, -1, -1]
+
+    def test_check_angle_shares_gates(self) -> None:
+        rounding = RoundToDiscreteZPass()
+        gate = rounding.check_angle(np.pi / 2)
+        assert gate is discrete_z_gates()[2]
+        assert rounding.check_angle(0.3) is None
+
+    def test_replaces_discrete_rotations(self) -> None:
+        circuit = Circuit(2)
+        for k in range(-8, 9):
+            circuit.append_gate(RZGate(), k % 2, [k * np.pi / 4])
+            circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(RZGate(), 1, [0.3])
+
+        with Compiler() as compiler:
+            result = compiler.compile(circuit, [RoundToDiscreteZPass()])
+
+        assert result.count(RZGate()) == 1
+        assert sum(isinstance(op.gate, CircuitGate) for op in result) == 17
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
+
+    def test_error(self) -> None:
+        circuit = Circuit(1)
+        for angle in [np.pi / 4 + 1e-9, np.pi / 2, -1e-9, 0.3]:
+            circuit.append_gate(RZGate(), 0, [angle])
+        data = PassData(circuit)
+        asyncio.run(RoundToDiscreteZPass(1e-8).run(circuit, data))
+        expected = 1 - (1 - np.sin(5e-10)) ** 2
+        assert np.isclose(data.error, expected, rtol=1e-6, atol=0)
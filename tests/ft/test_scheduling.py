@@ -0,0 +1,103 @@
+"""This file tests magic-state-factory-aware scheduling."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.compact import CliffordTCircuit
+from bqskit.ft.cliffordt.scheduling import MagicStateSchedulingPass
+from bqskit.ft.cliffordt.scheduling import schedule_magic_states
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+
+
+def critical_chain(num_side: int, chain: int) -> Circuit:
+    """Independent T gates first, then a chain of T and H on qubit 0."""
+    circuit = Circuit(num_side + 1)
+    for qudit in range(1, num_side + 1):
+        circuit.append_gate(TGate(), qudit)
+    for _ in range(chain):
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(HGate(), 0)
+    return circuit
+
+
+class TestScheduleMagicStates:
+
+    def test_factory_bound(self) -> None:
+        circuit = Circuit(4)
+        for qudit in range(4):
+            circuit.append_gate(TGate(), qudit)
+        schedule = schedule_magic_states(circuit, 2, 10)
+        assert schedule.t_count == 4
+        assert schedule.runtime == 21
+        assert sorted(schedule.start.tolist()) == [10, 10, 20, 20]
+        assert sorted(schedule.factory.tolist()) == [0, 0, 1, 1]
+        assert schedule.factory_utilization == pytest.approx(40 / 42)
+
+    def test_critical_t_gates_go_first(self) -> None:
+        schedule = schedule_magic_states(critical_chain(20, 10), 1, 1)
+        # In program order the chain would wait for 20 states first;
+        # here only producing the 30 states bounds the runtime
+        assert schedule.runtime < 20 + 2 * 10
+        assert schedule.runtime == 30 + 1
+
+    def test_dependencies_and_commutation(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(HGate(), 1)
+        circuit.append_gate(HGate(), 1)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(TGate(), 1)
+        circuit.append_gate(HGate(), 0)
+        schedule = schedule_magic_states(circuit, 2, 1)
+        start = schedule.start.tolist()
+        assert start[2] >= start[1] + 1 >= start[0] + 2
+        assert start[4] >= start[2] + 1
+        assert start[5] >= max(start[2], start[3]) + 1
+
+        # The T gate on the control commutes with the CNOT
+        assert start[3] < start[2]
+
+    def test_compact_circuit_matches(self) -> None:
+        circuit = critical_chain(5, 5)
+        schedule = schedule_magic_states(circuit, 3, 4)
+        compact = CliffordTCircuit.from_circuit(circuit)
+        other = schedule_magic_states(compact, 3, 4)
+        assert np.array_equal(schedule.start, other.start)
+
+    def test_invalid(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(U3Gate(), 0, [0.1, 0.2, 0.3])
+        with pytest.raises(ValueError):
+            schedule_magic_states(circuit, 1, 1)
+        with pytest.raises(ValueError):
+            schedule_magic_states(Circuit(1), 0, 1)
+
+    def test_rz_gates_are_rejected(self) -> None:
+        circuit = Circuit(1)
+        circuit.append_gate(TGate(), 0)
+        circuit.append_gate(RZGate(), 0, [0.3])
+        with pytest.raises(ValueError, match='1 RZ gates'):
+            schedule_magic_states(circuit, 1, 1)
+        with pytest.raises(ValueError):
+            schedule_magic_states(CliffordTCircuit.from_circuit(circuit), 1, 1)
+
+
+class TestMagicStateSchedulingPass:
+
+    def test_schedule_is_stored(self) -> None:
+        circuit = critical_chain(4, 3)
+        with Compiler(num_workers=1) as compiler:
+            out, data = compiler.compile(
+                circuit,
+                [MagicStateSchedulingPass(2, 5)],
+                request_data=True,
+            )
+        assert out == circuit
+        assert data['magic_state_schedule'].t_count == 7
@@ -0,0 +1,93 @@
+"""This file tests compile-once, bind-many Clifford+T templates."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.ft.cliffordt.cliffordtgates import t_gates
+from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.rotationcache import RotationCache
+from bqskit.ft.cliffordt.template import RotationSlot
+from bqskit.ft.cliffordt.template import with_rotation_slots
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+
+
+def ansatz(angles: list[float]) -> Circuit:
+    circuit = Circuit(2)
+    for angle in angles:
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        circuit.append_gate(RZGate(), 1, [angle])
+        circuit.append_gate(CNOTGate(), (0, 1))
+    return circuit
+
+
+class TestRotationSlots:
+
+    def test_with_rotation_slots(self) -> None:
+        slotted, angles = with_rotation_slots(ansatz([0.1, 0.2]))
+        assert angles == [0.1, 0.2]
+        assert RZGate() not in slotted.gate_set
+        assert slotted.count(RotationSlot(1)) == 1
+
+
+class TestCliffordTTemplate:
+
+    def test_bind_many(self) -> None:
+        model = CliffordTModel(2)
+        # The first skeleton of this seed is off its input, and recompiled
+        with Compiler(num_workers=2) as compiler:
+            template = model.compile_template(
+                ansatz([0.0] * 3),
+                1,
+                compiler,
+                seed=103,
+            )
+        assert template.num_slots == 3
+
+        for angles in [[0.3, -1.2, 2.0], [np.pi / 4, np.pi / 2, 0.0]]:
+            result = template.bind(angles)
+            assert RZGate() not in result.gate_set
+            assert not any(isinstance(op.gate, RotationSlot) for op in result)
+            assert any(result.count(g) > 0 for g in t_gates)
+            assert result.get_unitary().get_distance_from(
+                ansatz(angles).get_unitary(),
+            ) < 1e-6
+
+    def test_seed(self) -> None:
+        model = CliffordTModel(2)
+        with Compiler(num_workers=1) as compiler:
+            templates = [
+                model.compile_template(ansatz([0.0] * 2), 1, compiler, 7)
+                for _ in range(2)
+            ]
+        assert templates[0].operations == templates[1].operations
+
+    def test_bind_checks_angle_count(self) -> None:
+        with Compiler(num_workers=1) as compiler:
+            template = CliffordTModel(2).compile_template(
+                ansatz([0.5]),
+                compiler=compiler,
+            )
+        with pytest.raises(ValueError):
+            template.bind([0.1, 0.2])
+
+    def test_bind_fills_rotation_cache(self, tmp_path: Path) -> None:
+        path = str(tmp_path / 'rz.cache')
+        model = CliffordTModel(
+            2,
+            options=CliffordTOptions(rotation_cache=path),
+        )
+        with Compiler(num_workers=1) as compiler:
+            template = model.compile_template(ansatz([0.5]), 1, compiler)
+        assert template.cache_path == path
+
+        template.bind([0.4321])
+        assert len(RotationCache(path)) == 1
@@ -0,0 +1,213 @@
+"""This file tests the equivalence verification of Clifford+T circuits."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from random import choice
+from random import sample
+from random import seed
+
+import numpy as np
+import pytest
+
+from bqskit.compiler import Compiler
+from bqskit.compiler.basepass import BasePass
+from bqskit.compiler.passdata import PassData
+from bqskit.ft.cliffordt.defaultworkflow import build_circuit_workflow
+from bqskit.ft.cliffordt.defaultworkflow import build_cliffordt_workflow
+from bqskit.ft.cliffordt.gridsynth import RZtoCliffordTSynthesisPass
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.phasefolding import PhaseFoldingPass
+from bqskit.ft.cliffordt.verification import EquivalenceVerificationPass
+from bqskit.ft.cliffordt.verification import verify_equivalence
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import CRZGate
+from bqskit.ir.gates import CZGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RXGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import SGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+from bqskit.ir.gates import U3Gate
+
+
+def random_circuit(num_qudits: int, num_gates: int) -> Circuit:
+    gates = [
+        HGate(), SGate(), CNOTGate(), CZGate(), TGate(), TdgGate(),
+        RZGate(), RXGate(), U3Gate(),
+    ]
+    angles = [np.pi / 4, np.pi / 2, 0.3, -0.7]
+    circuit = Circuit(num_qudits)
+    while circuit.num_operations < num_gates:
+        gate = choice(gates)
+        if gate.num_qudits > num_qudits:
+            continue
+        location = sample(range(num_qudits), gate.num_qudits)
+        params = [choice(angles) for _ in range(gate.num_params)]
+        circuit.append_gate(gate, location, params)
+    return circuit
+
+
+def clifford_t_circuit(num_qudits: int, num_gates: int) -> Circuit:
+    gates = [HGate(), SGate(), CNOTGate(), TGate(), TdgGate()]
+    circuit = Circuit(num_qudits)
+    for _ in range(num_gates):
+        gate = choice(gates)
+        circuit.append_gate(gate, sample(range(num_qudits), gate.num_qudits))
+    return circuit
+
+
+class AppendPass(BasePass):
+
+    async def run(self, circuit: Circuit, data: PassData) -> None:
+        circuit.append_gate(TGate(), 0)
+
+
+class TestVerifyEquivalence:
+
+    def test_same_circuit(self) -> None:
+        seed(3)
+        for num_qudits in [1, 2, 3, 4]:
+            circuit = random_circuit(num_qudits, 30)
+            result = verify_equivalence(circuit.copy(), circuit)
+            assert result.passed
+            assert result.method == 'clifford'
+            assert result.distance_bound < 1e-8
+
+    def test_bound_holds(self) -> None:
+        seed(5)
+        for num_qudits in [2, 3, 4]:
+            circuit = random_circuit(num_qudits, 30)
+            perturbed = circuit.copy()
+            perturbed.append_gate(RZGate(), num_qudits - 1, [0.01])
+            distance = perturbed.get_unitary().get_distance_from(
+                circuit.get_unitary(),
+            )
+            result = verify_equivalence(perturbed, circuit)
+            assert result.method == 'generators'
+            assert not result.passed
+            assert distance - 1e-9 <= result.distance_bound <= 0.1
+            assert verify_equivalence(perturbed, circuit, 0.1).passed
+
+    def test_sampling(self) -> None:
+        seed(7)
+        circuit = random_circuit(3, 30)
+        perturbed = circuit.copy()
+        perturbed.append_gate(RXGate(), 1, [0.3])
+        distance = perturbed.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        )
+        result = verify_equivalence(
+            perturbed,
+            circuit,
+            num_samples=2000,
+            confidence=0.99,
+            seed=1,
+        )
+        assert result.method == 'sampling'
+        assert result.num_paulis == 2000
+        assert result.confidence == 0.99
+        assert abs(result.fidelity_estimate - (1 - distance ** 2)) < 0.05
+        assert result.distance_bound >= distance
+        assert result.fidelity_bound <= 1 - distance ** 2
+
+    def test_clifford_difference(self) -> None:
+        seed(9)
+        circuit = random_circuit(3, 30)
+        different = circuit.copy()
+        different.append_gate(SGate(), 0)
+        result = verify_equivalence(different, circuit)
+        assert not result.passed
+        assert result.distance_bound == 1.0
+
+    def test_many_qubits(self) -> None:
+        seed(11)
+        circuit = clifford_t_circuit(100, 2000)
+        optimized = circuit.copy()
+        asyncio.run(PhaseFoldingPass().run(optimized, PassData(optimized)))
+        assert optimized.count(TGate()) < circuit.count(TGate())
+        result = verify_equivalence(optimized, circuit)
+        assert result.passed
+        assert result.method == 'clifford'
+        assert result.num_paulis == 200
+
+        optimized.append_gate(TGate(), 0)
+        assert not verify_equivalence(optimized, circuit).passed
+
+    def test_other_gates(self) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(CRZGate(), (0, 1), [0.3])
+        result = verify_equivalence(circuit, circuit.copy())
+        assert result.passed
+        assert result.method == 'unitary'
+
+        circuit = Circuit(10)
+        circuit.append_gate(CRZGate(), (0, 1), [0.3])
+        with pytest.raises(ValueError):
+            verify_equivalence(circuit, circuit.copy())
+        with pytest.raises(ValueError):
+            verify_equivalence(circuit, Circuit(9))
+        with pytest.raises(ValueError):
+            verify_equivalence(circuit, circuit.copy(), num_samples=0)
+
+
+class TestEquivalenceVerificationPass:
+
+    def test_synthesized_rotations(self) -> None:
+        circuit = Circuit(8)
+        for q in range(8):
+            circuit.append_gate(HGate(), q)
+            circuit.append_gate(RZGate(), q, [0.3 * (q + 1)])
+        for q in range(7):
+            circuit.append_gate(CNOTGate(), (q, q + 1))
+        workflow = [
+            EquivalenceVerificationPass(
+                [RZtoCliffordTSynthesisPass(1e-8)],
+                chunk_size=2,
+            ),
+        ]
+        with Compiler(num_workers=2) as compiler:
+            result, data = compiler.compile(circuit, workflow, True)
+        assert result.count(RZGate()) == 0
+        verification = data['cliffordt_verification']
+        assert verification.passed
+        assert verification.num_paulis == 16
+        assert 0 < verification.distance_bound < 1e-6
+
+    def test_failure_is_logged(self, caplog: pytest.LogCaptureFixture) -> None:
+        circuit = Circuit(2)
+        circuit.append_gate(HGate(), 0)
+        circuit.append_gate(CNOTGate(), (0, 1))
+        data = PassData(circuit)
+        verification = EquivalenceVerificationPass([AppendPass()], key='v')
+        with caplog.at_level(logging.WARNING):
+            asyncio.run(verification.run(circuit, data))
+        assert not data['v'].passed
+        assert 'Failed verification' in caplog.text
+
+    def test_workflow_option(self) -> None:
+        passes = build_cliffordt_workflow(1)
+        assert not any(
+            isinstance(p, EquivalenceVerificationPass) for p in passes
+        )
+        passes = build_cliffordt_workflow(
+            1,
+            options=CliffordTOptions(verify=1e-3),
+        )
+        assert len(passes) == 1
+        assert isinstance(passes[0], EquivalenceVerificationPass)
+        assert passes[0].threshold == 1e-3
+
+        circuit = Circuit(2)
+        circuit.append_gate(RZGate(), 0, [0.3])
+        circuit.append_gate(CNOTGate(), (0, 1))
+        workflow = build_circuit_workflow(
+            1,
+            seed=1,
+            options=CliffordTOptions(verify=True),
+        )
+        with Compiler(num_workers=1) as compiler:
+            _, data = compiler.compile(circuit, workflow, True)
+        assert data['cliffordt_verification'].passed
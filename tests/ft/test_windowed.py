@@ -0,0 +1,129 @@
+"""This file tests the WindowedCompilationPass."""
+from __future__ import annotations
+
+import numpy as np
+
+from bqskit.compiler import Compiler
+from bqskit.compiler import MachineModel
+from bqskit.ft.cliffordt.cliffordtmodel import CliffordTModel
+from bqskit.ft.cliffordt.defaultworkflow import build_circuit_workflow
+from bqskit.ft.cliffordt.options import CliffordTOptions
+from bqskit.ft.cliffordt.profiling import profile_workflow
+from bqskit.ft.cliffordt.windowed import _cost
+from bqskit.ft.cliffordt.windowed import _window_rotations
+from bqskit.ft.cliffordt.windowed import split_windows
+from bqskit.ft.cliffordt.windowed import WindowedCompilationPass
+from bqskit.ir import Circuit
+from bqskit.ir.gates import CNOTGate
+from bqskit.ir.gates import HGate
+from bqskit.ir.gates import RZGate
+from bqskit.ir.gates import TdgGate
+from bqskit.ir.gates import TGate
+
+
+def random_circuit(
+    num_gates: int,
+    seed: int = 0,
+    discrete: bool = True,
+) -> Circuit:
+    rng = np.random.default_rng(seed)
+    circuit = Circuit(3)
+    for _ in range(num_gates):
+        q = int(rng.integers(3))
+        kind = rng.integers(3)
+        if kind == 0:
+            circuit.append_gate(HGate(), q)
+        elif kind == 1:
+            angle = np.pi / 4 * rng.integers(8) if discrete else rng.random()
+            circuit.append_gate(RZGate(), q, [angle])
+        else:
+            circuit.append_gate(CNOTGate(), (q, (q + 1) % 3))
+    return circuit
+
+
+class TestSplitWindows:
+
+    def test_windows_rebuild_circuit(self) -> None:
+        circuit = random_circuit(50)
+        windows = list(split_windows(circuit, 8))
+        assert len(windows) > 1
+        assert all(w.num_operations >= 8 for w in windows[:-1])
+        rebuilt = Circuit(3)
+        for window in windows:
+            rebuilt.append_circuit(window, [0, 1, 2])
+        assert rebuilt == circuit
+
+    def test_window_rotations(self) -> None:
+        circuit = random_circuit(50)
+        rotations = _window_rotations(circuit, 8)
+        windows = list(split_windows(circuit, 8))
+        assert rotations == [w.count(RZGate()) for w in windows]
+
+
+class TestWindowedCompilationPass:
+
+    def test_matches_whole_circuit(self) -> None:
+        circuit = random_circuit(40)
+        workflow = build_circuit_workflow(
+            1,
+            options=CliffordTOptions(window_size=10),
+        )
+        assert isinstance(workflow[0], WindowedCompilationPass)
+        with Compiler(num_workers=2) as compiler:
+            result = compiler.compile(circuit, workflow)
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
+
+    def test_seams_are_kept_when_cheaper(self) -> None:
+        circuit = Circuit(1)
+        for gate in [HGate(), TGate(), TdgGate(), HGate()]:
+            circuit.append_gate(gate, 0)
+        windowed = WindowedCompilationPass(
+            build_circuit_workflow(1)[:-2],
+            window_size=2,
+            overlap=2,
+        )
+        with Compiler(num_workers=2) as compiler:
+            result = compiler.compile(circuit, windowed)
+        assert result.count(TGate()) + result.count(TdgGate()) == 0
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) < 1e-7
+
+    def test_seams_are_costed_by_the_model(self) -> None:
+        rotation = Circuit(1)
+        rotation.append_gate(RZGate(), 0, [0.1])
+        t_gates = Circuit(1)
+        for _ in range(3):
+            t_gates.append_gate(TGate(), 0)
+        model = CliffordTModel(1)
+        assert _cost(t_gates, model) < _cost(rotation, model)
+        machine = MachineModel(1)
+        assert _cost(rotation, machine) < _cost(t_gates, machine)
+
+    def test_budget_is_split_between_windows(self) -> None:
+        circuit = random_circuit(40, discrete=False)
+        options = CliffordTOptions(window_size=10, error_budget=1e-3)
+        workflow = build_circuit_workflow(1, options=options)
+        with Compiler(num_workers=2) as compiler:
+            result, data = compiler.compile(circuit, workflow, True)
+        record = data['error_budget']
+        assert 0 < record['total'] <= 1e-3 + 1e-12
+        assert not record['exceeded']
+        assert data.error <= 1e-3
+        assert result.get_unitary().get_distance_from(
+            circuit.get_unitary(),
+        ) <= 1e-3
+
+    def test_window_records_are_merged(self) -> None:
+        circuit = random_circuit(40)
+        windowed = WindowedCompilationPass(
+            profile_workflow(build_circuit_workflow(1)[:-2]),
+            window_size=10,
+            overlap=0,
+        )
+        with Compiler(num_workers=2) as compiler:
+            _, data = compiler.compile(circuit, windowed, True)
+        windows = {record['window'] for record in data['pass_profile']}
+        assert windows == set(range(len(list(split_windows(circuit, 10)))))